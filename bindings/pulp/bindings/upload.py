@@ -29,6 +29,16 @@ class UploadAPI(PulpAPI):
         url = '/v2/content/uploads/%s/%s/' % (upload_id, offset)
         return self.server.PUT(url, data, ensure_encoding=False)
 
+    def find_existing_unit(self, upload_id, unit_type_id, unit_key, checksum_type, checksum):
+        url = '/v2/content/uploads/%s/existing/' % upload_id
+        body = {
+            'unit_type_id': unit_type_id,
+            'unit_key': unit_key,
+            'checksum_type': checksum_type,
+            'checksum': checksum,
+        }
+        return self.server.POST(url, body)
+
     def list_all_uploads(self):
         url = '/v2/content/uploads/'
         return self.server.GET(url)
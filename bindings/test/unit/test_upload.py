@@ -38,3 +38,16 @@ class TestUploadAPI(unittest.TestCase):
         self.api.server.POST.assert_called_once_with('/v2/repositories/%s/actions/import_upload/'
                                                      % 'repo_id', expected_body)
         self.assertEqual(ret, self.api.server.POST.return_value)
+
+    def test_find_existing_unit(self):
+        ret = self.api.find_existing_unit('upload_id', 'unit_type_id', {'k': 'v'}, 'sha256', 'abc')
+        expected_body = {
+            'unit_type_id': 'unit_type_id',
+            'unit_key': {'k': 'v'},
+            'checksum_type': 'sha256',
+            'checksum': 'abc',
+        }
+
+        self.api.server.POST.assert_called_once_with('/v2/content/uploads/upload_id/existing/',
+                                                     expected_body)
+        self.assertEqual(ret, self.api.server.POST.return_value)
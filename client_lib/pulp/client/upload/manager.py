@@ -20,15 +20,30 @@ client-side tracking of upload requests on the server.
 
 import copy
 import errno
+import hashlib
 import os
 import pickle
+import Queue
 import sys
+import threading
 
+from pulp.bindings.exceptions import (ApacheServerException, NotFoundException,
+                                      PulpServerException)
 from pulp.common.lock import LockFile
+from pulp.common.util import add_range, missing_ranges
 
 # -- constants ----------------------------------------------------------------
 
 DEFAULT_CHUNKSIZE = 1048576 # 1 MB per upload call
+DEFAULT_CONCURRENCY = 4  # number of upload calls in flight at once
+
+# Checksum sent to the server to find out if the file being uploaded is
+# already in its content storage
+CHECKSUM_TYPE = 'sha256'
+
+# Seconds to wait for a segment result at a time, so a KeyboardInterrupt is
+# not held off until the next segment completes
+RESULT_WAIT = 1
 
 # -- exceptions ---------------------------------------------------------------
 
@@ -85,7 +100,8 @@ class UploadManager(object):
     on disk state files.
     """
 
-    def __init__(self, upload_working_dir, bindings, chunk_size=DEFAULT_CHUNKSIZE):
+    def __init__(self, upload_working_dir, bindings, chunk_size=DEFAULT_CHUNKSIZE,
+                 concurrency=DEFAULT_CONCURRENCY):
         """
         @param upload_working_dir: directory in which to store client-side files
                to track upload requests; if it doesn't exist it will be created
@@ -98,10 +114,14 @@ class UploadManager(object):
         @param chunk_size: size in bytes of data to upload on each call to the
                server
         @type  chunk_size: int
+
+        @param concurrency: number of segments to upload to the server at once
+        @type  concurrency: int
         """
         self.upload_working_dir = upload_working_dir
         self.bindings = bindings
         self.chunk_size = chunk_size
+        self.concurrency = concurrency
 
         # Internal state
         self.tracker_files = {}
@@ -178,6 +198,7 @@ class UploadManager(object):
         tracker_file.upload_id = upload_id
         tracker_file.location = location
         tracker_file.offset = 0
+        tracker_file.completed_ranges = []
         tracker_file.repo_id = repo_id
         tracker_file.unit_type_id = unit_type_id
         tracker_file.unit_key = unit_key
@@ -198,13 +219,22 @@ class UploadManager(object):
         Begins or resumes the upload process for the given upload request.
         This call will not return until the upload is complete. The other
         expected exit point is a KeyboardError to kill the process. The
-        client-side on disk tracker files will store the current offset and
-        resume the upload from where it left off on the next call to this method.
+        client-side on disk tracker files will store the ranges of the file
+        that have been uploaded and resume the upload from where it left off
+        on the next call to this method.
+
+        Before any bits are uploaded, the checksum of the file is sent to the
+        server along with the unit key. If the server already has the unit in
+        its content storage, nothing is uploaded and importing the upload
+        associates the existing unit with the repository.
+
+        Up to concurrency segments are uploaded at once, each by its own
+        thread, in the order they appear in the file.
 
         The callback_func is used to get feedback on the upload process. After
         each successful upload segment call to the server, this function
-        will be invoked with the new offset in the file and the file size
-        (intended to be fed into a progress indicator). As this is called
+        will be invoked with the number of bytes uploaded so far and the file
+        size (intended to be fed into a progress indicator). As this is called
         after each upload segment call, the granularity at which it is called
         depends on the chunk_size value for this instance.
 
@@ -249,22 +279,35 @@ class UploadManager(object):
 
             source_file_size = os.path.getsize(tracker_file.source_filename)
 
-            f = open(tracker_file.source_filename, 'r')
-            while True:
-                # Load the chunk to upload
-                f.seek(tracker_file.offset)
-                data = f.read(self.chunk_size)
-                if not data:
-                    break
-
-                # Server request
-                self.bindings.uploads.upload_segment(upload_id, tracker_file.offset, data)
-
+            # Trackers saved before ranges were recorded only know the offset
+            if getattr(tracker_file, 'completed_ranges', None) is None:
+                tracker_file.completed_ranges = []
+                if tracker_file.offset:
+                    tracker_file.completed_ranges = [[0, tracker_file.offset]]
+
+            if not tracker_file.completed_ranges and self._unit_exists(upload_id, tracker_file):
+                tracker_file.is_finished_uploading = True
+                if callback_func is not None:
+                    callback_func(source_file_size, source_file_size)
+                return
+
+            segments = []
+            for start, end in missing_ranges(tracker_file.completed_ranges, source_file_size):
+                for offset in range(start, end, self.chunk_size):
+                    segments.append((offset, min(offset + self.chunk_size, end) - offset))
+
+            uploaded = source_file_size - sum(size for offset, size in segments)
+            for offset, size in self._upload_segments(upload_id, tracker_file, segments):
                 # Status update and callback notification
-                tracker_file.offset = min(tracker_file.offset + self.chunk_size, source_file_size)
+                tracker_file.completed_ranges = add_range(tracker_file.completed_ranges,
+                                                          offset, offset + size)
+                first_start, first_end = tracker_file.completed_ranges[0]
+                tracker_file.offset = first_end if first_start == 0 else 0
                 tracker_file.save()
 
-                callback_func(tracker_file.offset, source_file_size)
+                uploaded += size
+                if callback_func is not None:
+                    callback_func(uploaded, source_file_size)
 
             tracker_file.is_finished_uploading = True
         finally:
@@ -383,6 +426,118 @@ class UploadManager(object):
         self._uncache_tracker_file(tracker)
         tracker.delete()
 
+    def _unit_exists(self, upload_id, tracker_file):
+        """
+        Asks the server whether the unit being uploaded is already in its
+        content storage.
+
+        @param upload_id: identifies the upload request
+        @type  upload_id: str
+
+        @param tracker_file: tracker for the upload
+        @type  tracker_file: UploadTracker
+
+        @return: True if the server has the unit and its bits need not be uploaded
+        @rtype:  bool
+        """
+        checksum = hashlib.new(CHECKSUM_TYPE)
+        f = open(tracker_file.source_filename, 'r')
+        try:
+            data = f.read(self.chunk_size)
+            while data:
+                checksum.update(data)
+                data = f.read(self.chunk_size)
+        finally:
+            f.close()
+
+        try:
+            response = self.bindings.uploads.find_existing_unit(
+                upload_id, tracker_file.unit_type_id, tracker_file.unit_key, CHECKSUM_TYPE,
+                checksum.hexdigest())
+        except (NotFoundException, PulpServerException, ApacheServerException):
+            # Servers that predate this call answer 405 for it. If the upload request is
+            # gone instead, uploading the bits will fail in the usual way.
+            return False
+
+        return bool(response.response_body.get('exists'))
+
+    def _upload_segments(self, upload_id, tracker_file, segments):
+        """
+        Uploads the given segments of the tracker's source file using up to
+        concurrency threads, yielding each segment once the server has it.
+
+        If uploading a segment fails, no further segments are started and the
+        exception is raised once the segments in flight have finished.
+
+        @param upload_id: identifies the upload request
+        @type  upload_id: str
+
+        @param tracker_file: tracker for the upload
+        @type  tracker_file: UploadTracker
+
+        @param segments: (offset, size) of each segment to upload, in order
+        @type  segments: list
+
+        @return: generator of (offset, size) of the uploaded segments
+        """
+        todo = Queue.Queue()
+        for segment in segments:
+            todo.put(segment)
+        results = Queue.Queue()
+        stop = threading.Event()
+
+        def upload_segments():
+            source = open(tracker_file.source_filename, 'r')
+            try:
+                while not stop.is_set():
+                    try:
+                        offset, size = todo.get_nowait()
+                    except Queue.Empty:
+                        return
+                    try:
+                        source.seek(offset)
+                        data = source.read(size)
+                        self.bindings.uploads.upload_segment(upload_id, offset, data)
+                    except Exception:
+                        stop.set()
+                        results.put((offset, size, sys.exc_info()))
+                        return
+                    results.put((offset, size, None))
+            finally:
+                source.close()
+                results.put(None)
+
+        threads = []
+        for i in range(min(self.concurrency, len(segments))):
+            thread = threading.Thread(target=upload_segments)
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+
+        try:
+            error = None
+            running = len(threads)
+            while running:
+                try:
+                    result = results.get(True, RESULT_WAIT)
+                except Queue.Empty:
+                    continue
+                if result is None:
+                    # A thread has run out of segments
+                    running -= 1
+                    continue
+                offset, size, exc_info = result
+                if exc_info is not None:
+                    error = error or exc_info
+                else:
+                    yield offset, size
+            if error is not None:
+                raise error[0], error[1], error[2]
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+
     # -- tracker utilities ----------------------------------------------------
 
     def _tracker_filename(self, upload_id):
@@ -413,7 +568,8 @@ class UploadTracker(object):
         # Upload call information
         self.upload_id = None
         self.location = None # URL to the upload request on the server
-        self.offset = None # start of next chunk to upload
+        self.offset = None  # end of the uploaded data at the start of the file
+        self.completed_ranges = []  # sorted [start, end] ranges of the file uploaded
         self.source_filename = None # path on disk to the file to upload
 
         # Import call information
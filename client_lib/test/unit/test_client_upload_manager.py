@@ -12,6 +12,7 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import errno
+import hashlib
 import math
 import os
 import shutil
@@ -19,7 +20,8 @@ import unittest
 
 import mock
 
-from pulp.bindings.exceptions import NotFoundException
+from pulp.bindings.exceptions import (ApacheServerException, NotFoundException,
+                                      PulpServerException)
 from pulp.bindings.responses import Response
 import pulp.client.upload.manager as upload_util
 
@@ -49,6 +51,7 @@ class UploadManagerTests(unittest.TestCase):
         self.mock_bindings.uploads = self.mock_upload_bindings
 
         self._mock_initialize_upload()
+        self._mock_find_existing_unit()
         self._mock_upload_segment()
         self._mock_delete_upload()
         self._mock_import_upload()
@@ -262,20 +265,25 @@ class UploadManagerTests(unittest.TestCase):
         rpm_size = os.path.getsize(TEST_RPM_FILENAME)
         num_upload_calls = int(math.ceil(float(rpm_size) / float(self.upload_manager.chunk_size)))
 
-        # Verify the callback calls
+        # Verify the callback calls; the last segment is shorter and may finish
+        # before others
         self.assertEqual(num_upload_calls, mock_callback.update_status.call_count)
 
-        expected_offset = self.upload_manager.chunk_size
+        uploaded = 0
         for single_call_args in mock_callback.update_status.call_args_list:
             non_kwargs = single_call_args[0]
-            self.assertEqual(expected_offset, non_kwargs[0])
+            self.assertTrue(uploaded < non_kwargs[0] <= uploaded + self.upload_manager.chunk_size)
             self.assertEqual(rpm_size, non_kwargs[1])
-            expected_offset = min(expected_offset + self.upload_manager.chunk_size, rpm_size)
+            uploaded = non_kwargs[0]
+        self.assertEqual(rpm_size, uploaded)
 
-        # Verify the contents of the body sent to the server
+        # Verify the contents of the body sent to the server; segments are uploaded
+        # concurrently so the calls may be made in any order
         self.assertEqual(num_upload_calls, self.mock_upload_bindings.upload_segment.call_count)
         offset = 0
-        for single_call_args in self.mock_upload_bindings.upload_segment.call_args_list:
+        call_args_list = sorted(self.mock_upload_bindings.upload_segment.call_args_list,
+                                key=lambda c: c[0][1])
+        for single_call_args in call_args_list:
             # Body
             f = open(TEST_RPM_FILENAME, 'r')
             f.seek(offset)
@@ -301,6 +309,131 @@ class UploadManagerTests(unittest.TestCase):
         # Verify the state of the tracker in memory
         tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
         self.assertEqual(rpm_size, tracker.offset)
+        self.assertEqual([[0, rpm_size]], tracker.completed_ranges)
+
+    def test_upload_existing_unit(self):
+        # Setup
+        self._mock_find_existing_unit(exists=True)
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        mock_callback = mock.Mock()
+
+        # Test
+        self.upload_manager.upload(upload_id, mock_callback.update_status)
+
+        # Verify
+        f = open(TEST_RPM_FILENAME)
+        checksum = hashlib.sha256(f.read()).hexdigest()
+        f.close()
+        self.mock_upload_bindings.find_existing_unit.assert_called_once_with(
+            upload_id, 'type-1', {'k': 'v'}, 'sha256', checksum)
+        self.assertEqual(0, self.mock_upload_bindings.upload_segment.call_count)
+
+        rpm_size = os.path.getsize(TEST_RPM_FILENAME)
+        mock_callback.update_status.assert_called_once_with(rpm_size, rpm_size)
+        tracker = upload_util.UploadTracker.load(self.upload_manager._tracker_filename(upload_id))
+        self.assertTrue(tracker.is_finished_uploading)
+        self.assertFalse(tracker.is_running)
+
+    def test_upload_existing_unit_not_supported(self):
+        # Setup
+        self.mock_upload_bindings.find_existing_unit.side_effect = NotFoundException({})
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+
+        # Test
+        self.upload_manager.upload(upload_id, mock.Mock())
+
+        # Verify
+        self.assertEqual(1, self.mock_upload_bindings.upload_segment.call_count)
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        self.assertTrue(tracker.is_finished_uploading)
+
+    def test_upload_existing_unit_method_not_allowed(self):
+        # Setup
+        self.mock_upload_bindings.find_existing_unit.side_effect = ApacheServerException('None')
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+
+        # Test
+        self.upload_manager.upload(upload_id, mock.Mock())
+
+        # Verify
+        self.assertEqual(1, self.mock_upload_bindings.upload_segment.call_count)
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        self.assertTrue(tracker.is_finished_uploading)
+
+    def test_upload_existing_unit_server_error(self):
+        # Setup
+        self.mock_upload_bindings.find_existing_unit.side_effect = PulpServerException({})
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+
+        # Test
+        self.upload_manager.upload(upload_id, mock.Mock())
+
+        # Verify
+        self.assertEqual(1, self.mock_upload_bindings.upload_segment.call_count)
+
+    def test_upload_resume_missing_ranges(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        tracker.completed_ranges = [[0, 300], [400, 1000]]
+        tracker.offset = 300
+        mock_callback = mock.Mock()
+
+        # Test
+        self.upload_manager.upload(upload_id, mock_callback.update_status)
+
+        # Verify
+        rpm_size = os.path.getsize(TEST_RPM_FILENAME)
+        offsets = sorted(c[0][1] for c in self.mock_upload_bindings.upload_segment.call_args_list)
+        self.assertEqual([300] + range(1000, rpm_size, 100), offsets)
+        self.assertFalse(self.mock_upload_bindings.find_existing_unit.called)
+        self.assertEqual(mock_callback.update_status.call_args_list[0][0], (1000, rpm_size))
+        self.assertEqual(mock_callback.update_status.call_args[0], (rpm_size, rpm_size))
+        self.assertEqual([[0, rpm_size]], tracker.completed_ranges)
+
+    def test_upload_resume_tracker_without_ranges(self):
+        # Setup
+        self.upload_manager.chunk_size = 1000
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        tracker = self.upload_manager._get_tracker_file_by_id(upload_id)
+        del tracker.completed_ranges
+        tracker.offset = 1000
+
+        # Test
+        self.upload_manager.upload(upload_id, mock.Mock())
+
+        # Verify
+        offsets = [c[0][1] for c in self.mock_upload_bindings.upload_segment.call_args_list]
+        self.assertFalse(0 in offsets)
+        self.assertTrue(tracker.is_finished_uploading)
+
+    def test_upload_segment_error(self):
+        # Setup
+        self.upload_manager.chunk_size = 100
+        self.upload_manager.concurrency = 1
+        upload_id = self.upload_manager.initialize_upload(TEST_RPM_FILENAME, 'repo-1', 'type-1',
+                                                          {'k': 'v'}, 'm-1')
+        self.mock_upload_bindings.upload_segment.side_effect = [None, None, NotFoundException({}),
+                                                                None]
+
+        # Test
+        self.assertRaises(NotFoundException, self.upload_manager.upload, upload_id, mock.Mock())
+
+        # Verify no further segments are started and the completed ones are recorded
+        self.assertEqual(3, self.mock_upload_bindings.upload_segment.call_count)
+        tf_filename = self.upload_manager._tracker_filename(upload_id)
+        tracker = upload_util.UploadTracker.load(tf_filename)
+        self.assertEqual([[0, 200]], tracker.completed_ranges)
+        self.assertEqual(200, tracker.offset)
+        self.assertFalse(tracker.is_finished_uploading)
+        self.assertFalse(tracker.is_running)
 
     def test_upload_concurrent_upload(self):
         # Setup
@@ -435,6 +568,13 @@ class UploadManagerTests(unittest.TestCase):
         }
         self.mock_upload_bindings.initialize_upload.return_value = Response(201, body)
 
+    def _mock_find_existing_unit(self, exists=False):
+        """
+        Configures the mock bindings to report whether the unit is already on the server.
+        """
+        body = {'exists': exists, 'unit_id': exists and 'unit-1' or None}
+        self.mock_upload_bindings.find_existing_unit.return_value = Response(200, body)
+
     def _mock_upload_segment(self):
         """
         Configures the mock bindings to return a valid response to uploading a segment.
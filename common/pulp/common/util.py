@@ -53,3 +53,53 @@ def partial(func, *args, **kwds):
     Python 2.4 doesn't provide functools so provide our own version of the partial method
     """
     return lambda *fargs, **fkwds: func(*(args+fargs), **dict(kwds, **fkwds))
+
+
+def add_range(ranges, start, end):
+    """
+    Add the half-open range [start, end) to a list of ranges, merging it with any ranges it
+    overlaps or touches.
+
+    @param ranges: sorted list of non-overlapping [start, end] pairs; it is not modified
+    @type  ranges: list
+    @param start: first position in the range
+    @type  start: int
+    @param end: position just past the end of the range
+    @type  end: int
+    @return: new sorted list of non-overlapping [start, end] pairs
+    @rtype:  list
+    """
+    merged = []
+    for range_start, range_end in ranges:
+        if range_end < start or range_start > end:
+            merged.append([range_start, range_end])
+        else:
+            start = min(start, range_start)
+            end = max(end, range_end)
+    merged.append([start, end])
+    merged.sort()
+    return merged
+
+
+def missing_ranges(ranges, size):
+    """
+    Return the gaps in [0, size) that are not covered by a list of ranges.
+
+    @param ranges: sorted list of non-overlapping [start, end] pairs
+    @type  ranges: list
+    @param size: end of the space the ranges cover
+    @type  size: int
+    @return: sorted list of [start, end] pairs
+    @rtype:  list
+    """
+    gaps = []
+    position = 0
+    for range_start, range_end in ranges:
+        if range_start > position:
+            gaps.append([position, min(range_start, size)])
+        position = max(position, range_end)
+        if position >= size:
+            break
+    if position < size:
+        gaps.append([position, size])
+    return gaps
@@ -52,3 +52,30 @@ class TestPartial(unittest.TestCase):
         result_kwargs.update(kwargs)
         result_kwargs.update(additional_kwargs)
         base_func.assert_called_once_with(*result_args, **result_kwargs)
+
+
+class TestRanges(unittest.TestCase):
+
+    def test_add_range_empty(self):
+        self.assertEqual(util.add_range([], 5, 10), [[5, 10]])
+
+    def test_add_range_separate(self):
+        ranges = [[0, 5], [20, 30]]
+
+        merged = util.add_range(ranges, 10, 15)
+
+        self.assertEqual(merged, [[0, 5], [10, 15], [20, 30]])
+        self.assertEqual(ranges, [[0, 5], [20, 30]])
+
+    def test_add_range_merges_adjacent_and_overlapping(self):
+        ranges = [[0, 5], [10, 15], [20, 30]]
+
+        self.assertEqual(util.add_range(ranges, 5, 10), [[0, 15], [20, 30]])
+        self.assertEqual(util.add_range(ranges, 3, 25), [[0, 30]])
+        self.assertEqual(util.add_range(ranges, 12, 14), ranges)
+
+    def test_missing_ranges(self):
+        self.assertEqual(util.missing_ranges([], 10), [[0, 10]])
+        self.assertEqual(util.missing_ranges([[0, 10]], 10), [])
+        self.assertEqual(util.missing_ranges([[2, 4], [6, 8]], 10), [[0, 2], [4, 6], [8, 10]])
+        self.assertEqual(util.missing_ranges([[0, 4], [6, 20]], 10), [[4, 6]])
@@ -233,6 +233,9 @@ def install():
             mock.Mock(side_effect=lambda i,u,o,c,x: sorted(u))
         profiler.calculate_applicable_units = \
             mock.Mock(side_effect=lambda t,p,r,c,x: ['mocked-unit1', 'mocked-unit2'])
+        profiler.calculate_applicable_units_batch = \
+            mock.Mock(side_effect=lambda u, r, c, x, profiler=profiler: dict(
+                (h, profiler.calculate_applicable_units(p, r, c, x)) for h, p in u.items()))
 
 def reset():
     """
@@ -13,6 +13,7 @@ import os
 import tarfile
 
 from logging import getLogger
+from threading import RLock
 
 from pulp.server.content.sources import Listener, Request
 
@@ -52,6 +53,61 @@ def untar_dir(path, storage_path):
             os.unlink(path)
 
 
+# --- batching ---------------------------------------------------------------
+
+class UnitBatch(object):
+    """
+    Collects units to be added by the importer strategy so they can be
+    added (and associated) together.  Units are collected both by the strategy
+    and the download listener (on the downloader threads).  A batch is added
+    each time it is full and when flushed.
+    :ivar strategy: An importer strategy object.
+    :type strategy: pulp_node.importer.strategy.ImporterStrategy.
+    :ivar request: The nodes synchronization request.
+    :type request: pulp_node.importers.strategies.SyncRequest.
+    :ivar size: The maximum number of units in a batch.
+    :type size: int
+    :ivar units: The collected units.
+    :type units: list
+    """
+
+    def __init__(self, strategy, request, size):
+        """
+        :param strategy: An importer strategy object.
+        :type strategy: pulp_node.importer.strategy.ImporterStrategy.
+        :param request: The nodes synchronization request.
+        :type request: pulp_node.importers.strategies.SyncRequest.
+        :param size: The maximum number of units in a batch.
+        :type size: int
+        """
+        self.strategy = strategy
+        self.request = request
+        self.size = size
+        self.units = []
+        self._lock = RLock()
+
+    def add(self, unit):
+        """
+        Add a unit to the batch.  The batch is flushed when full.
+        :param unit: A content unit.
+        :type unit: dict
+        """
+        with self._lock:
+            self.units.append(unit)
+            if len(self.units) >= self.size:
+                self.flush()
+
+    def flush(self):
+        """
+        Add the collected units using the importer strategy.
+        """
+        with self._lock:
+            units = self.units
+            self.units = []
+            if units:
+                self.strategy.add_units(self.request, units)
+
+
 # --- downloading ------------------------------------------------------------
 
 class ContentDownloadListener(Listener):
@@ -60,6 +116,7 @@ class ContentDownloadListener(Listener):
     Listens for status changes to unit download requests and calls into the importer
     strategy object based on whether the download succeeded or failed.  If the download
     succeeded, the importer strategy is called to add the associated content unit (in the DB).
+    When a unit batch is specified, the unit is added to the batch instead.
     """
 
     @staticmethod
@@ -88,16 +145,19 @@ class ContentDownloadListener(Listener):
         request.data = data
         return request
 
-    def __init__(self, strategy, request):
+    def __init__(self, strategy, request, batch=None):
         """
         :param strategy: An importer strategy object.
         :type strategy: pulp_node.importer.strategy.ImporterStrategy.
         :param request: The nodes synchronization request.
         :type request: pulp_node.importers.strategies.SyncRequest.
+        :param batch: An optional batch used to add units.
+        :type batch: UnitBatch
         """
         super(self.__class__, self).__init__()
         self._strategy = strategy
         self.request = request
+        self.batch = batch
         self.error_list = []
 
     def download_succeeded(self, request):
@@ -114,7 +174,10 @@ class ContentDownloadListener(Listener):
         unit_ref = request.data[UNIT_REF]
         unit = unit_ref.fetch()
         unit[constants.STORAGE_PATH] = storage_path
-        self._strategy.add_unit(self.request, unit)
+        if self.batch is None:
+            self._strategy.add_unit(self.request, unit)
+        else:
+            self.batch.add(unit)
         if unit.get(constants.TARBALL_PATH):
             untar_dir(request.destination, storage_path)
 
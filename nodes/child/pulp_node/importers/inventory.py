@@ -9,7 +9,11 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from itertools import count
+from operator import attrgetter, itemgetter
+
 from pulp_node import constants
+from pulp_node.manifest import unit_digest, merge, DELTA_ACTION, ADDED, UPDATED, REMOVED
 
 
 class UniqueKey(object):
@@ -109,4 +113,209 @@ class UnitInventory(object):
             child_last_updated = child_unit.get(constants.LAST_UPDATED, 0)
             if parent_last_updated > child_last_updated:
                 updated.append((unit, ref))
-        return updated
\ No newline at end of file
+        return updated
+
+    def close(self):
+        """
+        Nothing is held open by this inventory.
+        """
+        pass
+
+
+class IndexedUnitInventory(object):
+    """
+    The unit inventory built from an indexed parent units file.
+    The parent index and the child units, both sorted by unit key digest, are
+    merged in a single pass.  Parent units are only decompressed when they
+    need to be added or updated on the child.
+    """
+
+    @staticmethod
+    def _import_child_units(units):
+        _units = []
+        for unit in units:
+            unit.pop('metadata', None)
+            _units.append((unit_digest(unit), unit))
+        _units.sort(key=itemgetter(0))
+        return _units
+
+    @staticmethod
+    def _fetch(refs):
+        """
+        Fetch the referenced units in the order they are stored.
+        :param refs: A list of IndexedUnitRef.
+        :type refs: list
+        :return: List of (unit, ref).
+        :rtype: list
+        """
+        fetched = []
+        for ref in sorted(refs, key=attrgetter('offset', 'position')):
+            unit = ref.fetch()
+            unit.pop('metadata', None)
+            fetched.append((unit, ref))
+        return fetched
+
+    def __init__(self, base_URL, parent_units, child_units):
+        """
+        :param base_URL: The base URL for downloading parent units.
+        :param parent_units: The content units in the parent node.
+        :type parent_units: pulp_node.manifest.IndexedUnits
+        :param child_units: The content units in the child node.
+        :type child_units: iterable
+        """
+        self.base_URL = base_URL
+        self.parent_units = parent_units
+        self.parent_only = []
+        self.child_only = []
+        self.updated = []
+        try:
+            self._merge(parent_units.index(), self._import_child_units(child_units))
+        except Exception:
+            self.close()
+            raise
+
+    def _merge(self, parent_index, child_units):
+        """
+        Merge the parent index with the child units.
+        :param parent_index: Index records of (digest, last_updated, ref) sorted by digest.
+        :type parent_index: iterable
+        :param child_units: List of (digest, unit) sorted by digest.
+        :type child_units: list
+        """
+        for parent, child in merge(parent_index, child_units):
+            if child is None:
+                self.parent_only.append(parent[2])
+                continue
+            if parent is None:
+                self.child_only.append(child[1])
+                continue
+            if parent[1] > child[1].get(constants.LAST_UPDATED, 0):
+                self.updated.append(parent[2])
+
+    def units_on_parent_only(self):
+        """
+        Listing of units contained in the parent inventory
+        but not contained in the child inventory.
+        :return: List of (unit, ref).
+        :rtype: list
+        """
+        return self._fetch(self.parent_only)
+
+    def units_on_child_only(self):
+        """
+        Listing of units contained in the child inventory
+        but not contained in the parent inventory.
+        :return: List of units that need to be purged.
+        :rtype: list
+        """
+        return list(self.child_only)
+
+    def updated_units(self):
+        """
+        Listing of units updated on the parent.
+        :return: List of (unit, ref).
+        :rtype: list
+        """
+        return self._fetch(self.updated)
+
+    def close(self):
+        """
+        Close the parent units file.  The units can no longer be fetched.
+        """
+        self.parent_units.close()
+
+
+class DeltaInventory(object):
+    """
+    The unit inventory built from the chain of deltas published since the
+    manifest last applied on the child.  Only the child units removed on the
+    parent need to be matched with the child inventory.
+    """
+
+    def __init__(self, base_URL, deltas, child_units):
+        """
+        :param base_URL: The base URL for downloading parent units.
+        :param deltas: The units in each delta (oldest first).
+        :type deltas: list of: pulp_node.manifest.IndexedUnits
+        :param child_units: The content units in the child node.
+        :type child_units: iterable
+        """
+        self.base_URL = base_URL
+        self.deltas = deltas
+        self.child_units = child_units
+        self.changes = {}
+        self._order = count()
+        try:
+            for delta in deltas:
+                self._apply(delta)
+        except Exception:
+            self.close()
+            raise
+
+    def _apply(self, delta):
+        """
+        Apply the delta to the changes collected from previous deltas.
+        A unit added and then updated is still added.
+        :param delta: The units in a delta.
+        :type delta: pulp_node.manifest.IndexedUnits
+        """
+        for unit, ref in delta:
+            unit.pop('metadata', None)
+            action = unit.pop(DELTA_ACTION)
+            digest = unit_digest(unit)
+            previous = self.changes.get(digest)
+            if previous is not None and previous[0] == ADDED and action == UPDATED:
+                action = ADDED
+            self.changes[digest] = (action, unit, ref, next(self._order))
+
+    def _changed(self, action):
+        """
+        Listing of changed units, in the order they are stored.
+        :param action: The delta action.
+        :type action: str
+        :return: List of (unit, ref).
+        :rtype: list
+        """
+        changed = [c for c in self.changes.values() if c[0] == action]
+        changed.sort(key=itemgetter(3))
+        return [(c[1], c[2]) for c in changed]
+
+    def units_on_parent_only(self):
+        """
+        Listing of units added on the parent.
+        :return: List of (unit, ref).
+        :rtype: list
+        """
+        return self._changed(ADDED)
+
+    def units_on_child_only(self):
+        """
+        Listing of units contained in the child inventory
+        that have been removed on the parent.
+        :return: List of units that need to be purged.
+        :rtype: list
+        """
+        removed = set(d for d, c in self.changes.items() if c[0] == REMOVED)
+        if not removed:
+            return []
+        units = []
+        for unit in self.child_units:
+            if unit_digest(unit) in removed:
+                unit.pop('metadata', None)
+                units.append(unit)
+        return units
+
+    def updated_units(self):
+        """
+        Listing of units updated on the parent.
+        :return: List of (unit, ref).
+        :rtype: list
+        """
+        return self._changed(UPDATED)
+
+    def close(self):
+        """
+        Close the delta units files.  The units can no longer be fetched.
+        """
+        for delta in self.deltas:
+            delta.close()
@@ -20,6 +20,7 @@ import errno
 
 from gettext import gettext as _
 from logging import getLogger
+from threading import Thread
 
 from pulp.plugins.model import Unit, AssociatedUnit
 from pulp.server.config import config as pulp_conf
@@ -28,9 +29,9 @@ from pulp.server.content.sources import ContentContainer
 from pulp_node import constants
 from pulp_node import pathlib
 from pulp_node.conduit import NodesConduit
-from pulp_node.manifest import Manifest, RemoteManifest
-from pulp_node.importers.inventory import UnitInventory
-from pulp_node.importers.download import ContentDownloadListener
+from pulp_node.manifest import Manifest, RemoteManifest, IndexedUnits
+from pulp_node.importers.inventory import UnitInventory, IndexedUnitInventory, DeltaInventory
+from pulp_node.importers.download import ContentDownloadListener, UnitBatch
 from pulp_node.error import (NodeError, GetChildUnitsError, GetParentUnitsError, AddUnitError,
     DeleteUnitError, InvalidManifestError, CaughtException)
 
@@ -38,6 +39,19 @@ from pulp_node.error import (NodeError, GetChildUnitsError, GetParentUnitsError,
 log = getLogger(__name__)
 
 
+# --- constants -------------------------------------------------------------------------
+
+# The number of units added (and associated) together.
+ADD_UNITS_BATCH_SIZE = 500
+
+# The number of threads used to check unit files.
+CHECK_FILES_THREADS = 8
+
+# Keys in the importer scratchpad.
+APPLIED_MANIFEST = 'applied_manifest'
+APPLIED_STRATEGY = 'applied_strategy'
+
+
 # --- i18n ------------------------------------------------------------------------------
 
 STRATEGY_UNSUPPORTED = _('Importer strategy "%(s)s" not supported')
@@ -65,6 +79,8 @@ class Request(object):
     :type repo_id: str
     :ivar working_dir: The absolute path to a directory to be used as temporary storage.
     :type working_dir: str
+    :ivar manifest_id: The ID of the parent manifest used to build the unit inventory.
+    :type manifest_id: str
     """
 
     def __init__(self, cancel_event, conduit, config, downloader, progress, summary, repo):
@@ -93,6 +109,7 @@ class Request(object):
         self.summary = summary
         self.repo_id = repo.id
         self.working_dir = repo.working_dir
+        self.manifest_id = None
 
     def started(self):
         """
@@ -128,6 +145,7 @@ class ImporterStrategy(object):
 
         try:
             self._synchronize(request)
+            self._manifest_applied(request)
         except NodeError, ne:
             request.summary.errors.append(ne)
         except Exception, e:
@@ -164,15 +182,82 @@ class ImporterStrategy(object):
             log.exception(unit['unit_id'])
             request.summary.errors.append(AddUnitError(request.repo_id))
 
+    def add_units(self, request, units):
+        """
+        Add the specified units to the child inventory and associate them
+        to the repository using the bulk operations of the conduit.  When
+        the bulk operations fail, the units are added one at a time so that
+        errors are reported for each unit.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        :param units: The units to be added.
+        :type units: list of: dict
+        """
+        try:
+            new_units = []
+            for unit in units:
+                new_unit = Unit(
+                    type_id=unit['type_id'],
+                    unit_key=unit['unit_key'],
+                    metadata=unit['metadata'],
+                    storage_path=unit['storage_path'])
+                new_units.append(new_unit)
+            request.conduit.save_units(new_units)
+        except Exception:
+            log.exception(request.repo_id)
+            for unit in units:
+                self.add_unit(request, unit)
+            return
+        if new_units:
+            request.progress.unit_added(added=len(new_units), details=new_units[-1].storage_path)
+
     # --- protected ---------------------------------------------------------------------
 
+    def _applied_manifest(self, request):
+        """
+        Get the ID of the parent manifest last applied by this strategy.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        :return: The manifest ID or None.
+        :rtype: str
+        """
+        try:
+            scratchpad = request.conduit.get_scratchpad()
+        except Exception:
+            log.exception(request.repo_id)
+            return None
+        if not isinstance(scratchpad, dict):
+            return None
+        if scratchpad.get(APPLIED_STRATEGY) != self.__class__.__name__:
+            return None
+        return scratchpad.get(APPLIED_MANIFEST)
+
+    def _manifest_applied(self, request):
+        """
+        Record the parent manifest as applied when synchronization
+        has completed without errors.  The deltas published after this
+        manifest can be applied by the next synchronization.
+        :param request: A synchronization request.
+        :type request: SyncRequest
+        """
+        if not request.manifest_id or request.summary.errors or request.cancelled():
+            return
+        scratchpad = {
+            APPLIED_MANIFEST: request.manifest_id,
+            APPLIED_STRATEGY: self.__class__.__name__
+        }
+        try:
+            request.conduit.set_scratchpad(scratchpad)
+        except Exception:
+            log.exception(request.repo_id)
+
     def _unit_inventory(self, request):
         """
         Build the unit inventory.
         :param request: A synchronization request.
         :type request: SyncRequest
         :return: The built inventory.
-        :rtype: UnitInventory
+        :rtype: UnitInventory|IndexedUnitInventory|DeltaInventory
         """
         # fetch child units
         try:
@@ -199,7 +284,14 @@ class ImporterStrategy(object):
                 pass
             fetched_manifest = RemoteManifest(url, request.downloader, request.working_dir)
             fetched_manifest.fetch()
-            if manifest != fetched_manifest or \
+            deltas = None
+            applied = self._applied_manifest(request)
+            if applied:
+                deltas = fetched_manifest.deltas_since(applied)
+            if deltas is not None:
+                fetched_manifest.fetch_deltas(deltas)
+                manifest = fetched_manifest
+            elif manifest != fetched_manifest or \
                     not manifest.is_valid() or not manifest.has_valid_units():
                 fetched_manifest.write()
                 fetched_manifest.fetch_units()
@@ -213,9 +305,15 @@ class ImporterStrategy(object):
             raise GetParentUnitsError(request.repo_id)
 
         # build the inventory
-        parent_units = manifest.get_units()
+        request.manifest_id = manifest.id
         base_URL = manifest.publishing_details[constants.BASE_URL]
-        inventory = UnitInventory(base_URL, parent_units, child_units)
+        if deltas is not None:
+            return DeltaInventory(base_URL, manifest.get_deltas(deltas), child_units)
+        parent_units = manifest.get_units()
+        if isinstance(parent_units, IndexedUnits):
+            inventory = IndexedUnitInventory(base_URL, parent_units, child_units)
+        else:
+            inventory = UnitInventory(base_URL, parent_units, child_units)
         return inventory
 
     def _reset_storage_path(self, unit):
@@ -256,25 +354,31 @@ class ImporterStrategy(object):
         download_list = []
         units = unit_inventory.units_on_parent_only()
         request.progress.begin_adding_units(len(units))
-        listener = ContentDownloadListener(self, request)
         for unit, unit_ref in units:
+            self._reset_storage_path(unit)
+        needs_download = self._check_files([unit for unit, unit_ref in units])
+        batch = UnitBatch(self, request, ADD_UNITS_BATCH_SIZE)
+        listener = ContentDownloadListener(self, request, batch)
+        try:
+            for (unit, unit_ref), download in zip(units, needs_download):
+                if request.cancelled():
+                    return
+                if not download:
+                    # unit has no file associated
+                    batch.add(unit_ref.fetch())
+                    continue
+                unit_path, destination = self._path_and_destination(unit)
+                unit_URL = pathlib.url_join(unit_inventory.base_URL, unit_path)
+                _request = listener.create_request(unit_URL, destination, unit, unit_ref)
+                download_list.append(_request)
             if request.cancelled():
                 return
-            self._reset_storage_path(unit)
-            if not self._needs_download(unit):
-                # unit has no file associated
-                self.add_unit(request, unit_ref.fetch())
-                continue
-            unit_path, destination = self._path_and_destination(unit)
-            unit_URL = pathlib.url_join(unit_inventory.base_URL, unit_path)
-            _request = listener.create_request(unit_URL, destination, unit, unit_ref)
-            download_list.append(_request)
-        if request.cancelled():
-            return
-        container = ContentContainer()
-        request.summary.sources = \
-            container.download(request.cancel_event, request.downloader, download_list, listener)
-        request.summary.errors.extend(listener.error_list)
+            container = ContentContainer()
+            request.summary.sources = container.download(
+                request.cancel_event, request.downloader, download_list, listener)
+            request.summary.errors.extend(listener.error_list)
+        finally:
+            batch.flush()
 
     def _update_units(self, request, unit_inventory):
         """
@@ -285,9 +389,11 @@ class ImporterStrategy(object):
         :param unit_inventory: The inventory of both parent and child content units.
         :type unit_inventory: UnitInventory
         """
+        batch = UnitBatch(self, request, ADD_UNITS_BATCH_SIZE)
         for unit, ref in unit_inventory.updated_units():
             unit = ref.fetch()
-            self.add_unit(request, unit)
+            batch.add(unit)
+        batch.flush()
 
     def _path_and_destination(self, unit):
         """
@@ -306,6 +412,31 @@ class ImporterStrategy(object):
             return pathlib.quote(tar_path),\
                 pathlib.join(os.path.dirname(storage_path), os.path.basename(tar_path))
 
+    def _check_files(self, units):
+        """
+        Determine which units have an associated file that needs to be downloaded.
+        The files are checked concurrently by up to CHECK_FILES_THREADS threads.
+        :param units: A list of content units.
+        :type units: list
+        :return: A list of bool, in the order of units.
+        :rtype: list
+        """
+        needs_download = [False] * len(units)
+
+        def check(begin):
+            for index in xrange(begin, len(units), CHECK_FILES_THREADS):
+                needs_download[index] = self._needs_download(units[index])
+
+        threads = []
+        for begin in range(min(CHECK_FILES_THREADS, len(units))):
+            thread = Thread(target=check, args=(begin,))
+            thread.setDaemon(True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        return needs_download
+
     def _needs_download(self, unit):
         """
         Get whether the unit has an associated file that needs to be downloaded.
@@ -372,9 +503,12 @@ class Mirror(ImporterStrategy):
         :type request: SyncRequest
         """
         unit_inventory = self._unit_inventory(request)
-        self._add_units(request, unit_inventory)
-        self._update_units(request, unit_inventory)
-        self._delete_units(request, unit_inventory)
+        try:
+            self._add_units(request, unit_inventory)
+            self._update_units(request, unit_inventory)
+            self._delete_units(request, unit_inventory)
+        finally:
+            unit_inventory.close()
 
 
 class Additive(ImporterStrategy):
@@ -395,8 +529,11 @@ class Additive(ImporterStrategy):
         :type request: SyncRequest
         """
         unit_inventory = self._unit_inventory(request)
-        self._add_units(request, unit_inventory)
-        self._update_units(request, unit_inventory)
+        try:
+            self._add_units(request, unit_inventory)
+            self._update_units(request, unit_inventory)
+        finally:
+            unit_inventory.close()
 
 
 # --- factory ---------------------------------------------------------------------------
@@ -14,11 +14,36 @@ Provides classes for managing the content unit manifest.
 The manifest is a json encoded file that defines content units
 associated with repository.  The units themselves are stored in a separate
 json encoded file.  For performance reasons, the unit files are compressed.
+
+Since version 3, the units file is indexed.  The json encoded units are
+written in compressed blocks followed by an index of fixed length records
+sorted by a digest of each unit's type_id and unit_key.  The index can be
+walked without decompressing any units and an individual unit can be read
+by decompressing only the block that contains it.  The file layout is:
+
+  header:  magic
+  blocks:  (length, zlib compressed json encoded units; one per line) ...
+  index:   (key digest, last_updated, block offset, block length, position) ...
+  trailer: index offset, record count, magic
+
+Each publish also writes a delta from the previously published manifest.
+A delta is an indexed units file containing the units added, updated and
+removed since that manifest.  The manifest lists the chain of deltas (oldest
+first) so that a child that has applied an earlier manifest can fetch just
+the deltas published since.
 """
 
 import os
 import gzip
+import mmap
+import shutil
+import zlib
 import errno
+import struct
+import hashlib
+
+from threading import RLock
+from operator import attrgetter
 
 from logging import getLogger
 
@@ -27,6 +52,7 @@ from nectar.listener import AggregatingEventListener
 
 from pulp.server.compat import json
 
+from pulp_node import constants
 from pulp_node import pathlib
 from pulp_node.error import ManifestDownloadError
 
@@ -36,9 +62,30 @@ log = getLogger(__name__)
 
 # --- constants -------------------------------------------------------------------------
 
-MANIFEST_VERSION = 2
+MANIFEST_VERSION = 3
 MANIFEST_FILE_NAME = 'manifest.json'
 UNITS_FILE_NAME = 'units.json.gz'
+INDEXED_UNITS_FILE_NAME = 'units.idx'
+
+# manifest versions that can still be read.
+SUPPORTED_VERSIONS = (2, 3)
+# the first manifest version having an indexed units file.
+INDEXED_VERSION = 3
+
+# number of units compressed together in the indexed units file.
+UNITS_PER_BLOCK = 256
+# number of decompressed blocks kept by the indexed units reader.
+CACHED_BLOCKS = 8
+
+# the maximum number of deltas kept in the chain.
+MAX_DELTAS = 10
+DELTAS_DIR = 'deltas'
+
+INDEX_MAGIC = 'PULPIDX3'
+INDEX_HEADER = struct.Struct('>8s')
+INDEX_BLOCK = struct.Struct('>I')
+INDEX_RECORD = struct.Struct('>20sdQII')
+INDEX_TRAILER = struct.Struct('>QQ8s')
 
 ID = 'id'
 VERSION = 'version'
@@ -48,6 +95,16 @@ UNITS = 'units'
 UNITS_PATH = 'path'
 UNITS_TOTAL = 'total'
 UNITS_SIZE = 'size'
+DELTAS = 'deltas'
+DELTA_FROM = 'from'
+DELTA_TO = 'to'
+DELTA_PATH = 'path'
+
+# the delta action is stored in each unit in the delta.
+DELTA_ACTION = '_delta'
+ADDED = 'added'
+UPDATED = 'updated'
+REMOVED = 'removed'
 
 
 # --- utils -----------------------------------------------------------------------------
@@ -76,6 +133,105 @@ def unzip(path, destination, bfrlen=65535):
         fp_in.close()
 
 
+def unit_digest(unit):
+    """
+    Get a digest of the unit's type_id and unit_key.
+    Used to order and match units in the indexed units file.
+    :param unit: A content unit.
+    :type unit: dict
+    :return: The sha1 digest.
+    :rtype: str
+    """
+    key = json.dumps((unit['type_id'], unit['unit_key']), sort_keys=True, separators=(',', ':'))
+    return hashlib.sha1(key).digest()
+
+
+def merge(left, right):
+    """
+    Merge two iterables of tuples sorted by the 1st element (the digest).
+    Adjacent tuples having the same digest are skipped.
+    :param left: An iterable of tuples sorted by digest.
+    :type left: iterable
+    :param right: An iterable of tuples sorted by digest.
+    :type right: iterable
+    :return: A generator of (left, right) where either may be None when the
+        digest is only contained in the other.
+    :rtype: generator
+    """
+    left = _unique(left)
+    right = _unique(right)
+    l_entry = next(left, None)
+    r_entry = next(right, None)
+    while l_entry is not None or r_entry is not None:
+        if r_entry is None or (l_entry is not None and l_entry[0] < r_entry[0]):
+            yield l_entry, None
+            l_entry = next(left, None)
+            continue
+        if l_entry is None or r_entry[0] < l_entry[0]:
+            yield None, r_entry
+            r_entry = next(right, None)
+            continue
+        yield l_entry, r_entry
+        l_entry = next(left, None)
+        r_entry = next(right, None)
+
+
+def _unique(entries):
+    """
+    Skip adjacent tuples having the same 1st element (the digest).
+    :param entries: An iterable of tuples.
+    :type entries: iterable
+    """
+    last = None
+    for entry in entries:
+        if entry[0] != last:
+            last = entry[0]
+            yield entry
+
+
+def write_delta(path, previous_units, units):
+    """
+    Write the delta between two indexed units files.
+    Units are fetched in the order they are stored.
+    :param path: The absolute path to the delta file.
+    :type path: str
+    :param previous_units: The previously published units.
+    :type previous_units: IndexedUnits
+    :param units: The published units.
+    :type units: IndexedUnits
+    :return: The (closed) writer used to write the delta.
+    :rtype: IndexedUnitWriter
+    """
+    changed = []
+    removed = []
+    for previous, current in merge(previous_units.index(), units.index()):
+        if previous is None:
+            changed.append((current[2], ADDED))
+            continue
+        if current is None:
+            removed.append(previous[2])
+            continue
+        if current[1] > previous[1]:
+            changed.append((current[2], UPDATED))
+    position = attrgetter('offset', 'position')
+    changed.sort(key=lambda c: position(c[0]))
+    removed.sort(key=position)
+    with IndexedUnitWriter(path) as writer:
+        for ref, action in changed:
+            unit = ref.fetch()
+            unit[DELTA_ACTION] = action
+            writer.add(unit)
+        for ref in removed:
+            unit = ref.fetch()
+            removed_unit = {
+                'type_id': unit['type_id'],
+                'unit_key': unit['unit_key'],
+                DELTA_ACTION: REMOVED
+            }
+            writer.add(removed_unit)
+    return writer
+
+
 # --- manifest --------------------------------------------------------------------------
 
 
@@ -104,6 +260,7 @@ class Manifest(object):
         self.version = MANIFEST_VERSION
         self.units = {UNITS_PATH: None, UNITS_TOTAL: 0, UNITS_SIZE: 0}
         self.publishing_details = {}
+        self.deltas = []
         if os.path.isdir(path):
             path = pathlib.join(path, MANIFEST_FILE_NAME)
         self.path = path
@@ -118,7 +275,8 @@ class Manifest(object):
             ID: self.id,
             VERSION: self.version,
             UNITS: self.units,
-            PUBLISHING_DETAILS: self.publishing_details
+            PUBLISHING_DETAILS: self.publishing_details,
+            DELTAS: self.deltas
         }
         with open(self.path, 'w+') as fp:
             json.dump(state, fp, indent=2)
@@ -138,6 +296,7 @@ class Manifest(object):
         self.version = d.get(VERSION, 0)
         self.units = d.get(UNITS, {UNITS_PATH: None, UNITS_TOTAL: 0, UNITS_SIZE: 0})
         self.publishing_details = d.get(PUBLISHING_DETAILS, {})
+        self.deltas = d.get(DELTAS, [])
 
     def get_units(self):
         """
@@ -148,22 +307,108 @@ class Manifest(object):
         :raise ValueError: json decoding errors
         """
         total = self.units[UNITS_TOTAL]
-        if total:
-            path = self.units_path()
-            path = self.unzip_units(path)
-            return UnitIterator(path, total)
-        else:
+        if not total:
             return []
+        path = self.units_path()
+        if self.version >= INDEXED_VERSION:
+            return IndexedUnits(path, total)
+        path = self.unzip_units(path)
+        return UnitIterator(path, total)
 
     def units_published(self, unit_writer):
         """
         Update the manifest publishing information.
+        The manifest version is determined by the writer.
         :param unit_writer: A writer used to publish the units.
-        :type unit_writer: UnitWriter
+        :type unit_writer: UnitWriter|IndexedUnitWriter
         """
+        self.version = unit_writer.version
         self.units[UNITS_TOTAL] = unit_writer.total_units
         self.units[UNITS_SIZE] = unit_writer.bytes_written
 
+    def add_delta(self, previous):
+        """
+        Write the delta from the previously published manifest and extend
+        the chain of deltas published with the previous manifest.  The oldest
+        deltas are dropped to keep at most MAX_DELTAS.  Both manifests must
+        have been published with indexed units files.
+        :param previous: The previously published manifest.
+        :type previous: Manifest
+        :return: True if the delta was written.
+        :rtype: bool
+        :raise IOError: on I/O errors.
+        """
+        if min(previous.version, self.version) < INDEXED_VERSION:
+            return False
+        if not previous.has_valid_units():
+            return False
+        dir_path = os.path.dirname(self.path)
+        previous_dir = os.path.dirname(previous.path)
+        pathlib.mkdir(pathlib.join(dir_path, DELTAS_DIR))
+        deltas = previous.deltas[max(0, len(previous.deltas) - MAX_DELTAS + 1):]
+        for delta in deltas:
+            path = delta[DELTA_PATH]
+            shutil.copy(pathlib.join(previous_dir, path), pathlib.join(dir_path, path))
+        path = pathlib.join(DELTAS_DIR, '%s.idx' % self.id)
+        previous_units = IndexedUnits(previous.units_path(), previous.units[UNITS_TOTAL])
+        units = IndexedUnits(self.units_path(), self.units[UNITS_TOTAL])
+        try:
+            writer = write_delta(pathlib.join(dir_path, path), previous_units, units)
+        finally:
+            previous_units.close()
+            units.close()
+        delta = {
+            DELTA_FROM: previous.id,
+            DELTA_TO: self.id,
+            DELTA_PATH: path,
+            UNITS_TOTAL: writer.total_units,
+            UNITS_SIZE: writer.bytes_written,
+        }
+        self.deltas = deltas + [delta]
+        return True
+
+    def deltas_since(self, manifest_id):
+        """
+        Get the chain of deltas published since the specified manifest.
+        :param manifest_id: The ID of a previously published manifest.
+        :type manifest_id: str
+        :return: The list of deltas (oldest first) or None when the chain is
+            not available or is larger than the units file.
+        :rtype: list
+        """
+        if manifest_id == self.id:
+            return []
+        for n, delta in enumerate(self.deltas):
+            if delta[DELTA_FROM] != manifest_id:
+                continue
+            deltas = self.deltas[n:]
+            if sum(d[UNITS_SIZE] for d in deltas) >= self.units[UNITS_SIZE]:
+                return None
+            return deltas
+        return None
+
+    def get_deltas(self, deltas):
+        """
+        Get the units contained in the specified (downloaded) deltas.
+        :param deltas: A list of deltas.
+        :type deltas: list
+        :return: A list of IndexedUnits; one for each delta.
+        :rtype: list
+        :raise IOError: on I/O errors.
+        :raise ValueError: when a delta file is not valid.
+        """
+        dir_path = os.path.dirname(self.path)
+        units = []
+        try:
+            for delta in deltas:
+                path = pathlib.join(dir_path, delta[DELTA_PATH])
+                units.append(IndexedUnits(path, delta[UNITS_TOTAL]))
+        except Exception:
+            for delta_units in units:
+                delta_units.close()
+            raise
+        return units
+
     def published(self, details):
         """
         Update the publishing details.
@@ -180,7 +425,7 @@ class Manifest(object):
         :rtype: bool
         """
         try:
-            return self.version == MANIFEST_VERSION
+            return self.version in SUPPORTED_VERSIONS
         except AttributeError:
             return False
 
@@ -222,12 +467,24 @@ class Manifest(object):
         self.write()
         return destination
 
+    def units_file_name(self):
+        """
+        Get the standard name of the units file for the manifest version.
+        :return: The file name.
+        :rtype: str
+        """
+        if self.version >= INDEXED_VERSION:
+            return INDEXED_UNITS_FILE_NAME
+        else:
+            return UNITS_FILE_NAME
+
     def units_path(self):
         """
         Get the absolute path to the associated units file.
         The path is
         """
-        return self.units[UNITS_PATH] or pathlib.join(os.path.dirname(self.path), UNITS_FILE_NAME)
+        path = self.units[UNITS_PATH]
+        return path or pathlib.join(os.path.dirname(self.path), self.units_file_name())
 
     def __eq__(self, other):
         if isinstance(other, Manifest):
@@ -281,9 +538,10 @@ class RemoteManifest(Manifest):
         :raise HTTPError: on URL errors.
         :raise ValueError: on json decoding errors
         """
+        file_name = self.units_file_name()
         base_url = self.url.rsplit('/', 1)[0]
-        url = pathlib.join(base_url, UNITS_FILE_NAME)
-        destination = pathlib.join(os.path.dirname(self.path), UNITS_FILE_NAME)
+        url = pathlib.join(base_url, file_name)
+        destination = pathlib.join(os.path.dirname(self.path), file_name)
         request = DownloadRequest(str(url), destination)
         listener = AggregatingEventListener()
         self.downloader.event_listener = listener
@@ -292,6 +550,30 @@ class RemoteManifest(Manifest):
             report = listener.failed_reports[0]
             raise ManifestDownloadError(self.url, report.error_msg)
 
+    def fetch_deltas(self, deltas):
+        """
+        Fetch the delta files referenced in the manifest.
+        Previously fetched delta files are removed.
+        :param deltas: A list of deltas.
+        :type deltas: list
+        :raise ManifestDownloadError: on downloading errors.
+        """
+        base_url = self.url.rsplit('/', 1)[0]
+        dir_path = os.path.dirname(self.path)
+        shutil.rmtree(pathlib.join(dir_path, DELTAS_DIR), ignore_errors=True)
+        pathlib.mkdir(pathlib.join(dir_path, DELTAS_DIR))
+        request_list = []
+        for delta in deltas:
+            url = pathlib.join(base_url, delta[DELTA_PATH])
+            destination = pathlib.join(dir_path, delta[DELTA_PATH])
+            request_list.append(DownloadRequest(str(url), destination))
+        listener = AggregatingEventListener()
+        self.downloader.event_listener = listener
+        self.downloader.download(request_list)
+        if listener.failed_reports:
+            report = listener.failed_reports[0]
+            raise ManifestDownloadError(self.url, report.error_msg)
+
 
 class UnitWriter(object):
     """
@@ -308,6 +590,8 @@ class UnitWriter(object):
     :type bytes_written: int
     """
 
+    version = 2
+
     def __init__(self, path):
         """
         :param path: The absolute path to a file or directory.
@@ -447,3 +731,235 @@ class UnitRef(object):
             fp.seek(self.offset)
             json_unit = fp.read(self.length)
             return json.loads(json_unit)
+
+
+class IndexedUnitWriter(object):
+    """
+    Writes json encoded content units to an indexed units file.
+    Units are compressed in blocks of UNITS_PER_BLOCK and the index is
+    written, sorted by unit key digest, when the writer is closed.
+    :ivar path:  The absolute path to a file or directory.  When a directory is specified,
+        the standard file name is appended.
+    :type path: str
+    :ivar fp: The file pointer used to write units to the file.
+    :type fp: A python file object.
+    :ivar total_units: Tracks the total number of units written.
+    :type total_units: int
+    :ivar bytes_written: The total number of bytes written.
+    :type bytes_written: int
+    """
+
+    version = INDEXED_VERSION
+
+    def __init__(self, path, units_per_block=UNITS_PER_BLOCK):
+        """
+        :param path: The absolute path to a file or directory.
+            When a directory is specified, the standard file name is appended.
+        :type path: str
+        :param units_per_block: The number of units compressed together.
+        :type units_per_block: int
+        :raise IOError: on I/O errors
+        """
+        if os.path.isdir(path):
+            path = pathlib.join(path, INDEXED_UNITS_FILE_NAME)
+        self.path = path
+        self.fp = open(path, 'wb')
+        self.fp.write(INDEX_HEADER.pack(INDEX_MAGIC))
+        self.units_per_block = units_per_block
+        self.total_units = 0
+        self.bytes_written = 0
+        self._block = []
+        self._index = []
+
+    @property
+    def closed(self):
+        """
+        Determines if the file is closed or not.
+        :return: True if the file is closed.
+        :rtype: bool
+        """
+        return self.fp.closed
+
+    def add(self, unit):
+        """
+        Add the specified unit to the current block.
+        The block is compressed and written when full.
+        :param unit: A content unit.
+        :type unit: dict
+        :raise IOError: on I/O errors.
+        :raise ValueError: json encoding errors
+        """
+        self.total_units += 1
+        last_updated = unit.get(constants.LAST_UPDATED) or 0
+        self._block.append((unit_digest(unit), last_updated, json.dumps(unit)))
+        if len(self._block) >= self.units_per_block:
+            self._write_block()
+
+    def _write_block(self):
+        """
+        Compress and write the current block and add its units to the index.
+        """
+        if not self._block:
+            return
+        data = zlib.compress('\n'.join(u[2] for u in self._block))
+        self.fp.write(INDEX_BLOCK.pack(len(data)))
+        offset = self.fp.tell()
+        self.fp.write(data)
+        for position, (digest, last_updated, _) in enumerate(self._block):
+            self._index.append((digest, float(last_updated), offset, len(data), position))
+        self._block = []
+
+    def close(self):
+        """
+        Write the remaining units, the sorted index and the trailer then close
+        the file.  This method is idempotent.
+        :return: The number of units written.
+        :rtype: int
+        """
+        if not self.closed:
+            self._write_block()
+            self._index.sort()
+            index_offset = self.fp.tell()
+            for record in self._index:
+                self.fp.write(INDEX_RECORD.pack(*record))
+            self.fp.write(INDEX_TRAILER.pack(index_offset, len(self._index), INDEX_MAGIC))
+            self.fp.close()
+            self._index = []
+            self.bytes_written = os.path.getsize(self.path)
+        return self.total_units
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *unused):
+        self.close()
+        return False
+
+
+class IndexedUnits(object):
+    """
+    Provides access to the units in an indexed units file.
+    The file is memory mapped and opened once.  Iterating yields (unit, ref) in
+    the order the units were written.  The index() method yields records in unit
+    key digest order without decompressing any units.  The most recently used
+    blocks are kept decompressed so that fetching units referenced by the same
+    block is cheap.
+    """
+
+    def __init__(self, path, total_units):
+        """
+        :param path: The absolute path to the indexed units file.
+        :type path: str
+        :param total_units: The number of units contained in the units file.
+        :type total_units: int
+        :raise IOError: on I/O errors.
+        :raise ValueError: when the file is not an indexed units file.
+        """
+        self.path = path
+        self.total_units = total_units
+        with open(path, 'rb') as fp:
+            self.map = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(self.map)
+        if size < INDEX_HEADER.size + INDEX_TRAILER.size:
+            self.map.close()
+            raise ValueError('%s: not an indexed units file' % path)
+        magic = INDEX_HEADER.unpack_from(self.map, 0)[0]
+        self.index_offset, self.count, trailer_magic = \
+            INDEX_TRAILER.unpack_from(self.map, size - INDEX_TRAILER.size)
+        if magic != INDEX_MAGIC or trailer_magic != INDEX_MAGIC:
+            self.map.close()
+            raise ValueError('%s: not an indexed units file' % path)
+        self._blocks = {}
+        self._lru = []
+        self._lock = RLock()
+
+    def index(self):
+        """
+        Iterate the index.
+        :return: A generator of (digest, last_updated, ref) sorted by digest.
+        :rtype: generator
+        """
+        for n in xrange(self.count):
+            offset = self.index_offset + (n * INDEX_RECORD.size)
+            digest, last_updated, block, length, position = \
+                INDEX_RECORD.unpack_from(self.map, offset)
+            yield digest, last_updated, IndexedUnitRef(self, block, length, position)
+
+    def block(self, offset, length):
+        """
+        Get the decompressed block at the specified offset.
+        :param offset: The offset of the compressed block.
+        :type offset: int
+        :param length: The length of the compressed block.
+        :type length: int
+        :return: The json encoded units in the block.
+        :rtype: list
+        """
+        with self._lock:
+            lines = self._blocks.get(offset)
+            if lines is None:
+                lines = zlib.decompress(self.map[offset:offset + length]).split('\n')
+                self._blocks[offset] = lines
+                self._lru.append(offset)
+                if len(self._lru) > CACHED_BLOCKS:
+                    del self._blocks[self._lru.pop(0)]
+            return lines
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        self.map.close()
+
+    def __iter__(self):
+        offset = INDEX_HEADER.size
+        while offset < self.index_offset:
+            length = INDEX_BLOCK.unpack_from(self.map, offset)[0]
+            offset += INDEX_BLOCK.size
+            lines = zlib.decompress(self.map[offset:offset + length]).split('\n')
+            for position, json_unit in enumerate(lines):
+                yield json.loads(json_unit), IndexedUnitRef(self, offset, length, position)
+            offset += length
+
+    def __len__(self):
+        return self.total_units
+
+
+class IndexedUnitRef(object):
+    """
+    Reference to a unit within an indexed units file.
+    :ivar units: The indexed units file.
+    :type units: IndexedUnits
+    :ivar offset: The offset of the compressed block containing the unit.
+    :type offset: int
+    :ivar length: The length of the compressed block.
+    :type length: int
+    :ivar position: The position of the unit within the block.
+    :type position: int
+    """
+
+    def __init__(self, units, offset, length, position):
+        """
+        :param units: The indexed units file.
+        :type units: IndexedUnits
+        :param offset: The offset of the compressed block containing the unit.
+        :type offset: int
+        :param length: The length of the compressed block.
+        :type length: int
+        :param position: The position of the unit within the block.
+        :type position: int
+        """
+        self.units = units
+        self.offset = offset
+        self.length = length
+        self.position = position
+
+    def fetch(self):
+        """
+        Fetch referenced content unit from the units file.
+        :return: The json decoded unit.
+        :rtype: dict
+        :raise ValueError: json decoding errors
+        """
+        lines = self.units.block(self.offset, self.length)
+        return json.loads(lines[self.position])
@@ -40,7 +40,7 @@ class HttpPublisher(FilePublisher):
     def publish(self, units):
         """
         Publish the specified units.
-        Writes the units.json file and symlinks each of the
+        Writes the units file and symlinks each of the
         files associated to the unit.storage_path.
         :param units: A list of units to publish.
         :type units: iterable
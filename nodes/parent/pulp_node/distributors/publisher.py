@@ -18,7 +18,7 @@ from logging import getLogger
 
 from pulp_node import constants
 from pulp_node import pathlib
-from pulp_node.manifest import Manifest, UnitWriter
+from pulp_node.manifest import Manifest, IndexedUnitWriter, MANIFEST_FILE_NAME
 
 
 log = getLogger(__name__)
@@ -68,7 +68,7 @@ class Publisher(object):
     def publish(self, units):
         """
         Publish the specified units.
-        Writes the units.json file and symlinks each of the files associated
+        Writes the units file and symlinks each of the files associated
         to the unit's "storage_path".
         :param units: A list of units to publish.
         :type units: list
@@ -113,7 +113,7 @@ class FilePublisher(Publisher):
     def publish(self, units):
         """
         Publish the specified units.
-        Writes the units.json file and symlinks each of the files associated
+        Writes the units file and symlinks each of the files associated
         to the unit.storage_path.  Publishing is staged in a temporary directory and
         must use commit() to make the publishing permanent.
         :param units: A list of units to publish.
@@ -123,17 +123,37 @@ class FilePublisher(Publisher):
         """
         pathlib.mkdir(self.publish_dir)
         self.tmp_dir = mkdtemp(dir=self.publish_dir)
-        with UnitWriter(self.tmp_dir) as writer:
+        with IndexedUnitWriter(self.tmp_dir) as writer:
             for unit in units:
                 self.publish_unit(unit)
                 writer.add(unit)
         manifest_id = str(uuid4())
         manifest = Manifest(self.tmp_dir, manifest_id)
         manifest.units_published(writer)
+        self.publish_delta(manifest)
         manifest.write()
         self.staged = True
         return manifest.path
 
+    def publish_delta(self, manifest):
+        """
+        Publish the delta between the currently published manifest and
+        the specified (staged) manifest.  The chain of deltas published with
+        the current manifest is carried forward.  Nothing is published when
+        there is no current manifest.
+        :param manifest: The staged manifest.
+        :type manifest: Manifest
+        """
+        path = pathlib.join(self.publish_dir, self.repo_id, MANIFEST_FILE_NAME)
+        if not os.path.exists(path):
+            return
+        try:
+            published = Manifest(path)
+            published.read()
+            manifest.add_delta(published)
+        except Exception:
+            log.exception(self.repo_id)
+
     def publish_unit(self, unit):
         """
         Publish the file associated with the unit into the publish directory.
@@ -21,7 +21,9 @@ from pulp.plugins.model import Unit
 from pulp.server.config import config as pulp_conf
 
 from pulp_node.importers.strategies import *
-from pulp_node.importers.inventory import UnitInventory
+from pulp_node.importers.inventory import UnitInventory, IndexedUnitInventory
+from pulp_node.importers.download import UnitBatch
+from pulp_node.manifest import IndexedUnitWriter, IndexedUnits
 from pulp_node.importers.reports import SummaryReport, ProgressListener
 from pulp_node.reports import RepositoryProgress
 from pulp_node.error import *
@@ -37,8 +39,11 @@ class TestConduit:
         ]
 
     save_unit = Mock()
+    save_units = Mock()
     remove_unit = Mock()
     set_progress = Mock()
+    get_scratchpad = Mock(return_value=None)
+    set_scratchpad = Mock()
 
 
 class CancelEvent(object):
@@ -253,6 +258,94 @@ class TestBase(TestCase):
         self.assertEqual(request.cancel_event.call_count, 2)
         self.assertFalse(mock_download.called)
 
+    def test_add_units(self):
+        # Setup
+        request = self.request()
+        request.conduit.save_units = Mock()
+        units = [dict(type_id='T', unit_key={'n': n}, metadata={}, storage_path=None)
+                 for n in range(3)]
+        # Test
+        strategy = ImporterStrategy()
+        strategy.add_units(request, units)
+        # Verify
+        self.assertEqual(request.conduit.save_units.call_count, 1)
+        args = request.conduit.save_units.call_args[0]
+        self.assertEqual([u.unit_key for u in args[0]], [u['unit_key'] for u in units])
+        self.assertEqual(request.progress.unit_add['completed'], 3)
+        self.assertEqual(request.summary.errors, [])
+
+    @patch('pulp_node.importers.strategies.ImporterStrategy.add_unit')
+    def test_add_units_exception(self, mock_add_unit):
+        # Setup
+        request = self.request()
+        request.conduit.save_units = Mock(side_effect=ValueError())
+        units = [dict(type_id='T', unit_key={'n': n}, metadata={}, storage_path=None)
+                 for n in range(3)]
+        # Test
+        strategy = ImporterStrategy()
+        strategy.add_units(request, units)
+        # Verify
+        self.assertEqual(mock_add_unit.call_count, 3)
+        for unit, call in zip(units, mock_add_unit.call_args_list):
+            self.assertEqual(call[0], (request, unit))
+
+    def test_manifest_applied(self):
+        # Setup
+        request = self.request()
+        request.conduit.set_scratchpad = Mock()
+        request.manifest_id = 'm1'
+        # Test
+        strategy = Mirror()
+        strategy._manifest_applied(request)
+        # Verify
+        scratchpad = {APPLIED_MANIFEST: 'm1', APPLIED_STRATEGY: 'Mirror'}
+        request.conduit.set_scratchpad.assert_called_once_with(scratchpad)
+        request.conduit.get_scratchpad = Mock(return_value=scratchpad)
+        self.assertEqual(Mirror()._applied_manifest(request), 'm1')
+        self.assertEqual(Additive()._applied_manifest(request), None)
+
+    def test_manifest_not_applied_on_errors(self):
+        # Setup
+        request = self.request()
+        request.conduit.set_scratchpad = Mock()
+        request.manifest_id = 'm1'
+        request.summary.errors.append(AddUnitError(REPO_ID))
+        # Test
+        strategy = Mirror()
+        strategy._manifest_applied(request)
+        # Verify
+        self.assertFalse(request.conduit.set_scratchpad.called)
+
+    def test_unit_batch(self):
+        strategy = Mock()
+        batch = UnitBatch(strategy, 'request', 2)
+        for n in range(5):
+            batch.add(n)
+        self.assertEqual(strategy.add_units.call_count, 2)
+        batch.flush()
+        batch.flush()
+        calls = [c[0] for c in strategy.add_units.call_args_list]
+        self.assertEqual(calls, [('request', [0, 1]), ('request', [2, 3]), ('request', [4])])
+
+    def test_check_files(self):
+        # Setup
+        path = os.path.join(self.tmp_dir, 'unit_1')
+        with open(path, 'w+') as fp:
+            fp.write('123')
+        size = os.path.getsize(path)
+        units = []
+        for n in range(20):
+            if n % 3:
+                units.append({constants.STORAGE_PATH: path, constants.FILE_SIZE: size})
+            else:
+                units.append({constants.STORAGE_PATH: path, constants.FILE_SIZE: size + n + 1})
+        # Test
+        strategy = ImporterStrategy()
+        needs_download = strategy._check_files(units)
+        # Verify
+        self.assertEqual(needs_download, [strategy._needs_download(u) for u in units])
+        self.assertEqual(needs_download, [not (n % 3) for n in range(20)])
+
     def test_needs_update(self):
         # Setup
         path = os.path.join(self.tmp_dir, 'unit_1')
@@ -268,7 +361,79 @@ class TestBase(TestCase):
         unit = {constants.STORAGE_PATH: path, constants.FILE_SIZE: size + 1}
         self.assertTrue(strategy._needs_download(unit))
 
+    @patch('pulp_node.importers.strategies.ImporterStrategy._add_units', side_effect=ValueError())
+    @patch('pulp_node.importers.strategies.ImporterStrategy._unit_inventory')
+    def test_inventory_closed(self, mock_unit_inventory, *unused):
+        for strategy in STRATEGIES.values():
+            # Setup
+            mock_unit_inventory.reset_mock()
+            request = self.request()
+            # Test
+            strategy().synchronize(request)
+            # Verify
+            mock_unit_inventory.return_value.close.assert_called_once_with()
+            self.assertEqual(len(request.summary.errors), 1)
+
     def test_strategy_factory(self):
         for name, strategy in STRATEGIES.items():
             self.assertEqual(find_strategy(name), strategy)
         self.assertRaises(StrategyUnsupported, find_strategy, '---')
+
+
+class TestIndexedUnitInventory(TestCase):
+
+    def setUp(self):
+        self.tmp_dir = mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def parent_units(self, units):
+        with IndexedUnitWriter(self.tmp_dir, units_per_block=2) as writer:
+            for unit in units:
+                writer.add(unit)
+        return IndexedUnits(writer.path, writer.total_units)
+
+    def test_inventory(self):
+        # Setup
+        parent = [dict(type_id='T', unit_key={'n': n}, last_updated=10) for n in range(6)]
+        child = [dict(type_id='T', unit_key={'n': n}, last_updated=10) for n in range(3, 9)]
+        child[0][constants.LAST_UPDATED] = 5
+        # Test
+        inventory = IndexedUnitInventory(BASE_URL, self.parent_units(parent), child)
+        # Verify
+        expected = UnitInventory(BASE_URL, self.parent_units(parent), [dict(u) for u in child])
+
+        def key(unit):
+            return unit['unit_key']['n']
+
+        added = sorted([u for u, r in inventory.units_on_parent_only()], key=key)
+        self.assertEqual(added, sorted([u for u, r in expected.units_on_parent_only()], key=key))
+        self.assertEqual([u['unit_key']['n'] for u in added], [0, 1, 2])
+        purged = sorted(inventory.units_on_child_only(), key=key)
+        self.assertEqual(purged, sorted(expected.units_on_child_only(), key=key))
+        self.assertEqual([u['unit_key']['n'] for u in purged], [6, 7, 8])
+        updated = inventory.updated_units()
+        self.assertEqual([u for u, r in updated], [u for u, r in expected.updated_units()])
+        self.assertEqual([u['unit_key']['n'] for u, r in updated], [3])
+        self.assertEqual(updated[0][1].fetch()['unit_key'], {'n': 3})
+
+    def test_inventory_duplicates(self):
+        # Setup
+        parent = [dict(type_id='T', unit_key={'n': 1})] * 3
+        child = [dict(type_id='T', unit_key={'n': 2}) for n in range(2)]
+        # Test
+        inventory = IndexedUnitInventory(BASE_URL, self.parent_units(parent), child)
+        # Verify
+        self.assertEqual(len(inventory.units_on_parent_only()), 1)
+        self.assertEqual(len(inventory.units_on_child_only()), 1)
+        self.assertEqual(inventory.updated_units(), [])
+
+    def test_close(self):
+        # Setup
+        parent = [dict(type_id='T', unit_key={'n': n}) for n in range(3)]
+        inventory = IndexedUnitInventory(BASE_URL, self.parent_units(parent), [])
+        # Test
+        inventory.close()
+        # Verify
+        self.assertRaises(ValueError, inventory.units_on_parent_only)
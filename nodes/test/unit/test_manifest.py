@@ -131,4 +131,77 @@ class TestManifest(TestCase):
             units_in.append(unit)
             _unit = ref.fetch()
             self.assertEqual(unit, _unit)
-        self.verify(units, units_in)
\ No newline at end of file
+        self.verify(units, units_in)
+
+    def test_validation_versions(self):
+        manifest_path = os.path.join(self.tmp_dir, MANIFEST_FILE_NAME)
+        manifest = Manifest(manifest_path, self.MANIFEST_ID)
+        for version in SUPPORTED_VERSIONS:
+            manifest.version = version
+            self.assertTrue(manifest.is_valid())
+        manifest.version = 1
+        self.assertFalse(manifest.is_valid())
+
+    def test_indexed_round_trip(self):
+        # Setup
+        units = []
+        manifest_path = os.path.join(self.tmp_dir, MANIFEST_FILE_NAME)
+        for i in range(0, self.NUM_UNITS):
+            unit = dict(unit_id=i, type_id='T', unit_key={'n': i}, last_updated=i)
+            units.append(unit)
+        writer = IndexedUnitWriter(self.tmp_dir, units_per_block=3)
+        for u in units:
+            writer.add(u)
+        writer.close()
+        manifest = Manifest(manifest_path, self.MANIFEST_ID)
+        manifest.units_published(writer)
+        manifest.write()
+        # Test
+        cfg = DownloaderConfig()
+        downloader = LocalFileDownloader(cfg)
+        working_dir = os.path.join(self.tmp_dir, 'working_dir')
+        os.makedirs(working_dir)
+        url = 'file://%s' % manifest_path
+        manifest = RemoteManifest(url, downloader, working_dir)
+        manifest.fetch()
+        manifest.fetch_units()
+        # Verify
+        self.assertEqual(manifest.version, INDEXED_VERSION)
+        self.assertTrue(manifest.is_valid())
+        self.assertTrue(manifest.has_valid_units())
+        self.assertTrue(manifest.units_path().endswith(INDEXED_UNITS_FILE_NAME))
+        parent_units = manifest.get_units()
+        self.assertEqual(len(parent_units), self.NUM_UNITS)
+        units_in = []
+        for unit, ref in parent_units:
+            units_in.append(unit)
+            self.assertEqual(unit, ref.fetch())
+        self.verify(units, units_in)
+
+    def test_indexed_units_index(self):
+        # Setup
+        units = []
+        for i in range(0, self.NUM_UNITS):
+            unit = dict(unit_id=i, type_id='T', unit_key={'n': i}, last_updated=i)
+            units.append(unit)
+        with IndexedUnitWriter(self.tmp_dir, units_per_block=4) as writer:
+            for u in units:
+                writer.add(u)
+        # Test
+        path = os.path.join(self.tmp_dir, INDEXED_UNITS_FILE_NAME)
+        parent_units = IndexedUnits(path, self.NUM_UNITS)
+        index = list(parent_units.index())
+        # Verify
+        digests = [r[0] for r in index]
+        self.assertEqual(digests, sorted(unit_digest(u) for u in units))
+        for digest, last_updated, ref in index:
+            unit = ref.fetch()
+            self.assertEqual(digest, unit_digest(unit))
+            self.assertEqual(last_updated, unit['last_updated'])
+        parent_units.close()
+
+    def test_indexed_units_invalid(self):
+        path = os.path.join(self.tmp_dir, INDEXED_UNITS_FILE_NAME)
+        with open(path, 'w+') as fp:
+            fp.write('invalid-units' * 4)
+        self.assertRaises(ValueError, IndexedUnits, path, 1)
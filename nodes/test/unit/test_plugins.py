@@ -51,7 +51,8 @@ from pulp.server.managers import factory as managers
 from pulp.server.content.sources import Request as DownloadRequest
 from pulp.server.config import config as pulp_conf
 from pulp.agent.lib.conduit import Conduit
-from pulp_node.manifest import Manifest, RemoteManifest, MANIFEST_FILE_NAME, UNITS_FILE_NAME
+from pulp_node.manifest import Manifest, RemoteManifest, MANIFEST_FILE_NAME, \
+    INDEXED_UNITS_FILE_NAME
 from pulp_node.handlers.strategies import Mirror, Additive
 from pulp_node import error
 from pulp_node import constants
@@ -616,10 +617,12 @@ class ImporterTest(PluginTestBase):
             RepoContentUnit.OWNER_TYPE_IMPORTER,
             constants.HTTP_IMPORTER)
         pulp_conf.set('server', 'storage_dir', self.childfs)
-        importer.sync_repo(repo, conduit, configuration)
+        report = importer.sync_repo(repo, conduit, configuration)
         # Verify
         units = conduit.get_units()
         self.assertEquals(len(units), self.NUM_UNITS)
+        self.assertEqual(report.added_count, self.NUM_UNITS)
+        self.assertEqual(report.updated_count, 0)
         mock_importer_config_to_nectar_config = mocks[0]
         mock_importer_config_to_nectar_config.assert_called_with(configuration.flatten())
 
@@ -644,11 +647,11 @@ class ImporterTest(PluginTestBase):
         self.define_plugins()
         publisher = dist.publisher(repo, configuration)
         manifest_path = publisher.manifest_path()
-        units_path = os.path.join(os.path.dirname(manifest_path), UNITS_FILE_NAME)
+        units_path = os.path.join(os.path.dirname(manifest_path), INDEXED_UNITS_FILE_NAME)
         manifest = Manifest(manifest_path)
         manifest.read()
         shutil.copy(manifest_path, os.path.join(working_dir, MANIFEST_FILE_NAME))
-        shutil.copy(units_path, os.path.join(working_dir, UNITS_FILE_NAME))
+        shutil.copy(units_path, os.path.join(working_dir, INDEXED_UNITS_FILE_NAME))
         # Test
         importer = NodesHttpImporter()
         manifest_url = pathlib.url_join(publisher.base_url, manifest_path)
@@ -734,7 +737,7 @@ class ImporterTest(PluginTestBase):
         manifest = Manifest(manifest_path)
         manifest.read()
         shutil.copy(manifest_path, os.path.join(working_dir, MANIFEST_FILE_NAME))
-        with open(os.path.join(working_dir, UNITS_FILE_NAME), 'w+') as fp:
+        with open(os.path.join(working_dir, INDEXED_UNITS_FILE_NAME), 'w+') as fp:
             fp.write('invalid-units')
         # Test
         importer = NodesHttpImporter()
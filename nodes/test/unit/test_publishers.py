@@ -21,7 +21,8 @@ from nectar.config import DownloaderConfig
 from pulp_node import constants
 from pulp_node import pathlib
 from pulp_node.distributors.http.publisher import HttpPublisher
-from pulp_node.manifest import RemoteManifest
+from pulp_node.manifest import RemoteManifest, Manifest, MAX_DELTAS, DELTA_FROM, DELTA_TO
+from pulp_node.importers.inventory import DeltaInventory
 
 
 class TestHttp(TestCase):
@@ -154,3 +155,82 @@ class TestHttp(TestCase):
             p.publish(units)
         # verify
         self.assertFalse(os.path.exists(p.tmp_dir))
+
+    def test_publish_deltas(self):
+        # setup
+        units = self.populate()
+        for unit in units:
+            unit[constants.LAST_UPDATED] = 1
+        # the deltas must be smaller than the units file
+        units.extend([{'type_id': 'unit', 'unit_key': {'n': 100 + n}} for n in range(100)])
+        repo_id = 'test_repo'
+        base_url = 'file://'
+        publish_dir = os.path.join(self.tmpdir, 'nodes/repos')
+        virtual_host = (publish_dir, publish_dir)
+        manifest_ids = []
+        # test
+        with HttpPublisher(base_url, virtual_host, repo_id) as p:
+            manifest_ids.append(self.manifest_id(p.publish(units)))
+            p.commit()
+        units[0][constants.LAST_UPDATED] = 2
+        units = units[:2] + units[3:] + [{'type_id': 'unit', 'unit_key': {'n': 10}}]
+        with HttpPublisher(base_url, virtual_host, repo_id) as p:
+            manifest_ids.append(self.manifest_id(p.publish(units)))
+            p.commit()
+        units.append({'type_id': 'unit', 'unit_key': {'n': 11}})
+        with HttpPublisher(base_url, virtual_host, repo_id) as p:
+            manifest_ids.append(self.manifest_id(p.publish(units)))
+            p.commit()
+        # verify
+        conf = DownloaderConfig()
+        downloader = LocalFileDownloader(conf)
+        working_dir = os.path.join(self.tmpdir, 'working_dir')
+        os.makedirs(working_dir)
+        url = pathlib.url_join(base_url, p.manifest_path())
+        manifest = RemoteManifest(url, downloader, working_dir)
+        manifest.fetch()
+        self.assertEqual(manifest.id, manifest_ids[2])
+        self.assertEqual(
+            [(d[DELTA_FROM], d[DELTA_TO]) for d in manifest.deltas],
+            [(manifest_ids[0], manifest_ids[1]), (manifest_ids[1], manifest_ids[2])])
+        self.assertEqual(manifest.deltas_since(manifest_ids[2]), [])
+        self.assertEqual(manifest.deltas_since('unknown'), None)
+        deltas = manifest.deltas_since(manifest_ids[0])
+        manifest.fetch_deltas(deltas)
+        child_units = [{'type_id': 'unit', 'unit_key': {'n': n}} for n in range(3)]
+        inventory = DeltaInventory(base_url, manifest.get_deltas(deltas), child_units)
+        added = [u['unit_key']['n'] for u, r in inventory.units_on_parent_only()]
+        self.assertEqual(sorted(added), [10, 11])
+        updated = [u['unit_key']['n'] for u, r in inventory.updated_units()]
+        self.assertEqual(updated, [0])
+        self.assertEqual(inventory.updated_units()[0][1].fetch()['unit_key'], {'n': 0})
+        removed = [u['unit_key']['n'] for u in inventory.units_on_child_only()]
+        self.assertEqual(removed, [2])
+
+    def test_publish_deltas_chain_limit(self):
+        # setup
+        units = [{'type_id': 'unit', 'unit_key': {'n': n}} for n in range(100)]
+        repo_id = 'test_repo'
+        publish_dir = os.path.join(self.tmpdir, 'nodes/repos')
+        virtual_host = (publish_dir, publish_dir)
+        # test
+        for n in range(MAX_DELTAS + 2):
+            units.append({'type_id': 'unit', 'unit_key': {'n': 1000 + n}})
+            with HttpPublisher('file://', virtual_host, repo_id) as p:
+                p.publish(units)
+                p.commit()
+        # verify
+        manifest = Manifest(os.path.join(publish_dir, repo_id))
+        manifest.read()
+        self.assertEqual(len(manifest.deltas), MAX_DELTAS)
+        for n, delta in enumerate(manifest.deltas[1:]):
+            self.assertEqual(delta[DELTA_FROM], manifest.deltas[n][DELTA_TO])
+        self.assertEqual(manifest.deltas[-1][DELTA_TO], manifest.id)
+        for delta in manifest.deltas:
+            path = os.path.join(publish_dir, repo_id, delta['path'])
+            self.assertTrue(os.path.isfile(path))
+
+    def manifest_id(self, path):
+        manifest = Manifest(path)
+        manifest.read()
+        return manifest.id
@@ -0,0 +1,91 @@
+#!/usr/bin/env python
+"""
+Measures how many authenticated GET requests per second the REST API can serve, with and
+without the authentication and authorization cache.
+
+Requests go through the full WSGI stack in this process, using HTTP basic authentication as a
+user that is not a super user and is granted READ on /v2/repositories/, so each uncached request
+verifies the password and walks the permissions of every prefix of the requested path. This
+needs a running MongoDB; the scratch database is dropped when the benchmark finishes.
+
+ python playpen/benchmarks/auth_requests.py --requests 500
+"""
+import base64
+from optparse import OptionParser
+import time
+
+from paste.fixture import TestApp
+import web
+
+from pulp.server import config
+from pulp.server.auth import authorization
+from pulp.server.auth import cache as auth_cache
+from pulp.server.db import connection
+from pulp.server.managers import factory as manager_factory
+from pulp.server.webservices import http
+
+
+LOGIN = 'benchmark-user'
+PASSWORD = 'benchmark-password'
+REPO_ID = 'benchmark-repo'
+
+
+def build_app():
+    from pulp.server.webservices import application
+    from pulp.server.webservices.middleware.exception import ExceptionHandlerMiddleware
+    from pulp.server.webservices.middleware.postponed import PostponedOperationMiddleware
+
+    def request_info(key):
+        if key == 'REQUEST_URI':
+            key = 'PATH_INFO'
+        return web.ctx.environ.get(key, None)
+
+    # There is no web server in front of the application to provide REQUEST_URI
+    http.request_info = request_info
+
+    pulp_app = web.subdir_application(application.URLS).wsgifunc()
+    components = [pulp_app, PostponedOperationMiddleware, ExceptionHandlerMiddleware]
+    stack = reduce(lambda a, m: m(a), components)
+    return TestApp(stack)
+
+
+def run(app, num_requests, ttl):
+    config.config.set('authentication', 'cache_ttl', str(ttl))
+    auth_cache.invalidate()
+    headers = {'Authorization': 'Basic %s' % base64.b64encode('%s:%s' % (LOGIN, PASSWORD))}
+    url = 'http://localhost/v2/repositories/%s/' % REPO_ID
+
+    start = time.time()
+    for i in range(num_requests):
+        app.get(url, headers=headers)
+    return time.time() - start
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--requests', type='int', default=500, help='number of requests to make')
+    parser.add_option('--database', default='pulp_benchmark',
+                      help='scratch database, dropped when done')
+    options, args = parser.parse_args()
+
+    connection.initialize(name=options.database)
+    manager_factory.initialize()
+    database = connection.get_database()
+    try:
+        manager_factory.role_manager().ensure_super_user_role()
+        manager_factory.user_manager().create_user(LOGIN, PASSWORD)
+        manager_factory.permission_manager().grant('/v2/repositories/', LOGIN,
+                                                   [authorization.READ])
+        manager_factory.repo_manager().create_repo(REPO_ID)
+        app = build_app()
+
+        for mode, ttl in (('uncached', 0), ('cached', 60)):
+            elapsed = run(app, options.requests, ttl)
+            print '%-8s %d requests in %.3f seconds: %.1f requests/second' % (
+                mode, options.requests, elapsed, options.requests / elapsed)
+    finally:
+        database.connection.drop_database(options.database)
+
+
+if __name__ == '__main__':
+    main()
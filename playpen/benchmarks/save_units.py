@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+"""
+Measures how long an importer conduit takes to save units one at a time with
+AddUnitMixin.save_unit compared to in bulk with AddUnitMixin.save_units.
+
+Each mode saves the units into its own empty repository (all units are new), and
+then saves them again (all units exist and are updated), as a re-sync would.
+This needs a running MongoDB; the units are written to a scratch database that
+is dropped when the benchmark finishes.
+
+ python playpen/benchmarks/save_units.py --units 50000
+"""
+from optparse import OptionParser
+import time
+
+from pulp.plugins.conduits.mixins import AddUnitMixin
+from pulp.plugins.model import Unit
+from pulp.plugins.types import database as types_db
+from pulp.plugins.types.model import TypeDefinition
+from pulp.server.db import connection
+from pulp.server.managers import factory as manager_factory
+
+
+TYPE_ID = 'benchmark-unit'
+
+
+def units(num_units):
+    for i in range(num_units):
+        unit_key = {'name': 'unit-%d' % i, 'version': '1.0'}
+        metadata = {'description': 'benchmark unit %d' % i, 'size': i}
+        yield Unit(TYPE_ID, unit_key, metadata, None)
+
+
+def run(repo_id, num_units, bulk):
+    conduit = AddUnitMixin(repo_id, 'benchmark-importer', 'importer', 'benchmark-importer')
+    start = time.time()
+    if bulk:
+        conduit.save_units(units(num_units))
+    else:
+        for unit in units(num_units):
+            conduit.save_unit(unit)
+    return time.time() - start
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--units', type='int', default=50000, help='number of units to save')
+    parser.add_option('--database', default='pulp_benchmark',
+                      help='scratch database, dropped when done')
+    options, args = parser.parse_args()
+
+    connection.initialize(name=options.database)
+    manager_factory.initialize()
+    database = connection.get_database()
+    try:
+        types_db.update_database([TypeDefinition(TYPE_ID, TYPE_ID, '', ['name', 'version'],
+                                                 [], [])])
+        for mode, bulk in (('single', False), ('bulk', True)):
+            repo_id = 'benchmark-%s' % mode
+            manager_factory.repo_manager().create_repo(repo_id)
+            for state in ('new', 'existing'):
+                if state == 'new':
+                    types_db.type_units_collection(TYPE_ID).remove()
+                elapsed = run(repo_id, options.units, bulk)
+                print '%-6s %-8s %d units in %.3f seconds: %.0f units/second' % (
+                    mode, state, options.units, elapsed, options.units / elapsed)
+    finally:
+        database.connection.drop_database(options.database)
+
+
+if __name__ == '__main__':
+    main()
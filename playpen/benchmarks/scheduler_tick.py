@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+"""
+Measures how long a celerybeat tick of pulp's Scheduler takes with many repository schedules,
+compared to checking every entry on each tick as celery's own Scheduler.tick does. It also
+measures applying one changed schedule compared to reloading all of them.
+
+Each schedule last ran just now, so only the first tick finds entries to check. The schedules
+are read from memory instead of the database and due tasks are not sent, so this measures the
+scheduler itself and needs neither MongoDB nor a broker.
+
+ python playpen/benchmarks/scheduler_tick.py --schedules 10000 --schedules 50000
+"""
+from optparse import OptionParser
+import random
+import time
+
+from celery import beat
+import mock
+
+from pulp.common import dateutils
+from pulp.server.async import scheduler
+from pulp.server.db.model.dispatch import ScheduledCall
+from pulp.server.managers.schedule import utils
+
+
+INTERVALS = ('PT1H', 'PT6H', 'P1D', 'P1W', 'P1M')
+
+
+class Cursor(object):
+    """
+    The part of a pymongo cursor the scheduler uses.
+    """
+    def __init__(self, docs):
+        self.docs = docs
+
+    def __iter__(self):
+        return (dict(doc) for doc in self.docs)
+
+    def count(self):
+        return len(self.docs)
+
+
+class BenchmarkScheduler(scheduler.Scheduler):
+    """
+    Applies the schedules changed on every tick, and never sends a task.
+    """
+    update_interval = 0
+    publisher = None
+
+    def apply_async(self, entry, publisher=None, **kwargs):
+        self.reserve(entry)
+        return mock.Mock()
+
+
+def schedules(num_schedules):
+    now = time.time()
+    for i in range(num_schedules):
+        first_run = dateutils.format_iso8601_utc_timestamp(now - random.randint(60, 86400 * 7))
+        iso_schedule = '%s/%s' % (first_run, random.choice(INTERVALS))
+        call = ScheduledCall(iso_schedule, 'pulp.server.tasks.repository.sync_with_auto_publish',
+                             args=['repo-%d' % i], principal='benchmark', total_run_count=1,
+                             last_run_at=dateutils.format_iso8601_utc_timestamp(now),
+                             resource='pulp:importer:repo-%d:benchmark' % i)
+        yield call.as_dict()
+
+
+def timed(function, repeat=1):
+    start = time.time()
+    for i in range(repeat):
+        function()
+    return (time.time() - start) / repeat
+
+
+def run(num_schedules, num_ticks):
+    docs = list(schedules(num_schedules))
+    updated = []
+
+    def get_enabled(fields=None):
+        return Cursor(docs)
+
+    def get_updated_since(seconds, enabled_only=True):
+        return [dict(doc) for doc in updated]
+
+    with mock.patch.object(utils, 'get_enabled', get_enabled):
+        with mock.patch.object(utils, 'get_updated_since', get_updated_since):
+            sched = BenchmarkScheduler(lazy=True)
+            results = [('load', timed(sched.setup_schedule)),
+                       ('first tick', timed(sched.tick)),
+                       ('tick', timed(sched.tick, num_ticks)),
+                       ('full scan tick', timed(lambda: beat.Scheduler.tick(sched)))]
+
+            updated.append(dict(docs[0], last_updated=time.time()))
+            results.append(('apply 1 change', timed(sched.update_schedule)))
+            results.append(('reload', timed(sched.setup_schedule)))
+
+    for name, elapsed in results:
+        print '%6d schedules  %-16s %10.3f ms' % (num_schedules, name, elapsed * 1000)
+
+
+def main():
+    parser = OptionParser()
+    parser.add_option('--schedules', type='int', action='append',
+                      help='number of schedules; may be given more than once')
+    parser.add_option('--ticks', type='int', default=20,
+                      help='number of ticks averaged once the schedules are loaded')
+    options, args = parser.parse_args()
+
+    scheduler.Scheduler._mongo_initialized = True
+    with mock.patch.object(ScheduledCall, 'save'):
+        for num_schedules in options.schedules or [10000, 50000]:
+            run(num_schedules, options.ticks)
+
+
+if __name__ == '__main__':
+    main()
@@ -264,7 +264,7 @@ Group: Development/Languages
 Requires: python-%{name}-common = %{pulp_version}
 Requires: python-celery >= 3.1.0
 Requires: python-celery < 3.2.0
-Requires: python-pymongo >= 2.5.2
+Requires: python-pymongo >= 2.7
 Requires: python-mongoengine >= 0.7.10
 Requires: python-setuptools
 Requires: python-webpy
@@ -30,6 +30,24 @@ class Cataloger(object):
         """
         raise NotImplementedError()
 
+    def fingerprint(self, conduit, config, url):
+        """
+        Get a fingerprint of the upstream metadata used to refresh the
+        content catalog, such as a checksum or ETag of the metadata.
+        When the fingerprint has not changed since the last refresh of
+        the URL, the refresh is skipped and the existing catalog entries
+        are renewed.  Returning None means the catalog is always refreshed.
+        :param conduit: Access to pulp platform API.
+        :type conduit: pulp.server.plugins.conduits.cataloger.CatalogerConduit
+        :param config: The content source configuration.
+        :type config: dict
+        :param url: The URL for the content source.
+        :type url: str
+        :return: The fingerprint or None.
+        :rtype: str
+        """
+        return None
+
     def refresh(self, conduit, config, url):
         """
         Refresh the content catalog.
@@ -11,6 +11,7 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import copy
 from gettext import gettext as _
 import logging
 import sys
@@ -20,6 +21,7 @@ from pymongo.errors import DuplicateKeyError
 import pulp.plugins.conduits._common as common_utils
 from pulp.plugins.model import Unit, PublishReport
 from pulp.plugins.types import database as types_db
+from pulp.plugins.util import misc
 from pulp.server.async.task_status_manager import TaskStatusManager
 from pulp.server.async.tasks import get_current_task_id
 from pulp.server.exceptions import MissingResource
@@ -33,6 +35,9 @@ from pulp.server.db.model.criteria import UnitAssociationCriteria, Criteria
 
 logger = logging.getLogger(__name__)
 
+# Number of units written by each bulk operation in AddUnitMixin.save_units
+SAVE_UNITS_PAGE_SIZE = 1000
+
 # -- exceptions ---------------------------------------------------------------
 
 class ImporterConduitException(Exception):
@@ -151,7 +156,7 @@ class SingleRepoUnitsMixin(object):
         self.repo_id = repo_id
         self.exception_class = exception_class
 
-    def get_units(self, criteria=None, as_generator=False):
+    def get_units(self, criteria=None, as_generator=False, batch_size=None):
         """
         Returns the collection of content units associated with the repository
         being operated on.
@@ -163,10 +168,18 @@ class SingleRepoUnitsMixin(object):
                the Criteria class can be imported from this module
         :type  criteria: UnitAssociationCriteria
 
+        :param as_generator: if true, return a generator; if false, a list
+        :type  as_generator: bool
+
+        :param batch_size: if specified, stream the units from the database this
+               many at a time instead of loading every association up front
+        :type  batch_size: int or None
+
         :return: list of unit instances
         :rtype:  list or generator of AssociatedUnit
         """
-        return do_get_repo_units(self.repo_id, criteria, self.exception_class, as_generator)
+        return do_get_repo_units(self.repo_id, criteria, self.exception_class, as_generator,
+                                 batch_size)
 
 
 class MultipleRepoUnitsMixin(object):
@@ -174,7 +187,7 @@ class MultipleRepoUnitsMixin(object):
     def __init__(self, exception_class):
         self.exception_class = exception_class
 
-    def get_units(self, repo_id, criteria=None, as_generator=False):
+    def get_units(self, repo_id, criteria=None, as_generator=False, batch_size=None):
         """
         Returns the collection of content units associated with the given
         repository.
@@ -186,10 +199,18 @@ class MultipleRepoUnitsMixin(object):
                the Criteria class can be imported from this module
         :type  criteria: UnitAssociationCriteria
 
+        :param as_generator: if true, return a generator; if false, a list
+        :type  as_generator: bool
+
+        :param batch_size: if specified, stream the units from the database this
+               many at a time instead of loading every association up front
+        :type  batch_size: int or None
+
         :return: list of unit instances
         :rtype:  list or generator of AssociatedUnit
         """
-        return do_get_repo_units(repo_id, criteria, self.exception_class, as_generator)
+        return do_get_repo_units(repo_id, criteria, self.exception_class, as_generator,
+                                 batch_size)
 
 
 class SearchUnitsMixin(object):
@@ -493,6 +514,69 @@ class AddUnitMixin(object):
             logger.exception(_('Content unit association failed [%s]' % str(unit)))
             raise ImporterConduitException(e), None, sys.exc_info()[2]
 
+    def save_units(self, units):
+        """
+        Bulk version of save_unit. The units are saved in pages; for each page,
+        the units that already exist are found with one query per type and the
+        units and their associations are written with bulk operations.
+
+        This call will populate the id field of each unit.
+
+        :param units: unit objects returned from the init_unit call
+        :type  units: iterable of Unit
+
+        :return: the IDs of the units, in the order they were provided
+        :rtype:  list of str
+        """
+        unit_ids = []
+        try:
+            for page in misc.paginate(units, SAVE_UNITS_PAGE_SIZE):
+                by_type = {}
+                for unit in page:
+                    by_type.setdefault(unit.type_id, []).append(unit)
+                for type_id, type_units in by_type.items():
+                    self._save_units(type_id, type_units)
+                unit_ids.extend(unit.id for unit in page)
+            return unit_ids
+        except Exception, e:
+            logger.exception(_('Content unit association failed'))
+            raise ImporterConduitException(e), None, sys.exc_info()[2]
+
+    def _save_units(self, type_id, units):
+        """
+        Add or update units of the same type and associate them with the repo.
+
+        :param type_id: the type of all of the units
+        :type  type_id: str
+        :param units:   the units to be saved
+        :type  units:   list of pulp.plugins.model.Unit
+        """
+        content_manager = manager_factory.content_manager()
+        documents = [(u.unit_key, common_utils.to_pulp_unit(u)) for u in units]
+        saved = content_manager.save_content_units(type_id, documents)
+        for unit, (unit_id, created) in zip(units, saved):
+            unit.id = unit_id
+            if created:
+                self._added_count += 1
+            else:
+                self._updated_count += 1
+        self._associate_units(type_id, [unit.id for unit in units])
+
+    def _associate_units(self, type_id, unit_ids):
+        """
+        Associate units of the same type with the repo using a bulk operation.
+        Units that are already associated are skipped.
+
+        :param type_id:  the type of all of the units
+        :type  type_id:  str
+        :param unit_ids: IDs of the units to associate
+        :type  unit_ids: list of str
+        """
+        association_manager = manager_factory.repo_unit_association_manager()
+        association_manager.associate_all_by_ids(self.repo_id, type_id, unit_ids,
+                                                 self.association_owner_type,
+                                                 self.association_owner_id)
+
     def _update_unit(self, unit, pulp_unit):
         """
         Update a unit. If it is not found, add it.
@@ -590,6 +674,9 @@ class StatusMixin(object):
         contents of the status is dependent on how the distributor
         implementation chooses to divide up the publish process.
 
+        Only the parts of the status that changed since the last call are
+        written; nothing is written if the status did not change.
+
         @param status: contains arbitrary data to describe the state of the
                publish; the contents may contain whatever information is relevant
                to the distributor implementation so long as it is serializable
@@ -600,9 +687,11 @@ class StatusMixin(object):
             return
 
         try:
-            self.progress_report[self.report_id] = status
-            delta = {'progress_report': self.progress_report}
-            TaskStatusManager.update_task_status(self.task_id, delta)
+            progress = self._progress_delta(status)
+            if progress:
+                TaskStatusManager.set_task_progress(self.task_id, progress)
+            # The caller may modify the status before the next call
+            self.progress_report[self.report_id] = copy.deepcopy(status)
         except Exception, e:
             logger.exception('Exception from server setting progress for report [%s]' % self.report_id)
             try:
@@ -613,6 +702,34 @@ class StatusMixin(object):
                 pass
             raise self.exception_class(e), None, sys.exc_info()[2]
 
+    def _progress_delta(self, status):
+        """
+        Determine which parts of the progress report need to be written. When
+        the status is a list or dict with the same length or keys as the last
+        status written, only the items that changed are returned.
+
+        @param status: the new status for this conduit's report
+        @return: the values to write keyed by their path within the progress report
+        @rtype:  dict
+        """
+        if self.report_id not in self.progress_report:
+            return {self.report_id: status}
+        previous = self.progress_report[self.report_id]
+        if status == previous:
+            return {}
+        if isinstance(status, list) and isinstance(previous, list) \
+                and len(status) == len(previous):
+            items = enumerate(status)
+        elif isinstance(status, dict) and isinstance(previous, dict) \
+                and set(status) == set(previous) \
+                and all(isinstance(k, basestring) and '.' not in k and not k.startswith('$')
+                        for k in status):
+            items = status.iteritems()
+        else:
+            return {self.report_id: status}
+        return dict(('%s.%s' % (self.report_id, key), value) for key, value in items
+                    if value != previous[key])
+
 
 class PublishReportMixin(object):
 
@@ -663,7 +780,7 @@ class PublishReportMixin(object):
         return r
 
 
-def do_get_repo_units(repo_id, criteria, exception_class, as_generator=False):
+def do_get_repo_units(repo_id, criteria, exception_class, as_generator=False, batch_size=None):
     """
     Performs a repo unit association query. This is split apart so we can have
     custom mixins with different signatures.
@@ -671,7 +788,8 @@ def do_get_repo_units(repo_id, criteria, exception_class, as_generator=False):
     try:
         association_query_manager = manager_factory.repo_unit_association_query_manager()
         # Use a get_units as_generator here and cast to a list later, if necessary.
-        units = association_query_manager.get_units(repo_id, criteria=criteria, as_generator=True)
+        units = association_query_manager.get_units(repo_id, criteria=criteria, as_generator=True,
+                                                    batch_size=batch_size)
 
         # Load all type definitions so we don't hammer the database.
         type_defs = dict((t['id'], t) for t in types_db.all_type_definitions())
@@ -110,6 +110,35 @@ class ImportUnitConduit(ImporterScratchPadMixin, RepoScratchPadMixin,
             _LOG.exception(_('Content unit association failed [%s]' % str(unit)))
             raise ImporterConduitException(e), None, sys.exc_info()[2]
 
+    def associate_units(self, units):
+        """
+        Bulk version of associate_unit. Units are associated in pages with one
+        query and one bulk write per page and type, so importers copying many
+        units should prefer this call.
+
+        This call is idempotent. Units that are already associated are skipped.
+
+        :param units: unit objects returned from the init_unit call
+        :type  units: iterable of pulp.plugins.model.Unit
+
+        :return: the provided units
+        :rtype:  list of pulp.plugins.model.Unit
+        """
+        units = list(units)
+        try:
+            by_type = {}
+            for unit in units:
+                by_type.setdefault(unit.type_id, []).append(unit.id)
+            for type_id, unit_ids in by_type.items():
+                self.__association_manager.associate_all_by_ids(self.dest_repo_id, type_id,
+                                                                unit_ids,
+                                                                self.association_owner_type,
+                                                                self.association_owner_id)
+            return units
+        except Exception, e:
+            _LOG.exception(_('Content unit association failed'))
+            raise ImporterConduitException(e), None, sys.exc_info()[2]
+
     def get_source_units(self, criteria=None):
         """
         Returns the collection of content units associated with the source
@@ -18,8 +18,22 @@ from pulp.plugins.conduits.mixins import (
 class UploadConduit(AddUnitMixin, SingleRepoUnitsMixin, SearchUnitsMixin):
 
     def __init__(self, repo_id, importer_id, association_owner_type,
-                 association_owner_id):
+                 association_owner_id, checksums=None):
         AddUnitMixin.__init__(self, repo_id, importer_id,
                               association_owner_type, association_owner_id)
         SingleRepoUnitsMixin.__init__(self, repo_id, ImporterConduitException)
         SearchUnitsMixin.__init__(self, ImporterConduitException)
+        self.checksums = checksums or {}
+
+    def get_upload_checksum(self, checksum_type):
+        """
+        Returns the checksum of the uploaded file, if the server calculated it
+        while the file was being uploaded. Importers should use this instead of
+        reading the file again when it is available.
+
+        :param checksum_type: type of checksum, such as "sha256"
+        :type  checksum_type: str
+        :return: hex digest of the uploaded file, or None if it is not known
+        :rtype:  str or None
+        """
+        return self.checksums.get(checksum_type)
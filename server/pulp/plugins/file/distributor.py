@@ -15,6 +15,8 @@ import os
 import logging
 from gettext import gettext as _
 import errno
+import hashlib
+import json
 import shutil
 import traceback
 import csv
@@ -25,6 +27,13 @@ from pulp.plugins.distributor import Distributor
 
 
 BUILD_DIRNAME = 'build'
+# Published builds are kept in this directory of the working directory, each named by the digest
+# of its contents. The hosting locations are symlinks to the current build.
+MASTER_DIRNAME = 'master'
+# Name of the symlink in the master directory that points to the current build
+CURRENT_LINK_NAME = 'current'
+# Suffix of the file, next to each build, that records the links in the build
+LINKS_SUFFIX = '.links'
 
 logger = logging.getLogger(__name__)
 
@@ -68,6 +77,11 @@ class FileDistributor(Distributor):
         """
         Publish the repository.
 
+        The build for the previous publish is kept as a spare. The new build is made by updating
+        the spare with only the links that differ from it, and the hosting locations are then
+        switched to the new build with an atomic symlink rename. When the published content has
+        not changed, the existing build is reused.
+
         :param repo:            metadata describing the repo
         :type  repo:            pulp.plugins.model.Repository
         :param publish_conduit: The conduit for publishing a repo
@@ -86,7 +100,17 @@ class FileDistributor(Distributor):
             progress_report.state = progress_report.STATE_IN_PROGRESS
             units = publish_conduit.get_units()
 
-            # Set up an empty build_dir
+            master_dir = os.path.join(repo.working_dir, MASTER_DIRNAME)
+            if not os.path.exists(master_dir):
+                os.makedirs(master_dir)
+            current_build = self._current_build(master_dir)
+            spare_build = self._spare_build(master_dir, current_build)
+            if spare_build:
+                previous_links = self._read_links(os.path.join(master_dir, spare_build))
+            else:
+                previous_links = {}
+
+            # The metadata is generated in an empty build_dir
             build_dir = os.path.join(repo.working_dir, BUILD_DIRNAME)
             # Let's erase the path at build_dir so we can be sure it's a clean directory
             self._rmtree_if_exists(build_dir)
@@ -94,27 +118,56 @@ class FileDistributor(Distributor):
 
             self.initialize_metadata(build_dir)
 
+            links = {}
+            changed_units = []
             try:
-                # process each unit
+                # process each unit, noting the links that differ from the spare build
                 for unit in units:
-                    links_to_create = self.get_paths_for_unit(unit)
-                    self._symlink_unit(build_dir, unit, links_to_create)
+                    changed_paths = []
+                    for path in self.get_paths_for_unit(unit):
+                        links[path] = unit.storage_path
+                        if previous_links.get(path) != unit.storage_path:
+                            changed_paths.append(path)
+                    if changed_paths:
+                        changed_units.append((unit, changed_paths))
                     self.publish_metadata_for_unit(unit)
             finally:
                 #Finalize the processing
                 self.finalize_metadata()
 
-            # Let's unpublish, and then republish
-            self.unpublish_repo(repo, config)
+            build = self._build_digest(build_dir, links)
+            build_path = os.path.join(master_dir, build)
+            if os.path.exists(build_path):
+                # The same content has already been published, the build is reused
+                self._rmtree_if_exists(build_dir)
+            else:
+                if spare_build:
+                    # Apply the differences to the spare build
+                    spare_dir = os.path.join(master_dir, spare_build)
+                    os.remove(spare_dir + LINKS_SUFFIX)
+                    for name in os.listdir(build_dir):
+                        os.rename(os.path.join(build_dir, name), os.path.join(spare_dir, name))
+                    os.rmdir(build_dir)
+                    build_dir = spare_dir
+                for unit, paths in changed_units:
+                    self._symlink_unit(build_dir, unit, paths)
+                for path in set(previous_links).difference(links):
+                    self._remove_link(build_dir, path)
+                self._write_links(build_path, links)
+                os.rename(build_dir, build_path)
 
             hosting_locations = self.get_hosting_locations(repo, config)
             for location in hosting_locations:
-                shutil.copytree(build_dir, location, symlinks=True)
+                self._switch_link(build_path, location)
+            self._switch_link(build, os.path.join(master_dir, CURRENT_LINK_NAME))
 
-            self.post_repo_publish(repo, config)
+            # Keep the build that was replaced as the spare for the next publish
+            if build == current_build:
+                self._clear_builds(master_dir, (build, spare_build))
+            else:
+                self._clear_builds(master_dir, (build, current_build))
 
-            # Clean up our build_dir
-            self._rmtree_if_exists(build_dir)
+            self.post_repo_publish(repo, config)
 
             # Report that we are done
             progress_report.state = progress_report.STATE_COMPLETE
@@ -141,7 +194,11 @@ class FileDistributor(Distributor):
         """
         hosting_locations = self.get_hosting_locations(repo, config)
         for location in hosting_locations:
-            self._rmtree_if_exists(location)
+            if os.path.islink(location):
+                os.remove(location)
+            else:
+                self._rmtree_if_exists(location)
+        self._rmtree_if_exists(os.path.join(repo.working_dir, MASTER_DIRNAME))
 
     def validate_config(self, repo, config, config_conduit):
         raise NotImplementedError()
@@ -248,6 +305,143 @@ class FileDistributor(Distributor):
             # so now we should recreate it.
             os.symlink(unit.storage_path, symlink_filename)
 
+    def _remove_link(self, build_dir, path):
+        """
+        Remove a link that is no longer published from a build.
+
+        :param build_dir: The path of the build
+        :type  build_dir: basestring
+        :param path:      The path of the link, relative to the build
+        :type  path:      basestring
+        """
+        try:
+            os.remove(os.path.join(build_dir, path))
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
+
+    @staticmethod
+    def _current_build(master_dir):
+        """
+        :param master_dir: The directory containing the builds
+        :type  master_dir: basestring
+        :return: the name of the build currently published, or None
+        :rtype:  basestring
+        """
+        try:
+            return os.readlink(os.path.join(master_dir, CURRENT_LINK_NAME))
+        except OSError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            return None
+
+    @staticmethod
+    def _spare_build(master_dir, current_build):
+        """
+        :param master_dir:    The directory containing the builds
+        :type  master_dir:    basestring
+        :param current_build: The name of the build currently published
+        :type  current_build: basestring
+        :return: the name of a complete build that is not currently published, or None
+        :rtype:  basestring
+        """
+        for name in os.listdir(master_dir):
+            if name.endswith(LINKS_SUFFIX):
+                build = name[:-len(LINKS_SUFFIX)]
+                if build != current_build and os.path.isdir(os.path.join(master_dir, build)):
+                    return build
+        return None
+
+    @staticmethod
+    def _clear_builds(master_dir, keep):
+        """
+        Remove the builds, and anything else, from the master directory except for the
+        current link and the given builds.
+
+        :param master_dir: The directory containing the builds
+        :type  master_dir: basestring
+        :param keep:       The names of the builds to keep
+        :type  keep:       iterable of basestring
+        """
+        keep = set(b for b in keep if b)
+        keep.update([b + LINKS_SUFFIX for b in keep])
+        keep.add(CURRENT_LINK_NAME)
+        for name in os.listdir(master_dir):
+            if name in keep:
+                continue
+            path = os.path.join(master_dir, name)
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+
+    @staticmethod
+    def _read_links(build_dir):
+        """
+        :param build_dir: The path of the build
+        :type  build_dir: basestring
+        :return: the link targets in the build, keyed by their relative path
+        :rtype:  dict
+        """
+        with open(build_dir + LINKS_SUFFIX) as links_file:
+            return json.load(links_file)
+
+    @staticmethod
+    def _write_links(build_dir, links):
+        """
+        Record the links in a build. The record is kept next to the build so that it is not
+        published.
+
+        :param build_dir: The path of the build
+        :type  build_dir: basestring
+        :param links:     The link targets in the build, keyed by their relative path
+        :type  links:     dict
+        """
+        with open(build_dir + LINKS_SUFFIX, 'w') as links_file:
+            json.dump(links, links_file)
+
+    @staticmethod
+    def _build_digest(build_dir, links):
+        """
+        :param build_dir: The path of the directory containing the metadata of the build
+        :type  build_dir: basestring
+        :param links:     The link targets in the build, keyed by their relative path
+        :type  links:     dict
+        :return: a digest of the links and metadata of the build, used as the name of the build
+        :rtype:  str
+        """
+        digest = hashlib.sha256()
+        for name in sorted(os.listdir(build_dir)):
+            digest.update(name)
+            with open(os.path.join(build_dir, name), 'rb') as metadata_file:
+                for block in iter(lambda: metadata_file.read(65536), ''):
+                    digest.update(block)
+        digest.update(json.dumps(links, sort_keys=True))
+        return digest.hexdigest()
+
+    def _switch_link(self, target, link_path):
+        """
+        Atomically point a symlink at a new target by renaming a temporary symlink over it.
+        A directory at the link path, left by an earlier version that copied the build, is
+        removed first.
+
+        :param target:    The target of the symlink
+        :type  target:    basestring
+        :param link_path: The path of the symlink
+        :type  link_path: basestring
+        """
+        link_path = link_path.rstrip('/')
+        parent = os.path.dirname(link_path)
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        if not os.path.islink(link_path):
+            self._rmtree_if_exists(link_path)
+        tmp_link = '%s.%s' % (link_path, os.getpid())
+        if os.path.islink(tmp_link):
+            os.remove(tmp_link)
+        os.symlink(target, tmp_link)
+        os.rename(tmp_link, link_path)
+
     def _rmtree_if_exists(self, path):
         """
         If the given path exists, remove it recursively. Else, do nothing.
@@ -253,3 +253,30 @@ class Profiler(object):
         :rtype:               list of str
         """
         raise NotImplementedError()
+
+    def calculate_applicable_units_batch(self, unit_profiles, bound_repo_id, config, conduit):
+        """
+        Calculate applicability for several distinct unit profiles against the same bound
+        repository. Pulp uses this when regenerating applicability so that a profiler can load
+        the repository's content once for the whole batch.
+
+        The default implementation calls calculate_applicable_units once per profile; profilers
+        that can share work between profiles should override it.
+
+        :param unit_profiles: consumer unit profiles keyed by profile hash
+        :type  unit_profiles: dict
+        :param bound_repo_id: repo id of a repository to be used to calculate applicability
+                              against the given consumer profiles
+        :type  bound_repo_id: str
+        :param config:        plugin configuration
+        :type  config:        pulp.server.plugins.config.PluginCallConfiguration
+        :param conduit:       provides access to relevant Pulp functionality
+        :type  conduit:       pulp.plugins.conduits.profile.ProfilerConduit
+        :return:              the applicability calculated for each profile, keyed by profile hash
+        :rtype:               dict
+        """
+        applicability = {}
+        for profile_hash, unit_profile in unit_profiles.items():
+            applicability[profile_hash] = self.calculate_applicable_units(
+                unit_profile, bound_repo_id, config, conduit)
+        return applicability
@@ -15,9 +15,17 @@
 Responsible for the storage and retrieval of content types in the database.
 This module covers both the ContentType collection itself as well as any
 type-specific collections that exist to suit the type needs.
+
+Type definitions are read from the database once and then cached by each
+process. The cache is invalidated whenever update_database or clean runs in the
+process. Types are only changed by pulp-manage-db, after which the services
+are restarted, so other processes never hold outdated definitions.
 """
 
+from collections import OrderedDict
+import copy
 import logging
+import threading
 
 from pymongo import ASCENDING
 
@@ -30,6 +38,53 @@ TYPE_COLLECTION_PREFIX = 'units_'
 
 LOG = logging.getLogger('db')
 
+# -- cache --------------------------------------------------------------------
+
+
+class _DefinitionCache(object):
+    """
+    Process level cache of the type definitions in the database. Readers load
+    the definitions whenever the generation has changed since they were last
+    loaded, or when they ask for a type that was not in the database at the time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.generation = 0
+        self._loaded_generation = None
+        self._definitions = OrderedDict()
+
+    def invalidate(self):
+        """
+        Start a new generation, so the definitions are reloaded on next use.
+        """
+        with self._lock:
+            self.generation += 1
+
+    def definitions(self, type_id=None):
+        """
+        @param type_id: if specified, the definitions are reloaded if this type
+                        is not among them
+        @type  type_id: str
+
+        @return: type definitions (mongo SON objects) keyed by type ID, in
+                 database order; must not be modified
+        @rtype:  OrderedDict
+        """
+        with self._lock:
+            if self._loaded_generation != self.generation or \
+                    (type_id is not None and type_id not in self._definitions):
+                generation = self.generation
+                definitions = OrderedDict()
+                for type_def in ContentType.get_collection().find():
+                    definitions[type_def['id']] = type_def
+                self._definitions = definitions
+                self._loaded_generation = generation
+            return self._definitions
+
+
+_CACHE = _DefinitionCache()
+
 # -- database exceptions ------------------------------------------------------
 
 
@@ -80,6 +135,16 @@ def update_database(definitions, error_on_missing_definitions=False):
     @type  error_on_missing_definitions: bool
     """
 
+    try:
+        _update_database(definitions, error_on_missing_definitions)
+    finally:
+        _CACHE.invalidate()
+
+
+def _update_database(definitions, error_on_missing_definitions):
+    """
+    Implementation of update_database, which takes care of invalidating the cache.
+    """
     all_type_ids = [d.id for d in definitions]
 
     LOG.info('Updating the database with types [%s]' % ', '.join(all_type_ids))
@@ -153,6 +218,7 @@ def clean():
     # Purge the types collection of all entries
     type_collection = ContentType.get_collection()
     type_collection.remove(safe=True)
+    _CACHE.invalidate()
 
 
 def type_units_collection(type_id):
@@ -177,11 +243,7 @@ def all_type_ids():
     @rtype:  list of str
     """
 
-    collection = ContentType.get_collection()
-    type_id_son = list(collection.find(fields={'id' : 1}))
-    type_ids = [t['id'] for t in type_id_son]
-
-    return type_ids
+    return _CACHE.definitions().keys()
 
 
 def all_type_collection_names():
@@ -190,14 +252,7 @@ def all_type_collection_names():
     @rtype:  list of str
     """
 
-    collection = ContentType.get_collection()
-    type_ids = list(collection.find(fields={'id' : 1}))
-
-    type_collection_names = []
-    for id in type_ids:
-        type_collection_names.append(unit_collection_name(id['id']))
-
-    return type_collection_names
+    return [unit_collection_name(type_id) for type_id in _CACHE.definitions()]
 
 
 def all_type_definitions():
@@ -206,9 +261,7 @@ def all_type_definitions():
     @rtype:  list of dict
     """
 
-    coll = ContentType.get_collection()
-    types = list(coll.find())
-    return types
+    return copy.deepcopy(_CACHE.definitions().values())
 
 
 def type_definition(type_id):
@@ -219,9 +272,7 @@ def type_definition(type_id):
     @return: corresponding type definition, None if not found
     @rtype: SON or None
     """
-    collection = ContentType.get_collection()
-    type_ = collection.find_one({'id': type_id})
-    return type_
+    return copy.deepcopy(_CACHE.definitions(type_id).get(type_id))
 
 
 def unit_collection_name(type_id):
@@ -248,11 +299,10 @@ def type_units_unit_key(type_id):
              content type collection
     @rtype: list of str or None
     """
-    collection = ContentType.get_collection()
-    type_def = collection.find_one({'id': type_id})
+    type_def = _CACHE.definitions(type_id).get(type_id)
     if type_def is None:
         return None
-    return type_def['unit_key']
+    return copy.copy(type_def['unit_key'])
 
 # -- private -----------------------------------------------------------------
 
@@ -285,6 +335,7 @@ def _create_or_update_type(type_def):
         content_type._id = existing_type['_id']
     # XXX this still causes a potential race condition when 2 users are updating the same type
     content_type_collection.save(content_type, safe=True)
+    _CACHE.invalidate()
 
 
 def _update_indexes(type_def, unique):
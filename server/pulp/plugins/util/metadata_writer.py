@@ -17,6 +17,45 @@ _LOG = logging.getLogger(__name__)
 BUFFER_SIZE = 1024
 
 
+class _DigestingFile(object):
+    """
+    Write-only file wrapper that passes everything written through to another file object while
+    updating a checksum of it, so the checksum of a file is known as soon as it is closed.
+    """
+
+    def __init__(self, file_object, digest=None, underlying_file=None):
+        """
+        :param file_object: file object to write to
+        :type  file_object: file
+        :param digest: hash object to update with everything written, if any
+        :type  digest: hashlib hash object or None
+        :param underlying_file: file object that file_object writes to and that is not closed
+                                along with it, such as the fileobj of a GzipFile. It is closed
+                                after file_object.
+        :type  underlying_file: file or None
+        """
+        self.file_object = file_object
+        self.digest = digest
+        self.underlying_file = underlying_file
+
+    @property
+    def closed(self):
+        return MetadataFileContext._is_closed(self.file_object)
+
+    def write(self, data):
+        if self.digest is not None:
+            self.digest.update(data)
+        self.file_object.write(data)
+
+    def flush(self):
+        self.file_object.flush()
+
+    def close(self):
+        self.file_object.close()
+        if self.underlying_file is not None:
+            self.underlying_file.close()
+
+
 class MetadataFileContext(object):
     """
     Context manager class for metadata file generation.
@@ -36,6 +75,10 @@ class MetadataFileContext(object):
         self.metadata_file_handle = None
         self.checksum_type = checksum_type
         self.checksum = None
+        # Checksum of the uncompressed content, only differs from checksum for gzipped files
+        self.open_checksum = None
+        self._digest = None
+        self._open_digest = None
         if self.checksum_type is not None:
             checksum_function = CHECKSUM_FUNCTIONS.get(checksum_type)
             if not checksum_function:
@@ -96,11 +139,13 @@ class MetadataFileContext(object):
         # Add calculated checksum to the filename
         file_name = os.path.basename(self.metadata_file_path)
         if self.checksum_type is not None:
-            with open(self.metadata_file_path, 'rb') as file_handle:
-                content = file_handle.read()
-                checksum = self.checksum_constructor(content).hexdigest()
+            if self._digest is None:
+                # The file was not written through the handle opened by this context
+                self._digest = self._file_digest(self.metadata_file_path)
+            checksum = self._digest.hexdigest()
 
             self.checksum = checksum
+            self.open_checksum = (self._open_digest or self._digest).hexdigest()
             file_name_with_checksum = checksum + '-' + file_name
             new_file_path = os.path.join(os.path.dirname(self.metadata_file_path),
                                          file_name_with_checksum)
@@ -142,11 +187,21 @@ class MetadataFileContext(object):
         msg = _('Opening metadata file handle for [%(p)s]')
         _LOG.debug(msg % {'p': self.metadata_file_path})
 
+        # Both the file as written to disk and, if it is compressed, its content are hashed as
+        # they are written so that finalize does not have to read the file back in.
+        if self.checksum_type is not None:
+            self._digest = self.checksum_constructor()
+        file_handle = _DigestingFile(open(self.metadata_file_path, 'w'), self._digest)
+
         if self.metadata_file_path.endswith('.gz'):
-            self.metadata_file_handle = gzip.open(self.metadata_file_path, 'w')
+            if self.checksum_type is not None:
+                self._open_digest = self.checksum_constructor()
+            gzip_handle = gzip.GzipFile(self.metadata_file_path, 'w', fileobj=file_handle)
+            self.metadata_file_handle = _DigestingFile(gzip_handle, self._open_digest,
+                                                       file_handle)
 
         else:
-            self.metadata_file_handle = open(self.metadata_file_path, 'w')
+            self.metadata_file_handle = file_handle
 
     def _write_file_header(self):
         """
@@ -169,6 +224,24 @@ class MetadataFileContext(object):
             self.metadata_file_handle.flush()
             self.metadata_file_handle.close()
 
+    def _file_digest(self, file_path):
+        """
+        Compute the checksum of a file that is already on disk.
+
+        :param file_path: full path to the file
+        :type  file_path: str
+
+        :return:    hash object updated with the content of the file
+        :rtype:     hashlib hash object
+        """
+        digest = self.checksum_constructor()
+        with open(file_path, 'rb') as file_handle:
+            content = file_handle.read(BUFFER_SIZE)
+            while content:
+                digest.update(content)
+                content = file_handle.read(BUFFER_SIZE)
+        return digest
+
     @staticmethod
     def _is_closed(file_object):
         """
@@ -346,25 +419,12 @@ class FastForwardXmlFileContext(XmlFileContext):
 
             self.existing_file = os.path.join(working_dir, self.existing_file)
 
-            # Open the file, unzip if necessary so that seek operations can be performed
-            self.original_file_handle = None
+            # The original file is only ever read forwards, so a compressed one is read as it is
+            # decompressed rather than being unzipped to disk first
             if self.existing_file.endswith('.gz'):
-                non_compressed_file = self.existing_file[:self.existing_file.rfind('.gz')]
-                with open(os.path.join(working_dir, non_compressed_file), 'wb') as plain_handle:
-                    gzip_handle = gzip.open(os.path.join(working_dir, self.existing_file), 'rb')
-                    try:
-                        content = gzip_handle.read(BUFFER_SIZE)
-                        while content:
-                            plain_handle.write(content)
-                            content = gzip_handle.read(BUFFER_SIZE)
-                    finally:
-                        if gzip_handle:
-                            gzip_handle.close()
-                # clean up the zipped file
-                os.unlink(self.existing_file)
-                self.existing_file = non_compressed_file
-
-            self.original_file_handle = open(os.path.join(working_dir, self.existing_file), 'r')
+                self.original_file_handle = gzip.open(self.existing_file, 'rb')
+            else:
+                self.original_file_handle = open(self.existing_file, 'r')
 
         super(FastForwardXmlFileContext, self)._open_metadata_file_handle()
 
@@ -377,7 +437,7 @@ class FastForwardXmlFileContext(XmlFileContext):
             start_tag = '<%s' % self.search_tag
             end_tag = '</%s' % self.root_tag
 
-            # Find the start offset
+            # Find the start tag
             content = ''
             index = -1
             while index < 0:
@@ -391,36 +451,29 @@ class FastForwardXmlFileContext(XmlFileContext):
                     return
                 content += content_buffer
                 index = content.find(start_tag)
-            start_offset = index
 
-            # Find the end offset
-            content = ''
-            index = -1
-            self.original_file_handle.seek(0, os.SEEK_END)
-            while index < 0:
-                amount_to_read = min(BUFFER_SIZE, self.original_file_handle.tell())
-                self.original_file_handle.seek(-amount_to_read, os.SEEK_CUR)
-                content_buffer = self.original_file_handle.read(amount_to_read)
-                if not content_buffer:
-                    raise Exception(_('Error: %(tag)s not found in the xml file.')
-                                    % {'tag': end_tag})
-                bytes_read = len(content_buffer)
-                self.original_file_handle.seek(-bytes_read, os.SEEK_CUR)
-                content = content_buffer + content
+            # Stream out everything from the start tag up to the last end tag in a single pass.
+            # Anything after an end tag is held back until it is known whether another end tag
+            # follows, and otherwise only enough to detect an end tag split across two reads.
+            content = content[index:]
+            held_back = len(end_tag) - 1
+            while True:
                 index = content.rfind(end_tag)
-            end_offset = self.original_file_handle.tell() + index
-
-            # stream out the content
-            self.original_file_handle.seek(start_offset)
-            bytes_to_read = end_offset - start_offset
-            content_buffer = self.original_file_handle.read(BUFFER_SIZE)
-            while bytes_to_read > 0:
-                buffer_size = len(content_buffer)
-                if buffer_size > bytes_to_read:
-                    content_buffer = content_buffer[:bytes_to_read]
-                self.metadata_file_handle.write(content_buffer)
-                bytes_to_read -= buffer_size
+                if index >= 0:
+                    write_length = index
+                else:
+                    write_length = max(len(content) - held_back, 0)
+                if write_length:
+                    self.metadata_file_handle.write(content[:write_length])
+                    content = content[write_length:]
+
                 content_buffer = self.original_file_handle.read(BUFFER_SIZE)
+                if not content_buffer:
+                    break
+                content += content_buffer
+
+            if not content.startswith(end_tag):
+                raise Exception(_('Error: %(tag)s not found in the xml file.') % {'tag': end_tag})
 
     def _close_metadata_file_handle(self):
         """
@@ -1,11 +1,14 @@
+from collections import deque
 import copy
 from gettext import gettext as _
 from itertools import chain, imap
 import logging
 import os
+from Queue import Queue
 import shutil
 import sys
 import tarfile
+import threading
 import time
 import traceback
 import uuid
@@ -28,6 +31,11 @@ from nectar.downloaders.threaded import HTTPThreadedDownloader
 
 _LOG = logging.getLogger(__name__)
 
+# Progress reported by a step tree is written at most this often (in seconds), unless a
+# step changed state or advanced by PROGRESS_REPORT_PERCENT percent of its total.
+PROGRESS_REPORT_INTERVAL = 0.5
+PROGRESS_REPORT_PERCENT = 1
+
 
 def _post_order(step):
     """
@@ -42,18 +50,150 @@ def _post_order(step):
     yield step
 
 
+def _process_post_order(step):
+    """
+    Process a step tree using post-order (depth first) traversal.
+
+    Consecutive sibling steps that are flagged as independent are processed concurrently,
+    each (along with its children) in its own thread.
+
+    :param step: the root of the step tree to process
+    :type step: Step
+    """
+    independent = []
+    for child in step.children:
+        if child.independent:
+            independent.append(child)
+            continue
+        _process_concurrently(independent)
+        independent = []
+        _process_post_order(child)
+    _process_concurrently(independent)
+    step.process()
+
+
+def _process_concurrently(steps):
+    """
+    Process each step tree in its own thread and wait for all of them to finish.
+    If processing any of the steps fails, the other steps are canceled and the
+    first failure (in sibling order) is raised.
+
+    :param steps: the root steps of the trees to process
+    :type steps: list of Step
+    """
+    if len(steps) < 2:
+        for step in steps:
+            _process_post_order(step)
+        return
+
+    failures = [None] * len(steps)
+
+    def run(index):
+        try:
+            _process_post_order(steps[index])
+        except Exception:
+            failures[index] = sys.exc_info()
+            for step in steps:
+                step.cancel()
+
+    threads = []
+    for index in range(len(steps)):
+        thread = threading.Thread(target=run, args=(index,))
+        thread.setDaemon(True)
+        thread.start()
+        threads.append(thread)
+    for thread in threads:
+        thread.join()
+
+    for exc_info in failures:
+        if exc_info is not None:
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+
+def _parallel_map(function, iterable, workers):
+    """
+    Call a function for each item from an iterable using a number of worker threads.
+
+    The results are yielded in the order of the iterable. The iterable is consumed as the
+    results are consumed, with at most twice as many items in progress as there are workers.
+    When the generator is closed, items that have not been started are skipped and the
+    workers are joined before returning.
+
+    :param function: called with each item
+    :type function: callable
+    :param iterable: the items
+    :type iterable: iterable
+    :param workers: the number of worker threads
+    :type workers: int
+    :return: generator of (item, result, exc_info) where exc_info is the sys.exc_info()
+             for the exception raised by the function, or None
+    :rtype: generator
+    """
+    tasks = Queue()
+    stopped = threading.Event()
+
+    def work():
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            if not stopped.is_set():
+                try:
+                    task['result'] = function(task['item'])
+                except Exception:
+                    task['exc_info'] = sys.exc_info()
+            task['done'].set()
+
+    threads = []
+    for n in range(workers):
+        thread = threading.Thread(target=work)
+        thread.setDaemon(True)
+        thread.start()
+        threads.append(thread)
+
+    pending = deque()
+    try:
+        for item in iterable:
+            task = dict(item=item, result=None, exc_info=None, done=threading.Event())
+            pending.append(task)
+            tasks.put(task)
+            if len(pending) >= workers * 2:
+                task = pending.popleft()
+                task['done'].wait()
+                yield task['item'], task['result'], task['exc_info']
+        while pending:
+            task = pending.popleft()
+            task['done'].wait()
+            yield task['item'], task['result'], task['exc_info']
+    finally:
+        stopped.set()
+        for thread in threads:
+            tasks.put(None)
+        for thread in threads:
+            thread.join()
+
+
 class Step(object):
     """
     Base class for step processing. The only tie to the platform is an assumption of
     the use of a conduit that extends StatusMixin for reporting status along the way.
     """
 
+    # The number of threads used to process the items of an iterative step. When more
+    # than one, the work done for each item must be thread-safe and must not depend on
+    # other items. Results are still handled in the order of the items. Subclasses
+    # override it, or it is set on the instance after __init__.
+    workers = 1
+
     def __init__(self, step_type, status_conduit=None, non_halting_exceptions=None):
         """
         :param step_type: The id of the step this processes
         :type step_type: str
         :param status_conduit: The conduit used for reporting status as the step executes
         :type status_conduit: pulp.plugins.conduits.mixins.StatusMixin
+        :param non_halting_exceptions: exception types that are recorded as failures of an
+                                       item without halting the processing of other items
+        :type non_halting_exceptions: list of type
         """
         self.status_conduit = status_conduit
         self.uuid = str(uuid.uuid4())
@@ -70,9 +210,14 @@ class Step(object):
         self.children = []
         self.last_report_time = 0
         self.last_reported_state = self.state
+        self.last_reported_processed = 0
         self.timestamp = str(time.time())
         self.non_halting_exceptions = non_halting_exceptions
         self.exceptions = []
+        # When True, the step (and its children) may be processed concurrently with
+        # neighbouring sibling steps that are also independent.
+        self.independent = False
+        self._progress_lock = threading.RLock()
 
     def add_child(self, step):
         """
@@ -120,11 +265,12 @@ class Step(object):
         * finalize - All finalize steps will be called even if one of them throws an exception.
                      This is so that open file handles can be closed.
         * post_process
+
+        Consecutive sibling steps that are independent are processed concurrently.
         """
         try:
             # Process the steps in post order
-            for step in _post_order(self):
-                step.process()
+            _process_post_order(self)
         finally:
             self.report_progress(force=True)
 
@@ -184,19 +330,21 @@ class Step(object):
                 self.report_progress()
                 if self.get_iterator():
                     #We are using a generator and will call _process_block for each item
-                    for item in self.get_iterator():
-                        try:
-                            self._process_block(item=item)
-                        except Exception as e:
+                    failures = self._process_items(self.get_iterator())
+                    try:
+                        for exc_info in failures:
+                            e = exc_info[1]
                             raise_exception = True
-                            for exception in self.non_halting_exceptions:
+                            for exception in self.non_halting_exceptions or ():
                                 if isinstance(e, exception):
                                     raise_exception = False
                                     self._record_failure(e=e)
                                     self.exceptions.append(e)
                                     break
                             if raise_exception:
-                                raise
+                                raise exc_info[0], exc_info[1], exc_info[2]
+                    finally:
+                        failures.close()
                     if self.exceptions:
                         raise PulpCodedTaskFailedException(error_code=error_codes.PLP0032,
                                                            task_id=self.status_conduit.task_id)
@@ -234,6 +382,40 @@ class Step(object):
         """
         pass
 
+    def _process_items(self, iterator):
+        """
+        Process each item from the iterator.
+
+        When the step has more than one worker, process_main is called for the items
+        concurrently and the progress is updated in the order of the items. An item is
+        counted as a success unless process_main raises an exception.
+
+        :param iterator: the items to process
+        :type iterator: iterable
+        :return: generator of sys.exc_info() for each item that raised an exception
+        :rtype: generator
+        """
+        if self.workers <= 1:
+            for item in iterator:
+                try:
+                    self._process_block(item=item)
+                except Exception:
+                    yield sys.exc_info()
+            return
+
+        processed = _parallel_map(lambda i: self.process_main(item=i), iterator, self.workers)
+        try:
+            for item, result, exc_info in processed:
+                if self.canceled:
+                    return
+                if exc_info is not None:
+                    yield exc_info
+                    continue
+                self.progress_successes += 1
+                self.report_progress()
+        finally:
+            processed.close()
+
     def _process_block(self, item=None):
         """
         This block is called for the main processing loop
@@ -260,6 +442,11 @@ class Step(object):
         """
         Bubble up that something has changed where progress should be reported.
         It is up to the parent to determine what actions should be taken.
+
+        The root step writes the progress report at most once every PROGRESS_REPORT_INTERVAL
+        seconds. A write is forced when a step changes state or when its progress advances
+        by PROGRESS_REPORT_PERCENT percent of its total.
+
         :param force: Whether or not a write to the database should be forced
         :type force: bool
         """
@@ -267,15 +454,18 @@ class Step(object):
         if self.state != self.last_reported_state:
             force = True
             self.last_reported_state = self.state
+        processed = self.progress_successes + self.progress_failures
+        if self.total_units and (processed - self.last_reported_processed) * 100 >= \
+                PROGRESS_REPORT_PERCENT * self.total_units:
+            force = True
+            self.last_reported_processed = processed
         if self.parent:
             self.parent.report_progress(force)
         else:
-            if force:
-                self.get_status_conduit().set_progress(self.get_progress_report())
-            else:
+            # Steps may be processed concurrently
+            with self._progress_lock:
                 current_time = time.time()
-                if current_time != self.last_report_time:
-                    # Update at most once a second
+                if force or current_time - self.last_report_time >= PROGRESS_REPORT_INTERVAL:
                     self.get_status_conduit().set_progress(self.get_progress_report())
                     self.last_report_time = current_time
 
@@ -866,14 +1056,19 @@ class CopyDirectoryStep(PublishStep):
 class PluginStepIterativeProcessingMixin(object):
     """
     A mixin for steps that iterate over a generator
-    """
 
+    When the step has more than one worker (see Step.workers), process_item is called
+    for the items concurrently and the progress is updated in the order of the items.
+    """
 
     def _process_block(self):
         """
         This block is called for the main processing loop and handles reporting.
         """
         generator = self.get_generator()
+        if self.workers > 1:
+            self._process_items_concurrently(generator)
+            return
         for item in generator:
             if self.canceled:
                 return
@@ -884,6 +1079,26 @@ class PluginStepIterativeProcessingMixin(object):
             self.progress_successes += 1
             self.report_progress()
 
+    def _process_items_concurrently(self, generator):
+        """
+        Process the items using the step's workers. The first exception raised by
+        process_item (in the order of the items) is raised once the workers have stopped.
+
+        :param generator: the items to process
+        :type generator: iterable
+        """
+        processed = _parallel_map(self.process_item, generator, self.workers)
+        try:
+            for item, result, exc_info in processed:
+                if self.canceled:
+                    return
+                if exc_info is not None:
+                    raise exc_info[0], exc_info[1], exc_info[2]
+                self.progress_successes += 1
+                self.report_progress()
+        finally:
+            processed.close()
+
     def get_generator(self):
         """
         This method returns a generator to loop over items.
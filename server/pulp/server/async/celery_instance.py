@@ -30,6 +30,11 @@ CELERYBEAT_SCHEDULE = {
         'schedule': timedelta(days=30),
         'args': tuple(),
     },
+    'deliver_event_notifications': {
+        'task': 'pulp.server.event.http.deliver_notifications',
+        'schedule': timedelta(minutes=5),
+        'args': tuple(),
+    },
 }
 
 
@@ -0,0 +1,215 @@
+"""
+The resource manager's view of which workers exist and which resources are reserved on them.
+
+The ReservationScheduler keeps that view in memory so that assigning a task to a worker does not
+require any database queries. It is only used inside the resource manager process, which handles
+one message at a time, so no locking is needed. The scheduler is told about changes through
+messages sent to the resource manager queue: a resource being released by a worker, or the set of
+workers changing. Each of those wakes it up to dispatch any tasks that were waiting.
+
+Tasks that cannot be dispatched when they arrive are kept in a first in, first out queue per
+resource and persisted as PendingReservation documents so that they survive a restart of the
+resource manager.
+"""
+from collections import deque, OrderedDict
+from datetime import datetime
+from gettext import gettext as _
+import logging
+import pickle
+
+from pulp.server.db.model.criteria import Criteria
+from pulp.server.db.model.resources import PendingReservation, ReservedResource
+from pulp.server.managers import resources
+
+
+_logger = logging.getLogger(__name__)
+
+
+class ReservationScheduler(object):
+    """
+    Assigns tasks that reserve a resource to workers.
+
+    A task whose resource is already reserved is sent to the worker holding the reservation. A
+    task whose resource is not reserved is sent to a worker with no reservations at all. If there
+    is no such worker the task waits, behind any other task waiting for the same resource, until a
+    worker is released or a new worker comes online.
+    """
+
+    def __init__(self, dispatch):
+        """
+        :param dispatch: called with the task name, task id, resource id, inner args, inner kwargs
+                         and worker name to send a task to a worker. It is responsible for
+                         persisting the ReservedResource.
+        :type  dispatch: callable
+        """
+        self._dispatch = dispatch
+
+        # Names of all known workers
+        self.workers = set()
+        # task_id -> (worker_name, resource_id)
+        self.reservations = {}
+        # resource_id -> [worker_name, number of reservations]
+        self._reserved_resources = {}
+        # worker_name -> number of reservations
+        self._worker_reservation_counts = {}
+        # resource_id -> deque of (task_name, task_id, inner_args, inner_kwargs). The insertion
+        # order of the keys is the order in which the resources started waiting.
+        self.pending = OrderedDict()
+
+    def load(self):
+        """
+        Replace the in-memory state with what is currently in the database. This is done when
+        the scheduler is created and whenever the set of workers changes, since workers (and
+        their reservations) are added and removed by other processes.
+        """
+        self.workers = set(w.name for w in resources.filter_workers(Criteria()))
+
+        self.reservations = {}
+        self._reserved_resources = {}
+        self._worker_reservation_counts = {}
+        for reservation in ReservedResource.get_collection().find():
+            self._add_reservation(reservation['_id'], reservation['worker_name'],
+                                  reservation['resource_id'])
+
+        self.pending = OrderedDict()
+        sort = [('queued_at', 1)]
+        for reservation in PendingReservation.get_collection().find(sort=sort):
+            inner_args, inner_kwargs = pickle.loads(str(reservation['args']))
+            self._add_pending(reservation['task_name'], reservation['_id'],
+                              reservation['resource_id'], inner_args, inner_kwargs)
+
+    def queue(self, task_name, task_id, resource_id, inner_args, inner_kwargs):
+        """
+        Dispatch a task that reserves the given resource, or queue it to be dispatched once a
+        worker is available.
+
+        :param task_name:    The name of the task to be called
+        :type  task_name:    basestring
+        :param task_id:      The UUID to be set on the task being called
+        :type  task_id:      basestring
+        :param resource_id:  The name of the resource the task reserves
+        :type  resource_id:  basestring
+        :param inner_args:   positional arguments for the task's apply_async
+        :type  inner_args:   list
+        :param inner_kwargs: keyword arguments for the task's apply_async
+        :type  inner_kwargs: dict
+        :return:             the name of the worker the task was dispatched to, or None if it
+                             has to wait
+        :rtype:              basestring or None
+        """
+        if resource_id not in self.pending:
+            worker_name = self._worker_for(resource_id)
+            if worker_name is not None:
+                self._reserve_and_dispatch(task_name, task_id, resource_id, inner_args,
+                                           inner_kwargs, worker_name)
+                return worker_name
+
+        self._add_pending(task_name, task_id, resource_id, inner_args, inner_kwargs)
+        PendingReservation(task_id, task_name, resource_id,
+                           pickle.dumps((inner_args, inner_kwargs)), datetime.utcnow()).save()
+        return None
+
+    def release(self, task_id):
+        """
+        Forget the reservation held by the given task and dispatch any tasks that were waiting.
+
+        :param task_id: The UUID of the task that held the reservation
+        :type  task_id: basestring
+        """
+        self._remove_reservation(task_id)
+        self.dispatch_pending()
+
+    def reload(self):
+        """
+        Reload the workers and reservations from the database and dispatch any tasks that were
+        waiting.
+        """
+        self.load()
+        self.dispatch_pending()
+
+    def dispatch_pending(self):
+        """
+        Dispatch waiting tasks, in the order they started waiting, for as long as there are
+        workers for them.
+
+        :return: number of tasks dispatched
+        :rtype:  int
+        """
+        dispatched = 0
+
+        for resource_id in self.pending.keys():
+            worker_name = self._worker_for(resource_id)
+            if worker_name is None:
+                continue
+
+            waiting = self.pending.pop(resource_id)
+            while waiting:
+                task_name, task_id, inner_args, inner_kwargs = waiting.popleft()
+                self._reserve_and_dispatch(task_name, task_id, resource_id, inner_args,
+                                           inner_kwargs, worker_name)
+                PendingReservation.get_collection().remove({'_id': task_id})
+                dispatched += 1
+
+        return dispatched
+
+    def _worker_for(self, resource_id):
+        """
+        Return the name of the worker that a task reserving the given resource should go to.
+
+        :param resource_id: The name of the resource
+        :type  resource_id: basestring
+        :return:            name of the worker holding the resource, else of a worker with no
+                            reservations, else None
+        :rtype:             basestring or None
+        """
+        if resource_id in self._reserved_resources:
+            return self._reserved_resources[resource_id][0]
+
+        unreserved = self.workers.difference(self._worker_reservation_counts)
+        if unreserved:
+            return min(unreserved)
+
+        return None
+
+    def _reserve_and_dispatch(self, task_name, task_id, resource_id, inner_args, inner_kwargs,
+                              worker_name):
+        """
+        Record the reservation in memory and hand the task to the dispatch callable.
+        """
+        self._add_reservation(task_id, worker_name, resource_id)
+        try:
+            self._dispatch(task_name, task_id, resource_id, inner_args, inner_kwargs,
+                           worker_name)
+        except Exception:
+            msg = _('Error dispatching task [%(task_id)s] to worker %(worker)s')
+            _logger.exception(msg % {'task_id': task_id, 'worker': worker_name})
+
+    def _add_reservation(self, task_id, worker_name, resource_id):
+        self.reservations[task_id] = (worker_name, resource_id)
+
+        reserved = self._reserved_resources.setdefault(resource_id, [worker_name, 0])
+        reserved[1] += 1
+
+        count = self._worker_reservation_counts.get(worker_name, 0)
+        self._worker_reservation_counts[worker_name] = count + 1
+
+    def _remove_reservation(self, task_id):
+        try:
+            worker_name, resource_id = self.reservations.pop(task_id)
+        except KeyError:
+            # The reservation was already dropped, for example because its worker went away
+            return
+
+        reserved = self._reserved_resources[resource_id]
+        reserved[1] -= 1
+        if reserved[1] == 0:
+            del self._reserved_resources[resource_id]
+
+        self._worker_reservation_counts[worker_name] -= 1
+        if self._worker_reservation_counts[worker_name] == 0:
+            del self._worker_reservation_counts[worker_name]
+
+    def _add_pending(self, task_name, task_id, resource_id, inner_args, inner_kwargs):
+        waiting = self.pending.setdefault(resource_id, deque())
+        waiting.append((task_name, task_id, inner_args, inner_kwargs))
+
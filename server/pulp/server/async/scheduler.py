@@ -1,6 +1,7 @@
 from collections import namedtuple
 from datetime import datetime, timedelta
 from gettext import gettext as _
+import heapq
 import itertools
 import logging
 import threading
@@ -251,6 +252,11 @@ class Scheduler(beat.Scheduler):
     Two threads are started, one that uses EventMonitor, and handles all Celery events. The
     second, is a WorkerTimeoutMonitor thread that watches for cases where all workers disappear
     at once.
+
+    The entries are kept in a heap ordered by the time they next need to be checked, so that
+    each tick only checks the entries that may be due rather than every entry. Schedules that
+    change in the database are applied to the loaded schedule one by one, by the timestamp of
+    their last update.
     """
     Entry = ScheduleEntry
 
@@ -258,6 +264,9 @@ class Scheduler(beat.Scheduler):
     # that will ever elapse before the scheduler looks for new or changed schedules.
     max_interval = 90
 
+    # the minimum number of seconds between two looks for new or changed schedules
+    update_interval = 5
+
     # allows mongo initialization to occur exactly once during the first call to setup_schedule()
     _mongo_initialized = False
 
@@ -272,6 +281,14 @@ class Scheduler(beat.Scheduler):
         self._schedule = None
         self._failure_watcher = FailureWatcher()
         self._loaded_from_db_count = 0
+        self._ignored_db_ids = set()
+        self._most_recent_timestamp = 0
+        self._last_update_check = 0
+        # (time to check the entry, version, entry name) for each pending check of an entry
+        self._heap = []
+        # the version of the one valid pending check of each entry, keyed by entry name
+        self._versions = {}
+        self._version_counter = itertools.count()
 
         # Force the use of the Pulp celery_instance when this custom Scheduler is used.
         kwargs['app'] = app
@@ -307,17 +324,36 @@ class Scheduler(beat.Scheduler):
 
     def tick(self):
         """
-        Superclass runs a tick, that is one iteration of the scheduler. Executes
-        all due tasks.
-
-        This method adds a call to trim the failure watcher.
+        Runs a tick, that is one iteration of the scheduler. Applies the schedules that changed
+        in the database, then executes the due tasks of the entries whose time to be checked has
+        come, and trims the failure watcher.
 
         :return:    number of seconds before the next tick should run
         :rtype:     float
         """
-        ret = super(Scheduler, self).tick()
+        if self._schedule is None:
+            self.setup_schedule()
+        if time.time() - self._last_update_check >= self.update_interval:
+            self.update_schedule()
+
+        now = time.time()
+        while self._heap and self._heap[0][0] <= now:
+            check_at, version, name = heapq.heappop(self._heap)
+            if self._versions.get(name) != version:
+                # the entry was changed or removed since this check was scheduled
+                continue
+            next_time_to_run = self.maybe_due(self._schedule[name], self.publisher)
+            # the entry is removed from the schedule when it runs for the last time
+            if name in self._versions:
+                self._push(name, now + (next_time_to_run or self.max_interval))
+
         self._failure_watcher.trim()
-        return ret
+
+        while self._heap and self._versions.get(self._heap[0][2]) != self._heap[0][1]:
+            heapq.heappop(self._heap)
+        if not self._heap:
+            return self.max_interval
+        return max(min(self._heap[0][0] - time.time(), self.max_interval), 0)
 
     def setup_schedule(self):
         """
@@ -330,50 +366,105 @@ class Scheduler(beat.Scheduler):
             Scheduler._mongo_initialized = True
         _logger.debug(_('loading schedules from app'))
         self._schedule = {}
+        self._heap = []
+        self._versions = {}
         for key, value in self.app.conf.CELERYBEAT_SCHEDULE.iteritems():
             self._schedule[key] = beat.ScheduleEntry(**dict(value, name=key))
+            self._push(key, 0)
 
         # include a "0" as the default in case there are no schedules to load
         update_timestamps = [0]
 
         _logger.debug(_('loading schedules from DB'))
-        ignored_db_count = 0
         self._loaded_from_db_count = 0
+        self._ignored_db_ids = set()
+        self._last_update_check = time.time()
         for call in itertools.imap(ScheduledCall.from_db, utils.get_enabled()):
-            if call.remaining_runs == 0:
-                _logger.debug(_('ignoring schedule with 0 remaining runs: %(id)s') % {'id': call.id})
-                ignored_db_count += 1
-            else:
-                self._schedule[call.id] = call.as_schedule_entry()
-                update_timestamps.append(call.last_updated)
-                self._loaded_from_db_count += 1
+            self._add_call(call)
+            update_timestamps.append(call.last_updated)
 
         _logger.debug('loaded %(count)d schedules' % {'count': self._loaded_from_db_count})
 
         self._most_recent_timestamp = max(update_timestamps)
 
-    @property
     @retry_decorator()
-    def schedule_changed(self):
+    def update_schedule(self):
         """
-        Looks at the update timestamps in the database to determine if there
-        are new or modified schedules.
+        Looks at the update timestamps in the database for new, modified or disabled schedules
+        and applies each of them to the loaded schedule. Schedules that have been deleted are
+        found by comparing the number of enabled schedules to the number loaded.
 
         Indexing should make this very fast.
+        """
+        self._last_update_check = time.time()
+        updated = list(utils.get_updated_since(self._most_recent_timestamp, enabled_only=False))
+        for call in itertools.imap(ScheduledCall.from_db, updated):
+            _logger.debug(_('schedule %(id)s has been updated') % {'id': call.id})
+            self._remove_call(call.id)
+            if call.enabled:
+                self._add_call(call)
+            self._most_recent_timestamp = max(self._most_recent_timestamp, call.last_updated)
+
+        loaded_count = self._loaded_from_db_count + len(self._ignored_db_ids)
+        if not updated and utils.get_enabled().count() == loaded_count:
+            return
+
+        # a schedule may have been deleted while another was added
+        _logger.debug(_('looking for deleted schedules'))
+        enabled_ids = set(str(call['_id']) for call in utils.get_enabled(fields=['_id']))
+        loaded_ids = self._ignored_db_ids.union(
+            name for name, entry in self._schedule.iteritems() if isinstance(entry, ScheduleEntry))
+        for schedule_id in loaded_ids - enabled_ids:
+            self._remove_call(schedule_id)
+
+        if enabled_ids - loaded_ids:
+            # schedules were enabled without their update timestamp being newer than the most
+            # recent one seen, which can happen when the clocks of pulp's servers differ
+            _logger.debug(_('reloading schedules that were missed'))
+            self.setup_schedule()
 
-        :return:    True iff the set of enabled scheduled calls has changed
-                    in the database.
-        :rtype:     bool
+    def _add_call(self, call):
         """
-        if utils.get_enabled().count() != self._loaded_from_db_count:
-            logging.debug(_('number of enabled schedules has changed'))
-            return True
+        Adds an enabled scheduled call to the schedule, to be checked on the next tick.
 
-        if utils.get_updated_since(self._most_recent_timestamp).count() > 0:
-            logging.debug(_('one or more enabled schedules has been updated'))
-            return True
+        :param call:    an enabled scheduled call
+        :type  call:    pulp.server.db.model.dispatch.ScheduledCall
+        """
+        if call.remaining_runs == 0:
+            _logger.debug(_('ignoring schedule with 0 remaining runs: %(id)s') % {'id': call.id})
+            self._ignored_db_ids.add(call.id)
+        else:
+            self._schedule[call.id] = call.as_schedule_entry()
+            self._loaded_from_db_count += 1
+            self._push(call.id, 0)
 
-        return False
+    def _remove_call(self, schedule_id):
+        """
+        Removes a scheduled call from the schedule, if it was loaded.
+
+        :param schedule_id: ID of the scheduled call
+        :type  schedule_id: basestring
+        """
+        if schedule_id in self._ignored_db_ids:
+            self._ignored_db_ids.discard(schedule_id)
+        elif schedule_id in self._schedule:
+            del self._schedule[schedule_id]
+            self._versions.pop(schedule_id, None)
+            self._loaded_from_db_count -= 1
+
+    def _push(self, name, check_at):
+        """
+        Schedules the next check of an entry, replacing any check already scheduled.
+
+        :param name:        name of the entry
+        :type  name:        basestring
+        :param check_at:    time at which to check whether the entry is due, as seconds since
+                            the epoch
+        :type  check_at:    float
+        """
+        version = next(self._version_counter)
+        self._versions[name] = version
+        heapq.heappush(self._heap, (check_at, version, name))
 
     @property
     def schedule(self):
@@ -386,11 +477,24 @@ class Scheduler(beat.Scheduler):
         if self._schedule is None:
             return self.get_schedule()
 
-        if self.schedule_changed:
-            self.setup_schedule()
-
         return self._schedule
 
+    def reserve(self, entry):
+        """
+        The superclass calls reserve before the task referenced by the entry is queued, to
+        replace the entry with its next instance. An entry that ran for the last time is
+        disabled when it is saved, and is removed from the schedule here.
+
+        :param entry:   schedule entry whose task is about to be queued
+        :type  entry:   celery.beat.ScheduleEntry
+        :return:        the next instance of the entry
+        :rtype:         celery.beat.ScheduleEntry
+        """
+        new_entry = self._schedule[entry.name] = next(entry)
+        if isinstance(new_entry, ScheduleEntry) and not new_entry._scheduled_call.enabled:
+            self._remove_call(entry.name)
+        return new_entry
+
     def add(self, **kwargs):
         """
         This class does not support adding entries in-place. You must add new
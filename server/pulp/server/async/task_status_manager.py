@@ -204,6 +204,25 @@ class TaskStatusManager(object):
         TaskStatus.get_collection().save(task_status, safe=True)
         return task_status
 
+    @staticmethod
+    def set_task_progress(task_id, progress):
+        """
+        Sets parts of the progress report of the task with given task id. Unlike
+        update_task_status, this is a single $set update that only sends the given values.
+
+        :param task_id: identity of the task this status corresponds to
+        :type  task_id: basestring
+        :param progress: new values keyed by their dotted path within the progress report,
+                         for example {'report-id.0': {...}}
+        :type  progress: dict
+        :raise MissingResource: if there is no task status corresponding to the given task_id
+        """
+        values = dict(('progress_report.%s' % path, value) for path, value in progress.items())
+        result = TaskStatus.get_collection().update({'task_id': task_id}, {'$set': values},
+                                                    safe=True)
+        if not result['n']:
+            raise MissingResource(task_id)
+
     @staticmethod
     def delete_task_status(task_id):
         """
@@ -2,7 +2,6 @@ from datetime import datetime
 from gettext import gettext as _
 import logging
 import signal
-import time
 import uuid
 
 from celery import task, Task as CeleryTask, current_task
@@ -13,12 +12,12 @@ from celery.signals import worker_init
 from pulp.common import constants, dateutils
 from pulp.server.async.celery_instance import celery, RESOURCE_MANAGER_QUEUE, \
     DEDICATED_QUEUE_EXCHANGE
+from pulp.server.async.reservations import ReservationScheduler
 from pulp.server.async.task_status_manager import TaskStatusManager
 from pulp.server.exceptions import PulpException, MissingResource
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.db.model.resources import ReservedResource, Worker
-from pulp.server.exceptions import NoWorkers
 from pulp.server.managers import resources
 
 
@@ -26,6 +25,58 @@ controller = control.Control(app=celery)
 logger = logging.getLogger(__name__)
 
 
+# The resource manager's in-memory reservation state. It is created on first use since only the
+# resource manager process needs it.
+_reservation_scheduler = None
+
+
+def _get_reservation_scheduler():
+    """
+    Return the ReservationScheduler for this process, loading its state from the database the
+    first time it is requested.
+
+    :return: the process's reservation scheduler
+    :rtype:  pulp.server.async.reservations.ReservationScheduler
+    """
+    global _reservation_scheduler
+    if _reservation_scheduler is None:
+        scheduler = ReservationScheduler(_dispatch_reserved_task)
+        scheduler.load()
+        _reservation_scheduler = scheduler
+    return _reservation_scheduler
+
+
+def _dispatch_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs, worker_name):
+    """
+    Record the reservation of resource_id for the task, dispatch the task into the dedicated
+    queue of the given worker and follow it with a _release_resource task.
+
+    :param name:          The name of the task to be called
+    :type  name:          basestring
+    :param task_id:       The UUID to be set on the task being called
+    :type  task_id:       basestring
+    :param resource_id:   The name of the resource reserved for the task
+    :type  resource_id:   basestring
+    :param inner_args:    positional arguments for the task's apply_async
+    :type  inner_args:    list
+    :param inner_kwargs:  keyword arguments for the task's apply_async
+    :type  inner_kwargs:  dict
+    :param worker_name:   The name of the worker that will run the task
+    :type  worker_name:   basestring
+    """
+    ReservedResource(task_id, worker_name, resource_id).save()
+
+    inner_kwargs['routing_key'] = worker_name
+    inner_kwargs['exchange'] = DEDICATED_QUEUE_EXCHANGE
+    inner_kwargs['task_id'] = task_id
+
+    try:
+        celery.tasks[name].apply_async(*inner_args, **inner_kwargs)
+    finally:
+        _release_resource.apply_async((task_id, ), routing_key=worker_name,
+                                      exchange=DEDICATED_QUEUE_EXCHANGE)
+
+
 @task(acks_late=True)
 def _queue_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs):
     """
@@ -36,8 +87,10 @@ def _queue_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs):
     and keyword arguments using the * and ** operators.
 
     The inner task is dispatched into a dedicated queue for a worker that is decided at dispatch
-    time. The logic deciding which queue receives a task is controlled through the
-    find_worker function.
+    time by the resource manager's ReservationScheduler. If the resource is already reserved the
+    task goes to the worker holding it, otherwise to a worker with no reservations. If no worker
+    is available the task is held by the scheduler, in order behind any other tasks waiting for the
+    same resource, and dispatched when a _resource_released or _workers_changed task wakes it up.
 
     :param name:          The name of the task to be called
     :type name:           basestring
@@ -52,35 +105,33 @@ def _queue_reserved_task(name, task_id, resource_id, inner_args, inner_kwargs):
 
     :return: None
     """
-    while True:
-        try:
-            worker = resources.get_worker_for_reservation(resource_id)
-        except NoWorkers:
-            pass
-        else:
-            break
+    _get_reservation_scheduler().queue(name, task_id, resource_id, inner_args, inner_kwargs)
 
-        try:
-            worker = resources.get_unreserved_worker()
-        except NoWorkers:
-            pass
-        else:
-            break
 
-        # No worker is ready for this work, so we need to wait
-        time.sleep(0.25)
+@task
+def _resource_released(task_id):
+    """
+    Do not queue this task yourself. It is sent to the resource manager by _release_resource.
 
-    ReservedResource(task_id, worker['name'], resource_id).save()
+    Tell the resource manager's reservation scheduler that the reservation held by the task is
+    gone, so that it can dispatch tasks that were waiting for a worker.
 
-    inner_kwargs['routing_key'] = worker.name
-    inner_kwargs['exchange'] = DEDICATED_QUEUE_EXCHANGE
-    inner_kwargs['task_id'] = task_id
+    :param task_id: The UUID of the task that held the reservation
+    :type  task_id: basestring
+    """
+    _get_reservation_scheduler().release(task_id)
 
-    try:
-        celery.tasks[name].apply_async(*inner_args, **inner_kwargs)
-    finally:
-        _release_resource.apply_async((task_id, ), routing_key=worker.name,
-                                      exchange=DEDICATED_QUEUE_EXCHANGE)
+
+@task
+def _workers_changed():
+    """
+    Do not queue this task yourself. It is sent to the resource manager when a worker is
+    discovered or deleted.
+
+    Reload the workers and reservations known to the resource manager's reservation scheduler and
+    dispatch tasks that were waiting for a worker.
+    """
+    _get_reservation_scheduler().reload()
 
 
 def _delete_worker(name, normal_shutdown=False):
@@ -114,14 +165,15 @@ def _delete_worker(name, normal_shutdown=False):
 
     # Delete all reserved_resource documents for the worker
     ReservedResource.get_collection().remove({'worker_name': name})
+    _workers_changed.apply_async(queue=RESOURCE_MANAGER_QUEUE)
 
     # Cancel all of the tasks that were assigned to this worker's queue
     worker = Worker.from_bson({'_id': name})
-    for task in TaskStatusManager.find_by_criteria(
+    for task_status in TaskStatusManager.find_by_criteria(
             Criteria(
                 filters={'worker_name': worker.name,
                          'state': {'$in': constants.CALL_INCOMPLETE_STATES}})):
-        cancel(task['task_id'])
+        cancel(task_status['task_id'])
 
 
 @task
@@ -131,12 +183,14 @@ def _release_resource(task_id):
     the _queue_reserved_task task.
 
     When a resource-reserving task is complete, this method releases the resource by removing the
-    ReservedResource object by UUID.
+    ReservedResource object by UUID, and tells the resource manager so that it can dispatch tasks
+    that were waiting for a worker.
 
     :param task_id: The UUID of the task that requested the reservation
     :type  task_id: basestring
     """
     ReservedResource.get_collection().remove({'_id': task_id})
+    _resource_released.apply_async((task_id, ), queue=RESOURCE_MANAGER_QUEUE)
 
 
 class TaskResult(object):
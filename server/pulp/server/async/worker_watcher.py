@@ -19,7 +19,7 @@ import logging
 import re
 
 from pulp.server.async.celery_instance import RESOURCE_MANAGER_QUEUE
-from pulp.server.async.tasks import _delete_worker
+from pulp.server.async.tasks import _delete_worker, _workers_changed
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.resources import Worker
 from pulp.server.managers import resources
@@ -87,7 +87,8 @@ def handle_worker_heartbeat(event):
     The event is first parsed and logged. If this event is from the resource manager, there is
     no further processing to be done. Then the existing Worker objects are searched
     for one to update. If an existing one is found, it is updated. Otherwise a new
-    Worker entry is created. Logging at the info and debug level is also done.
+    Worker entry is created and the resource manager is told about it, so that it can dispatch
+    tasks that were waiting for a worker. Logging at the info and debug level is also done.
 
     :param event: A celery event to handle.
     :type event: dict
@@ -112,6 +113,7 @@ def handle_worker_heartbeat(event):
         msg = _("New worker '%(worker_name)s' discovered") % event_info
         _logger.info(msg)
         new_worker.save()
+        _workers_changed.apply_async(queue=RESOURCE_MANAGER_QUEUE)
 
 
 def handle_worker_offline(event):
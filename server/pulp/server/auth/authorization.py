@@ -52,3 +52,104 @@ def _operations_not_granted_by_roles(resource, operations, roles):
             if operation in permissions[resource]:
                 culled_ops.remove(operation)
     return culled_ops
+
+
+def _resource_parts(resource):
+    """
+    Split a resource path into its components.
+    @type resource: str
+    @param resource: pulp resource path
+    @rtype: list of str
+    @return: the non-empty components of the path
+    """
+    return [p for p in resource.split('/') if p]
+
+
+class PermissionTrie(object):
+    """
+    The operations a single user is allowed to perform, arranged by resource
+    path. A permission on a resource applies to every resource below it, so an
+    operation is allowed on a resource if it is granted on any node from the
+    root to that resource.
+    """
+
+    def __init__(self):
+        self._root = {'operations': set(), 'children': {}}
+
+    @classmethod
+    def from_permissions(cls, permissions, login):
+        """
+        Build the trie of a user from permission documents.
+        @type permissions: iterable of L{pulp.server.db.model.auth.Permission}
+        @param permissions: permissions that grant the user operations
+        @type login: str
+        @param login: login of the user
+        @rtype: L{PermissionTrie}
+        """
+        trie = cls()
+        for permission in permissions:
+            for user in permission['users']:
+                if user['username'] == login:
+                    trie.grant(permission['resource'], user['permissions'])
+        return trie
+
+    def grant(self, resource, operations):
+        """
+        Allow operations on a resource and everything below it.
+        @type resource: str
+        @param resource: pulp resource path
+        @type operations: iterable of int's
+        @param operations: operations being granted
+        """
+        parts = _resource_parts(resource)
+        if resource != '/%s' % ''.join('%s/' % p for p in parts):
+            # only canonical paths, such as /v2/repositories/, ever match a request
+            return
+        node = self._root
+        for part in parts:
+            node = node['children'].setdefault(part, {'operations': set(), 'children': {}})
+        node['operations'].update(operations)
+
+    def revoke(self, resource, operations):
+        """
+        Remove operations granted on a resource. Operations granted on other
+        resources above or below it are not affected.
+        @type resource: str
+        @param resource: pulp resource path
+        @type operations: iterable of int's
+        @param operations: operations being revoked
+        """
+        path = [self._root]
+        for part in _resource_parts(resource):
+            node = path[-1]['children'].get(part)
+            if node is None:
+                return
+            path.append(node)
+        path[-1]['operations'].difference_update(operations)
+
+        # prune the nodes left without operations or children
+        parts = _resource_parts(resource)
+        while len(path) > 1 and not path[-1]['operations'] and not path[-1]['children']:
+            path.pop()
+            del path[-1]['children'][parts[len(path) - 1]]
+
+    def is_authorized(self, resource, operation):
+        """
+        @type resource: str
+        @param resource: pulp resource path
+        @type operation: int
+        @param operation: operation to be performed on resource
+        @rtype: bool
+        @return: True if the operation is granted on the resource or any
+                 resource above it
+        """
+        node = self._root
+        if operation in node['operations']:
+            return True
+        for part in _resource_parts(resource):
+            node = node['children'].get(part)
+            if node is None:
+                return False
+            if operation in node['operations']:
+                return True
+        return False
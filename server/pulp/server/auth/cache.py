@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2014 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Per-process caches of authentication and authorization results.
+
+Verifying a password takes a database query and thousands of HMAC rounds, and
+checking a user's permissions takes a query for the user and one for the
+permissions granted to them. Their results are cached for [authentication]
+cache_ttl seconds so that a client making many requests only pays for them
+once in a while.
+
+The caches are updated or cleared whenever users, roles or permissions are
+changed by the managers in this process. Changes made by other processes (other web server
+processes, or tasks run by the workers) are not seen until the cached results
+expire, so cache_ttl bounds how long a revoked permission or changed password
+can still be used. Setting it to 0 disables caching.
+"""
+
+from collections import OrderedDict
+from threading import RLock
+import hashlib
+import hmac
+import os
+import time
+
+from pulp.server import config
+
+
+# The maximum number of entries held by each cache
+MAX_ENTRIES = 10000
+
+# Credentials are cached under a keyed hash so that the cache never holds a
+# password, nor anything that can be checked against guesses outside of this
+# process.
+_CREDENTIALS_KEY = os.urandom(32)
+
+
+class AuthCache(object):
+    """
+    A thread safe, least recently used cache whose entries expire after
+    [authentication] cache_ttl seconds.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        """
+        :param max_entries: the maximum number of cached entries
+        :type  max_entries: int
+        """
+        self._mutex = RLock()
+        self._entries = OrderedDict()
+        self.max_entries = max_entries
+
+    @staticmethod
+    def ttl():
+        """
+        :return: the number of seconds entries are cached for; 0 when caching is disabled
+        :rtype:  int
+        """
+        return config.config.getint('authentication', 'cache_ttl')
+
+    def get(self, key):
+        """
+        :param key: key the value was cached under
+        :type  key: hashable
+        :return: the cached value, or None if it was not cached or has expired
+        """
+        with self._mutex:
+            try:
+                expiration, value = self._entries.pop(key)
+            except KeyError:
+                return None
+            if expiration < time.time():
+                return None
+            self._entries[key] = (expiration, value)
+            return value
+
+    def put(self, key, value):
+        """
+        Cache a value, unless caching is disabled.
+
+        :param key: key to cache the value under
+        :type  key: hashable
+        :param value: value to cache; None cannot be cached
+        """
+        ttl = self.ttl()
+        if ttl <= 0:
+            return
+        with self._mutex:
+            self._entries.pop(key, None)
+            self._entries[key] = (time.time() + ttl, value)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def pop(self, key):
+        """
+        Drop the entry cached under a key, if there is one.
+
+        :param key: key the value was cached under
+        :type  key: hashable
+        """
+        with self._mutex:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        """
+        Drop all cached entries.
+        """
+        with self._mutex:
+            self._entries.clear()
+
+
+# login of the user keyed by credentials_key(username, password)
+credentials = AuthCache()
+
+# whether the user is a super user keyed by login
+superusers = AuthCache()
+
+# pulp.server.auth.authorization.PermissionTrie of each user keyed by login
+permissions = AuthCache()
+
+
+def credentials_key(username, password):
+    """
+    :param username: the login the client authenticated with
+    :type  username: str
+    :param password: the password the client authenticated with, or None if the
+                     user was authenticated by the web server
+    :type  password: str or None
+    :return: the key to cache the result of checking the credentials under
+    :rtype:  str
+    """
+    message = '%s\0%s' % (username, '' if password is None else '\1%s' % password)
+    if isinstance(message, unicode):
+        message = message.encode('utf-8')
+    return hmac.new(_CREDENTIALS_KEY, message, hashlib.sha256).digest()
+
+
+def permissions_granted(login, resource, operations):
+    """
+    Update the cached permissions of a user after operations were granted to it.
+
+    :param login: login of the user
+    :type  login: str
+    :param resource: uri path of the resource
+    :type  resource: str
+    :param operations: operations granted on the resource
+    :type  operations: list of int
+    """
+    trie = permissions.get(login)
+    if trie is not None:
+        trie.grant(resource, operations)
+
+
+def permissions_revoked(login, resource, operations):
+    """
+    Update the cached permissions of a user after operations were revoked from it.
+
+    :param login: login of the user
+    :type  login: str
+    :param resource: uri path of the resource
+    :type  resource: str
+    :param operations: operations revoked on the resource
+    :type  operations: list of int
+    """
+    trie = permissions.get(login)
+    if trie is not None:
+        trie.revoke(resource, operations)
+
+
+def roles_changed(login):
+    """
+    Drop what is cached about a user that depends on its roles. The permissions
+    granted by the roles are updated separately as they are granted and revoked.
+
+    :param login: login of the user
+    :type  login: str
+    """
+    superusers.pop(login)
+
+
+def invalidate():
+    """
+    Drop all cached authentication and authorization results. Called whenever a
+    user or a whole permission changes.
+    """
+    credentials.clear()
+    superusers.clear()
+    permissions.clear()
@@ -10,6 +10,7 @@ _default_values = {
     'authentication': {
         'rsa_key': '/etc/pki/pulp/rsa.key',
         'rsa_pub': '/etc/pki/pulp/rsa_pub.key',
+        'cache_ttl': '30',
     },
     'consumer_history': {
         'lifetime': '180',  # in days
@@ -77,6 +78,7 @@ _default_values = {
         'log_level': 'INFO',
         'key_url': '/pulp/gpg',
         'ks_url': '/pulp/ks',
+        'unit_refcounts': 'false',
     },
     'tasks': {
         'broker_url': 'qpid://guest@localhost/',
@@ -1,12 +1,14 @@
 from collections import namedtuple
 from logging import getLogger
 from threading import Thread, RLock
+from time import time
 from Queue import Queue, Empty, Full
 
 from nectar.listener import DownloadEventListener
 from nectar.report import DownloadReport as NectarDownloadReport
 from nectar.request import DownloadRequest
 
+from pulp.plugins.util import misc
 from pulp.server.content.sources.model import ContentSource, PrimarySource, \
     DownloadReport, DownloadDetails, RefreshReport
 from pulp.server.managers import factory as managers
@@ -15,6 +17,13 @@ from pulp.server.managers import factory as managers
 log = getLogger(__name__)
 
 
+# The number of requests for which content sources are found together.
+FIND_SOURCES_BATCH_SIZE = 500
+
+# The maximum number of content sources refreshed concurrently.
+REFRESH_THREADS = 4
+
+
 class ContentContainer(object):
     """
     The content container represents a virtual collection of content that is
@@ -66,21 +75,16 @@ class ContentContainer(object):
         :return: A list of refresh reports.
         :rtype: list of: pulp.server.content.sources.model.RefreshReport
         """
-        reports = []
         catalog = managers.content_catalog_manager()
-        for source_id, source in self.sources.items():
+        sources = []
+        for source_id, source in sorted(self.sources.items()):
             if canceled.is_set():
                 break
             if force or not catalog.has_entries(source_id):
-                try:
-                    report = source.refresh(canceled)
-                    reports.extend(report)
-                except Exception, e:
-                    log.error('refresh %s, failed: %s', source_id, e)
-                    report = RefreshReport(source_id, '')
-                    report.errors.append(str(e))
-                    reports.append(report)
+                sources.append(source)
+        reports = RefreshPool(canceled, REFRESH_THREADS).refresh(sources)
         catalog.purge_expired()
+        catalog.refresh_cache()
         return reports
 
     def purge_orphans(self):
@@ -94,6 +98,87 @@ class ContentContainer(object):
         catalog.purge_orphans(valid_ids)
 
 
+class RefreshPool(object):
+    """
+    Refreshes content sources concurrently using a bounded number of threads.
+    Each source is refreshed by one thread.  A source that has not started
+    refreshing when the refresh is canceled is not refreshed and a source
+    that is refreshing stops before its next URL.
+    :ivar canceled: An event that indicates the refresh has been canceled.
+    :type canceled: threading.Event
+    :ivar threads: The maximum number of threads.
+    :type threads: int
+    """
+
+    def __init__(self, canceled, threads):
+        """
+        :param canceled: An event that indicates the refresh has been canceled.
+        :type canceled: threading.Event
+        :param threads: The maximum number of threads.
+        :type threads: int
+        """
+        self.canceled = canceled
+        self.threads = threads
+
+    def refresh(self, sources):
+        """
+        Refresh the specified content sources.
+        :param sources: A list of content sources.
+        :type sources: list
+        :return: A list of refresh reports, in the order of sources.
+        :rtype: list of: pulp.server.content.sources.model.RefreshReport
+        """
+        pending = Queue()
+        for index, source in enumerate(sources):
+            pending.put((index, source))
+        results = [[] for source in sources]
+        threads = []
+        for n in range(min(self.threads, len(sources))):
+            thread = Thread(target=self._run, args=(pending, results))
+            thread.setDaemon(True)
+            thread.start()
+            threads.append(thread)
+        for thread in threads:
+            thread.join()
+        reports = []
+        for result in results:
+            reports.extend(result)
+        return reports
+
+    def _run(self, pending, results):
+        """
+        The thread main.  Refresh sources until none are pending.
+        :param pending: A queue of tuple: (index, source).
+        :type pending: Queue
+        :param results: The list of refresh reports for each source.
+        :type results: list
+        """
+        while not self.canceled.is_set():
+            try:
+                index, source = pending.get_nowait()
+            except Empty:
+                break
+            results[index] = self._refresh(source)
+
+    def _refresh(self, source):
+        """
+        Refresh the specified content source.
+        :param source: A content source.
+        :type source: pulp.server.content.sources.model.ContentSource
+        :return: The list of refresh reports.
+        :rtype: list of: pulp.server.content.sources.model.RefreshReport
+        """
+        started = time()
+        try:
+            return source.refresh(self.canceled)
+        except Exception, e:
+            log.error('refresh %s, failed: %s', source.id, e)
+            report = RefreshReport(source.id, '')
+            report.errors.append(str(e))
+            report.duration = time() - started
+            return [report]
+
+
 class Listener(object):
     """
     Download event listener.
@@ -351,12 +436,18 @@ class Batch(object):
         report.total_sources = len(self.sources)
 
         try:
-            for request in self.requests:
+            catalog = managers.content_catalog_manager()
+            for requests in misc.paginate(self.requests, FIND_SOURCES_BATCH_SIZE):
                 if self.is_canceled:
                     break
-                request.find_sources(self.primary, self.sources)
-                self.dispatch(request)
-                count += 1
+                units = [(r.type_id, r.unit_key) for r in requests]
+                found = catalog.find_many(units, cached=True)
+                for request, entries in zip(requests, found):
+                    if self.is_canceled:
+                        break
+                    request.find_sources(self.primary, self.sources, entries)
+                    self.dispatch(request)
+                    count += 1
         except Exception:
             self.canceled.set()
             raise
@@ -16,12 +16,14 @@ import re
 from urlparse import urljoin
 from logging import getLogger
 from ConfigParser import ConfigParser
+from time import time
 
 from pulp.common.constants import PRIMARY_ID
 from pulp.plugins.conduits.cataloger import CatalogerConduit
 from pulp.plugins.loader import api as plugins
 from pulp.server.content.sources import constants
 from pulp.server.content.sources.descriptor import is_valid, to_seconds, DEFAULT
+from pulp.server.db.model.content import ContentCatalog
 from pulp.server.managers import factory as managers
 
 
@@ -33,6 +35,7 @@ PATHS_REGEX = re.compile(r'\s+')
 
 REFRESHING = 'Refreshing [%s] url:%s'
 REFRESH_SUCCEEDED = 'Refresh [%s] succeeded.  Added: %d, Deleted: %d'
+REFRESH_SKIPPED = 'Refresh [%s] url: %s, skipped: not changed'
 REFRESH_FAILED = 'Refresh [%s] url: %s, failed: %s'
 
 
@@ -80,7 +83,7 @@ class Request(object):
         self.errors = []
         self.data = None
 
-    def find_sources(self, primary, alternates):
+    def find_sources(self, primary, alternates, entries=None):
         """
         Find and set the list of content sources in the order they are to
         be used to satisfy the request.  The alternate sources are
@@ -89,10 +92,15 @@ class Request(object):
         :type primary: ContentSource
         :param alternates: A list of alternative sources.
         :type list of: ContentSource
+        :param entries: The catalog entries for the requested unit.
+            The catalog is searched when not specified.
+        :type entries: list
         """
         resolved = [(primary, self.url)]
-        catalog = managers.content_catalog_manager()
-        for entry in catalog.find(self.type_id, self.unit_key):
+        if entries is None:
+            catalog = managers.content_catalog_manager()
+            entries = catalog.find(self.type_id, self.unit_key)
+        for entry in entries:
             source_id = entry[constants.SOURCE_ID]
             source = alternates.get(source_id)
             if source is None:
@@ -292,22 +300,39 @@ class ContentSource(object):
         reports = []
         conduit = self.get_conduit()
         plugin = self.get_cataloger()
+        catalog = managers.content_catalog_manager()
         for url in self.urls:
             if cancel_event.isSet():
                 break
             conduit.reset()
             report = RefreshReport(self.id, url)
             log.info(REFRESHING, self.id, url)
+            started = time()
             try:
-                plugin.refresh(conduit, self.descriptor, url)
-                log.info(REFRESH_SUCCEEDED, self.id, conduit.added_count, conduit.deleted_count)
+                fingerprint = plugin.fingerprint(conduit, self.descriptor, url)
+                if fingerprint is not None \
+                        and fingerprint == catalog.get_fingerprint(self.id, url) \
+                        and catalog.renew(self.id, url, self.expires):
+                    log.info(REFRESH_SKIPPED, self.id, url)
+                    report.skipped = True
+                else:
+                    # entries added or renewed by the refresh expire at or after this
+                    expiration = ContentCatalog.get_expiration(self.expires)
+                    plugin.refresh(conduit, self.descriptor, url)
+                    conduit.deleted_count += catalog.purge_stale(self.id, url, expiration)
+                    catalog.set_fingerprint(self.id, url, fingerprint)
+                    if conduit.added_count:
+                        catalog.increment_generation()
+                    log.info(
+                        REFRESH_SUCCEEDED, self.id, conduit.added_count, conduit.deleted_count)
+                    report.added_count = conduit.added_count
+                    report.deleted_count = conduit.deleted_count
                 report.succeeded = True
-                report.added_count = conduit.added_count
-                report.deleted_count = conduit.deleted_count
             except Exception, e:
                 log.error(REFRESH_FAILED, self.id, url, e)
                 report.errors.append(str(e))
             finally:
+                report.duration = time() - started
                 reports.append(report)
         return reports
 
@@ -438,6 +463,11 @@ class RefreshReport(object):
     :type added_count: int
     :ivar deleted_count: The number of entries deleted from the catalog.
     :type deleted_count: int
+    :ivar skipped: Indicates the refresh was skipped because the upstream
+        metadata has not changed.  The existing entries were renewed.
+    :type skipped: bool
+    :ivar duration: The number of seconds the refresh took.
+    :type duration: float
     :ivar errors: The list of errors.
     :type errors: list
     """
@@ -454,6 +484,8 @@ class RefreshReport(object):
         self.succeeded = False
         self.added_count = 0
         self.deleted_count = 0
+        self.skipped = False
+        self.duration = 0.0
         self.errors = []
 
     def dict(self):
@@ -464,4 +496,4 @@ class RefreshReport(object):
         """
         return dict(source_id=self.source_id, url=self.url, succeeded=self.succeeded,
                     added_count=self.added_count, deleted_count=self.deleted_count,
-                    errors=self.errors)
+                    skipped=self.skipped, duration=self.duration, errors=self.errors)
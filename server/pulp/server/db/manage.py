@@ -19,12 +19,14 @@ import os
 import sys
 
 from pulp.plugins.loader.api import load_content_types
+from pulp.plugins.types import database as types_db
 from pulp.server import logs
 from pulp.server.db import connection
 from pulp.server.db.migrate import models
 from pulp.server.managers import factory
 from pulp.server.managers.auth.role.cud import RoleManager, SUPER_USER_ROLE
 from pulp.server.managers.auth.user.cud import UserManager
+from pulp.server.managers.content.refcount import ContentRefcountManager
 
 
 logger = None
@@ -54,6 +56,11 @@ def parse_args():
                       help=_('Run migration, but do not update version'))
     parser.add_option('--dry-run', action='store_true', dest='dry_run', default=False,
                       help=_('Perform a dry run with no changes made. Returns 1 if there are migrations to apply.'))
+    parser.add_option('--repair-refcounts', action='store_true', dest='repair_refcounts',
+                      default=False,
+                      help=_('Recompute the number of repositories each content unit is '
+                             'associated with. With --dry-run, only reports the units whose '
+                             'counts are wrong and returns 1 if there are any.'))
     options, args = parser.parse_args()
     if args:
         parser.error(_('Unknown arguments: %s') % ', '.join(args))
@@ -186,12 +193,42 @@ def _auto_manage_db(options):
     message = _('Database migrations complete.')
     logger.info(message)
 
+    if options.repair_refcounts:
+        if _repair_refcounts(options):
+            unperformed_migrations = True
+    elif ContentRefcountManager.enabled() and not options.dry_run:
+        # loading the content types drops the reference count indexes
+        for content_type_id in types_db.all_type_ids():
+            ContentRefcountManager.ensure_index(content_type_id)
+
     if unperformed_migrations:
         return 1
 
     return os.EX_OK
 
 
+def _repair_refcounts(options):
+    """
+    Recompute the reference counts of all content units, storing them unless this is a dry run.
+
+    :param options: The command line parameters from the user.
+    :return: True if this is a dry run and some counts are wrong
+    :rtype:  bool
+    """
+    mismatched = 0
+    for content_type_id in types_db.all_type_ids():
+        message = _('Verifying reference counts of content type %(t)s.')
+        logger.info(message % {'t': content_type_id})
+        mismatched += ContentRefcountManager.verify_refcounts(
+            content_type_id, repair=not options.dry_run)
+    if options.dry_run:
+        message = _('Would have corrected the reference counts of %(n)d content units.')
+    else:
+        message = _('Corrected the reference counts of %(n)d content units.')
+    logger.info(message % {'n': mismatched})
+    return options.dry_run and mismatched > 0
+
+
 def _start_logging():
     """
     Call into Pulp to get the logging started, and set up the logger to be used in this module.
@@ -90,6 +90,7 @@ class Permission(Model):
 
     collection_name = 'permissions'
     unique_indices = ('resource',)
+    search_indices = ('users.username',)
 
     def __init__(self, resource, users=None):
         super(Permission, self).__init__()
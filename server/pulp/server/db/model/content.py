@@ -95,7 +95,7 @@ class ContentCatalog(Model):
     """
 
     collection_name = 'content_catalog'
-    search_indices = ('source_id', 'locator')
+    search_indices = ('source_id', 'locator', ('source_id', 'locator', 'url'))
     unique_indices = ()
 
     @staticmethod
@@ -148,3 +148,51 @@ class ContentCatalog(Model):
         self.unit_key = unit_key
         self.locator = self.get_locator(type_id, unit_key)
         self.url = url
+
+
+class ContentCatalogFingerprint(Model):
+    """
+    The fingerprint of the upstream metadata last used to refresh the
+    content catalog for a content source URL.  Used to skip refreshing
+    the catalog when the metadata has not changed.
+    :ivar source_id: The content source ID.
+    :type source_id: str
+    :ivar url: The content source URL.
+    :type url: str
+    :ivar fingerprint: The fingerprint (e.g. checksum or ETag) reported by the cataloger.
+    :type fingerprint: str
+    """
+
+    collection_name = 'content_catalog_fingerprints'
+    unique_indices = (('source_id', 'url'),)
+
+    def __init__(self, source_id, url, fingerprint):
+        """
+        :param source_id: The content source ID.
+        :type source_id: str
+        :param url: The content source URL.
+        :type url: str
+        :param fingerprint: The fingerprint reported by the cataloger.
+        :type fingerprint: str
+        """
+        Model.__init__(self)
+        self.source_id = source_id
+        self.url = url
+        self.fingerprint = fingerprint
+
+
+class ContentCatalogGeneration(Model):
+    """
+    The generation of the content catalog.  Incremented each time entries
+    are added to the catalog by refreshing a content source URL so that the
+    catalog cache of each process can tell it was built before the refresh.
+    The collection contains a single document.
+    :ivar generation: The catalog generation.
+    :type generation: int
+    """
+
+    collection_name = 'content_catalog_generation'
+    unique_indices = ()
+
+    # The ID of the generation document.
+    DOCUMENT_ID = 'catalog'
@@ -32,6 +32,15 @@ from pulp.server.managers import factory
 
 logger = logging.getLogger(__name__)
 
+# The maximum number of parsed values held by each of the caches below
+PARSED_CACHE_SIZE = 100000
+
+# The scheduler checks schedules far more often than they change, so the UTC
+# datetimes parsed from their ISO8601 strings and the intervals unpickled from
+# their schedules are cached, keyed by the strings they were parsed from.
+_parsed_datetimes = {}
+_parsed_intervals = {}
+
 
 class CallResource(Model):
     """
@@ -336,17 +345,18 @@ class ScheduledCall(Model):
 
         """
         now_s = time.time()
-        first_run_dt = dateutils.to_utc_datetime(dateutils.parse_iso8601_datetime(self.first_run))
+        first_run_dt = _parse_utc_datetime(self.first_run)
         first_run_s = calendar.timegm(first_run_dt.utctimetuple())
         since_first_s = now_s - first_run_s
 
         # An interval could be an isodate.Duration or a datetime.timedelta
-        interval = self.as_schedule_entry().schedule.run_every
+        interval = _cached(_parsed_intervals, str(self.schedule),
+                           lambda schedule: pickle.loads(schedule).run_every)
         if isinstance(interval, isodate.Duration):
             # Determine how long (in seconds) to wait between the last run and the next one. This changes
             # depending on the current time because a duration can be a month or a year.
             if self.last_run_at is not None:
-                last_run_dt = dateutils.to_utc_datetime(dateutils.parse_iso8601_datetime(str(self.last_run_at)))
+                last_run_dt = _parse_utc_datetime(str(self.last_run_at))
                 run_every_s = timedelta_seconds(interval.totimedelta(start=last_run_dt))
             else:
                 run_every_s = timedelta_seconds(interval.totimedelta(start=first_run_dt))
@@ -355,7 +365,7 @@ class ScheduledCall(Model):
             expected_runs = 0
             current_run = first_run_dt
             last_scheduled_run_s = first_run_s
-            duration = self.as_schedule_entry().schedule.run_every
+            duration = interval
             while True:
                 # The interval is determined by the date of the previous run
                 current_interval = duration.totimedelta(start=current_run)
@@ -404,6 +414,36 @@ class ScheduledCall(Model):
         return dateutils.format_iso8601_utc_timestamp(next_run_s)
 
 
+def _cached(cache, key, parse):
+    """
+    :param cache:   one of the caches of parsed values in this module
+    :type  cache:   dict
+    :param key:     string to parse
+    :type  key:     basestring
+    :param parse:   function that parses the key; its result must not be modified
+    :type  parse:   callable
+    :return:        the value parsed from the key
+    """
+    try:
+        return cache[key]
+    except KeyError:
+        if len(cache) >= PARSED_CACHE_SIZE:
+            cache.clear()
+        value = cache[key] = parse(key)
+        return value
+
+
+def _parse_utc_datetime(datetime_str):
+    """
+    :param datetime_str:    ISO8601 datetime string
+    :type  datetime_str:    basestring
+    :return:    the datetime parsed from the string, converted to UTC
+    :rtype:     datetime.datetime
+    """
+    return _cached(_parsed_datetimes, datetime_str,
+                   lambda s: dateutils.to_utc_datetime(dateutils.parse_iso8601_datetime(s)))
+
+
 class ScheduleEntry(beat.ScheduleEntry):
     def __init__(self, *args, **kwargs):
         """
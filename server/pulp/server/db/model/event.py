@@ -13,6 +13,7 @@
 
 from pulp.server.db.model.base import Model
 
+
 class EventListener(Model):
     """
     Represents a configured event listener. Each instance will define a
@@ -38,4 +39,45 @@ class EventListener(Model):
 
         self.notifier_type_id = notifier_type_id
         self.notifier_config = notifier_config
-        self.event_types = event_types
\ No newline at end of file
+        self.event_types = event_types
+
+
+class EventNotification(Model):
+    """
+    An event waiting to be delivered by a notifier. Notifications are stored
+    before they are sent so that they survive the process that fired the event
+    and can be retried until they are delivered.
+
+    @ivar notifier_type_id: identifies the notifier that delivers the event
+    @type notifier_type_id: str
+
+    @ivar notifier_config: configuration of the listener the event is delivered to
+    @type notifier_config: dict
+
+    @ivar body: the serialized event
+    @type body: str
+
+    @ivar attempts: number of failed attempts to deliver the event
+    @type attempts: int
+
+    @ivar next_attempt: seconds since the epoch after which the event is next
+          delivered; pushed forward while an attempt is in progress
+    @type next_attempt: float
+
+    @ivar claim: identifies the attempt in progress, if any
+    @type claim: str or None
+    """
+
+    collection_name = 'event_notifications'
+    unique_indices = ()
+    search_indices = ('next_attempt', 'claim')
+
+    def __init__(self, notifier_type_id, notifier_config, body, next_attempt):
+        super(EventNotification, self).__init__()
+
+        self.notifier_type_id = notifier_type_id
+        self.notifier_config = notifier_config
+        self.body = body
+        self.attempts = 0
+        self.next_attempt = next_attempt
+        self.claim = None
@@ -131,3 +131,84 @@ class ReservedResource(Model):
         self.get_collection().save(
             {'_id': self.task_id, 'resource_id': self.resource_id, 'worker_name': self.worker_name},
             safe=True)
+
+
+class PendingReservation(Model):
+    """
+    Instances of this class represent tasks that have asked the resource manager for a
+    reservation but could not be dispatched yet because no worker was available. They are
+    persisted so that the resource manager can pick them up again if it is restarted.
+
+    :ivar task_id:       The uuid of the task waiting for the reservation
+    :type task_id:       basestring
+    :ivar task_name:     The name of the task waiting for the reservation
+    :type task_name:     basestring
+    :ivar resource_id:   The name of the resource the task wants to reserve.
+    :type resource_id:   basestring
+    :ivar args:          pickled tuple of the positional and keyword arguments for the task
+    :type args:          basestring
+    :ivar queued_at:     when the task asked for the reservation
+    :type queued_at:     datetime.datetime
+    """
+    collection_name = 'pending_reservations'
+    unique_indices = tuple()
+    search_indices = ('queued_at',)
+
+    def __init__(self, task_id, task_name, resource_id, args, queued_at):
+        """
+        :param task_id:       The uuid of the task waiting for the reservation
+        :type task_id:        basestring
+        :param task_name:     The name of the task waiting for the reservation
+        :type task_name:      basestring
+        :param resource_id:   The name of the resource the task wants to reserve.
+        :type resource_id:    basestring
+        :param args:          pickled tuple of the positional and keyword arguments for the task
+        :type args:           basestring
+        :param queued_at:     when the task asked for the reservation
+        :type queued_at:      datetime.datetime
+        """
+        super(PendingReservation, self).__init__()
+
+        self.task_id = task_id
+        self.task_name = task_name
+        self.resource_id = resource_id
+        self.args = args
+        self.queued_at = queued_at
+
+        # We don't need these
+        del self['_id']
+        del self['id']
+
+    def delete(self):
+        """
+        Delete self from the DB
+        """
+        self.get_collection().remove({'_id': self.task_id})
+
+    @classmethod
+    def from_bson(cls, bson_reservation):
+        """
+        Instantiate a PendingReservation from the given bson. A Python dict can also be used in
+        place of bson_reservation.
+
+        :param bson_reservation: A bson object or a dict representing a PendingReservation.
+        :type  bson_reservation: bson.BSON or dict
+        :return:                 A PendingReservation representing the given bson_reservation
+        :rtype:                  pulp.server.db.model.resources.PendingReservation
+        """
+        return cls(
+            task_id=bson_reservation['_id'],
+            task_name=bson_reservation['task_name'],
+            resource_id=bson_reservation['resource_id'],
+            args=bson_reservation['args'],
+            queued_at=bson_reservation['queued_at'])
+
+    def save(self):
+        """
+        Save any changes made to this PendingReservation to the database. If it doesn't exist,
+        insert a new record to represent it.
+        """
+        self.get_collection().save(
+            {'_id': self.task_id, 'task_name': self.task_name, 'resource_id': self.resource_id,
+             'args': self.args, 'queued_at': self.queued_at},
+            safe=True)
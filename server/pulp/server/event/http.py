@@ -19,15 +19,36 @@ url
   Full URL to contact with the event data. A POST request will be made to this
   URL with the contents of the events in the body.
 
-Eventually this should be enhanced to support authentication credentials as well.
+username, password
+  Optional credentials sent to the URL with basic authentication.
+
+batch_size
+  Optional maximum number of events sent with each request. When greater than
+  1, the body of each request is a JSON list of events rather than a single
+  event. Defaults to 1.
+
+Fired events are stored in the event_notifications collection and delivered by
+a thread of the process that fired them, so that pulp never blocks on the
+remote server. Requests are made by a bounded pool of threads that reuse
+persistent connections to each server. Events that cannot be delivered are
+retried with an exponential backoff, and events left behind by a process that
+exited are delivered by the deliver_notifications task, run by celerybeat.
 """
 
 import base64
 import httplib
 import logging
+import os
+import socket
 import threading
+import time
+import uuid
+from multiprocessing.pool import ThreadPool
+
+from celery import task
 
 from pulp.server.compat import json, json_util
+from pulp.server.db.model.event import EventNotification
 
 # -- constants ----------------------------------------------------------------
 
@@ -35,44 +56,273 @@ TYPE_ID = 'http'
 
 LOG = logging.getLogger(__name__)
 
+# Number of requests made concurrently by each process
+DELIVERY_THREADS = 4
+
+# Maximum number of notifications claimed for delivery at once
+CLAIM_PAGE_SIZE = 100
+
+# Seconds after which notifications are checked for again if no event is fired
+POLL_INTERVAL = 30
+
+# Seconds after which a notification claimed by a process is considered
+# abandoned and delivered again
+CLAIM_TIMEOUT = 300
+
+# Seconds waited before the first retry; doubled after each failed attempt
+RETRY_DELAY = 15
+MAX_RETRY_DELAY = 3600
+
+# Number of failed attempts after which a notification is dropped
+MAX_ATTEMPTS = 10
+
+# Seconds waited on the remote server before a request fails
+CONNECTION_TIMEOUT = 30
+
 # -- framework hook -----------------------------------------------------------
 
+
 def handle_event(notifier_config, event):
-    # fire the actual http push function off in a separate thread to keep
+    # the event is only stored here; it is sent by the delivery thread to keep
     # pulp from blocking or deadlocking due to the tasking subsystem
 
+    url = notifier_config.get('url')
+    if not url:
+        LOG.warn('HTTP notifier configured without a URL; cannot fire event')
+        return
+
+    try:
+        _parse_url(url)
+    except ValueError:
+        LOG.warn('Improperly configured post_sync_url: %(u)s' % {'u': url})
+        return
+
     data = event.data()
 
     LOG.info(data)
 
     body = json.dumps(data, default=json_util.default)
 
-    thread = threading.Thread(target=_send_post, args=[notifier_config, body])
-    thread.setDaemon(True)
-    thread.start()
+    notification = EventNotification(TYPE_ID, notifier_config, body, time.time())
+    EventNotification.get_collection().insert(notification, safe=True)
+    _deliverer.wakeup()
+
+
+@task
+def deliver_notifications():
+    """
+    Delivers the notifications that are due, including those left behind by
+    processes that exited before delivering them.
+    """
+    _deliverer.wakeup()
 
 # -- private ------------------------------------------------------------------
 
-def _send_post(notifier_config, body):
 
-    # Basic headers
-    headers = {'Accept': 'application/json',
-               'Content-Type': 'application/json'}
+class _Deliverer(object):
+    """
+    Delivers the stored notifications from a thread of the current process,
+    started the first time it is woken up.
+    """
 
-    # Parse the URL for the pieces we need
-    if 'url' not in notifier_config or not notifier_config['url']:
-        LOG.warn('HTTP notifier configured without a URL; cannot fire event')
-        return
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = None
+        self._wakeup = None
+
+    def wakeup(self):
+        """
+        Start delivering the notifications that are due.
+        """
+        with self._lock:
+            # threads do not survive a fork, so each process starts its own
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._wakeup = threading.Event()
+                thread = threading.Thread(target=self._run, args=[self._wakeup])
+                thread.setDaemon(True)
+                thread.start()
+            self._wakeup.set()
+
+    @staticmethod
+    def _run(wakeup):
+        pool = ThreadPool(DELIVERY_THREADS)
+        connections = _ConnectionPool()
+        while True:
+            wakeup.clear()
+            try:
+                _deliver_due(pool, connections)
+            except Exception:
+                LOG.exception('Failed to deliver event notifications')
+            wakeup.wait(POLL_INTERVAL)
+
+
+_deliverer = _Deliverer()
+
+
+class _ConnectionPool(object):
+    """
+    Idle connections to each server, kept open to be reused by later requests.
+    """
+
+    def __init__(self, max_idle=DELIVERY_THREADS):
+        self._lock = threading.Lock()
+        self._idle = {}
+        self.max_idle = max_idle
+
+    def get(self, scheme, server):
+        """
+        @return: tuple of a connection to the server and whether it was used before
+        @rtype:  tuple
+        """
+        with self._lock:
+            idle = self._idle.get((scheme, server))
+            if idle:
+                return idle.pop(), True
+        return _create_connection(scheme, server), False
 
-    url = notifier_config['url']
+    def put(self, scheme, server, connection):
+        """
+        Keep a connection whose response has been read for later requests.
+        """
+        with self._lock:
+            idle = self._idle.setdefault((scheme, server), [])
+            if len(idle) < self.max_idle:
+                idle.append(connection)
+                return
+        connection.close()
 
+
+def _deliver_due(pool, connections):
+    """
+    Claims the notifications that are due in pages and sends each page with the
+    pool of threads until none are left.
+    """
+    collection = EventNotification.get_collection()
+    while True:
+        notifications = _claim_due(collection)
+        if notifications is None:
+            return
+        pool.map(lambda batch: _deliver(batch, connections), _batches(notifications))
+
+
+def _claim_due(collection):
+    """
+    Claims a page of the notifications that are due so that no other process
+    delivers them at the same time.
+
+    @return: the claimed notifications, or None if none were due
+    @rtype:  list or None
+    """
+    now = time.time()
+    due = collection.find({'notifier_type_id': TYPE_ID, 'next_attempt': {'$lte': now}},
+                          fields=['_id']).sort('next_attempt').limit(CLAIM_PAGE_SIZE)
+    ids = [n['_id'] for n in due]
+    if not ids:
+        return None
+
+    claim = str(uuid.uuid4())
+    collection.update({'_id': {'$in': ids}, 'next_attempt': {'$lte': now}},
+                      {'$set': {'next_attempt': now + CLAIM_TIMEOUT, 'claim': claim}},
+                      multi=True, safe=True)
+    return list(collection.find({'claim': claim}).sort('_id'))
+
+
+def _batches(notifications):
+    """
+    Groups the notifications by the listener configuration they are sent with
+    and splits the groups into batches of at most its batch_size.
+
+    @return: list of lists of notifications sent with a single request
+    @rtype:  list
+    """
+    groups = {}
+    order = []
+    for notification in notifications:
+        key = json.dumps(notification['notifier_config'], sort_keys=True)
+        if key not in groups:
+            groups[key] = []
+            order.append(key)
+        groups[key].append(notification)
+
+    batches = []
+    for key in order:
+        group = groups[key]
+        size = _batch_size(group[0]['notifier_config'])
+        batches.extend(group[i:i + size] for i in range(0, len(group), size))
+    return batches
+
+
+def _batch_size(notifier_config):
     try:
-        scheme, empty, server, path = url.split('/', 3)
-    except ValueError:
-        LOG.warn('Improperly configured post_sync_url: %(u)s' % {'u': url})
+        return max(1, int(notifier_config.get('batch_size', 1)))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _deliver(notifications, connections):
+    """
+    Sends a batch of notifications with a single request and removes them once
+    the server has answered, or schedules them to be retried.
+    """
+    notifier_config = notifications[0]['notifier_config']
+    bodies = [n['body'] for n in notifications]
+    if _batch_size(notifier_config) > 1:
+        body = '[%s]' % ', '.join(bodies)
+    else:
+        body = bodies[0]
+
+    try:
+        status, response_body = _send_post(notifier_config, body, connections)
+    except Exception, e:
+        LOG.warn('Failed to send events to HTTP notifier %(u)s: %(e)s' %
+                 {'u': notifier_config.get('url'), 'e': e})
+        _retry(notifications)
+        return
+
+    if status >= 500:
+        LOG.warn('Error response from HTTP notifier: %(e)s' % {'e': response_body})
+        _retry(notifications)
         return
+    if status < 200 or status >= 300:
+        LOG.warn('Error response from HTTP notifier: %(e)s' % {'e': response_body})
+
+    EventNotification.get_collection().remove(
+        {'_id': {'$in': [n['_id'] for n in notifications]}}, safe=True)
+
+
+def _retry(notifications):
+    """
+    Schedules the next attempt to deliver each notification, or drops it once
+    it has failed MAX_ATTEMPTS times.
+    """
+    collection = EventNotification.get_collection()
+    now = time.time()
+    for notification in notifications:
+        attempts = notification['attempts'] + 1
+        if attempts >= MAX_ATTEMPTS:
+            LOG.error('Dropping event for HTTP notifier %(u)s after %(n)d attempts' %
+                      {'u': notification['notifier_config'].get('url'), 'n': attempts})
+            collection.remove({'_id': notification['_id']}, safe=True)
+            continue
+        delay = min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+        collection.update({'_id': notification['_id']},
+                          {'$set': {'attempts': attempts, 'next_attempt': now + delay,
+                                    'claim': None}},
+                          safe=True)
+
+
+def _send_post(notifier_config, body, connections):
+    """
+    @return: tuple of the status and the body of the response
+    @rtype:  tuple
+    """
 
-    connection = _create_connection(scheme, server)
+    # Basic headers
+    headers = {'Accept': 'application/json',
+               'Content-Type': 'application/json'}
+
+    scheme, server, path = _parse_url(notifier_config['url'])
 
     # Process authentication
     if 'username' in notifier_config and 'password' in notifier_config:
@@ -80,16 +330,38 @@ def _send_post(notifier_config, body):
         encoded = base64.encodestring(raw)[:-1]
         headers['Authorization'] = 'Basic ' + encoded
 
-    connection.request('POST', '/' + path, body=body, headers=headers)
-    response = connection.getresponse()
-    if response.status != httplib.OK:
-        error_msg = response.read()
-        LOG.warn('Error response from HTTP notifier: %(e)s' % {'e': error_msg})
-    connection.close()
+    connection, reused = connections.get(scheme, server)
+    while True:
+        try:
+            connection.request('POST', path, body=body, headers=headers)
+            response = connection.getresponse()
+            # the response must be read before the connection is used again
+            response_body = response.read()
+        except (httplib.HTTPException, socket.error):
+            connection.close()
+            if not reused:
+                raise
+            # the server may have closed the idle connection; retry on a new one
+            connection, reused = _create_connection(scheme, server), False
+            continue
+        connections.put(scheme, server, connection)
+        return response.status, response_body
+
+
+def _parse_url(url):
+    """
+    @return: tuple of the scheme, server and path of the url
+    @rtype:  tuple
+
+    @raise ValueError: if the url cannot be parsed
+    """
+    scheme, empty, server, path = url.split('/', 3)
+    return scheme, server, '/' + path
+
 
 def _create_connection(scheme, server):
     if scheme.startswith('https'):
-        connection = httplib.HTTPSConnection(server)
+        connection = httplib.HTTPSConnection(server, timeout=CONNECTION_TIMEOUT)
     else:
-        connection = httplib.HTTPConnection(server)
+        connection = httplib.HTTPConnection(server, timeout=CONNECTION_TIMEOUT)
     return connection
@@ -15,6 +15,7 @@ import oauth2
 
 from pulp.server.db.model.consumer import Consumer
 from pulp.server.managers import factory
+from pulp.server.auth import cache as auth_cache
 from pulp.server.auth import ldap_connection
 from pulp.server.config import config
 from pulp.server.exceptions import PulpException
@@ -109,10 +110,16 @@ class AuthenticationManager(object):
         :rtype: str or None
         :return: user login corresponding to the credentials
         """
+        key = auth_cache.credentials_key(username, password)
+        login = auth_cache.credentials.get(key)
+        if login is not None:
+            return login
+
         user = self._check_username_password_local(username, password)
         if user is None and config.getboolean('ldap', 'enabled'):
             user = self._check_username_password_ldap(username, password)
         if user is not None:
+            auth_cache.credentials.put(key, user['login'])
             return user['login']
         return None
 
@@ -22,6 +22,7 @@ from celery import task
 
 from pulp.server.async.tasks import Task
 from pulp.server.auth import authorization
+from pulp.server.auth import cache as auth_cache
 from pulp.server.db.model.auth import Permission, User
 from pulp.server.exceptions import (
     DuplicateResource, InvalidValue, MissingResource, PulpDataException,
@@ -88,6 +89,7 @@ class PermissionManager(object):
             raise PulpDataException(_("Update Keyword [%s] is not supported" % key))
 
         Permission.get_collection().save(found, safe=True)
+        auth_cache.invalidate()
 
     @staticmethod
     def delete_permission(resource_uri):
@@ -110,6 +112,7 @@ class PermissionManager(object):
             raise MissingResource(resource_uri)
 
         Permission.get_collection().remove({'resource': resource_uri}, safe=True)
+        auth_cache.invalidate()
 
     @staticmethod
     def grant(resource, login, operations):
@@ -149,6 +152,7 @@ class PermissionManager(object):
             current_ops.append(o)
 
         Permission.get_collection().save(permission, safe=True)
+        auth_cache.permissions_granted(login, resource, operations)
 
     @staticmethod
     def revoke(resource, login, operations):
@@ -194,6 +198,7 @@ class PermissionManager(object):
             return
 
         Permission.get_collection().save(permission, safe=True)
+        auth_cache.permissions_revoked(login, resource, operations)
 
     def grant_automatic_permissions_for_resource(self, resource):
         """
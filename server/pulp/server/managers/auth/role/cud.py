@@ -20,6 +20,7 @@ from gettext import gettext as _
 from celery import task
 
 from pulp.server.async.tasks import Task
+from pulp.server.auth import cache as auth_cache
 from pulp.server.auth.authorization import CREATE, READ, UPDATE, DELETE, EXECUTE, \
     _operations_not_granted_by_roles
 from pulp.server.db.model.auth import Role, User
@@ -243,6 +244,7 @@ class RoleManager(object):
 
         user['roles'].append(role_id)
         User.get_collection().save(user, safe=True)
+        auth_cache.roles_changed(login)
 
         for resource, operations in role['permissions'].items():
             factory.permission_manager().grant(resource, login, operations)
@@ -278,6 +280,7 @@ class RoleManager(object):
 
         user['roles'].remove(role_id)
         User.get_collection().save(user, safe=True)
+        auth_cache.roles_changed(login)
 
         for resource, operations in role['permissions'].items():
             other_roles = factory.role_query_manager().get_other_roles(role, user['roles'])
@@ -16,6 +16,8 @@ Contains users query classes
 
 from gettext import gettext as _
 
+from pulp.server.auth import cache as auth_cache
+from pulp.server.auth.authorization import PermissionTrie
 from pulp.server.db.model.auth import User, Permission, Role
 from pulp.server.exceptions import PulpDataException, MissingResource
 from pulp.server.managers import factory
@@ -99,12 +101,17 @@ class UserQueryManager(object):
         @rtype: bool
         @return: True if the user is a super user, False otherwise
         """
+        superuser = auth_cache.superusers.get(login)
+        if superuser is not None:
+            return superuser
+
         user = User.get_collection().find_one({'login' : login})
         if user is None:
             raise MissingResource(login)
 
-        role_manager = factory.role_manager()
-        return SUPER_USER_ROLE in user['roles']
+        superuser = SUPER_USER_ROLE in user['roles']
+        auth_cache.superusers.put(login, superuser)
+        return superuser
 
     def is_authorized(self, resource, login, operation):
         """
@@ -125,21 +132,26 @@ class UserQueryManager(object):
         """
         if self.is_superuser(login):
             return True
+        return self.find_effective_permissions(login).is_authorized(resource, operation)
 
-        permission_query_manager = factory.permission_query_manager()
+    def find_effective_permissions(self, login):
+        """
+        Get the operations a user has been granted on each resource, either
+        directly or through its roles. They are loaded with a single query and
+        then cached; see pulp.server.auth.cache.
 
-        parts = [p for p in resource.split('/') if p]
-        while parts:
-            current_resource = '/%s/' % '/'.join(parts)
-            permission = permission_query_manager.find_by_resource(current_resource)
-            if permission is not None:
-                if operation in permission_query_manager.find_user_permission(permission, login):
-                    return True
-            parts = parts[:-1]
+        @type login: str
+        @param login: login of user to find the permissions of
 
-        permission = Permission.get_collection().find_one({'resource': '/'})
-        return (permission is not None and
-                operation in permission_query_manager.find_user_permission(permission, login))
+        @rtype: L{pulp.server.auth.authorization.PermissionTrie}
+        @return: the permissions of the user
+        """
+        trie = auth_cache.permissions.get(login)
+        if trie is None:
+            permissions = Permission.get_collection().find({'users.username': login})
+            trie = PermissionTrie.from_permissions(permissions, login)
+            auth_cache.permissions.put(login, trie)
+        return trie
 
     def is_last_super_user(self, login):
         """
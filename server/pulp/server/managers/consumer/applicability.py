@@ -19,21 +19,35 @@ from gettext import gettext as _
 from logging import getLogger
 
 from celery import task
+from pymongo.errors import BulkWriteError
 
+from pulp.common import tags
 from pulp.plugins.conduits.profiler import ProfilerConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
 from pulp.plugins.profiler import Profiler
+from pulp.plugins.util import misc
 from pulp.server.db.model.consumer import Bind, RepoProfileApplicability, UnitProfile
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.repository import Repo
 from pulp.server.managers import factory as managers
 from pulp.server.managers.consumer.query import ConsumerQueryManager
-from pulp.server.async.tasks import Task
+from pulp.server.async.tasks import Task, TaskResult
 
 
 logger = getLogger(__name__)
 
+# Maximum number of distinct profiles calculated and saved together
+PROFILE_BATCH_SIZE = 100
+
+# Maximum number of repositories regenerated by a single task. Regeneration for more repositories
+# than this is split into several tasks so that it can run on several workers.
+REPO_BATCH_SIZE = 10
+
+# Number of times the applicability of a batch is written when the same applicability is
+# created concurrently by another regeneration task
+SAVE_APPLICABILITY_ATTEMPTS = 3
+
 
 class ApplicabilityRegenerationManager(object):
     @staticmethod
@@ -61,28 +75,23 @@ class ApplicabilityRegenerationManager(object):
 
         # Get all unit profiles associated with given consumers
         unit_profile_criteria = Criteria(filters={'consumer_id':{'$in':consumer_ids}},
-                                         fields=['consumer_id', 'profile_hash', 'content_type', 'id'])
+                                         fields=['consumer_id', 'profile_hash', 'content_type'])
         all_unit_profiles = consumer_profile_manager.find_by_criteria(unit_profile_criteria)
 
         # Create a consumer-profile map with consumer id as the key and list of tuples
         # with profile details as the value
         consumer_unit_profiles_map = {}
-        # Also create a map of profile_id keyed by profile_hash for profile lookup.
-        profile_hash_profile_id_map = {}
+        # Also collect the distinct profile hashes.
+        all_profile_hashes = set()
         for unit_profile in all_unit_profiles:
             profile_hash = unit_profile['profile_hash']
             content_type = unit_profile['content_type']
             consumer_id = unit_profile['consumer_id']
-            profile_id = unit_profile['id']
 
             profile_tuple = (profile_hash, content_type)
             # Add this tuple to the list of profile tuples for a consumer
             consumer_unit_profiles_map.setdefault(consumer_id, []).append(profile_tuple)
-
-            # We need just one profile_id per profile_hash to be used in regenerate_applicability
-            # method to get the actual profile corresponding to given profile_hash.
-            if profile_hash not in profile_hash_profile_id_map:
-                profile_hash_profile_id_map[profile_hash] = profile_id
+            all_profile_hashes.add(profile_hash)
 
         # Get all repos bound to given consumers
         bind_criteria = Criteria(filters={'consumer_id': {'$in':consumer_ids}},
@@ -94,27 +103,31 @@ class ApplicabilityRegenerationManager(object):
         for binding in all_repo_bindings:
             repo_consumers_map.setdefault(binding['repo_id'], []).append(binding['consumer_id'])
 
-        # Create a set of (repo_id, (profile_hash, content_type))
-        repo_profile_hashes = set()
+        # Group the (profile_hash, content_type) pairs that need applicability by
+        # (content_type, repo_id) so that each group can be calculated with a single
+        # profiler call. Pairs that already have applicability are skipped; they are
+        # found with one query instead of one per pair.
+        existing = ApplicabilityRegenerationManager._existing_applicability(
+            repo_consumers_map.keys(), list(all_profile_hashes))
+        profile_hashes_by_type_and_repo = {}
         for repo_id, consumer_id_list in repo_consumers_map.items():
             for consumer_id in consumer_id_list:
-                if consumer_id in consumer_unit_profiles_map:
-                    for unit_profile_tuple in consumer_unit_profiles_map[consumer_id]:
-                        repo_profile_hashes.add((repo_id, unit_profile_tuple))
-
-        # Iterate through each tuple in repo_profile_hashes set and regenerate applicability,
-        # if it doesn't exist. These are all guaranteed to be unique tuples because of the logic
-        # used to create maps and sets above, eliminating multiple unnecessary queries
-        # to check for existing applicability for same profiles.
-        manager = managers.applicability_regeneration_manager()
-        for repo_id, (profile_hash, content_type) in repo_profile_hashes:
-            # Check if applicability for given profile_hash and repo_id already exists
-            if ApplicabilityRegenerationManager._is_existing_applicability(repo_id, profile_hash):
-                continue
-            # If applicability does not exist, generate applicability data for given profile
-            # and repo id.
-            profile_id = profile_hash_profile_id_map[profile_hash]
-            manager.regenerate_applicability(profile_hash, content_type, profile_id, repo_id)
+                for profile_hash, content_type in consumer_unit_profiles_map.get(consumer_id, []):
+                    if (repo_id, profile_hash) in existing:
+                        continue
+                    profile_hashes_by_type_and_repo.setdefault(
+                        (content_type, repo_id), set()).add(profile_hash)
+
+        for (content_type, repo_id), profile_hashes in profile_hashes_by_type_and_repo.items():
+            for batch in misc.paginate(sorted(profile_hashes), PROFILE_BATCH_SIZE):
+                # Load all of the profiles for the batch with one query
+                profiles = {}
+                unit_profiles = UnitProfile.get_collection().find(
+                    {'profile_hash': {'$in': batch}}, fields=['profile_hash', 'profile'])
+                for unit_profile in unit_profiles:
+                    profiles[unit_profile['profile_hash']] = unit_profile['profile']
+                ApplicabilityRegenerationManager.regenerate_applicability_batch(
+                    content_type, repo_id, profiles)
 
     @staticmethod
     def regenerate_applicability_for_repos(repo_criteria):
@@ -131,55 +144,73 @@ class ApplicabilityRegenerationManager(object):
         repo_criteria.fields = ['id']
         repo_ids = [r['id'] for r in repo_query_manager.find_by_criteria(repo_criteria)]
 
+        if len(repo_ids) <= REPO_BATCH_SIZE:
+            ApplicabilityRegenerationManager.regenerate_applicability_for_repo_ids(repo_ids)
+            return
+
+        # Fan the work out across the workers, one task per batch of repositories
+        task_tags = [tags.action_tag('content_applicability_regeneration')]
+        spawned_tasks = []
+        for batch in misc.paginate(repo_ids, REPO_BATCH_SIZE):
+            spawned_tasks.append(
+                regenerate_applicability_for_repo_ids.apply_async((list(batch),), tags=task_tags))
+        return TaskResult(spawned_tasks=spawned_tasks)
+
+    @staticmethod
+    def regenerate_applicability_for_repo_ids(repo_ids):
+        """
+        Regenerate and save the existing applicability data for the given repositories.
+
+        :param repo_ids: ids of the repositories whose applicability data should be regenerated
+        :type  repo_ids: list
+        """
         for repo_id in repo_ids:
             # Find all existing applicabilities for given repo_id
             existing_applicabilities = RepoProfileApplicability.get_collection().find(
-                {'repo_id': repo_id})
-            for existing_applicability in existing_applicabilities:
-                # Convert cursor to RepoProfileApplicability object
-                existing_applicability = RepoProfileApplicability(**dict(existing_applicability))
-                profile_hash = existing_applicability['profile_hash']
-                unit_profile = UnitProfile.get_collection().find_one({'profile_hash': profile_hash},
-                                                                     fields=['id', 'content_type'])
-                if unit_profile is None:
-                    # Unit profiles change whenever packages are installed or removed on consumers,
-                    # and it is possible that existing_applicability references a UnitProfile
-                    # that no longer exists. This is harmless, as Pulp has a monthly cleanup task
-                    # that will identify these dangling references and remove them.
-                    continue
-
-                # Regenerate applicability data for given unit_profile and repo id
-                ApplicabilityRegenerationManager.regenerate_applicability(profile_hash, 
-                                                                          unit_profile['content_type'],
-                                                                          unit_profile['id'],
-                                                                          repo_id,
-                                                                          existing_applicability)
+                {'repo_id': repo_id}, fields=['profile_hash', 'profile'])
+
+            for batch in misc.paginate(existing_applicabilities, PROFILE_BATCH_SIZE):
+                profiles = dict((a['profile_hash'], a['profile']) for a in batch)
+
+                # Look up the content type of every profile in the batch with one query
+                unit_profiles = UnitProfile.get_collection().find(
+                    {'profile_hash': {'$in': profiles.keys()}},
+                    fields=['profile_hash', 'content_type'])
+                profiles_by_type = {}
+                for unit_profile in unit_profiles:
+                    profile_hash = unit_profile['profile_hash']
+                    profiles_by_type.setdefault(unit_profile['content_type'], {})[profile_hash] = \
+                        profiles[profile_hash]
+
+                # Unit profiles change whenever packages are installed or removed on consumers,
+                # and it is possible that an existing applicability references a UnitProfile
+                # that no longer exists. Those profiles are simply not found above. This is
+                # harmless, as Pulp has a monthly cleanup task that will identify these dangling
+                # references and remove them.
+                for content_type, type_profiles in profiles_by_type.items():
+                    ApplicabilityRegenerationManager.regenerate_applicability_batch(
+                        content_type, repo_id, type_profiles)
 
     @staticmethod
-    def regenerate_applicability(profile_hash, content_type, profile_id,
-                                 bound_repo_id, existing_applicability=None):
+    def regenerate_applicability_batch(content_type, bound_repo_id, profiles):
         """
-        Regenerate and save applicability data for given profile and bound repo id.
-        If existing_applicability is not None, replace it with the new applicability data.
-
-        :param profile_hash: hash of the unit profile
-        :type profile_hash: basestring
-
-        :param content_type: profile (unit) type ID
-        :type content_type: str
-
-        :param profile_id: unique id of the unit profile
-        :type profile_id: str
-
-        :param bound_repo_id: repo id to be used to calculate applicability
-                              against the given unit profile
-        :type bound_repo_id: str
-
-        :param existing_applicability: existing RepoProfileApplicability object to be replaced
-        :type existing_applicability: pulp.server.db.model.consumer.RepoProfileApplicability
+        Regenerate and save applicability data for a batch of distinct profiles of the same
+        content type against one bound repo. The profiler is called once for the whole batch and
+        the results are written with a single bulk upsert, replacing any existing applicability
+        for the same profile and repo. Repository regeneration tasks run concurrently with
+        consumer regeneration, so an applicability may be created by another task during the
+        write; the write is then attempted again, up to SAVE_APPLICABILITY_ATTEMPTS times.
+
+        :param content_type:  profile (unit) type ID
+        :type  content_type:  str
+        :param bound_repo_id: repo id to be used to calculate applicability against the profiles
+        :type  bound_repo_id: str
+        :param profiles:      unit profiles keyed by profile hash
+        :type  profiles:      dict
         """
-        profiler_conduit = ProfilerConduit()
-        # Get the profiler for content_type of given unit_profile
+        if not profiles:
+            return
+
         profiler, profiler_cfg = ApplicabilityRegenerationManager._profiler(content_type)
 
         # Check if the profiler supports applicability, else return
@@ -188,41 +219,40 @@ class ApplicabilityRegenerationManager(object):
             # skip applicability regeneration
             return
 
-        # Find out which content types have unit counts greater than zero in the bound repo
+        # Only regenerate if the bound repo has units of a type that the profiler handles
         repo_content_types = ApplicabilityRegenerationManager._get_existing_repo_content_types(
             bound_repo_id)
-        # Get the intersection of existing types in the repo and the types that the profiler
-        # handles. If the intersection is not empty, regenerate applicability
-        if (set(repo_content_types) & set(profiler.metadata()['types'])):
-            # Get the actual profile for existing_applicability or lookup using profile_id
-            if existing_applicability:
-                profile = existing_applicability.profile
-            else:
-                unit_profile = UnitProfile.get_collection().find_one({'id': profile_id},
-                                                                     fields=['profile'])
-                profile = unit_profile['profile']
-            call_config = PluginCallConfiguration(plugin_config=profiler_cfg,
-                                                  repo_plugin_config=None)
+        if not (set(repo_content_types) & set(profiler.metadata()['types'])):
+            return
+
+        call_config = PluginCallConfiguration(plugin_config=profiler_cfg,
+                                              repo_plugin_config=None)
+        try:
+            applicabilities = profiler.calculate_applicable_units_batch(
+                profiles, bound_repo_id, call_config, ProfilerConduit())
+        except NotImplementedError:
+            logger.debug("Profiler for content type [%s] does not support applicability"
+                         % content_type)
+            return
+
+        if not applicabilities:
+            return
+
+        for attempt in range(1, SAVE_APPLICABILITY_ATTEMPTS + 1):
+            bulk = RepoProfileApplicability.get_collection().initialize_unordered_bulk_op()
+            for profile_hash, applicability in applicabilities.items():
+                spec = {'profile_hash': profile_hash, 'repo_id': bound_repo_id}
+                bulk.find(spec).upsert().update_one(
+                    {'$set': {'profile': profiles[profile_hash], 'applicability': applicability}})
             try:
-                applicability = profiler.calculate_applicable_units(profile,
-                                                                    bound_repo_id,
-                                                                    call_config,
-                                                                    profiler_conduit)
-            except NotImplementedError:
-                logger.debug("Profiler for content type [%s] does not support applicability"
-                           % content_type)
+                bulk.execute()
                 return
-
-            if existing_applicability:
-                # Update existing applicability object
-                existing_applicability.applicability = applicability
-                existing_applicability.save()
-            else:
-                # Create a new RepoProfileApplicability object and save it in the db
-                RepoProfileApplicability.objects.create(profile_hash,
-                                                        bound_repo_id,
-                                                        unit_profile['profile'],
-                                                        applicability)
+            except BulkWriteError, e:
+                # Two concurrent upserts of the same profile and repo may both insert, and one
+                # of them fails on the unique index; it updates the document on the next attempt
+                if attempt == SAVE_APPLICABILITY_ATTEMPTS or \
+                        any(error['code'] != 11000 for error in e.details['writeErrors']):
+                    raise
 
     @staticmethod
     def _get_existing_repo_content_types(repo_id):
@@ -243,21 +273,27 @@ class ApplicabilityRegenerationManager(object):
         return repo_content_types_with_non_zero_unit_count
 
     @staticmethod
-    def _is_existing_applicability(repo_id, profile_hash):
+    def _existing_applicability(repo_ids, profile_hashes):
         """
-        Check if applicability for given repo and profle hash is already calculated.
-
-        :param repo_id:      repo id
-        :type repo_id:       basestring
-        :param profile_hash: unit profile hash
-        :type profile_hash:  basestring
-        :return:             true if applicability exists, false otherwise
-        :type:               boolean
+        Find which of the given repos and profile hashes already have applicability calculated.
+
+        :param repo_ids:       repo ids
+        :type  repo_ids:       list
+        :param profile_hashes: unit profile hashes
+        :type  profile_hashes: list
+        :return:               (repo_id, profile_hash) tuples for which applicability exists
+        :rtype:                set
         """
-        query_params = {'repo_id': repo_id, 'profile_hash': profile_hash}
-        if RepoProfileApplicability.get_collection().find_one(query_params, fields=['_id']):
-            return True
-        return False
+        existing = set()
+        if not repo_ids or not profile_hashes:
+            return existing
+        query_params = {'repo_id': {'$in': list(repo_ids)},
+                        'profile_hash': {'$in': list(profile_hashes)}}
+        applicabilities = RepoProfileApplicability.get_collection().find(
+            query_params, fields=['repo_id', 'profile_hash'])
+        for applicability in applicabilities:
+            existing.add((applicability['repo_id'], applicability['profile_hash']))
+        return existing
 
     @staticmethod
     def _profiler(type_id):
@@ -285,6 +321,9 @@ regenerate_applicability_for_consumers = task(
 regenerate_applicability_for_repos = task(
     ApplicabilityRegenerationManager.regenerate_applicability_for_repos, base=Task,
     ignore_result=True)
+regenerate_applicability_for_repo_ids = task(
+    ApplicabilityRegenerationManager.regenerate_applicability_for_repo_ids, base=Task,
+    ignore_result=True)
 
 
 class DoesNotExist(Exception):
@@ -9,11 +9,17 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import math
+import re
+
+from collections import OrderedDict
 from logging import getLogger
+from threading import RLock
 
 from pymongo import ASCENDING
 
-from pulp.server.db.model.content import ContentCatalog
+from pulp.server.db.model.content import (
+    ContentCatalog, ContentCatalogFingerprint, ContentCatalogGeneration)
 
 
 log = getLogger(__name__)
@@ -24,6 +30,9 @@ log = getLogger(__name__)
 # in the catalog after it has expired.
 GRACE_PERIOD = 3600  # 1 hour.
 
+# The maximum number of locators included in each find_many() query.
+FIND_MANY_BATCH_SIZE = 1000
+
 
 class ContentCatalogManager(object):
     """
@@ -45,6 +54,8 @@ class ContentCatalogManager(object):
     def add_entry(self, source_id, expires, type_id, unit_key, url):
         """
         Add an entry to the content catalog.
+        When the source already contributed an entry for the same unit and URL,
+        only the expiration of the existing entry is updated.
         :param source_id: A content source ID.
         :type source_id: str
         :param expires: The entry expiration in seconds.
@@ -58,7 +69,11 @@ class ContentCatalogManager(object):
         """
         collection = ContentCatalog.get_collection()
         entry = ContentCatalog(source_id, expires, type_id, unit_key, url)
-        collection.insert(entry, safe=True)
+        query = {'source_id': source_id, 'locator': entry.locator, 'url': url}
+        inserted = dict((k, v) for k, v in entry.items() if k not in query and k != 'expiration')
+        update = {'$set': {'expiration': entry.expiration}, '$setOnInsert': inserted}
+        collection.update(query, update, upsert=True, safe=True)
+        CACHE.added(entry.locator)
 
     def delete_entry(self, source_id, type_id, unit_key):
         """
@@ -74,6 +89,7 @@ class ContentCatalogManager(object):
         locator = ContentCatalog.get_locator(type_id, unit_key)
         query = {'source_id': source_id, 'locator': locator}
         collection.remove(query, safe=True)
+        CACHE.deleted(locator)
 
     def purge(self, source_id):
         """
@@ -87,8 +103,128 @@ class ContentCatalogManager(object):
         collection = ContentCatalog.get_collection()
         query = {'source_id': source_id}
         result = collection.remove(query, safe=True)
+        ContentCatalogFingerprint.get_collection().remove(query, safe=True)
+        CACHE.clear()
+        return result['n']
+
+    def renew(self, source_id, url, expires):
+        """
+        Renew the expiration of entries contributed by the specified content
+        source while refreshing the specified URL.  Entries are matched by
+        download URL, which is expected to be below the refreshed URL.
+        :param source_id: A content source ID.
+        :type source_id: str
+        :param url: The URL used to refresh the catalog.
+        :type url: str
+        :param expires: The entry expiration in seconds.
+        :type expires: int
+        :return: The number of entries renewed.
+        :rtype: int
+        """
+        collection = ContentCatalog.get_collection()
+        query = {'source_id': source_id, 'url': {'$regex': self._url_pattern(url)}}
+        update = {'$set': {'expiration': ContentCatalog.get_expiration(expires)}}
+        result = collection.update(query, update, multi=True, safe=True)
+        return result['n']
+
+    def purge_stale(self, source_id, url, expiration):
+        """
+        Purge (delete) entries contributed by the specified content source
+        while refreshing the specified URL that were not added or renewed
+        by a refresh.
+        :param source_id: A content source ID.
+        :type source_id: str
+        :param url: The URL used to refresh the catalog.
+        :type url: str
+        :param expiration: The entry expiration timestamp at the start of the refresh.
+            Entries added during the refresh expire at or after this timestamp.
+        :type expiration: int
+        :return: The number of entries purged.
+        :rtype: int
+        """
+        collection = ContentCatalog.get_collection()
+        query = {
+            'source_id': source_id,
+            'url': {'$regex': self._url_pattern(url)},
+            'expiration': {'$lt': expiration}
+        }
+        result = collection.remove(query, safe=True)
+        if result['n']:
+            CACHE.clear()
         return result['n']
 
+    @staticmethod
+    def _url_pattern(url):
+        """
+        Get the regex matching download URLs below the specified URL.
+        The match is anchored on a path boundary so that the URLs of
+        sibling directories sharing a prefix (eg: repo and repo-updates)
+        are not matched.
+        :param url: The URL used to refresh the catalog.
+        :type url: str
+        :return: The regex.
+        :rtype: str
+        """
+        return '^' + re.escape(url.rstrip('/') + '/')
+
+    def get_fingerprint(self, source_id, url):
+        """
+        Get the fingerprint of the upstream metadata last used to refresh
+        the catalog for the specified content source URL.
+        :param source_id: A content source ID.
+        :type source_id: str
+        :param url: The URL used to refresh the catalog.
+        :type url: str
+        :return: The fingerprint or None when not recorded.
+        :rtype: str
+        """
+        collection = ContentCatalogFingerprint.get_collection()
+        document = collection.find_one({'source_id': source_id, 'url': url})
+        if document is None:
+            return None
+        return document['fingerprint']
+
+    def set_fingerprint(self, source_id, url, fingerprint):
+        """
+        Record the fingerprint of the upstream metadata used to refresh
+        the catalog for the specified content source URL.
+        :param source_id: A content source ID.
+        :type source_id: str
+        :param url: The URL used to refresh the catalog.
+        :type url: str
+        :param fingerprint: The fingerprint.  None removes the recorded fingerprint.
+        :type fingerprint: str
+        """
+        collection = ContentCatalogFingerprint.get_collection()
+        query = {'source_id': source_id, 'url': url}
+        if fingerprint is None:
+            collection.remove(query, safe=True)
+            return
+        collection.update(query, {'$set': {'fingerprint': fingerprint}}, upsert=True, safe=True)
+
+    def get_generation(self):
+        """
+        Get the catalog generation.
+        :return: The generation.
+        :rtype: int
+        """
+        collection = ContentCatalogGeneration.get_collection()
+        document = collection.find_one({'_id': ContentCatalogGeneration.DOCUMENT_ID})
+        if document is None:
+            return 0
+        return document['generation']
+
+    def increment_generation(self):
+        """
+        Increment the catalog generation.  Should be called after entries
+        have been added to the catalog by a refresh so that the catalog
+        cache filters built by all processes before the refresh are no
+        longer used.
+        """
+        collection = ContentCatalogGeneration.get_collection()
+        query = {'_id': ContentCatalogGeneration.DOCUMENT_ID}
+        collection.update(query, {'$inc': {'generation': 1}}, upsert=True, safe=True)
+
     def purge_expired(self, grace_period=GRACE_PERIOD):
         """
         Purge (delete) expired entries from the content catalog belonging
@@ -122,6 +258,8 @@ class ContentCatalogManager(object):
         for source_id in collection.distinct('source_id'):
             if source_id not in valid_ids:
                 purged += self.purge(source_id)
+        fingerprints = ContentCatalogFingerprint.get_collection()
+        fingerprints.remove({'source_id': {'$nin': list(valid_ids)}}, safe=True)
         return purged
 
     def find(self, type_id, unit_key):
@@ -148,6 +286,71 @@ class ContentCatalogManager(object):
             newest_by_source[entry['source_id']] = entry
         return newest_by_source.values()
 
+    def find_many(self, units, cached=False):
+        """
+        Find entries in the content catalog for many units using a few queries.
+        Same as calling find() for each unit.  When cached, entries found
+        by earlier calls are served from the per-process catalog cache and
+        units that the cache filter knows are not in the catalog are skipped.
+        The cache filter is built by refresh_cache() and is dropped once the
+        catalog generation has changed since it was built.
+        :param units: A list of tuple: (type_id, unit_key).
+        :type units: list
+        :param cached: Use the per-process catalog cache.
+        :type cached: bool
+        :return: A list of matching entries for each unit, in the order of units.
+        :rtype: list
+        """
+        now = ContentCatalog.get_expiration(0)
+        found = [None] * len(units)
+        wanted = {}
+        if cached:
+            CACHE.validate(self.get_generation())
+        for index, (type_id, unit_key) in enumerate(units):
+            locator = ContentCatalog.get_locator(type_id, unit_key)
+            if cached:
+                entries = CACHE.get(locator, now)
+                if entries is not None:
+                    found[index] = entries
+                    continue
+            wanted.setdefault(locator, []).append(index)
+
+        collection = ContentCatalog.get_collection()
+        locators = wanted.keys()
+        for start in range(0, len(locators), FIND_MANY_BATCH_SIZE):
+            query = {
+                'locator': {'$in': locators[start:start + FIND_MANY_BATCH_SIZE]},
+                'expiration': {'$gte': now}
+            }
+            newest_by_source = {}
+            for entry in collection.find(query, sort=[('_id', ASCENDING)]):
+                newest_by_source[(entry['locator'], entry['source_id'])] = entry
+            by_locator = {}
+            for (locator, source_id), entry in newest_by_source.items():
+                by_locator.setdefault(locator, []).append(entry)
+            for locator in locators[start:start + FIND_MANY_BATCH_SIZE]:
+                entries = by_locator.get(locator, [])
+                if cached:
+                    CACHE.put(locator, entries)
+                for index in wanted[locator]:
+                    found[index] = entries
+
+        return found
+
+    def refresh_cache(self):
+        """
+        Clear the per-process catalog cache and rebuild the cache filter
+        using the locators of all unexpired catalog entries.
+        Should be called after the catalog has been refreshed.
+        """
+        # read first so that a refresh completed while reading the locators
+        # leaves the filter stale
+        generation = self.get_generation()
+        collection = ContentCatalog.get_collection()
+        query = {'expiration': {'$gte': ContentCatalog.get_expiration(0)}}
+        locators = set(e['locator'] for e in collection.find(query, fields=['locator']))
+        CACHE.rebuild(locators, generation)
+
     def has_entries(self, source_id):
         """
         Get whether the specified content source has entries in the catalog.
@@ -163,3 +366,189 @@ class ContentCatalogManager(object):
         }
         cursor = collection.find(query)
         return cursor.count() > 0
+
+
+class BloomFilter(object):
+    """
+    A bloom filter of catalog locators.
+    Membership tests never yield false negatives and yield false positives
+    at roughly the specified rate.  The locator is a SHA256 hex digest so
+    the bit positions are taken directly from slices of it.
+    :ivar size: The number of bits.
+    :type size: int
+    :ivar hashes: The number of bits set for each locator.
+    :type hashes: int
+    """
+
+    def __init__(self, capacity, error_rate=0.01):
+        """
+        :param capacity: The expected number of locators.
+        :type capacity: int
+        :param error_rate: The expected false positive rate.
+        :type error_rate: float
+        """
+        capacity = max(capacity, 1)
+        self.size = int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        # limited by the number of 8 digit slices in a SHA256 hex digest
+        self.hashes = min(8, max(1, int(round(self.size / float(capacity) * math.log(2)))))
+        self._bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, locator):
+        """
+        Get the bit positions for the specified locator.
+        :param locator: A catalog locator.
+        :type locator: str
+        :return: The bit positions.
+        :rtype: generator
+        """
+        for n in range(self.hashes):
+            yield int(locator[n * 8:(n + 1) * 8], 16) % self.size
+
+    def add(self, locator):
+        """
+        Add a locator.
+        :param locator: A catalog locator.
+        :type locator: str
+        """
+        for position in self._positions(locator):
+            self._bits[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, locator):
+        for position in self._positions(locator):
+            if not self._bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+class CatalogCache(object):
+    """
+    The per-process catalog cache used by ContentCatalogManager.find_many().
+    Contains a least recently used cache of entries keyed by locator.  Cached
+    entries are dropped when the first of them expires.  The (optional) filter
+    contains the locators of all catalog entries when it was built and is used
+    to answer lookups for units not in the catalog without a query.
+    The filter is only used while the catalog generation is the one it was
+    built for.  Entries added to the catalog by other processes during a
+    refresh are not seen until the refresh increments the generation.
+    In that case the content is downloaded from the primary source.
+    :ivar max_size: The maximum number of cached locators.
+    :type max_size: int
+    :ivar filter: The filter of locators in the catalog.
+    :type filter: BloomFilter
+    :ivar generation: The catalog generation when the filter was built.
+    :type generation: int
+    """
+
+    def __init__(self, max_size=100000):
+        """
+        :param max_size: The maximum number of cached locators.
+        :type max_size: int
+        """
+        self._mutex = RLock()
+        self._entries = OrderedDict()
+        self.max_size = max_size
+        self.filter = None
+        self.generation = None
+
+    def get(self, locator, now):
+        """
+        Get the cached entries for the specified locator.
+        :param locator: A catalog locator.
+        :type locator: str
+        :param now: The current UTC timestamp.
+        :type now: int
+        :return: The list of entries or None when not cached.
+        :rtype: list
+        """
+        with self._mutex:
+            if self.filter is not None and locator not in self.filter:
+                return []
+            try:
+                expiration, entries = self._entries.pop(locator)
+            except KeyError:
+                return None
+            if expiration is not None and expiration < now:
+                return None
+            self._entries[locator] = (expiration, entries)
+            return entries
+
+    def put(self, locator, entries):
+        """
+        Cache the entries found for the specified locator.
+        :param locator: A catalog locator.
+        :type locator: str
+        :param entries: The list of entries.
+        :type entries: list
+        """
+        if entries:
+            expiration = min(e['expiration'] for e in entries)
+        else:
+            if self.filter is None:
+                # without the filter, a unit added to the catalog would never be seen
+                return
+            expiration = None
+        with self._mutex:
+            self._entries.pop(locator, None)
+            self._entries[locator] = (expiration, entries)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def added(self, locator):
+        """
+        Notification that an entry has been added to the catalog.
+        :param locator: A catalog locator.
+        :type locator: str
+        """
+        with self._mutex:
+            self._entries.pop(locator, None)
+            if self.filter is not None:
+                self.filter.add(locator)
+
+    def deleted(self, locator):
+        """
+        Notification that entries have been deleted from the catalog.
+        :param locator: A catalog locator.
+        :type locator: str
+        """
+        with self._mutex:
+            self._entries.pop(locator, None)
+
+    def validate(self, generation):
+        """
+        Clear the cache and drop the filter when the filter was built
+        for a catalog generation other than the specified one.
+        :param generation: The current catalog generation.
+        :type generation: int
+        """
+        with self._mutex:
+            if self.filter is not None and self.generation != generation:
+                self.clear()
+
+    def rebuild(self, locators, generation):
+        """
+        Clear the cache and rebuild the filter.
+        :param locators: The locators of all entries in the catalog.
+        :type locators: collections.Sized
+        :param generation: The catalog generation read before the locators.
+        :type generation: int
+        """
+        bloom = BloomFilter(len(locators))
+        for locator in locators:
+            bloom.add(locator)
+        with self._mutex:
+            self._entries = OrderedDict()
+            self.filter = bloom
+            self.generation = generation
+
+    def clear(self):
+        """
+        Clear the cache and drop the filter.
+        """
+        with self._mutex:
+            self._entries = OrderedDict()
+            self.filter = None
+            self.generation = None
+
+
+# The per-process catalog cache.
+CACHE = CatalogCache()
@@ -1,10 +1,17 @@
 import uuid
 
+from pymongo.errors import BulkWriteError
+
 from pulp.common import dateutils
 from pulp.plugins.types import database as content_types_db
 from pulp.server.exceptions import InvalidValue
 
 
+# Number of times save_content_units attempts the bulk write when units are
+# added concurrently by another workflow
+SAVE_CONTENT_UNITS_ATTEMPTS = 3
+
+
 class ContentManager(object):
     """
     Create, update and delete operations for content in pulp.
@@ -49,6 +56,108 @@ class ContentManager(object):
         collection = content_types_db.type_units_collection(content_type)
         collection.update({'_id': unit_id}, {'$set': unit_metadata_delta}, safe=True)
 
+    def save_content_units(self, content_type, units):
+        """
+        Add or update content units using one query to find the units that
+        already exist and one bulk write. Units are matched to the stored units
+        by unit key; the metadata of a unit that already exists is updated.
+        If a unit is added by another workflow before the write completes, it
+        is updated instead; the write is attempted up to
+        SAVE_CONTENT_UNITS_ATTEMPTS times.
+        @param content_type: unique id of content collection
+        @type content_type: str
+        @param units: list of (unit_key, unit_metadata) tuples; all units must
+                      have the same unit key fields
+        @type units: list of (dict, dict)
+        @return: list of (unit_id, created) tuples in the order of units, where
+                 created is True if the unit was added
+        @rtype: list of (str, bool)
+        """
+        collection = content_types_db.type_units_collection(content_type)
+        for attempt in range(1, SAVE_CONTENT_UNITS_ATTEMPTS + 1):
+            try:
+                return self._save_content_units(collection, content_type, units)
+            except BulkWriteError, e:
+                # A unit was added by another workflow after it was looked up,
+                # it is updated on the next attempt.
+                if attempt == SAVE_CONTENT_UNITS_ATTEMPTS or \
+                        any(error['code'] != 11000 for error in e.details['writeErrors']):
+                    raise
+
+    @staticmethod
+    def _save_content_units(collection, content_type, units):
+        """
+        Single attempt of save_content_units.
+        """
+        keys = [tuple(sorted(unit_key.items())) for unit_key, metadata in units]
+        existing = ContentManager._content_unit_ids(collection, keys)
+        last_updated = dateutils.now_utc_timestamp()
+
+        # The same unit may be passed more than once, the last metadata wins
+        documents = {}
+        for key, (unit_key, metadata) in zip(keys, units):
+            document = documents.setdefault(key, {})
+            document.update(metadata)
+            document.update(unit_key)
+            document['_last_updated'] = last_updated
+
+        added = {}
+        bulk = collection.initialize_unordered_bulk_op()
+        for key, document in documents.items():
+            unit_id = existing.get(key)
+            if unit_id is not None:
+                bulk.find({'_id': unit_id}).update_one({'$set': document})
+                continue
+            unit_id = str(uuid.uuid4())
+            added[key] = unit_id
+            inserted = {'_id': unit_id, '_content_type_id': content_type}
+            bulk.find(dict(key)).upsert().update_one({'$set': document,
+                                                      '$setOnInsert': inserted})
+        if documents:
+            result = bulk.execute()
+            if result['nUpserted'] < len(added):
+                # Added by another workflow after the lookup, so it was updated
+                # and the generated ID was not used.
+                upserted = set(u['_id'] for u in result['upserted'])
+                missed = [key for key, added_id in added.items() if added_id not in upserted]
+                existing.update(ContentManager._content_unit_ids(collection, missed))
+                for key in missed:
+                    del added[key]
+
+        saved = []
+        for key in keys:
+            if key in added:
+                # Only the first occurrence of a unit is reported as created
+                unit_id = added.pop(key)
+                existing[key] = unit_id
+                saved.append((unit_id, True))
+            else:
+                saved.append((existing[key], False))
+        return saved
+
+    @staticmethod
+    def _content_unit_ids(collection, keys):
+        """
+        Find the IDs of stored content units.
+        @param collection: the collection for the content type
+        @type collection: pymongo.collection.Collection
+        @param keys: unit keys as sorted tuples of (field, value)
+        @type keys: list of tuple
+        @return: unit IDs keyed by unit key
+        @rtype: dict
+        """
+        if not keys:
+            return {}
+        fields = set(['_id'])
+        for key in keys:
+            fields.update(field for field, value in key)
+        ids = {}
+        spec = {'$or': [dict(key) for key in set(keys)]}
+        for document in collection.find(spec, fields=list(fields)):
+            unit_id = document.pop('_id')
+            ids[tuple(sorted(document.items()))] = unit_id
+        return ids
+
     def remove_content_unit(self, content_type, unit_id):
         """
         Remove a content unit and its metadata from the corresponding pulp db
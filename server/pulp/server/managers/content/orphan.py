@@ -16,17 +16,26 @@ import os
 import re
 import shutil
 from gettext import gettext as _
+from multiprocessing.pool import ThreadPool
 
 from celery import task
 
 from pulp.plugins.types import database as content_types_db
 from pulp.server import config as pulp_config, exceptions as pulp_exceptions
-from pulp.server.async.tasks import Task
+from pulp.server.async.task_status_manager import TaskStatusManager
+from pulp.server.async.tasks import Task, get_current_task_id
 from pulp.server.db.model.repository import RepoContentUnit
+from pulp.server.managers.content.refcount import ContentRefcountManager
 
 
 logger = logging.getLogger(__name__)
 
+# The number of content units checked, and deleted, with each query
+ORPHAN_PAGE_SIZE = 1000
+
+# The number of threads deleting the files of orphaned content units
+FILE_DELETE_WORKERS = 8
+
 
 class OrphanManager(object):
 
@@ -47,14 +56,21 @@ class OrphanManager(object):
         """
         Generate a count of the orphans of a given content type.
 
+        When reference counts are enabled, this is an indexed count of the units
+        whose reference count is 0.
+
         :param content_type_id: unique id of the content type to count orphans of
         :type content_type_id: basestring
         :return: count of orphaned units of the given type
         :rtype: int
         """
+        if ContentRefcountManager.enabled():
+            collection = content_types_db.type_units_collection(content_type_id)
+            return collection.find(ContentRefcountManager.orphan_spec()).count()
+
         count = 0
-        for unit in OrphanManager.generate_orphans_by_type(content_type_id):
-            count += 1
+        for orphans in OrphanManager._generate_orphan_pages(content_type_id, ['_id']):
+            count += len(orphans)
         return count
 
     def generate_all_orphans(self, fields=None):
@@ -105,18 +121,70 @@ class OrphanManager(object):
         """
 
         fields = fields if fields is not None else ['_id']
+
+        for orphans in OrphanManager._generate_orphan_pages(content_type_id, fields):
+            for content_unit in orphans:
+                yield content_unit
+
+    @staticmethod
+    def _generate_orphan_pages(content_type_id, fields, content_unit_ids=None):
+        """
+        Return a generator of pages of orphaned content units of the given content type.
+
+        The content units are read in pages sorted by `_id` and each page is
+        checked against the associated content units with one query, so no
+        cursor is held open between pages. When reference counts are enabled,
+        only the units whose reference count is 0 are read; they are still
+        checked against the associations so that a wrong count never causes
+        an associated unit to be deleted. The `_id` field is always present.
+
+        :param content_type_id: id of the content type
+        :type content_type_id: basestring
+        :param fields: list of fields to include in each content unit
+        :type fields: list
+        :param content_unit_ids: ids of the only content units to consider; None means all
+        :type content_unit_ids: iterable or None
+        :return: generator of lists of orphaned content units
+        :rtype: generator
+        """
+
+        fields = list(set(fields) | set(['_id']))
         content_units_collection = content_types_db.type_units_collection(content_type_id)
         repo_content_units_collection = RepoContentUnit.get_collection()
 
-        for content_unit in content_units_collection.find({}, fields=fields):
-
-            repo_content_units_cursor = repo_content_units_collection.find(
-                {'unit_id': content_unit['_id']})
+        if content_unit_ids is not None:
+            content_unit_ids = sorted(set(content_unit_ids))
 
-            if repo_content_units_cursor.count() > 0:
-                continue
+        orphan_spec = {}
+        if ContentRefcountManager.enabled():
+            orphan_spec = ContentRefcountManager.orphan_spec()
 
-            yield content_unit
+        last_id = None
+        while True:
+            spec = dict(orphan_spec)
+            if content_unit_ids is not None:
+                page_ids = content_unit_ids[:ORPHAN_PAGE_SIZE]
+                if not page_ids:
+                    return
+                del content_unit_ids[:ORPHAN_PAGE_SIZE]
+                spec['_id'] = {'$in': page_ids}
+                content_units = list(content_units_collection.find(spec, fields=fields))
+            else:
+                if last_id is not None:
+                    spec['_id'] = {'$gt': last_id}
+                cursor = content_units_collection.find(spec, fields=fields)
+                content_units = list(cursor.sort('_id').limit(ORPHAN_PAGE_SIZE))
+                if not content_units:
+                    return
+                last_id = content_units[-1]['_id']
+
+            unit_ids = [content_unit['_id'] for content_unit in content_units]
+            associated_ids = set(repo_content_units_collection.find(
+                {'unit_id': {'$in': unit_ids}}).distinct('unit_id'))
+
+            orphans = [u for u in content_units if u['_id'] not in associated_ids]
+            if orphans:
+                yield orphans
 
     @staticmethod
     def generate_orphans_by_type_with_unit_keys(content_type_id):
@@ -155,12 +223,9 @@ class OrphanManager(object):
                                  given content type and unit id
         """
 
-        for content_unit in OrphanManager.generate_orphans_by_type(content_type_id):
-
-            if content_unit['_id'] != content_unit_id:
-                continue
-
-            return content_unit
+        for orphans in OrphanManager._generate_orphan_pages(content_type_id, ['_id'],
+                                                            [content_unit_id]):
+            return orphans[0]
 
         raise pulp_exceptions.MissingResource(content_type=content_type_id,
                                               content_unit=content_unit_id)
@@ -210,6 +275,11 @@ class OrphanManager(object):
 
         NOTE: this method deletes the content unit's bits from disk, if applicable.
 
+        The orphans are deleted in pages of ORPHAN_PAGE_SIZE units; the files of
+        each page are deleted by a pool of FILE_DELETE_WORKERS threads and the
+        number of units deleted so far is reported in the progress report of
+        the current task under orphans.<content_type_id>.
+
         :param content_type_id: id of the content type
         :type content_type_id: basestring
         :param content_unit_ids: list of content unit ids to delete; None means delete them all
@@ -217,18 +287,65 @@ class OrphanManager(object):
         """
 
         content_units_collection = content_types_db.type_units_collection(content_type_id)
+        pool = ThreadPool(FILE_DELETE_WORKERS)
+        deleted = 0
 
-        for content_unit in OrphanManager.generate_orphans_by_type(content_type_id,
-                                                                   fields=['_id', '_storage_path']):
+        try:
+            for orphans in OrphanManager._generate_orphan_pages(
+                    content_type_id, ['_id', '_storage_path'], content_unit_ids):
 
-            if content_unit_ids is not None and content_unit['_id'] not in content_unit_ids:
-                continue
+                orphan_ids = [content_unit['_id'] for content_unit in orphans]
+                content_units_collection.remove({'_id': {'$in': orphan_ids}}, safe=True)
 
-            content_units_collection.remove(content_unit['_id'], safe=False)
+                storage_paths = [content_unit['_storage_path'] for content_unit in orphans
+                                 if content_unit.get('_storage_path') is not None]
+                OrphanManager.delete_orphaned_files(storage_paths, pool)
 
-            storage_path = content_unit.get('_storage_path', None)
-            if storage_path is not None:
-                OrphanManager.delete_orphaned_file(storage_path)
+                deleted += len(orphans)
+                OrphanManager._report_progress(content_type_id, deleted)
+        finally:
+            pool.close()
+            pool.join()
+
+    @staticmethod
+    def _report_progress(content_type_id, deleted):
+        """
+        Record the number of orphaned content units of the given type deleted so
+        far in the progress report of the current task, if there is one.
+
+        :param content_type_id: id of the content type
+        :type content_type_id: basestring
+        :param deleted: number of orphaned content units deleted
+        :type deleted: int
+        """
+        logger.info(_('Deleted %(n)d orphaned units of type %(t)s') %
+                    {'n': deleted, 't': content_type_id})
+
+        task_id = get_current_task_id()
+        if task_id is None:
+            return
+        TaskStatusManager.set_task_progress(task_id,
+                                            {'orphans.%s' % content_type_id: {'deleted': deleted}})
+
+    @staticmethod
+    def delete_orphaned_files(paths, pool):
+        """
+        Delete orphaned files using the given pool of threads. Links into
+        shared storage are deleted one at a time as deciding whether the shared
+        content is still used must not race with deleting its other links.
+
+        :param paths: absolute paths of the files to delete
+        :type paths: list of str
+        :param pool: pool of threads to delete the files with
+        :type pool: multiprocessing.pool.ThreadPool
+        """
+        storage_dir = pulp_config.config.get('server', 'storage_dir')
+        shared = set(p for p in paths if OrphanManager.is_shared(storage_dir, p))
+        unshared = [p for p in paths if p not in shared]
+
+        pool.map(OrphanManager.delete_orphaned_file, unshared)
+        for path in shared:
+            OrphanManager.delete_orphaned_file(path)
 
     @staticmethod
     def delete_orphaned_file(path):
@@ -257,12 +374,16 @@ class OrphanManager(object):
             path = os.path.dirname(path)
             if root_content_regex.match(path):
                 break
-            contents = os.listdir(path)
-            if contents:
-                break
-            if not os.access(path, os.W_OK):
+            try:
+                contents = os.listdir(path)
+                if contents:
+                    break
+                if not os.access(path, os.W_OK):
+                    break
+                os.rmdir(path)
+            except OSError:
+                # deleted, or filled, by another thread deleting a sibling
                 break
-            os.rmdir(path)
 
     @staticmethod
     def is_shared(storage_dir, path):
@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2014 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Maintains the number of repositories each content unit is associated with.
+
+When [server] unit_refcounts is enabled, each content unit document carries
+the number of repositories it is associated with in its REFCOUNT field,
+kept up to date by the repo unit association manager and by repository
+deletion. Units without the field have never been associated. Orphans can
+then be found with an indexed query instead of checking every unit against
+the associations.
+
+Counts are only maintained while the option is enabled, so the counts must be
+recomputed with pulp-manage-db --repair-refcounts whenever it is turned on.
+"""
+
+import logging
+from gettext import gettext as _
+
+from pulp.plugins.types import database as content_types_db
+from pulp.plugins.util import misc
+from pulp.server import config as pulp_config
+from pulp.server.db.model.repository import RepoContentUnit
+
+
+logger = logging.getLogger(__name__)
+
+# The field of each content unit holding the number of repositories it is associated with
+REFCOUNT = '_refcount'
+
+# The number of content units counted, or updated, with each query
+REFCOUNT_PAGE_SIZE = 1000
+
+
+class ContentRefcountManager(object):
+    """
+    Maintains and verifies the repository reference counts of content units.
+    """
+
+    @staticmethod
+    def enabled():
+        """
+        :return: True if reference counts are maintained and used to find orphans
+        :rtype:  bool
+        """
+        return pulp_config.config.getboolean('server', 'unit_refcounts')
+
+    @staticmethod
+    def orphan_spec():
+        """
+        :return: query matching the content units not associated with any repository
+        :rtype:  dict
+        """
+        # None also matches the units that have never been associated
+        return {REFCOUNT: {'$in': [0, None]}}
+
+    @staticmethod
+    def ensure_index(content_type_id):
+        """
+        Ensure the units of the given type are indexed by their reference count.
+
+        :param content_type_id: id of the content type
+        :type  content_type_id: basestring
+        """
+        collection = content_types_db.type_units_collection(content_type_id)
+        collection.ensure_index(REFCOUNT, background=True)
+
+    @staticmethod
+    def update_refcounts(content_type_id, unit_ids, delta):
+        """
+        Atomically change the reference counts of the given units, if reference
+        counts are enabled.
+
+        :param content_type_id: id of the content type
+        :type  content_type_id: basestring
+        :param unit_ids: ids of the units whose reference counts change
+        :type  unit_ids: iterable of str
+        :param delta: amount by which to change each reference count
+        :type  delta: int
+        """
+        if not delta or not ContentRefcountManager.enabled():
+            return
+        collection = content_types_db.type_units_collection(content_type_id)
+        for page in misc.paginate(unit_ids, REFCOUNT_PAGE_SIZE):
+            collection.update({'_id': {'$in': list(page)}}, {'$inc': {REFCOUNT: delta}},
+                              multi=True, safe=True)
+
+    @staticmethod
+    def repo_removed(repo_id):
+        """
+        Decrement the reference counts of the units associated with a repository
+        that is being deleted, if reference counts are enabled. This must be
+        called before the associations are removed.
+
+        :param repo_id: identifies the repo
+        :type  repo_id: str
+        """
+        if not ContentRefcountManager.enabled():
+            return
+        collection = RepoContentUnit.get_collection()
+        for content_type_id in collection.find({'repo_id': repo_id}).distinct('unit_type_id'):
+            spec = {'repo_id': repo_id, 'unit_type_id': content_type_id}
+            cursor = collection.find(spec, fields=['unit_id']).sort('unit_id')
+            ContentRefcountManager.update_refcounts(
+                content_type_id, _unique(a['unit_id'] for a in cursor), -1)
+
+    @staticmethod
+    def verify_refcounts(content_type_id, repair=False):
+        """
+        Recompute the reference counts of all units of the given type from the
+        repository associations and compare them to the stored counts.
+
+        The counts must not be repaired while associations are being changed,
+        so this should only be run while Pulp's services are stopped.
+
+        :param content_type_id: id of the content type
+        :type  content_type_id: basestring
+        :param repair: if True, store the recomputed counts of the units whose counts differ
+        :type  repair: bool
+        :return: the number of units whose stored count differed from the recomputed one
+        :rtype:  int
+        """
+        units_collection = content_types_db.type_units_collection(content_type_id)
+        associations_collection = RepoContentUnit.get_collection()
+        if repair:
+            ContentRefcountManager.ensure_index(content_type_id)
+
+        mismatched = 0
+        last_id = None
+        while True:
+            spec = {} if last_id is None else {'_id': {'$gt': last_id}}
+            cursor = units_collection.find(spec, fields=['_id', REFCOUNT])
+            units = list(cursor.sort('_id').limit(REFCOUNT_PAGE_SIZE))
+            if not units:
+                return mismatched
+            last_id = units[-1]['_id']
+
+            repos = dict((unit['_id'], set()) for unit in units)
+            associations = associations_collection.find({'unit_id': {'$in': list(repos)}},
+                                                        fields=['unit_id', 'repo_id'])
+            for association in associations:
+                repos[association['unit_id']].add(association['repo_id'])
+
+            # maps the correct count to the ids of the units stored with another count
+            corrections = {}
+            for unit in units:
+                count = len(repos[unit['_id']])
+                if unit.get(REFCOUNT, 0) != count:
+                    corrections.setdefault(count, []).append(unit['_id'])
+                    mismatched += 1
+
+            if corrections:
+                logger.info(_('Found %(n)d units of type %(t)s with incorrect reference counts') %
+                            {'n': sum(len(ids) for ids in corrections.values()),
+                             't': content_type_id})
+            if not repair:
+                continue
+            for count, unit_ids in corrections.items():
+                units_collection.update({'_id': {'$in': unit_ids}}, {'$set': {REFCOUNT: count}},
+                                        multi=True, safe=True)
+
+
+def _unique(sorted_ids):
+    """
+    :param sorted_ids: sorted ids that may contain duplicates
+    :type  sorted_ids: iterable
+    :return: generator of the ids without duplicates
+    :rtype:  generator
+    """
+    previous = None
+    for unit_id in sorted_ids:
+        if unit_id != previous:
+            yield unit_id
+        previous = unit_id
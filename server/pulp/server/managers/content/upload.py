@@ -10,27 +10,46 @@
 # NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+from collections import OrderedDict
+from contextlib import contextmanager
 from celery import task
 from gettext import gettext as _
 from uuid import uuid4
+import errno
+import fcntl
+import hashlib
+import json
 import logging
 import os
 import sys
 
+from pulp.common.util import add_range
 from pulp.plugins.conduits.upload import UploadConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api, exceptions as plugin_exceptions
+from pulp.plugins.util.verification import CHECKSUM_FUNCTIONS
 from pulp.server import config as pulp_config
 from pulp.server.async.tasks import Task
 from pulp.server.db.model.repository import RepoContentUnit
 from pulp.server.exceptions import (PulpDataException, MissingResource, PulpExecutionException,
-                                    PulpException)
+                                    PulpException, InvalidValue)
 import pulp.server.managers.factory as manager_factory
 import pulp.server.managers.repo._common as repo_common_utils
 
 
 logger = logging.getLogger(__name__)
 
+# Checksum calculated while the bits of an upload are received
+UPLOAD_CHECKSUM_TYPE = 'sha256'
+UPLOAD_STATE_SUFFIX = '.state'
+READ_CHUNK_SIZE = 1048576
+
+# Uploads for which this process holds the running digest of the received contiguous data,
+# upload_id -> (offset, digest). Hash objects cannot be stored, so only the process that last
+# extended the digest of an upload can extend it further.
+_upload_digests = OrderedDict()
+MAX_UPLOAD_DIGESTS = 100
+
 
 class ContentUploadManager(object):
     def initialize_upload(self):
@@ -59,6 +78,10 @@ class ContentUploadManager(object):
         f = open(file_path, 'w')
         f.close()
 
+        f = open(ContentUploadManager._upload_state_path(upload_id), 'w')
+        json.dump(ContentUploadManager._initial_upload_state(), f)
+        f.close()
+
         return upload_id
 
     def save_data(self, upload_id, offset, data):
@@ -68,6 +91,10 @@ class ContentUploadManager(object):
         to retrieve the upload_id value and perform any steps necessary before
         bits can be saved.
 
+        Segments may be saved in any order and concurrently. The ranges received
+        are recorded with the upload, and the checksum of the upload is extended
+        whenever the data received from the start of the file grows.
+
         @param upload_id: upload request ID
         @type  upload_id: str
 
@@ -89,6 +116,155 @@ class ContentUploadManager(object):
         f.write(data)
         f.close()
 
+        self._record_segment(upload_id, offset, data)
+
+    def get_upload_state(self, upload_id):
+        """
+        Returns what is known about the data received for an upload request.
+
+        @param upload_id: upload request ID
+        @type  upload_id: str
+
+        @return: dict with the sorted list of [start, end] byte ranges received
+                 under "ranges", the number of contiguous bytes from the start of
+                 the file that have been hashed under "hashed" and the checksum
+                 of those bytes under "checksum"
+        @rtype:  dict
+        """
+        try:
+            f = open(ContentUploadManager._upload_state_path(upload_id))
+        except IOError, e:
+            if e.errno != errno.ENOENT:
+                raise
+            # Uploads initialized before their state was recorded
+            return ContentUploadManager._initial_upload_state()
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+            return ContentUploadManager._read_upload_state(f)
+        finally:
+            f.close()
+
+    def _record_segment(self, upload_id, offset, data):
+        """
+        Adds a newly written segment to the state of the upload and extends the
+        checksum of the upload if the segment makes more of the file contiguous.
+
+        The state file is locked for the duration, which serializes segments of
+        the same upload being saved by different threads and processes.
+
+        @param upload_id: upload request ID
+        @type  upload_id: str
+        @param offset: position in the file the segment was written at
+        @type  offset: int
+        @param data: content of the segment
+        @type  data: str
+        """
+        with ContentUploadManager._locked_upload_state(upload_id) as state:
+            state['ranges'] = add_range(state['ranges'], offset, offset + len(data))
+            self._update_checksum(upload_id, state, offset, data)
+
+    def _update_checksum(self, upload_id, state, offset, data):
+        """
+        Extends the checksum in the upload state over any data that is now
+        contiguous with the part of the file already hashed.
+
+        This is only possible in the process holding the digest of that part of
+        the file. Other processes leave the checksum as it is. If nothing is
+        able to extend it, it will not cover the whole file and the file is
+        hashed when it is imported instead.
+
+        @param upload_id: upload request ID
+        @type  upload_id: str
+        @param state: upload state, updated in place
+        @type  state: dict
+        @param offset: position in the file the segment was written at
+        @type  offset: int
+        @param data: content of the segment
+        @type  data: str
+        """
+        hashed = state['hashed']
+        first_start, contiguous_end = state['ranges'][0]
+        if first_start != 0 or contiguous_end <= hashed:
+            return
+
+        position, digest = _upload_digests.pop(upload_id, (None, None))
+        if hashed == 0:
+            position, digest = 0, hashlib.new(UPLOAD_CHECKSUM_TYPE)
+        elif position != hashed:
+            return
+
+        # The data being saved is still in memory, anything after it was saved earlier
+        if offset <= position < offset + len(data):
+            digest.update(buffer(data, position - offset))
+            position = offset + len(data)
+        if position < contiguous_end:
+            f = open(ContentUploadManager._upload_file_path(upload_id), 'rb')
+            try:
+                f.seek(position)
+                while position < contiguous_end:
+                    chunk = f.read(min(READ_CHUNK_SIZE, contiguous_end - position))
+                    digest.update(chunk)
+                    position += len(chunk)
+            finally:
+                f.close()
+
+        _upload_digests[upload_id] = (position, digest)
+        while len(_upload_digests) > MAX_UPLOAD_DIGESTS:
+            _upload_digests.popitem(last=False)
+
+        state['hashed'] = position
+        state['checksum'] = digest.hexdigest()
+
+    def find_existing_unit(self, upload_id, unit_type_id, unit_key, checksum_type, checksum):
+        """
+        Checks whether the unit being uploaded is already in the server's content
+        storage. If it is, the unit is recorded with the upload request and
+        importing the upload associates that unit with the repository, so its
+        bits do not need to be uploaded. The unit type and key are recorded
+        too, and the unit is only used by an import for the same type and key.
+
+        A unit only counts as present if a unit with the given key exists, it
+        records a checksum of the given type that matches, and its file is in
+        content storage.
+
+        @param upload_id: upload request ID
+        @type  upload_id: str
+
+        @param unit_type_id: type of unit being uploaded
+        @type  unit_type_id: str
+
+        @param unit_key: unique identifier for the unit
+        @type  unit_key: dict
+
+        @param checksum_type: type of the checksum, such as "sha256"
+        @type  checksum_type: str
+
+        @param checksum: hex digest of the file being uploaded
+        @type  checksum: str
+
+        @return: ID of the existing unit or None if it is not present
+        @rtype:  str or None
+        """
+        if not os.path.exists(ContentUploadManager._upload_file_path(upload_id)):
+            raise MissingResource(upload_request=upload_id)
+
+        query_manager = manager_factory.content_query_manager()
+        try:
+            units = query_manager.get_multiple_units_by_keys_dicts(unit_type_id, (unit_key,))
+        except ValueError:
+            raise InvalidValue(['unit_key'])
+
+        unit_id = None
+        if units and ContentUploadManager._unit_has_bits(units[0], checksum_type, checksum):
+            unit_id = units[0]['_id']
+
+        with ContentUploadManager._locked_upload_state(upload_id) as state:
+            state['existing_unit_id'] = unit_id
+            state['existing_unit_type_id'] = unit_type_id
+            state['existing_unit_key'] = unit_key
+
+        return unit_id
+
     def delete_upload(self, upload_id):
         """
         Deletes all files associated with the given upload request. If the
@@ -99,10 +275,16 @@ class ContentUploadManager(object):
         @type  upload_id: str
         """
 
+        _upload_digests.pop(upload_id, None)
+
         file_path = ContentUploadManager._upload_file_path(upload_id)
         if os.path.exists(file_path):
             os.remove(file_path)
 
+        state_path = ContentUploadManager._upload_state_path(upload_id)
+        if os.path.exists(state_path):
+            os.remove(state_path)
+
     def read_upload(self, upload_id):
         """
         Utility method for reading and returning the contents of an upload
@@ -135,7 +317,7 @@ class ContentUploadManager(object):
         @rtype:  list
         """
         upload_dir = ContentUploadManager._upload_storage_dir()
-        upload_ids = os.listdir(upload_dir)
+        upload_ids = [f for f in os.listdir(upload_dir) if not f.endswith(UPLOAD_STATE_SUFFIX)]
         return upload_ids
 
     @staticmethod
@@ -207,9 +389,28 @@ class ContentUploadManager(object):
         except plugin_exceptions.PluginNotFound:
             raise MissingResource(repo_id), None, sys.exc_info()[2]
 
+        file_path = ContentUploadManager._upload_file_path(upload_id)
+        state = manager_factory.content_upload_manager().get_upload_state(upload_id)
+        owner_id = manager_factory.principal_manager().get_principal()['login']
+
+        # The unit is already in content storage and its bits were not uploaded. The existing
+        # unit is only used if it was found for the unit being imported.
+        if state.get('existing_unit_id') and not state['ranges'] and \
+                state['existing_unit_type_id'] == unit_type_id and \
+                state['existing_unit_key'] == unit_key:
+            return ContentUploadManager._associate_existing_unit(
+                repo_id, unit_type_id, state['existing_unit_id'], owner_id)
+
+        # The checksum calculated while the bits were received is only passed on if it covers
+        # the whole file
+        checksums = {}
+        if os.path.exists(file_path):
+            if state['checksum'] and state['hashed'] == os.path.getsize(file_path):
+                checksums[UPLOAD_CHECKSUM_TYPE] = state['checksum']
+
         # Assemble the data needed for the import
         conduit = UploadConduit(repo_id, repo_importer['id'], RepoContentUnit.OWNER_TYPE_USER,
-                                manager_factory.principal_manager().get_principal()['login'])
+                                owner_id, checksums=checksums)
 
         call_config = PluginCallConfiguration(plugin_config, repo_importer['config'],
                                               override_config)
@@ -217,8 +418,6 @@ class ContentUploadManager(object):
         transfer_repo.working_dir = repo_common_utils.importer_working_dir(
             repo_importer['importer_type_id'], repo_id, mkdir=True)
 
-        file_path = ContentUploadManager._upload_file_path(upload_id)
-
         # Invoke the importer
         try:
             return importer_instance.upload_unit(transfer_repo, unit_type_id, unit_key,
@@ -236,6 +435,61 @@ class ContentUploadManager(object):
 
         # TODO: Add support for tracking the report as a history entry on the repo
 
+    @staticmethod
+    def _associate_existing_unit(repo_id, unit_type_id, unit_id, owner_id):
+        """
+        Associates a unit already in content storage with the repository in
+        place of importing an uploaded file.
+
+        :param repo_id:      identifies the repository into which the unit is uploaded
+        :type  repo_id:      str
+        :param unit_type_id: type of unit being uploaded
+        :type  unit_type_id: str
+        :param unit_id:      ID of the existing unit
+        :type  unit_id:      str
+        :param owner_id:     login of the user uploading the unit
+        :type  owner_id:     str
+        :return:             report of the association, in the same form as the report
+                             returned for an upload handled by the importer
+        :rtype:              dict
+        """
+        spec = {'repo_id': repo_id, 'unit_type_id': unit_type_id, 'unit_id': unit_id}
+        if RepoContentUnit.get_collection().find_one(spec) is None:
+            association_manager = manager_factory.repo_unit_association_manager()
+            association_manager.associate_unit_by_id(repo_id, unit_type_id, unit_id,
+                                                     RepoContentUnit.OWNER_TYPE_USER, owner_id)
+
+        summary = _('Associated existing unit [%(u)s]') % {'u': unit_id}
+        return {'success_flag': True, 'summary': summary, 'details': {}}
+
+    @staticmethod
+    def _unit_has_bits(unit, checksum_type, checksum):
+        """
+        :param unit:          content unit as stored in the database
+        :type  unit:          dict
+        :param checksum_type: type of the checksum, such as "sha256"
+        :type  checksum_type: str
+        :param checksum:      hex digest of the file being uploaded
+        :type  checksum:      str
+        :return:              True if the unit records the given checksum and its file is in
+                              content storage
+        :rtype:               bool
+        """
+        storage_path = unit.get('_storage_path')
+        if not storage_path or not os.path.isfile(storage_path):
+            return False
+
+        unit_checksum = unit.get('checksum')
+        # Units that do not say what type of checksum they record use the upload default
+        unit_checksum_type = unit.get('checksumtype') or unit.get('checksum_type') or \
+            UPLOAD_CHECKSUM_TYPE
+        checksum_function = CHECKSUM_FUNCTIONS.get(checksum_type)
+        if not unit_checksum or checksum_function is None or \
+                CHECKSUM_FUNCTIONS.get(unit_checksum_type) is not checksum_function:
+            return False
+
+        return unit_checksum.lower() == checksum.lower()
+
     @staticmethod
     def _upload_file_path(upload_id):
         """
@@ -250,6 +504,64 @@ class ContentUploadManager(object):
         path = os.path.join(upload_storage_dir, upload_id)
         return path
 
+    @staticmethod
+    def _upload_state_path(upload_id):
+        """
+        Returns the full path to the file recording the state of the given upload.
+
+        :param upload_id: identifies the upload in question
+        :type  upload_id: str
+        :return:          full path on the server's filesystem
+        :rtype:           str
+        """
+        return ContentUploadManager._upload_file_path(upload_id) + UPLOAD_STATE_SUFFIX
+
+    @staticmethod
+    def _initial_upload_state():
+        """
+        :return: state of an upload that has not received any data
+        :rtype:  dict
+        """
+        return {'ranges': [], 'hashed': 0, 'checksum': None}
+
+    @staticmethod
+    @contextmanager
+    def _locked_upload_state(upload_id):
+        """
+        Locks the state file of an upload for the duration of the context,
+        which serializes updates made by different threads and processes, and
+        writes the state back once the context exits without an error.
+
+        :param upload_id: identifies the upload in question
+        :type  upload_id: str
+        :return:          context manager providing the upload state to update in place
+        """
+        state_path = ContentUploadManager._upload_state_path(upload_id)
+        f = os.fdopen(os.open(state_path, os.O_RDWR | os.O_CREAT, 0600), 'r+')
+        try:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            state = ContentUploadManager._read_upload_state(f)
+            yield state
+
+            f.seek(0)
+            f.truncate()
+            json.dump(state, f)
+        finally:
+            f.close()
+
+    @staticmethod
+    def _read_upload_state(state_file):
+        """
+        :param state_file: open upload state file
+        :type  state_file: file
+        :return:           upload state read from the file, or the initial state if it is empty
+        :rtype:            dict
+        """
+        content = state_file.read()
+        if not content:
+            return ContentUploadManager._initial_upload_state()
+        return json.loads(content)
+
     @staticmethod
     def _upload_storage_dir():
         """
@@ -22,6 +22,7 @@ from pulp.server.db.model.event import EventListener
 from pulp.server.exceptions import InvalidValue, MissingResource
 from pulp.server.event import notifiers
 from pulp.server.event.data import ALL_EVENT_TYPES
+from pulp.server.managers.event.fire import listener_cache
 
 # -- manager -----------------------------------------------------------------
 
@@ -71,6 +72,7 @@ class EventListenerManager(object):
         collection = EventListener.get_collection()
         created_id = collection.save(el, safe=True)
         created = collection.find_one(created_id)
+        listener_cache.invalidate()
 
         return created
 
@@ -116,6 +118,7 @@ class EventListenerManager(object):
         self.get(event_listener_id) # check for MissingResource
 
         collection.remove({'_id' : ObjectId(event_listener_id)})
+        listener_cache.invalidate()
 
     def update(self, event_listener_id, notifier_config=None, event_types=None):
         """
@@ -166,6 +169,7 @@ class EventListenerManager(object):
 
         # Update the database
         collection.save(existing, safe=True)
+        listener_cache.invalidate()
 
         # Reload to return
         existing = collection.find_one({'_id' : ObjectId(event_listener_id)})
@@ -19,6 +19,8 @@ in a consistent event format for that type.
 """
 
 import logging
+import threading
+import time
 
 from pulp.server.db.model.event import EventListener
 from pulp.server.event import notifiers
@@ -26,6 +28,49 @@ from pulp.server.event import data as e
 
 _LOG = logging.getLogger(__name__)
 
+# Number of seconds the event listeners are cached for. Listeners changed by
+# another process are not seen by this one until its cache expires.
+LISTENER_CACHE_TTL = 30
+
+
+class ListenerCache(object):
+    """
+    Per-process cache of the configured event listeners, so that firing an
+    event does not query the database for them each time.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = None
+        self._expiration = 0
+
+    def get(self, event_type):
+        """
+        @param event_type: type of the event being fired
+        @type  event_type: str
+
+        @return: the listeners of the given event type
+        @rtype:  list of dict
+        """
+        with self._lock:
+            if self._listeners is None or self._expiration < time.time():
+                self._listeners = list(EventListener.get_collection().find())
+                self._expiration = time.time() + LISTENER_CACHE_TTL
+            listeners = self._listeners
+        return [listener for listener in listeners
+                if event_type in listener['event_types'] or '*' in listener['event_types']]
+
+    def invalidate(self):
+        """
+        Drop the cached listeners so that they are read again on the next fire.
+        """
+        with self._lock:
+            self._listeners = None
+
+
+listener_cache = ListenerCache()
+
+
 class EventFireManager(object):
 
     # -- specific event fire methods ------------------------------------------
@@ -78,8 +123,7 @@ class EventFireManager(object):
         @type  event: pulp.server.event.data.Event
         """
         # Determine which listeners should be notified
-        listeners = list(EventListener.get_collection().find(
-            {'$or': ({'event_types' : event.event_type}, {'event_types' : '*'})}))
+        listeners = listener_cache.get(event.event_type)
 
         # For each listener, retrieve the notifier and invoke it. Be sure that
         # an exception from a notifier is logged but does not interrupt the
@@ -43,6 +43,7 @@ TYPE_CONTENT                    = 'content-manager'
 TYPE_CONTENT_CATALOG            = 'content-catalog-manager'
 TYPE_CONTENT_ORPHAN             = 'content-orphan-manager'
 TYPE_CONTENT_QUERY              = 'content-query-manager'
+TYPE_CONTENT_REFCOUNT           = 'content-refcount-manager'
 TYPE_CONTENT_UPLOAD             = 'content-upload-manager'
 TYPE_DEPENDENCY                 = 'dependencies-manager'
 TYPE_EVENT_FIRE                 = 'event-fire-manager'
@@ -212,6 +213,14 @@ def content_query_manager():
     """
     return get_manager(TYPE_CONTENT_QUERY)
 
+
+def content_refcount_manager():
+    """
+    @rtype: L{pulp.server.managers.content.refcount.ContentRefcountManager}
+    """
+    return get_manager(TYPE_CONTENT_REFCOUNT)
+
+
 def content_upload_manager():
     """
     @rtype: L{pulp.server.managers.content.upload.ContentUploadManager}
@@ -419,6 +428,7 @@ def initialize():
     from pulp.server.managers.content.catalog import ContentCatalogManager
     from pulp.server.managers.content.orphan import OrphanManager
     from pulp.server.managers.content.query import ContentQueryManager
+    from pulp.server.managers.content.refcount import ContentRefcountManager
     from pulp.server.managers.content.upload import ContentUploadManager
     from pulp.server.managers.event.crud import EventListenerManager
     from pulp.server.managers.event.fire import EventFireManager
@@ -462,6 +472,7 @@ def initialize():
         TYPE_CONTENT_CATALOG: ContentCatalogManager,
         TYPE_CONTENT_ORPHAN: OrphanManager,
         TYPE_CONTENT_QUERY: ContentQueryManager,
+        TYPE_CONTENT_REFCOUNT: ContentRefcountManager,
         TYPE_CONTENT_UPLOAD: ContentUploadManager,
         TYPE_DEPENDENCY: DependencyManager,
         TYPE_EVENT_FIRE: EventFireManager,
@@ -257,6 +257,7 @@ class RepoManager(object):
             RepoPublishResult.get_collection().remove({'repo_id': repo_id}, safe=True)
 
             # Remove all associations from the repo
+            manager_factory.content_refcount_manager().repo_removed(repo_id)
             RepoContentUnit.get_collection().remove({'repo_id': repo_id}, safe=True)
         except Exception, e:
             msg = _('Error updating one or more database collections while removing repo [%(r)s]')
@@ -12,6 +12,7 @@ import pymongo
 from pulp.plugins.conduits.unit_import import ImportUnitConduit
 from pulp.plugins.config import PluginCallConfiguration
 from pulp.plugins.loader import api as plugin_api
+from pulp.plugins.util import misc
 from pulp.server.async.tasks import Task
 from pulp.server.db.model.criteria import UnitAssociationCriteria
 from pulp.server.db.model.repository import RepoContentUnit
@@ -43,6 +44,9 @@ SORT_DESCENDING = pymongo.DESCENDING
 
 _VALID_DIRECTIONS = (SORT_ASCENDING, SORT_DESCENDING)
 
+# The number of units associated or unassociated with each bulk operation
+ASSOCIATION_PAGE_SIZE = 1000
+
 logger = logging.getLogger(__name__)
 
 
@@ -97,28 +101,13 @@ class RepoUnitAssociationManager(object):
         if owner_type not in _OWNER_TYPES:
             raise exceptions.InvalidValue(['owner_type'])
 
-        # If the association already exists, no need to do anything else
-        spec = {'repo_id': repo_id,
-                'unit_id': unit_id,
-                'unit_type_id': unit_type_id}
-        existing_association = RepoContentUnit.get_collection().find_one(spec)
-        if existing_association is not None:
-            return
-
-        similar_exists = False
-        if update_repo_metadata:
-            similar_exists = RepoUnitAssociationManager.association_exists(repo_id, unit_id,
-                                                                           unit_type_id)
-
-        # Create the database entry
-        association = RepoContentUnit(repo_id, unit_id, unit_type_id, owner_type, owner_id)
-        RepoContentUnit.get_collection().save(association, safe=True)
-
-        manager = manager_factory.repo_manager()
+        associated = RepoUnitAssociationManager._associate_units(
+            repo_id, unit_type_id, [unit_id], owner_type, owner_id)
 
         # update the count of associated units on the repo object
-        if update_repo_metadata and not similar_exists:
-            manager.update_unit_count(repo_id, unit_type_id, 1)
+        if update_repo_metadata and associated:
+            manager = manager_factory.repo_manager()
+            manager.update_unit_count(repo_id, unit_type_id, associated)
 
             # update the record for the last added field
             manager.update_last_unit_added(repo_id)
@@ -127,7 +116,10 @@ class RepoUnitAssociationManager(object):
         """
         Creates multiple associations between the given repo and content units.
 
-        See associate_unit_by_id for semantics.
+        See associate_unit_by_id for semantics. The units are associated in
+        pages; for each page, the units already associated are found with one
+        query and the new associations are written with one bulk operation.
+        The unit count of the repo is updated once at the end.
 
         @param repo_id: identifies the repo
         @type  repo_id: str
@@ -152,15 +144,13 @@ class RepoUnitAssociationManager(object):
         @raise InvalidType: if the given owner type is not of the valid enumeration
         """
 
-        # There may be a way to batch this in mongo which would be ideal for a
-        # bulk operation like this. But for deadline purposes, this call will
-        # simply loop and call the single method.
+        if owner_type not in _OWNER_TYPES:
+            raise exceptions.InvalidValue(['owner_type'])
 
         unique_count = 0
-        for unit_id in unit_id_list:
-            if not RepoUnitAssociationManager.association_exists(repo_id, unit_id, unit_type_id):
-                unique_count += 1
-            self.associate_unit_by_id(repo_id, unit_type_id, unit_id, owner_type, owner_id, False)
+        for page in misc.paginate(unit_id_list, ASSOCIATION_PAGE_SIZE):
+            unique_count += RepoUnitAssociationManager._associate_units(
+                repo_id, unit_type_id, page, owner_type, owner_id)
 
         # update the count of associated units on the repo object
         if unique_count:
@@ -370,25 +360,32 @@ class RepoUnitAssociationManager(object):
         if len(unassociate_units) == 0:
             return {}
 
-        unit_map = {}  # maps unit_type_id to a list of unit_ids
+        unit_map = {}  # maps unit_type_id to a set of unit_ids
 
         for unit in unassociate_units:
-            id_list = unit_map.setdefault(unit['unit_type_id'], [])
-            id_list.append(unit['unit_id'])
+            id_set = unit_map.setdefault(unit['unit_type_id'], set())
+            id_set.add(unit['unit_id'])
 
         collection = RepoContentUnit.get_collection()
         repo_manager = manager_factory.repo_manager()
+        refcount_manager = manager_factory.content_refcount_manager()
 
         for unit_type_id, unit_ids in unit_map.items():
-            spec = {'repo_id': repo_id,
-                    'unit_type_id': unit_type_id,
-                    'unit_id': {'$in': unit_ids}
-                    }
-            collection.remove(spec, safe=True)
-
-            unique_count = sum(
-                1 for unit_id in unit_ids if not RepoUnitAssociationManager.association_exists(
-                    repo_id, unit_id, unit_type_id))
+            unique_count = 0
+            for page in misc.paginate(unit_ids, ASSOCIATION_PAGE_SIZE):
+                spec = {'repo_id': repo_id,
+                        'unit_type_id': unit_type_id,
+                        'unit_id': {'$in': list(page)}
+                        }
+                collection.remove(spec, safe=True)
+
+                # units may still be associated through a concurrent association
+                remaining = RepoUnitAssociationManager._associated_unit_ids(
+                    repo_id, unit_type_id, page)
+                removed_ids = [unit_id for unit_id in page if unit_id not in remaining]
+                refcount_manager.update_refcounts(unit_type_id, removed_ids, -1)
+                unique_count += len(removed_ids)
+
             if not unique_count:
                 continue
 
@@ -409,6 +406,68 @@ class RepoUnitAssociationManager(object):
 
         return {'units_successful': serializable_units}
 
+    @staticmethod
+    def _associate_units(repo_id, unit_type_id, unit_ids, owner_type, owner_id):
+        """
+        Associates a batch of units of the same type with the given repo. The
+        units that are already associated, by any owner, are found with one
+        query and the rest are associated with one bulk operation. The unit
+        count of the repo is not updated; the reference counts of the newly
+        associated units are.
+
+        :param repo_id:      identifies the repo
+        :type  repo_id:      str
+        :param unit_type_id: identifies the type of the units
+        :type  unit_type_id: str
+        :param unit_ids:     unique identifiers of the units within the given type
+        :type  unit_ids:     iterable of str
+        :param owner_type:   category of the caller making the association
+        :type  owner_type:   str
+        :param owner_id:     identifies the caller making the association
+        :type  owner_id:     str
+        :return:             number of units newly associated with the repo
+        :rtype:              int
+        """
+        unit_ids = set(unit_ids)
+        unit_ids -= RepoUnitAssociationManager._associated_unit_ids(repo_id, unit_type_id,
+                                                                    unit_ids)
+        if not unit_ids:
+            return 0
+
+        unit_ids = list(unit_ids)
+        bulk = RepoContentUnit.get_collection().initialize_unordered_bulk_op()
+        for unit_id in unit_ids:
+            spec = {'repo_id': repo_id, 'unit_type_id': unit_type_id, 'unit_id': unit_id}
+            association = RepoContentUnit(repo_id, unit_id, unit_type_id, owner_type, owner_id)
+            inserted = dict((k, v) for k, v in association.items() if k not in spec)
+            # upserts so that units associated concurrently are neither
+            # associated twice nor counted
+            bulk.find(spec).upsert().update_one({'$setOnInsert': inserted})
+        result = bulk.execute()
+
+        associated_ids = [unit_ids[upserted['index']] for upserted in result['upserted']]
+        manager_factory.content_refcount_manager().update_refcounts(unit_type_id,
+                                                                    associated_ids, 1)
+        return result['nUpserted']
+
+    @staticmethod
+    def _associated_unit_ids(repo_id, unit_type_id, unit_ids):
+        """
+        :param repo_id:      identifies the repo
+        :type  repo_id:      str
+        :param unit_type_id: identifies the type of the units
+        :type  unit_type_id: str
+        :param unit_ids:     unique identifiers of the units within the given type
+        :type  unit_ids:     iterable of str
+        :return:             the subset of unit_ids associated with the repo, by any owner
+        :rtype:              set of str
+        """
+        spec = {'repo_id': repo_id,
+                'unit_type_id': unit_type_id,
+                'unit_id': {'$in': list(unit_ids)}}
+        associations = RepoContentUnit.get_collection().find(spec, fields=['unit_id'])
+        return set(association['unit_id'] for association in associations)
+
     @staticmethod
     def association_exists(repo_id, unit_id, unit_type_id):
         """
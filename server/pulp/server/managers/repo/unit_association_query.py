@@ -2,9 +2,12 @@
 Contains the manager class for performing queries for repo-unit associations.
 """
 
+import copy
+
 import pymongo
 
 from pulp.plugins.types import database as types_db
+from pulp.plugins.util import misc
 from pulp.server.db.model.criteria import UnitAssociationCriteria
 from pulp.server.db.model.repository import RepoContentUnit
 
@@ -23,6 +26,13 @@ SORT_DESCENDING = pymongo.DESCENDING
 
 _VALID_DIRECTIONS = (SORT_ASCENDING, SORT_DESCENDING)
 
+# Default number of associations resolved against the unit collections at a
+# time when streaming units
+DEFAULT_STREAM_BATCH_SIZE = 1000
+
+# Association order used when streaming without an explicit association sort
+_STREAM_DEFAULT_SORT = [('unit_type_id', SORT_ASCENDING), ('unit_id', SORT_ASCENDING)]
+
 
 class RepoUnitAssociationQueryManager(object):
 
@@ -91,11 +101,20 @@ class RepoUnitAssociationQueryManager(object):
         """
         return RepoContentUnit.get_collection().query(criteria)
 
-    def get_units(self, repo_id, criteria=None, as_generator=False):
+    def get_units(self, repo_id, criteria=None, as_generator=False, batch_size=None):
         """
         Get the units associated with the repository based on the provided unit
         association criteria.
 
+        If batch_size is specified, the units are streamed: associations are
+        read from the database batch_size at a time and each batch is resolved
+        against the unit collections before the next one is read, so memory
+        use does not grow with the size of the repository. Streamed units are
+        returned in association order; when no association sort is given they
+        are ordered by unit type and unit id. A unit sort cannot be honored
+        without loading every association, so criteria with a unit sort are
+        never streamed.
+
         :param repo_id: identifies the repository
         :type  repo_id: str
 
@@ -105,12 +124,24 @@ class RepoUnitAssociationQueryManager(object):
         :param as_generator: if true, return a generator; if false, a list
         :type  as_generator: bool
 
+        :param batch_size: if specified, stream the units resolving this many
+                           associations at a time
+        :type  batch_size: int or None
+
         :return: generator or list of units associated with the repo
         :rtype: generator or list
         """
 
         criteria = criteria or UnitAssociationCriteria()
 
+        if batch_size and not criteria.unit_sort:
+            units_generator = self._streamed_units(repo_id, criteria, batch_size)
+
+            if as_generator:
+                return units_generator
+
+            return list(units_generator)
+
         unit_associations_generator = self._unit_associations_cursor(repo_id, criteria)
 
         if criteria.remove_duplicates:
@@ -206,6 +237,47 @@ class RepoUnitAssociationQueryManager(object):
         # to a list. Should probably log this. Is there a log-level "stupid"?
         return list(units_generator)
 
+    def _streamed_units(self, repo_id, criteria, batch_size):
+        """
+        Generate units associated with the repository that match the criteria,
+        resolving the associations against the unit collections one batch at
+        a time.
+
+        :type repo_id: str
+        :type criteria: UnitAssociationCriteria
+        :type batch_size: int
+        :rtype: generator
+        """
+        assert isinstance(batch_size, int) and batch_size > 0
+
+        # Work on a copy so the default sort (and the created sort added when
+        # removing duplicates) does not leak back into the caller's criteria.
+        criteria = copy.copy(criteria)
+        criteria.association_sort = list(criteria.association_sort or _STREAM_DEFAULT_SORT)
+
+        unit_associations_generator = self._unit_associations_cursor(repo_id, criteria)
+
+        if criteria.remove_duplicates:
+            unit_associations_generator = self._unit_associations_no_duplicates(
+                criteria, unit_associations_generator)
+
+        if not criteria.unit_filters:
+            # Every association resolves to a unit, so skip and limit can be
+            # applied before any unit is loaded.
+            unit_associations_generator = self._with_skip_and_limit(unit_associations_generator,
+                                                                    criteria.skip, criteria.limit)
+
+        units_generator = self._units_from_association_batches(
+            misc.paginate(unit_associations_generator, batch_size), criteria)
+
+        if criteria.unit_filters:
+            # Associations whose unit does not match the filters are dropped,
+            # so skip and limit can only be applied to the results.
+            units_generator = self._with_skip_and_limit(units_generator, criteria.skip,
+                                                        criteria.limit)
+
+        return units_generator
+
     def get_units_across_types(self, repo_id, criteria=None, as_generator=False):
         """
         Retrieves data describing units associated with the given repository
@@ -384,6 +456,54 @@ class RepoUnitAssociationQueryManager(object):
 
     # -- associated units methods ----------------------------------------------
 
+    @staticmethod
+    def _units_from_association_batches(association_batches, criteria):
+        """
+        Resolve each batch of associations against the unit collections and
+        return the associations, in the order given, with the unit
+        information as metadata. Associations whose unit does not match the
+        criteria's unit filters are dropped.
+
+        :type association_batches: iterator of tuples
+        :type criteria: UnitAssociationCriteria
+        :rtype: generator
+        """
+
+        fields = criteria.unit_fields
+
+        # The _content_type_id is required for looking up the association.
+        if fields is not None and '_content_type_id' not in fields:
+            fields = list(fields)
+            fields.append('_content_type_id')
+
+        for batch in association_batches:
+
+            # unit_type_id -> [unit_id, ...]
+            unit_ids_by_type = {}
+            for association in batch:
+                unit_ids = unit_ids_by_type.setdefault(association['unit_type_id'], [])
+                unit_ids.append(association['unit_id'])
+
+            # (unit_type_id, unit_id) -> unit
+            units_by_id = {}
+            for unit_type_id, unit_ids in unit_ids_by_type.items():
+                spec = criteria.unit_filters.copy()
+                spec['_id'] = {'$in': unit_ids}
+
+                collection = types_db.type_units_collection(unit_type_id)
+                for unit in collection.find(spec, fields=fields):
+                    units_by_id[(unit_type_id, unit['_id'])] = unit
+
+            for association in batch:
+                unit = units_by_id.get((association['unit_type_id'], association['unit_id']))
+
+                if unit is None:
+                    continue
+
+                association = association.copy()
+                association['metadata'] = unit
+                yield association
+
     @staticmethod
     def _associated_units_by_type_cursor(unit_type_id, criteria, associated_unit_ids):
         """
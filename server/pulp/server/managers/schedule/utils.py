@@ -56,32 +56,38 @@ def get_by_resource(resource):
     return itertools.imap(ScheduledCall.from_db, schedules)
 
 
-def get_enabled():
+def get_enabled(fields=None):
     """
     Get schedules that are enabled, that is, their "enabled" attribute is True
 
+    :param fields:  optional list of the fields to return; all fields by default
+    :type  fields:  list
+
     :return:    pymongo cursor of ScheduledCall database objects
     :rtype:     pymongo.cursor.Cursor
     """
-    criteria = Criteria(filters={'enabled': True})
+    criteria = Criteria(filters={'enabled': True}, fields=fields)
     return ScheduledCall.get_collection().query(criteria)
 
 
-def get_updated_since(seconds):
+def get_updated_since(seconds, enabled_only=True):
     """
     Get schedules that are enabled, that is, their "enabled" attribute is True,
     and that have been updated since the timestamp represented by "seconds".
 
     :param seconds: seconds since the epoch
     :param seconds: float
+    :param enabled_only:    if False, disabled schedules that have been updated
+                            are returned as well
+    :type  enabled_only:    bool
 
     :return:    pymongo cursor of ScheduledCall database objects
     :rtype:     pymongo.cursor.Cursor
     """
-    criteria = Criteria(filters={
-        'enabled': True,
-        'last_updated': {'$gt': seconds},
-    })
+    filters = {'last_updated': {'$gt': seconds}}
+    if enabled_only:
+        filters['enabled'] = True
+    criteria = Criteria(filters=filters)
     return ScheduledCall.get_collection().query(criteria)
 
 
@@ -15,5 +15,6 @@ This module contains imports that are needed for the Celery workers to find task
 of this Python package.
 """
 import pulp.server.db.reaper
+import pulp.server.event.http
 import pulp.server.maintenance.monthly
 import pulp.server.tasks.content
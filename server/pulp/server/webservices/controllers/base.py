@@ -27,6 +27,10 @@ from pulp.server.webservices import http, serialization
 
 _log = logging.getLogger(__name__)
 
+# Approximate number of bytes of encoded JSON collected before a chunk of a
+# streamed response is handed to the web server
+STREAM_CHUNK_SIZE = 64 * 1024
+
 
 def json_encoder(thing):
     """
@@ -41,6 +45,40 @@ def json_encoder(thing):
     return json_util.default(thing)
 
 
+def _json_stream(items, extra=None):
+    """
+    Encode items as a JSON list, yielding the encoded text in chunks of about
+    STREAM_CHUNK_SIZE bytes.
+
+    :param items: items to encode
+    :type  items: iterable
+    :param extra: see JSONController._output_stream
+    :type  extra: callable
+    :return: generator of encoded chunks
+    :rtype:  generator
+    """
+    buf = ['{"results": [' if extra else '[']
+    buf_size = 0
+    separator = ''
+    for item in items:
+        encoded = json.dumps(item, default=json_encoder)
+        buf.append(separator)
+        buf.append(encoded)
+        separator = ', '
+        buf_size += len(encoded)
+        if buf_size >= STREAM_CHUNK_SIZE:
+            yield ''.join(buf)
+            buf = []
+            buf_size = 0
+
+    buf.append(']')
+    if extra:
+        for key, value in extra().items():
+            buf.append(', %s: %s' % (json.dumps(key), json.dumps(value, default=json_encoder)))
+        buf.append('}')
+    yield ''.join(buf)
+
+
 class JSONController(object):
     """
     Base controller class with convenience methods for JSON serialization
@@ -151,6 +189,25 @@ class JSONController(object):
         http.header('Content-Length', len(body))
         return body
 
+    def _output_stream(self, items, extra=None):
+        """
+        JSON encode an iterable of items incrementally and set the appropriate
+        headers. The response is sent as it is encoded, so there is no
+        Content-Length and the items are never all held in memory at once.
+
+        :param items: items to encode as a JSON list
+        :type  items: iterable
+        :param extra: optional callable returning a dict of additional values.
+                      When given, the list is returned under the key "results"
+                      of a JSON object that also contains these values. It is
+                      called after all of the items have been encoded.
+        :type  extra: callable
+        :return: generator of chunks of the encoded response
+        :rtype:  generator
+        """
+        http.header('Content-Type', 'application/json')
+        return _json_stream(items, extra)
+
     def _error_dict(self, msg, code=None):
         """
         Standardized error returns
@@ -172,6 +229,18 @@ class JSONController(object):
         http.status_ok()
         return self._output(data)
 
+    def ok_stream(self, items, extra=None):
+        """
+        Return an ok response whose body is streamed as it is encoded.
+        @type items: iterable
+        @param items: items to be returned as a list in the body of the response
+        @type extra: callable
+        @param extra: see _output_stream
+        @return: generator of JSON encoded response chunks
+        """
+        http.status_ok()
+        return self._output_stream(items, extra)
+
     def created(self, location, data):
         """
         Return a created response.
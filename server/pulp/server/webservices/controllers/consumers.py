@@ -131,24 +131,30 @@ class ConsumerSearch(SearchController):
         super(ConsumerSearch, self).__init__(
             managers.consumer_query_manager().find_by_criteria)
 
+    @staticmethod
+    def _process_consumers(options):
+        """
+        @param options: The (expanding) options; see expand_consumers.
+        @type options: dict
+        @return: function that expands and adds links to a list of consumers
+        @rtype: callable
+        """
+        def process(consumers):
+            consumers = expand_consumers(options, consumers)
+            for c in consumers:
+                href = serialization.link.search_safe_link_obj(c['id'])
+                c.update(href)
+            return consumers
+        return process
+
     def GET(self):
         params = web.input()
         ignored = ('details', 'bindings')
-        found = self._get_query_results_from_get(ignored)
-        consumers = expand_consumers(params, found)
-        for c in consumers:
-            href = serialization.link.search_safe_link_obj(c['id'])
-            c.update(href)
-        return self.ok(consumers)
+        return self._stream_results_from_get(ignored, process=self._process_consumers(params))
 
     def POST(self):
         body = self.params()
-        found = self._get_query_results_from_post()
-        consumers = expand_consumers(body, found)
-        for c in consumers:
-            href = serialization.link.search_safe_link_obj(c['id'])
-            c.update(href)
-        return self.ok(consumers)
+        return self._stream_results_from_post(process=self._process_consumers(body))
 
 
 class Bindings(JSONController):
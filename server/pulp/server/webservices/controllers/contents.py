@@ -7,7 +7,7 @@ from pulp.common import tags
 from pulp.server.auth.authorization import CREATE, READ, UPDATE, DELETE
 from pulp.server.content.sources.container import ContentContainer
 from pulp.server.db.model.criteria import Criteria
-from pulp.server.exceptions import MissingResource, InvalidValue, OperationPostponed
+from pulp.server.exceptions import MissingResource, MissingValue, InvalidValue, OperationPostponed
 from pulp.server.managers import factory
 from pulp.server.managers.content import orphan
 from pulp.common.tags import (action_tag, resource_tag, RESOURCE_CONTENT_SOURCE,
@@ -136,6 +136,24 @@ class ContentUnitsSearch(SearchController):
             unit['repository_memberships'] = list(association_map.get(unit['_id'], []))
         return units
 
+    @classmethod
+    def _process_units(cls, type_id, include_repos):
+        """
+        :param type_id:         content type id
+        :type  type_id:         str
+        :param include_repos:   if True, add the repository memberships of each unit
+        :type  include_repos:   bool
+        :return:    function that converts a list of unit documents into the
+                    units returned to the client
+        :rtype:     callable
+        """
+        def process(raw_units):
+            units = [ContentUnitsCollection.process_unit(unit) for unit in raw_units]
+            if include_repos:
+                cls._add_repo_memberships(units, type_id)
+            return units
+        return process
+
     @auth_required(READ)
     def GET(self, type_id):
         """
@@ -149,12 +167,8 @@ class ContentUnitsSearch(SearchController):
         @type  type_id: basestring
         """
         self._type_id = type_id
-        raw_units = self._get_query_results_from_get(ignore_fields=('include_repos',))
-        units = [ContentUnitsCollection.process_unit(unit) for unit in raw_units]
-        if web.input().get('include_repos'):
-            self._add_repo_memberships(units, type_id)
-
-        return self.ok(units)
+        process = self._process_units(type_id, web.input().get('include_repos'))
+        return self._stream_results_from_get(ignore_fields=('include_repos',), process=process)
 
     @auth_required(READ)
     def POST(self, type_id):
@@ -169,12 +183,8 @@ class ContentUnitsSearch(SearchController):
         @type  type_id: basestring
         """
         self._type_id = type_id
-        raw_units = self._get_query_results_from_post()
-        units = [ContentUnitsCollection.process_unit(unit) for unit in raw_units]
-        if self.params().get('include_repos'):
-            self._add_repo_memberships(units, type_id)
-
-        return self.ok(units)
+        process = self._process_units(type_id, self.params().get('include_repos'))
+        return self._stream_results_from_post(process=process)
 
 
 class ContentUnitResource(JSONController):
@@ -254,6 +264,30 @@ class UploadSegmentResource(JSONController):
         return self.ok(None)
 
 
+class UploadExistingUnitResource(JSONController):
+
+    # Scope:  Sub-Resource
+    # POST:   Check whether the unit being uploaded is already in content storage
+
+    @auth_required(UPDATE)
+    def POST(self, upload_id):
+
+        params = self.params()
+        try:
+            unit_type_id = params['unit_type_id']
+            unit_key = params['unit_key']
+            checksum_type = params['checksum_type']
+            checksum = params['checksum']
+        except KeyError, e:
+            raise MissingValue([e.args[0]])
+
+        upload_manager = factory.content_upload_manager()
+        unit_id = upload_manager.find_existing_unit(upload_id, unit_type_id, unit_key,
+                                                    checksum_type, checksum)
+
+        return self.ok({'exists': unit_id is not None, 'unit_id': unit_id})
+
+
 class OrphanCollection(JSONController):
 
     @auth_required(READ)
@@ -432,6 +466,7 @@ _URLS = ('/types/$', ContentTypesCollection,
          '/units/([^/]+)/([^/]+)/$', ContentUnitResource,
          '/uploads/$', UploadsCollection,
          '/uploads/([^/]+)/$', UploadResource,
+         '/uploads/([^/]+)/existing/$', UploadExistingUnitResource,
          '/uploads/([^/]+)/([^/]+)/$', UploadSegmentResource,
          '/orphans/$', OrphanCollection,
          '/orphans/([^/]+)/$', OrphanTypeSubCollection,
@@ -35,6 +35,10 @@ class SearchTaskCollection(SearchController):
     def __init__(self):
         super(SearchTaskCollection, self).__init__(TaskStatusManager.find_by_criteria)
 
+    @staticmethod
+    def _serialize_tasks(raw_tasks):
+        return [task_serializer(task) for task in raw_tasks]
+
     @auth_required(authorization.READ)
     def GET(self):
         """
@@ -47,9 +51,7 @@ class SearchTaskCollection(SearchController):
         :return: json encoded response
         :rtype: str
         """
-        raw_tasks = self._get_query_results_from_get()
-        serialized_tasks = [task_serializer(task) for task in raw_tasks]
-        return self.ok(serialized_tasks)
+        return self._stream_results_from_get(process=self._serialize_tasks)
 
     @auth_required(authorization.READ)
     def POST(self):
@@ -61,9 +63,7 @@ class SearchTaskCollection(SearchController):
         :return: response for web browser
         :rtype: str
         """
-        raw_tasks = self._get_query_results_from_post()
-        serialized_tasks = [task_serializer(task) for task in raw_tasks]
-        return self.ok(serialized_tasks)
+        return self._stream_results_from_post(process=self._serialize_tasks)
 
 
 class TaskCollection(JSONController):
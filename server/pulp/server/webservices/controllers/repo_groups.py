@@ -69,19 +69,19 @@ class RepoGroupSearch(SearchController):
         super(RepoGroupSearch, self).__init__(
             managers_factory.repo_group_query_manager().find_by_criteria)
 
+    @staticmethod
+    def _process_groups(groups):
+        for group in groups:
+            group.update(serialization.link.search_safe_link_obj(group['id']))
+        return groups
+
     @auth_required(authorization.READ)
     def GET(self):
-        items = self._get_query_results_from_get()
-        for item in items:
-            item.update(serialization.link.search_safe_link_obj(item['id']))
-        return self.ok(items)
+        return self._stream_results_from_get(process=self._process_groups)
 
     @auth_required(authorization.READ)
     def POST(self):
-        items = self._get_query_results_from_post()
-        for item in items:
-            item.update(serialization.link.search_safe_link_obj(item['id']))
-        return self.ok(items)
+        return self._stream_results_from_post(process=self._process_groups)
 
 
 class RepoGroupResource(JSONController):
@@ -186,21 +186,25 @@ class RepoSearch(SearchController):
         super(RepoSearch, self).__init__(
             manager_factory.repo_query_manager().find_by_criteria)
 
+    @staticmethod
+    def _process_repos(importers, distributors):
+        """
+        @return: function that applies RepoCollection._process_repos to a
+                 list of repositories with the given options
+        @rtype:  callable
+        """
+        return lambda repos: RepoCollection._process_repos(repos, importers, distributors)
+
     @auth_required(READ)
     def GET(self):
         query_params = web.input()
         if query_params.pop('details', False):
             query_params['importers'] = True
             query_params['distributors'] = True
-        items = self._get_query_results_from_get(
-            ('details', 'importers', 'distributors'))
-
-        RepoCollection._process_repos(
-            items,
-            query_params.pop('importers', False),
-            query_params.pop('distributors', False)
-        )
-        return self.ok(items)
+        process = self._process_repos(query_params.pop('importers', False),
+                                      query_params.pop('distributors', False))
+        return self._stream_results_from_get(('details', 'importers', 'distributors'),
+                                             process=process)
 
     @auth_required(READ)
     def POST(self):
@@ -209,14 +213,10 @@ class RepoSearch(SearchController):
         'criteria' which has a data structure that can be turned into a
         Criteria instance.
         """
-        items = self._get_query_results_from_post()
-
-        RepoCollection._process_repos(
-            items,
-            self.params().get('importers', False),
-            self.params().get('distributors', False)
-        )
-        return self.ok(items)
+        params = self.params()
+        process = self._process_repos(params.get('importers', False),
+                                      params.get('distributors', False))
+        return self._stream_results_from_post(process=process)
 
 
 class RepoResource(JSONController):
@@ -11,15 +11,118 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import base64
+import logging
+import sys
+
+import pymongo
 import web
 
 from pulp.server.auth.authorization import READ
+from pulp.server.compat import json, json_util
 from pulp.server.db.model.criteria import Criteria
 import pulp.server.exceptions as exceptions
 from pulp.server.webservices.controllers.base import JSONController
 from pulp.server.webservices.controllers.decorators import auth_required
 
 
+_logger = logging.getLogger(__name__)
+
+
+# Number of results returned per page when a cursor is requested without a limit
+DEFAULT_CURSOR_LIMIT = 1000
+
+# Number of documents read from the database and processed together while a
+# response is streamed
+STREAM_BATCH_SIZE = 500
+
+
+def encode_cursor(last_id):
+    """
+    Create the opaque token a client passes back to get the page of results
+    that follows the document with the given _id.
+
+    @param last_id: _id of the last document in a page of results
+    @type  last_id: any type mongo uses for an _id
+
+    @return:    URL safe token
+    @rtype:     str
+    """
+    return base64.urlsafe_b64encode(json.dumps(last_id, default=json_util.default))
+
+
+def decode_cursor(token):
+    """
+    Reverse of encode_cursor.
+
+    @param token:   token previously returned by encode_cursor
+    @type  token:   str
+
+    @return:    _id of the last document in the previous page of results
+    @raise InvalidValue: if the token is not one this module created
+    """
+    try:
+        return json.loads(base64.urlsafe_b64decode(str(token)), object_hook=json_util.object_hook)
+    except (TypeError, ValueError):
+        raise exceptions.InvalidValue(['cursor']), None, sys.exc_info()[2]
+
+
+def cursor_criteria(criteria, token):
+    """
+    Build the Criteria for one page of a keyset paginated search. Results are
+    ordered by _id and the page starts after the _id in the token, so the
+    database can seek straight to it instead of skipping over the previous
+    pages.
+
+    @param criteria:    search requested by the client; it cannot include a
+                        sort or skip
+    @type  criteria:    pulp.server.db.model.criteria.Criteria
+    @param token:       value returned by encode_cursor for the previous page,
+                        or an empty value for the first page
+    @type  token:       str
+
+    @return:    criteria for the requested page
+    @rtype:     pulp.server.db.model.criteria.Criteria
+    @raise InvalidValue: if the token is invalid or the criteria includes a
+                         sort or skip
+    """
+    if criteria.sort:
+        raise exceptions.InvalidValue(['sort'])
+    if criteria.skip:
+        raise exceptions.InvalidValue(['skip'])
+
+    filters = criteria.filters
+    if token:
+        after = {'_id': {'$gt': decode_cursor(token)}}
+        filters = {'$and': [filters, after]} if filters else after
+
+    return Criteria(filters=filters, sort=[('_id', pymongo.ASCENDING)],
+                    limit=criteria.limit or DEFAULT_CURSOR_LIMIT, fields=criteria.fields)
+
+
+def _end_on_error(chunks):
+    """
+    Pass through the chunks of a streamed response. web.py only encodes the
+    first chunk before the response starts, so an error raised by any later
+    chunk cannot become an error response; it is logged and the response body
+    ends where it is.
+
+    @param chunks:  generator of JSON encoded response chunks
+    @type  chunks:  generator
+
+    @return:    generator of JSON encoded response chunks
+    """
+    started = False
+    try:
+        for chunk in chunks:
+            yield chunk
+            started = True
+    except Exception:
+        if not started:
+            raise
+        _logger.exception('Error while streaming search results, the response is incomplete')
+
+
 class SearchController(JSONController):
     def __init__(self, query_method):
         """
@@ -29,6 +132,8 @@ class SearchController(JSONController):
         """
         super(SearchController, self).__init__()
         self.query_method = query_method
+        # True when the client asked for a page of results with a cursor
+        self.paginated = False
 
     @auth_required(READ)
     def GET(self):
@@ -38,8 +143,11 @@ class SearchController(JSONController):
         separate key-value pairs as is normal with query parameters in URLs. For
         example, '/v2/sometype/search/?field=id&field=display_name' will
         return the fields 'id' and 'display_name'.
+
+        Pass a 'cursor' parameter, empty for the first page, to page through
+        the results. See _stream_query_results.
         """
-        return self.ok(self._get_query_results_from_get())
+        return self._stream_results_from_get()
 
     @auth_required(READ)
     def POST(self):
@@ -51,17 +159,18 @@ class SearchController(JSONController):
         @param criteria:    Required. data structure that can be turned into
                             an instance of the Criteria model.
         @type  criteria:    dict
+        @param cursor:      Optional. empty for the first page of results, else
+                            the next_cursor of the previous page
+        @type  cursor:      str
 
         @return:    list of matching items
         @rtype:     list
         """
+        return self._stream_results_from_post()
 
-        return self.ok(self._get_query_results_from_post())
-
-    def _get_query_results_from_get(self, ignore_fields=None, is_user_search=False):
+    def _get_criteria_from_get(self, ignore_fields=None, is_user_search=False):
         """
-        Looks for query parameters that define a Criteria, and returns the
-        results of a search based on that Criteria.
+        Looks for query parameters that define a Criteria.
 
         @param ignore_fields:   Field names to ignore. All other fields will be
                                 used in an attempt to generate a Criteria
@@ -74,14 +183,15 @@ class SearchController(JSONController):
 
         @type is_user_search
 
-        @return:    list of documents from the DB that match the given criteria
-                    for the collection associated with this controller
-        @rtype:     list
+        @return:    the Criteria, limited to the requested page if a cursor
+                    was passed
+        @rtype:     pulp.server.db.model.criteria.Criteria
         """
         input = self._ensure_input_encoding(web.input(field=[]))
         if ignore_fields:
             for field in ignore_fields:
                 input.pop(field, None)
+        cursor = input.pop('cursor', None)
 
         # rename this to 'fields' within the dict, and omit it if empty so we
         # default to getting all fields
@@ -94,19 +204,19 @@ class SearchController(JSONController):
             input['fields'] = fields
 
         criteria = Criteria.from_client_input(input)
-        return list(self.query_method(criteria))
+        return self._apply_cursor(criteria, cursor)
 
-    def _get_query_results_from_post(self, is_user_search=False):
+    def _get_criteria_from_post(self, is_user_search=False):
         """
-        Looks for a Criteria passed as a POST parameter on ket 'criteria', and
-        returns the results of a search based on that Criteria.
+        Looks for a Criteria passed as a POST parameter on key 'criteria'.
 
-        @return:    list of documents from the DB that match the given criteria
-                    for the collection associated with this controller
-        @rtype:     list
+        @return:    the Criteria, limited to the requested page if a cursor
+                    was passed
+        @rtype:     pulp.server.db.model.criteria.Criteria
         """
+        params = self.params()
         try:
-            criteria_param = self.params()['criteria']
+            criteria_param = params['criteria']
         except KeyError:
             raise exceptions.MissingValue(['criteria'])
         criteria = Criteria.from_client_input(criteria_param)
@@ -115,4 +225,118 @@ class SearchController(JSONController):
                 criteria.fields.append('id')
             if is_user_search and 'login' not in criteria.fields and u'login' not in criteria.fields:
                 criteria.fields.append('login')
+        return self._apply_cursor(criteria, params.get('cursor'))
+
+    def _apply_cursor(self, criteria, cursor):
+        """
+        @param criteria:    search requested by the client
+        @type  criteria:    pulp.server.db.model.criteria.Criteria
+        @param cursor:      cursor passed by the client, None if there was none
+        @type  cursor:      str or None
+
+        @return:    criteria to run
+        @rtype:     pulp.server.db.model.criteria.Criteria
+        """
+        if cursor is None:
+            return criteria
+        self.paginated = True
+        return cursor_criteria(criteria, cursor)
+
+    def _get_query_results_from_get(self, ignore_fields=None, is_user_search=False):
+        """
+        Looks for query parameters that define a Criteria, and returns the
+        results of a search based on that Criteria.
+
+        @param ignore_fields:   see _get_criteria_from_get
+        @type  ignore_fields:   list
+
+        @type is_user_search:   see _get_criteria_from_get
+
+        @return:    list of documents from the DB that match the given criteria
+                    for the collection associated with this controller
+        @rtype:     list
+        """
+        criteria = self._get_criteria_from_get(ignore_fields, is_user_search)
+        return list(self.query_method(criteria))
+
+    def _get_query_results_from_post(self, is_user_search=False):
+        """
+        Looks for a Criteria passed as a POST parameter on ket 'criteria', and
+        returns the results of a search based on that Criteria.
+
+        @return:    list of documents from the DB that match the given criteria
+                    for the collection associated with this controller
+        @rtype:     list
+        """
+        criteria = self._get_criteria_from_post(is_user_search)
         return list(self.query_method(criteria))
+
+    def _stream_results_from_get(self, ignore_fields=None, is_user_search=False, process=None):
+        """
+        Streamed equivalent of _get_query_results_from_get.
+
+        @param process: see _stream_query_results
+
+        @return:    generator of JSON encoded response chunks
+        """
+        criteria = self._get_criteria_from_get(ignore_fields, is_user_search)
+        return self._stream_query_results(criteria, process)
+
+    def _stream_results_from_post(self, is_user_search=False, process=None):
+        """
+        Streamed equivalent of _get_query_results_from_post.
+
+        @param process: see _stream_query_results
+
+        @return:    generator of JSON encoded response chunks
+        """
+        criteria = self._get_criteria_from_post(is_user_search)
+        return self._stream_query_results(criteria, process)
+
+    def _stream_query_results(self, criteria, process=None):
+        """
+        Run a search and return an ok response that is encoded as documents are
+        read from the database, rather than after all of them have been loaded.
+
+        If the client passed a cursor, the body is an object with the page of
+        results under "results", and under "next_cursor" the cursor to pass
+        for the next page, or null if this is the last one.
+
+        @param criteria:    criteria returned by _get_criteria_from_get or
+                            _get_criteria_from_post
+        @type  criteria:    pulp.server.db.model.criteria.Criteria
+        @param process:     optional callable that is passed lists of up to
+                            STREAM_BATCH_SIZE documents and returns the list of
+                            items to send to the client for them
+        @type  process:     callable
+
+        An error raised while the first chunk is encoded is handled like any
+        other error raised by a controller. Once the first chunk has been
+        returned, the response status has been sent, so an error is logged and
+        ends the response body early, leaving it incomplete JSON.
+
+        @return:    generator of JSON encoded response chunks
+        """
+        page = {'count': 0, 'last_id': None}
+
+        def results():
+            batch = []
+            for document in self.query_method(criteria):
+                page['count'] += 1
+                page['last_id'] = document.get('_id')
+                batch.append(document)
+                if len(batch) >= STREAM_BATCH_SIZE:
+                    for item in (process(batch) if process else batch):
+                        yield item
+                    batch = []
+            if batch:
+                for item in (process(batch) if process else batch):
+                    yield item
+
+        def next_cursor():
+            if page['count'] < criteria.limit:
+                return {'next_cursor': None}
+            return {'next_cursor': encode_cursor(page['last_id'])}
+
+        return _end_on_error(self.ok_stream(results(), next_cursor if self.paginated else None))
+
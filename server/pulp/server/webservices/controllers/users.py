@@ -151,10 +151,8 @@ class UserSearch(SearchController):
 
     @auth_required(READ)
     def GET(self):
-        users = self._get_query_results_from_get(is_user_search=True)
-        UsersCollection._process_users(users)
-
-        return self.ok(users)
+        return self._stream_results_from_get(is_user_search=True,
+                                             process=UsersCollection._process_users)
 
     @auth_required(READ)
     def POST(self):
@@ -170,10 +168,8 @@ class UserSearch(SearchController):
         @return:    list of matching users
         @rtype:     list
         """
-        users = self._get_query_results_from_post(is_user_search=True)
-        UsersCollection._process_users(users)
-
-        return self.ok(users)
+        return self._stream_results_from_post(is_user_search=True,
+                                              process=UsersCollection._process_users)
 
 
 urls = (
@@ -24,7 +24,8 @@ from mock import Mock, MagicMock, patch
 
 from pulp.common.plugins.distributor_constants import MANIFEST_FILENAME
 from pulp.devel.mock_distributor import get_publish_conduit
-from pulp.plugins.file.distributor import FileDistributor, FilePublishProgressReport, BUILD_DIRNAME
+from pulp.plugins.file.distributor import (FileDistributor, FilePublishProgressReport,
+                                           BUILD_DIRNAME, MASTER_DIRNAME)
 from pulp.plugins.model import Repository, Unit
 
 
@@ -161,6 +162,71 @@ class FileDistributorTest(unittest.TestCase):
         # Ensure the old rpm is no longer included
         self.assertFalse(os.path.islink(target_file))
 
+    def _unit(self, name):
+        return Unit('RPM', {'name': name, 'size': 1, 'checksum': 'sum-%s' % name}, {},
+                    os.path.join(DATA_DIR, name))
+
+    def _publish(self, distributor, names):
+        conduit = get_publish_conduit(existing_units=[self._unit(n) for n in names])
+        report = distributor.publish_repo(self.repo, conduit, {})
+        self.assertTrue(report.success_flag)
+
+    def test_repo_publish_hosting_location_is_symlink(self):
+        distributor = self.create_distributor_with_mocked_api_calls()
+        distributor.publish_repo(self.repo, self.publish_conduit, {})
+
+        self.assertTrue(os.path.islink(self.target_dir))
+        master_dir = os.path.join(self.temp_dir, MASTER_DIRNAME)
+        self.assertEqual(os.path.dirname(os.path.realpath(self.target_dir)), master_dir)
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, BUILD_DIRNAME)))
+
+    def test_repo_publish_replaces_copied_directory(self):
+        os.makedirs(self.target_dir)
+        with open(os.path.join(self.target_dir, 'stale'), 'w') as stale:
+            stale.write('stale')
+
+        distributor = self.create_distributor_with_mocked_api_calls()
+        distributor.publish_repo(self.repo, self.publish_conduit, {})
+
+        self.assertTrue(os.path.islink(self.target_dir))
+        self.assertFalse(os.path.exists(os.path.join(self.target_dir, 'stale')))
+        self.assertTrue(os.path.islink(os.path.join(self.target_dir, SAMPLE_RPM)))
+
+    def test_republish_incremental(self):
+        distributor = self.create_distributor_with_mocked_api_calls()
+        self._publish(distributor, ['a', 'b'])
+        self._publish(distributor, ['a', 'c'])
+        distributor._symlink_unit = Mock(wraps=distributor._symlink_unit)
+
+        # The build from the first publish is updated
+        self._publish(distributor, ['a', 'd'])
+
+        linked = [c[0][2] for c in distributor._symlink_unit.call_args_list]
+        self.assertEqual(linked, [['d']])
+        self.assertEqual(sorted(os.listdir(self.target_dir)), [MANIFEST_FILENAME, 'a', 'd'])
+        self.assertEqual(readlink(os.path.join(self.target_dir, 'd')),
+                         os.path.join(DATA_DIR, 'd'))
+        with open(os.path.join(self.target_dir, MANIFEST_FILENAME), 'rb') as f:
+            self.assertEqual([row[0] for row in csv.reader(f)], ['a', 'd'])
+        # The current build and the spare
+        master_dir = os.path.join(self.temp_dir, MASTER_DIRNAME)
+        self.assertEqual(len([n for n in os.listdir(master_dir) if n.endswith('.links')]), 2)
+
+    def test_republish_unchanged_reuses_build(self):
+        distributor = self.create_distributor_with_mocked_api_calls()
+        self._publish(distributor, ['a', 'b'])
+        self._publish(distributor, ['a'])
+        published = os.path.realpath(self.target_dir)
+        master_dir = os.path.join(self.temp_dir, MASTER_DIRNAME)
+        builds = sorted(os.listdir(master_dir))
+        distributor._symlink_unit = Mock()
+
+        self._publish(distributor, ['a'])
+
+        self.assertEqual(os.path.realpath(self.target_dir), published)
+        self.assertEqual(sorted(os.listdir(master_dir)), builds)
+        self.assertEqual(distributor._symlink_unit.call_count, 0)
+
     def test_distributor_removed_calls_unpublish(self):
         distributor = self.create_distributor_with_mocked_api_calls()
         distributor.unpublish_repo = Mock()
@@ -173,6 +239,8 @@ class FileDistributorTest(unittest.TestCase):
         self.assertTrue(os.path.exists(self.target_dir))
         distributor.unpublish_repo(self.repo, {})
         self.assertFalse(os.path.exists(self.target_dir))
+        self.assertFalse(os.path.islink(self.target_dir))
+        self.assertFalse(os.path.exists(os.path.join(self.temp_dir, MASTER_DIRNAME)))
 
     def test__rmtree_if_exists(self):
         """
@@ -248,6 +248,47 @@ class MetadataWriterTests(unittest.TestCase):
                                                    expected_metadata_file_name)
         self.assertEquals(expected_metadata_file_path, context.metadata_file_path)
 
+    def test_finalize_checksum_computed_while_writing(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml')
+        context = MetadataFileContext(path, 'sha256')
+        context._file_digest = Mock()
+
+        context.initialize()
+        context.metadata_file_handle.write('some content')
+        context.finalize()
+
+        self.assertFalse(context._file_digest.called)
+        expected = hashlib.sha256('some content').hexdigest()
+        self.assertEqual(context.checksum, expected)
+        self.assertEqual(context.open_checksum, expected)
+        self.assertEqual(context.metadata_file_path,
+                         os.path.join(self.metadata_file_dir, expected + '-test.xml'))
+
+    def test_finalize_checksum_gzip(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml.gz')
+        context = MetadataFileContext(path, 'sha256')
+
+        context.initialize()
+        context.metadata_file_handle.write('some content')
+        context.finalize()
+
+        with open(context.metadata_file_path, 'rb') as file_handle:
+            self.assertEqual(context.checksum, hashlib.sha256(file_handle.read()).hexdigest())
+        self.assertEqual(context.open_checksum, hashlib.sha256('some content').hexdigest())
+        file_handle = gzip.open(context.metadata_file_path)
+        self.assertEqual(file_handle.read(), 'some content')
+        file_handle.close()
+
+    def test_finalize_checksum_file_handle_replaced(self):
+        path = os.path.join(self.metadata_file_dir, 'test.xml')
+        context = MetadataFileContext(path, 'sha256')
+        context.metadata_file_handle = open(path, 'w')
+        context.metadata_file_handle.write('some content')
+
+        context.finalize()
+
+        self.assertEqual(context.checksum, hashlib.sha256('some content').hexdigest())
+
     @patch('pulp.plugins.util.metadata_writer._LOG.exception')
     def test_finalize_error_on_footer(self, mock_logger):
 
@@ -403,7 +444,18 @@ class FastForwardXmlFileContextTests(unittest.TestCase):
         context._open_metadata_file_handle()
         self.assertTrue(context.fast_forward)
         self.assertEquals(context.existing_file,
-                          os.path.join(self.working_dir, 'original.test.xml'))
+                          os.path.join(self.working_dir, 'original.test.xml.gz'))
+
+    @patch('pulp.plugins.util.metadata_writer.XMLGenerator')
+    def test_open_metadata_file_handle_existing_gzip_file_not_decompressed(self, mock_generator):
+        shutil.copy(os.path.join(self.metadata_dir, 'test.xml.gz'),
+                    os.path.join(self.working_dir, 'test.xml.gz'))
+        context = FastForwardXmlFileContext(os.path.join(self.working_dir, 'test.xml.gz'),
+                                            self.tag, 'package', self.attributes)
+        context._open_metadata_file_handle()
+        self.assertEquals(sorted(os.listdir(self.working_dir)),
+                          ['original.test.xml.gz', 'test.xml.gz'])
+        context._close_metadata_file_handle()
 
     @patch('pulp.plugins.util.metadata_writer.XMLGenerator')
     def test_open_metadata_file_handle_existing_checksum_file(self, mock_generator):
@@ -435,7 +487,7 @@ class FastForwardXmlFileContextTests(unittest.TestCase):
         context._open_metadata_file_handle()
         self.assertTrue(context.fast_forward)
         self.assertEquals(context.existing_file,
-                          os.path.join(self.working_dir, 'original.bb-test.xml'))
+                          os.path.join(self.working_dir, 'original.bb-test.xml.gz'))
 
     @patch('pulp.plugins.util.metadata_writer.BUFFER_SIZE', new=8)
     def test_write_file_header_fast_forward_small_buffer(self):
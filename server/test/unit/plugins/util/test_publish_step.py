@@ -4,6 +4,7 @@ import shutil
 import sys
 import tarfile
 import tempfile
+import threading
 import time
 import traceback
 import unittest
@@ -21,7 +22,8 @@ from pulp.plugins.conduits.repo_sync import RepoSyncConduit
 from pulp.plugins.model import Repository, Unit
 from pulp.plugins.util.publish_step import Step, PublishStep, UnitPublishStep, PluginStep, \
     AtomicDirectoryPublishStep, SaveTarFilePublishStep, _post_order, CopyDirectoryStep, \
-    PluginStepIterativeProcessingMixin, DownloadStep, GetLocalUnitsStep
+    PluginStepIterativeProcessingMixin, DownloadStep, GetLocalUnitsStep, _parallel_map
+from pulp.server.exceptions import PulpCodedTaskFailedException
 from pulp.server.managers import factory
 
 
@@ -86,6 +88,159 @@ class PostOrderTests(unittest.TestCase):
         self.assertEquals(value_list, [1, 2, 3, 4, 5])
 
 
+class ParallelMapTests(unittest.TestCase):
+
+    def test_ordered_results(self):
+        def function(n):
+            # Later items finish first
+            time.sleep(0.01 * (5 - n))
+            return n * 2
+
+        results = list(_parallel_map(function, range(5), 3))
+
+        self.assertEquals([(n, n * 2, None) for n in range(5)], results)
+
+    def test_exception(self):
+        def function(n):
+            if n == 1:
+                raise ValueError(n)
+            return n
+
+        results = list(_parallel_map(function, range(3), 2))
+
+        self.assertEquals([0, 1, 2], [r[0] for r in results])
+        self.assertEquals(results[1][2][0], ValueError)
+        self.assertEquals(results[2][1], 2)
+
+    def test_close_skips_pending_items(self):
+        called = []
+
+        def function(n):
+            called.append(n)
+            return n
+
+        processed = _parallel_map(function, range(100), 2)
+        processed.next()
+        processed.close()
+
+        # At most the look ahead is processed, and nothing after closing
+        count = len(called)
+        self.assertTrue(count <= 5)
+        time.sleep(0.05)
+        self.assertEquals(count, len(called))
+
+
+class ConcurrentStepTests(unittest.TestCase):
+
+    class ItemStep(Step):
+
+        def __init__(self, items, **kwargs):
+            super(ConcurrentStepTests.ItemStep, self).__init__('items', **kwargs)
+            self.items = items
+            self.processed = []
+            self.threads = set()
+
+        def get_iterator(self):
+            return self.items
+
+        def process_main(self, item=None):
+            time.sleep(0.001 * (len(self.items) - item))
+            if item % 5 == 0:
+                raise ValueError(item)
+            self.threads.add(threading.current_thread())
+            self.processed.append(item)
+
+    def test_process_workers(self):
+        step = self.ItemStep(range(1, 5), status_conduit=Mock())
+        step.workers = 4
+        step.report_progress = Mock()
+
+        step.process()
+
+        self.assertEquals(step.state, reporting_constants.STATE_COMPLETE)
+        self.assertEquals(sorted(step.processed), [1, 2, 3, 4])
+        self.assertEquals(step.progress_successes, 4)
+        self.assertTrue(len(step.threads) > 1)
+
+    def test_process_workers_non_halting_exceptions(self):
+        conduit = Mock(task_id='foo')
+        step = self.ItemStep(range(1, 12), status_conduit=conduit,
+                             non_halting_exceptions=[ValueError])
+        step.workers = 3
+
+        self.assertRaises(PulpCodedTaskFailedException, step.process)
+
+        self.assertEquals(sorted(step.processed), [1, 2, 3, 4, 6, 7, 8, 9, 11])
+        self.assertEquals(step.progress_successes, 9)
+        self.assertEquals(step.progress_failures, 2)
+        self.assertEquals([e.args[0] for e in step.exceptions], [5, 10])
+
+    def test_process_workers_halting_exception(self):
+        step = self.ItemStep(range(1, 12), status_conduit=Mock())
+        step.workers = 3
+
+        try:
+            step.process()
+            self.fail('no exception raised')
+        except ValueError, e:
+            self.assertEquals(e.args, (5,))
+
+        self.assertEquals(step.state, reporting_constants.STATE_FAILED)
+        self.assertEquals(step.progress_successes, 4)
+
+    def test_process_lifecycle_independent_steps(self):
+        started = [threading.Event(), threading.Event()]
+        processed = []
+
+        def process(index):
+            # Each step waits for the other one to start
+            started[index].set()
+            processed.append(started[1 - index].wait(5))
+
+        parent = Step('parent', status_conduit=Mock())
+        parent.process = Mock(side_effect=lambda: processed.append('parent'))
+        for index in range(2):
+            child = Step('child')
+            child.independent = True
+            child.process = Mock(side_effect=lambda index=index: process(index))
+            parent.add_child(child)
+
+        parent.process_lifecycle()
+
+        self.assertEquals(processed, [True, True, 'parent'])
+
+    def test_process_lifecycle_dependent_steps_in_order(self):
+        processed = []
+        parent = Step('parent', status_conduit=Mock())
+        parent.process = Mock()
+        for name in ('a', 'b', 'c'):
+            child = Step(name)
+            child.independent = name != 'b'
+            child.process = Mock(side_effect=lambda name=name: processed.append(name))
+            parent.add_child(child)
+
+        parent.process_lifecycle()
+
+        self.assertEquals(processed, ['a', 'b', 'c'])
+
+    def test_process_lifecycle_independent_step_failure(self):
+        parent = Step('parent', status_conduit=Mock())
+        parent.process = Mock()
+        failing = Step('failing')
+        failing.process = Mock(side_effect=ValueError('foo'))
+        other = Step('other')
+        other.process = Mock()
+        for child in (failing, other):
+            child.independent = True
+            parent.add_child(child)
+
+        self.assertRaises(ValueError, parent.process_lifecycle)
+
+        self.assertFalse(parent.process.called)
+        self.assertTrue(failing.canceled)
+        self.assertTrue(other.canceled)
+
+
 class StepTests(PublisherBase):
 
     def test_add_child(self):
@@ -117,6 +272,56 @@ class StepTests(PublisherBase):
         step.parent.get_status_conduit.return_value = 'foo'
         self.assertEquals('foo', step.get_status_conduit())
 
+    @patch('pulp.plugins.util.publish_step.time.time')
+    def test_report_progress_rate_limited(self, mock_time):
+        conduit = Mock()
+        step = Step('foo_step', status_conduit=conduit)
+        child = Step('child_step')
+        child.total_units = 1000
+        step.add_child(child)
+        mock_time.return_value = 100.0
+
+        # The first report is written, the following ones only once the interval has passed
+        child.report_progress()
+        child.progress_successes = 1
+        child.report_progress()
+        mock_time.return_value = 100.6
+        child.report_progress()
+
+        self.assertEquals(conduit.set_progress.call_count, 2)
+
+    @patch('pulp.plugins.util.publish_step.time.time', return_value=100.0)
+    def test_report_progress_percent(self, mock_time):
+        conduit = Mock()
+        step = Step('foo_step', status_conduit=conduit)
+        child = Step('child_step')
+        child.total_units = 1000
+        step.add_child(child)
+        step.last_report_time = 100.0
+
+        for n in range(1, 21):
+            child.progress_successes = n
+            child.report_progress()
+
+        # Once per percent
+        self.assertEquals(conduit.set_progress.call_count, 2)
+
+    @patch('pulp.plugins.util.publish_step.time.time', return_value=100.0)
+    def test_report_progress_state_change(self, mock_time):
+        conduit = Mock()
+        step = Step('foo_step', status_conduit=conduit)
+        child = Step('child_step')
+        child.total_units = 1000
+        step.add_child(child)
+        step.last_report_time = 100.0
+
+        child.report_progress()
+        child.state = reporting_constants.STATE_COMPLETE
+        child.report_progress()
+        step.report_progress(force=True)
+
+        self.assertEquals(conduit.set_progress.call_count, 2)
+
 
 class PluginStepTests(PluginBase):
     """
@@ -896,6 +1101,7 @@ class TestPluginStepIterativeProcessingMixin(unittest.TestCase):
         def __init__(self):
             self.canceled = False
             self.progress_successes = 0
+            self.workers = 1
             self.process_item = Mock()
             self.report_progress = Mock()
 
@@ -909,6 +1115,7 @@ class TestPluginStepIterativeProcessingMixin(unittest.TestCase):
         def __init__(self):
             self.canceled = True
             self.progress_successes = 0
+            self.workers = 1
             self.process_item = Mock()
             self.report_progress = Mock()
 
@@ -940,6 +1147,27 @@ class TestPluginStepIterativeProcessingMixin(unittest.TestCase):
         # step is canceled!
         self.assertEquals(dummystep.progress_successes, 0)
 
+    def test_process_block_workers(self):
+        dummystep = self.DummyStep()
+        dummystep.workers = 2
+        dummystep._process_block()
+        self.assertEquals(dummystep.process_item.call_count, 2)
+        self.assertEquals(dummystep.report_progress.call_count, 2)
+        self.assertEquals(dummystep.progress_successes, 2)
+
+    def test_process_block_workers_exception(self):
+        dummystep = self.DummyStep()
+        dummystep.workers = 2
+        dummystep.process_item.side_effect = [None, ValueError()]
+        self.assertRaises(ValueError, dummystep._process_block)
+        self.assertEquals(dummystep.progress_successes, 1)
+
+    def test_process_block_workers_canceled(self):
+        dummystep = self.DummyCanceledStep()
+        dummystep.workers = 2
+        dummystep._process_block()
+        self.assertEquals(dummystep.progress_successes, 0)
+
 
 class DownloadStepTests(unittest.TestCase):
 
@@ -11,6 +11,7 @@ import mock
 from pulp.server.async import celery_instance
 from pulp.server.config import config, _default_values
 from pulp.server.db.reaper import queue_reap_expired_documents
+from pulp.server.event.http import deliver_notifications
 from pulp.server.maintenance.monthly import queue_monthly_maintenance
 
 
@@ -27,7 +28,7 @@ class TestCelerybeatSchedule(unittest.TestCase):
         """
         # Please read the docblock to this test if you find yourself needing to adjust this
         # assertion.
-        self.assertEqual(len(celery_instance.celery.conf['CELERYBEAT_SCHEDULE']), 2)
+        self.assertEqual(len(celery_instance.celery.conf['CELERYBEAT_SCHEDULE']), 3)
 
     def test_reap_expired_documents(self):
         """
@@ -53,6 +54,19 @@ class TestCelerybeatSchedule(unittest.TestCase):
         self.assertEqual(celery_instance.celery.conf['CELERYBEAT_SCHEDULE']['monthly_maintenance'],
                          expected_monthly_maintenance)
 
+    def test_deliver_event_notifications(self):
+        """
+        Make sure the deliver_notifications Task is present and properly configured.
+        """
+        expected_deliver = {
+            'task': deliver_notifications.name,
+            'schedule': timedelta(minutes=5),
+            'args': tuple(),
+        }
+        self.assertEqual(
+            celery_instance.celery.conf['CELERYBEAT_SCHEDULE']['deliver_event_notifications'],
+            expected_deliver)
+
     def test_celery_conf_updated(self):
         """
         Make sure the Celery config was updated with our CELERYBEAT_SCHEDULE.
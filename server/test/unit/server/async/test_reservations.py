@@ -0,0 +1,176 @@
+"""
+This module contains tests for the pulp.server.async.reservations module.
+"""
+from datetime import datetime
+import pickle
+import unittest
+
+import mock
+
+from pulp.server.async import reservations
+from pulp.server.db.model.resources import Worker
+
+
+class ReservationSchedulerTests(unittest.TestCase):
+
+    def setUp(self):
+        self.patch_a = mock.patch('pulp.server.async.reservations.PendingReservation',
+                                  autospec=True)
+        self.mock_pending_reservation = self.patch_a.start()
+
+        self.patch_b = mock.patch('pulp.server.async.reservations.ReservedResource',
+                                  autospec=True)
+        self.mock_reserved_resource = self.patch_b.start()
+
+        self.patch_c = mock.patch('pulp.server.async.reservations.resources', autospec=True)
+        self.mock_resources = self.patch_c.start()
+
+        self.dispatch = mock.Mock()
+        self.scheduler = reservations.ReservationScheduler(self.dispatch)
+        self.scheduler.workers = set(['worker-1', 'worker-2'])
+
+    def tearDown(self):
+        self.patch_a.stop()
+        self.patch_b.stop()
+        self.patch_c.stop()
+
+    def dispatched(self):
+        """
+        :return: list of (task_id, worker_name) in the order tasks were dispatched
+        """
+        return [(c[0][1], c[0][5]) for c in self.dispatch.call_args_list]
+
+    def test_queue_unreserved_worker(self):
+        worker = self.scheduler.queue('task', 'task-1', 'repo:a', [1], {'b': 2})
+
+        self.assertEqual(worker, 'worker-1')
+        self.dispatch.assert_called_once_with('task', 'task-1', 'repo:a', [1], {'b': 2},
+                                              'worker-1')
+        self.assertEqual(self.scheduler.reservations, {'task-1': ('worker-1', 'repo:a')})
+        self.assertFalse(self.mock_pending_reservation.called)
+
+    def test_queue_reserved_resource_goes_to_same_worker(self):
+        self.scheduler.queue('task', 'task-1', 'repo:a', [], {})
+        self.scheduler.queue('task', 'task-2', 'repo:b', [], {})
+        self.scheduler.queue('task', 'task-3', 'repo:a', [], {})
+
+        self.assertEqual(self.dispatched(), [('task-1', 'worker-1'), ('task-2', 'worker-2'),
+                                             ('task-3', 'worker-1')])
+
+    def test_queue_no_worker_waits(self):
+        self.scheduler.queue('task', 'task-1', 'repo:a', [], {})
+        self.scheduler.queue('task', 'task-2', 'repo:b', [], {})
+
+        worker = self.scheduler.queue('task', 'task-3', 'repo:c', [1], {'b': 2})
+
+        self.assertTrue(worker is None)
+        self.assertEqual(self.dispatch.call_count, 2)
+        self.assertEqual(list(self.scheduler.pending['repo:c']),
+                         [('task', 'task-3', [1], {'b': 2})])
+
+        # The waiting task is persisted
+        pending = self.mock_pending_reservation.call_args[0]
+        self.assertEqual(pending[:3], ('task-3', 'task', 'repo:c'))
+        self.assertEqual(pickle.loads(pending[3]), ([1], {'b': 2}))
+        self.mock_pending_reservation.return_value.save.assert_called_once_with()
+
+    def test_queue_waits_behind_pending_task_for_same_resource(self):
+        self.scheduler.workers = set(['worker-1'])
+        self.scheduler.queue('task', 'task-1', 'repo:a', [], {})
+        self.scheduler.queue('task', 'task-2', 'repo:b', [], {})
+
+        # A worker frees up without the scheduler being told, the task for repo:b must still
+        # wait behind task-2
+        self.scheduler.workers.add('worker-2')
+        self.scheduler.queue('task', 'task-3', 'repo:b', [], {})
+
+        self.assertEqual(self.dispatched(), [('task-1', 'worker-1')])
+        self.assertEqual([t[1] for t in self.scheduler.pending['repo:b']], ['task-2', 'task-3'])
+
+    def test_queue_reserved_resource_not_blocked_by_other_waiting_tasks(self):
+        self.scheduler.workers = set(['worker-1'])
+        self.scheduler.queue('task', 'task-1', 'repo:a', [], {})
+        self.scheduler.queue('task', 'task-2', 'repo:b', [], {})
+
+        self.scheduler.queue('task', 'task-3', 'repo:a', [], {})
+
+        self.assertEqual(self.dispatched(), [('task-1', 'worker-1'), ('task-3', 'worker-1')])
+
+    def test_release_dispatches_waiting_tasks_in_order(self):
+        self.scheduler.workers = set(['worker-1'])
+        self.scheduler.queue('task', 'task-1', 'repo:a', [], {})
+        self.scheduler.queue('task', 'task-2', 'repo:b', [], {})
+        self.scheduler.queue('task', 'task-3', 'repo:c', [], {})
+        self.scheduler.queue('task', 'task-4', 'repo:b', [], {})
+
+        self.scheduler.release('task-1')
+
+        # repo:b started waiting first, so both its tasks go to the free worker. repo:c keeps
+        # waiting since the worker now holds repo:b.
+        self.assertEqual(self.dispatched(), [('task-1', 'worker-1'), ('task-2', 'worker-1'),
+                                             ('task-4', 'worker-1')])
+        self.assertEqual(self.scheduler.pending.keys(), ['repo:c'])
+        remove = self.mock_pending_reservation.get_collection.return_value.remove
+        self.assertEqual(remove.call_args_list, [mock.call({'_id': 'task-2'}),
+                                                 mock.call({'_id': 'task-4'})])
+
+        self.scheduler.release('task-2')
+        self.assertEqual(self.dispatch.call_count, 3)
+
+        self.scheduler.release('task-4')
+        self.assertEqual(self.dispatched()[-1], ('task-3', 'worker-1'))
+        self.assertEqual(len(self.scheduler.pending), 0)
+
+    def test_release_unknown_task(self):
+        self.scheduler.queue('task', 'task-1', 'repo:a', [], {})
+
+        self.scheduler.release('unknown')
+
+        self.assertEqual(self.scheduler.reservations, {'task-1': ('worker-1', 'repo:a')})
+
+    def test_dispatch_error_does_not_stop_other_tasks(self):
+        self.scheduler.workers = set(['worker-1'])
+        self.scheduler.queue('task', 'task-1', 'repo:a', [], {})
+        self.scheduler.queue('task', 'task-2', 'repo:b', [], {})
+        self.scheduler.queue('task', 'task-3', 'repo:b', [], {})
+        self.dispatch.side_effect = [ValueError(), None]
+
+        self.scheduler.release('task-1')
+
+        self.assertEqual(self.dispatched()[1:], [('task-2', 'worker-1'), ('task-3', 'worker-1')])
+
+    def test_load(self):
+        self.mock_resources.filter_workers.return_value = [Worker('worker-1', datetime.utcnow()),
+                                                           Worker('worker-3', datetime.utcnow())]
+        self.mock_reserved_resource.get_collection.return_value.find.return_value = [
+            {'_id': 'task-1', 'worker_name': 'worker-1', 'resource_id': 'repo:a'}]
+        self.mock_pending_reservation.get_collection.return_value.find.return_value = [
+            {'_id': 'task-2', 'task_name': 'task', 'resource_id': 'repo:b',
+             'args': pickle.dumps(([1], {'b': 2}))}]
+
+        self.scheduler.load()
+
+        self.assertEqual(self.scheduler.workers, set(['worker-1', 'worker-3']))
+        self.assertEqual(self.scheduler.reservations, {'task-1': ('worker-1', 'repo:a')})
+        self.assertEqual(list(self.scheduler.pending['repo:b']),
+                         [('task', 'task-2', [1], {'b': 2})])
+        find = self.mock_pending_reservation.get_collection.return_value.find
+        find.assert_called_once_with(sort=[('queued_at', 1)])
+
+    def test_reload_dispatches_to_new_worker(self):
+        self.scheduler.workers = set(['worker-1'])
+        self.scheduler.queue('task', 'task-1', 'repo:a', [], {})
+        self.scheduler.queue('task', 'task-2', 'repo:b', [], {})
+
+        self.mock_resources.filter_workers.return_value = [Worker('worker-1', datetime.utcnow()),
+                                                           Worker('worker-2', datetime.utcnow())]
+        self.mock_reserved_resource.get_collection.return_value.find.return_value = [
+            {'_id': 'task-1', 'worker_name': 'worker-1', 'resource_id': 'repo:a'}]
+        self.mock_pending_reservation.get_collection.return_value.find.return_value = [
+            {'_id': 'task-2', 'task_name': 'task', 'resource_id': 'repo:b',
+             'args': pickle.dumps(([], {}))}]
+
+        self.scheduler.reload()
+
+        self.assertEqual(self.dispatched(), [('task-1', 'worker-1'), ('task-2', 'worker-2')])
+        self.assertEqual(len(self.scheduler.pending), 0)
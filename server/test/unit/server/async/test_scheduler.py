@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+import copy
 import time
 import unittest
 
@@ -253,23 +254,98 @@ class TestSchedulerSpawnPulpMonitorThreads(unittest.TestCase):
 
 class TestSchedulerTick(unittest.TestCase):
     @mock.patch('celery.beat.Scheduler.__init__', new=mock.Mock())
-    @mock.patch('celery.beat.Scheduler.tick')
-    def test_calls_superclass(self, mock_tick):
-        sched_instance = scheduler.Scheduler()
+    def setUp(self):
+        self.sched_instance = scheduler.Scheduler()
+        self.sched_instance._schedule = {'a': mock.Mock(), 'b': mock.Mock()}
+        self.sched_instance._last_update_check = 1000
 
-        sched_instance.tick()
+    @mock.patch('time.time', return_value=1000)
+    @mock.patch.object(scheduler.Scheduler, 'publisher', new=mock.Mock())
+    @mock.patch.object(scheduler.Scheduler, 'maybe_due', return_value=60)
+    def test_checks_due_entries(self, mock_maybe_due, mock_time):
+        self.sched_instance._push('a', 0)
+        self.sched_instance._push('b', 5000)
 
-        mock_tick.assert_called_once_with()
+        ret = self.sched_instance.tick()
 
-    @mock.patch('celery.beat.Scheduler.__init__', new=mock.Mock())
+        mock_maybe_due.assert_called_once_with(self.sched_instance._schedule['a'],
+                                               self.sched_instance.publisher)
+        # the entry is checked again when it says it will next be due
+        self.assertEqual(ret, 60)
+        self.assertEqual(self.sched_instance._heap[0][0], 1060)
+
+    @mock.patch('time.time', return_value=1000)
+    @mock.patch.object(scheduler.Scheduler, 'maybe_due')
+    def test_replaced_check_ignored(self, mock_maybe_due, mock_time):
+        self.sched_instance._push('a', 0)
+        self.sched_instance._push('a', 1050)
+
+        ret = self.sched_instance.tick()
+
+        self.assertFalse(mock_maybe_due.called)
+        self.assertEqual(ret, 50)
+        self.assertEqual(len(self.sched_instance._heap), 1)
+
+    @mock.patch('time.time', return_value=1000)
+    def test_nothing_scheduled(self, mock_time):
+        ret = self.sched_instance.tick()
+
+        self.assertEqual(ret, self.sched_instance.max_interval)
+
+    @mock.patch('time.time', return_value=1000 + scheduler.Scheduler.update_interval)
+    @mock.patch.object(scheduler.Scheduler, 'update_schedule')
+    def test_updates_schedule(self, mock_update_schedule, mock_time):
+        self.sched_instance.tick()
+
+        mock_update_schedule.assert_called_once_with()
+
+    @mock.patch('time.time', return_value=1001)
+    @mock.patch.object(scheduler.Scheduler, 'update_schedule')
+    def test_update_schedule_rate_limited(self, mock_update_schedule, mock_time):
+        self.sched_instance.tick()
+
+        self.assertFalse(mock_update_schedule.called)
+
+    @mock.patch('time.time', return_value=1000)
     @mock.patch.object(scheduler.FailureWatcher, 'trim')
-    @mock.patch('celery.beat.Scheduler.tick')
-    def test_calls_trim(self, mock_tick, mock_trim):
+    def test_calls_trim(self, mock_trim, mock_time):
+        self.sched_instance.tick()
+
+        mock_trim.assert_called_once_with()
+
+
+class TestSchedulerReserve(unittest.TestCase):
+    @mock.patch('threading.Thread', new=mock.MagicMock())
+    @mock.patch.object(scheduler.Scheduler, 'setup_schedule')
+    @mock.patch('pulp.server.db.model.dispatch.ScheduledCall.save')
+    def test_last_run_removed(self, mock_save, mock_setup_schedule):
         sched_instance = scheduler.Scheduler()
+        call = dispatch.ScheduledCall.from_db(dict(copy.deepcopy(SCHEDULES[0]), remaining_runs=1))
+        entry = call.as_schedule_entry()
+        sched_instance._schedule = {call.id: entry}
+        sched_instance._loaded_from_db_count = 1
+        sched_instance._push(call.id, 0)
 
-        sched_instance.tick()
+        new_entry = sched_instance.reserve(entry)
 
-        mock_trim.assert_called_once_with()
+        self.assertFalse(new_entry._scheduled_call.enabled)
+        self.assertEqual(sched_instance._schedule, {})
+        self.assertEqual(sched_instance._versions, {})
+        self.assertEqual(sched_instance._loaded_from_db_count, 0)
+
+    @mock.patch('threading.Thread', new=mock.MagicMock())
+    @mock.patch.object(scheduler.Scheduler, 'setup_schedule')
+    @mock.patch('pulp.server.db.model.dispatch.ScheduledCall.save')
+    def test_replaced(self, mock_save, mock_setup_schedule):
+        sched_instance = scheduler.Scheduler()
+        call = dispatch.ScheduledCall.from_db(copy.deepcopy(SCHEDULES[1]))
+        entry = call.as_schedule_entry()
+        sched_instance._schedule = {call.id: entry}
+
+        new_entry = sched_instance.reserve(entry)
+
+        self.assertTrue(sched_instance._schedule[call.id] is new_entry)
+        self.assertEqual(new_entry.total_run_count, 1088)
 
 
 class TestSchedulerSetupSchedule(unittest.TestCase):
@@ -328,48 +404,102 @@ class TestSchedulerSetupSchedule(unittest.TestCase):
         self.assertEqual(sched_instance._most_recent_timestamp, 1387218569.811224)
         # make sure the entry with no remaining runs does not go into the schedule
         self.assertTrue('529f4bd93de3a31d0ec77340' not in sched_instance._schedule)
+        self.assertTrue('529f4bd93de3a31d0ec77340' in sched_instance._ignored_db_ids)
+        # every entry is checked on the first tick
+        self.assertTrue(set(sched_instance._schedule) <= set(sched_instance._versions))
+        self.assertTrue(all(check[0] == 0 for check in sched_instance._heap))
 
 
-class TestSchedulerScheduleChanged(unittest.TestCase):
-    @mock.patch('threading.Thread', new=mock.MagicMock())
-    @mock.patch('pulp.server.managers.schedule.utils.get_enabled')
-    @mock.patch('pulp.server.managers.schedule.utils.get_updated_since')
-    def test_count_changed(self, mock_updated_since, mock_get_enabled):
-        mock_updated_since.return_value.count.return_value = 0
-        mock_get_enabled.return_value = SCHEDULES
-        sched_instance = scheduler.Scheduler()
-
-        mock_get_enabled.return_value = mock.MagicMock()
-        mock_get_enabled.return_value.count.return_value = sched_instance._loaded_from_db_count + 1
-
-        self.assertTrue(sched_instance.schedule_changed is True)
+@mock.patch('threading.Thread', new=mock.MagicMock())
+@mock.patch.object(scheduler.Scheduler, '_mongo_initialized', new=True)
+@mock.patch('pulp.server.managers.schedule.utils.get_updated_since')
+@mock.patch('pulp.server.managers.schedule.utils.get_enabled')
+class TestSchedulerUpdateSchedule(unittest.TestCase):
 
-    @mock.patch('threading.Thread', new=mock.MagicMock())
-    @mock.patch('pulp.server.managers.schedule.utils.get_enabled')
-    @mock.patch('pulp.server.managers.schedule.utils.get_updated_since')
-    def test_new_updated(self, mock_updated_since, mock_get_enabled):
-        mock_get_enabled.return_value = SCHEDULES
+    def _scheduler(self, mock_get_enabled, enabled_ids=None):
+        mock_get_enabled.return_value = copy.deepcopy(SCHEDULES)
         sched_instance = scheduler.Scheduler()
+        if enabled_ids is None:
+            # other tests load SCHEDULES itself, which pops the ids from its documents
+            enabled_ids = ['529f4bd93de3a31d0ec77338', '529f4bd93de3a31d0ec77339',
+                           '529f4bd93de3a31d0ec77340']
+        mock_get_enabled.reset_mock()
+
+        def get_enabled(fields=None):
+            if fields:
+                return [{'_id': i} for i in enabled_ids]
+            cursor = mock.MagicMock()
+            cursor.count.return_value = len(enabled_ids)
+            return cursor
+        mock_get_enabled.side_effect = get_enabled
+        return sched_instance
+
+    def test_no_changes(self, mock_get_enabled, mock_updated_since):
+        mock_updated_since.return_value = []
+        sched_instance = self._scheduler(mock_get_enabled)
+
+        sched_instance.update_schedule()
+
+        mock_updated_since.assert_called_once_with(1387218569.811224, enabled_only=False)
+        mock_get_enabled.assert_called_once_with()
+        self.assertEqual(sched_instance._loaded_from_db_count, 2)
+        self.assertEqual(sched_instance._ignored_db_ids, set(['529f4bd93de3a31d0ec77340']))
+
+    def test_updated(self, mock_get_enabled, mock_updated_since):
+        sched_instance = self._scheduler(mock_get_enabled)
+        version = sched_instance._versions['529f4bd93de3a31d0ec77339']
+        updated = copy.deepcopy(SCHEDULES[1])
+        updated['args'] = ['demo4', 'puppet_distributor']
+        updated['last_updated'] = 1387218600.0
+        mock_updated_since.return_value = [updated]
+
+        sched_instance.update_schedule()
+
+        entry = sched_instance._schedule['529f4bd93de3a31d0ec77339']
+        self.assertEqual(entry.args, ['demo4', 'puppet_distributor'])
+        self.assertNotEqual(sched_instance._versions['529f4bd93de3a31d0ec77339'], version)
+        self.assertEqual(sched_instance._loaded_from_db_count, 2)
+        self.assertEqual(sched_instance._most_recent_timestamp, 1387218600.0)
+
+    def test_disabled(self, mock_get_enabled, mock_updated_since):
+        sched_instance = self._scheduler(
+            mock_get_enabled, ['529f4bd93de3a31d0ec77338', '529f4bd93de3a31d0ec77340'])
+        updated = copy.deepcopy(SCHEDULES[1])
+        updated['enabled'] = False
+        mock_updated_since.return_value = [updated]
+
+        sched_instance.update_schedule()
+
+        self.assertTrue('529f4bd93de3a31d0ec77339' not in sched_instance._schedule)
+        self.assertTrue('529f4bd93de3a31d0ec77339' not in sched_instance._versions)
+        self.assertEqual(sched_instance._loaded_from_db_count, 1)
+
+    def test_deleted(self, mock_get_enabled, mock_updated_since):
+        mock_updated_since.return_value = []
+        sched_instance = self._scheduler(
+            mock_get_enabled, ['529f4bd93de3a31d0ec77339'])
+
+        sched_instance.update_schedule()
+
+        self.assertTrue('529f4bd93de3a31d0ec77338' not in sched_instance._schedule)
+        self.assertTrue('529f4bd93de3a31d0ec77339' in sched_instance._schedule)
+        self.assertEqual(sched_instance._loaded_from_db_count, 1)
+        self.assertEqual(sched_instance._ignored_db_ids, set())
 
-        mock_get_enabled.return_value = mock.MagicMock()
-        mock_get_enabled.return_value.count.return_value = sched_instance._loaded_from_db_count
-        mock_updated_since.return_value.count.return_value = 1
-
-        self.assertTrue(sched_instance.schedule_changed is True)
-
-    @mock.patch('threading.Thread', new=mock.MagicMock())
-    @mock.patch('pulp.server.managers.schedule.utils.get_enabled')
-    @mock.patch('pulp.server.managers.schedule.utils.get_updated_since')
-    def test_no_changes(self, mock_updated_since, mock_get_enabled):
-        mock_updated_since.return_value.count.return_value = 0
-        mock_get_enabled.return_value = SCHEDULES
+    @mock.patch.object(scheduler.Scheduler, 'setup_schedule')
+    def test_missed(self, mock_setup_schedule, mock_get_enabled, mock_updated_since):
+        mock_updated_since.return_value = []
+        mock_get_enabled.return_value = []
         sched_instance = scheduler.Scheduler()
-
+        sched_instance._schedule = {}
         mock_get_enabled.return_value = mock.MagicMock()
-        # -1 because there is an ignored schedule that has 0 remaining runs
-        mock_get_enabled.return_value.count.return_value = len(SCHEDULES) - 1
+        mock_get_enabled.return_value.count.return_value = 1
+        mock_get_enabled.return_value.__iter__.return_value = [{'_id': 'new'}]
+        mock_setup_schedule.reset_mock()
 
-        self.assertTrue(sched_instance.schedule_changed is False)
+        sched_instance.update_schedule()
+
+        mock_setup_schedule.assert_called_once_with()
 
 
 class TestSchedulerSchedule(unittest.TestCase):
@@ -386,19 +516,7 @@ class TestSchedulerSchedule(unittest.TestCase):
 
     @mock.patch('threading.Thread', new=mock.MagicMock())
     @mock.patch.object(scheduler.Scheduler, 'setup_schedule')
-    @mock.patch.object(scheduler.Scheduler, 'schedule_changed', new=True)
-    def test_schedule_changed(self, mock_setup_schedule):
-        sched_instance = scheduler.Scheduler()
-
-        sched_instance.schedule
-
-        # make sure it called the setup_schedule() method
-        mock_setup_schedule.assert_called_once_with()
-
-    @mock.patch('threading.Thread', new=mock.MagicMock())
-    @mock.patch.object(scheduler.Scheduler, 'schedule_changed', return_value=False)
-    @mock.patch.object(scheduler.Scheduler, 'setup_schedule')
-    def test_schedule_returns_value(self, mock_setup_schedule, mock_schedule_changed):
+    def test_schedule_returns_value(self, mock_setup_schedule):
         sched_instance = scheduler.Scheduler()
         sched_instance._schedule = mock.Mock()
 
@@ -434,7 +552,7 @@ class TestSchedulerApplyAsync(unittest.TestCase):
     @mock.patch('celery.beat.Scheduler.apply_async')
     def test_celery_entry(self, mock_apply_async, mock_setup_schedule):
         sched_instance = scheduler.Scheduler()
-        call = dispatch.ScheduledCall('PT1H', 'fake.task')
+        call = dispatch.ScheduledCall.from_db(copy.deepcopy(SCHEDULES[1]))
         entry = call.as_schedule_entry()
 
         sched_instance.apply_async(entry)
@@ -166,6 +166,30 @@ class TaskStatusManagerTests(base.PulpServerTests):
         self.assertTrue('disregard' not in updated)
         self.assertTrue('disregard' not in task_status)
 
+    def test_set_task_progress(self):
+        """
+        Tests that set_task_progress() only replaces the given parts of the progress report.
+        """
+        task_id = self.get_random_uuid()
+        TaskStatusManager.create_task_status(task_id, 'worker', state='running')
+        TaskStatusManager.set_task_progress(task_id, {'report-id': [{'a': 1}, {'b': 1}],
+                                                      'other-id': 'other'})
+
+        TaskStatusManager.set_task_progress(task_id, {'report-id.1': {'b': 2}})
+
+        task_status = TaskStatusManager.find_by_task_id(task_id)
+        self.assertEqual(task_status['progress_report'],
+                         {'report-id': [{'a': 1}, {'b': 2}], 'other-id': 'other'})
+        self.assertEqual(task_status['state'], 'running')
+
+    def test_set_missing_task_progress(self):
+        """
+        Tests setting the progress of a task status that doesn't exist.
+        """
+        task_id = self.get_random_uuid()
+        self.assertRaises(exceptions.MissingResource, TaskStatusManager.set_task_progress,
+                          task_id, {'report-id': 'progress'})
+
     def test_update_missing_task_status(self):
         """
         Tests updating a task status that doesn't exist raises the appropriate exception.
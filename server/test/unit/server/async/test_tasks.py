@@ -22,7 +22,6 @@ from pulp.server.async.task_status_manager import TaskStatusManager
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.db.model.resources import Worker, ReservedResource
 from pulp.server.db.reaper import queue_reap_expired_documents
-from pulp.server.exceptions import NoWorkers
 from pulp.server.maintenance.monthly import queue_monthly_maintenance
 
 
@@ -32,98 +31,89 @@ WORKER_2 = 'worker-2'
 WORKER_3 = 'worker-3'
 
 
-class TestQueueReservedTask(ResourceReservationTests):
+class TestGetReservationScheduler(unittest.TestCase):
 
-    def setUp(self):
-        self.patch_a = mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation',
-                                  autospec=True)
-        self.mock_get_worker_for_reservation = self.patch_a.start()
+    def tearDown(self):
+        tasks._reservation_scheduler = None
 
-        self.patch_b = mock.patch('pulp.server.async.tasks.resources.get_unreserved_worker',
-                                  autospec=True)
-        self.mock_get_unreserved_worker = self.patch_b.start()
+    @mock.patch('pulp.server.async.tasks.ReservationScheduler', autospec=True)
+    def test_creates_and_loads_once(self, mock_scheduler_class):
+        tasks._reservation_scheduler = None
 
-        self.patch_c = mock.patch('pulp.server.async.tasks.time', autospec=True)
-        self.mock_time = self.patch_c.start()
+        scheduler = tasks._get_reservation_scheduler()
+        again = tasks._get_reservation_scheduler()
 
-        self.patch_d = mock.patch('pulp.server.async.tasks.ReservedResource', autospec=True)
-        self.mock_reserved_resource = self.patch_d.start()
+        self.assertTrue(scheduler is mock_scheduler_class.return_value)
+        self.assertTrue(again is scheduler)
+        mock_scheduler_class.assert_called_once_with(tasks._dispatch_reserved_task)
+        scheduler.load.assert_called_once_with()
 
-        self.patch_e = mock.patch('pulp.server.async.tasks.celery', autospec=True)
-        self.mock_celery = self.patch_e.start()
-        self.mock_celery.tasks = {'task_name': mock.Mock()}
 
-        self.patch_f = mock.patch('pulp.server.async.tasks._release_resource', autospec=True)
-        self.mock__release_resource = self.patch_f.start()
+class TestDispatchReservedTask(unittest.TestCase):
+
+    def setUp(self):
+        self.patch_a = mock.patch('pulp.server.async.tasks.ReservedResource', autospec=True)
+        self.mock_reserved_resource = self.patch_a.start()
+
+        self.patch_b = mock.patch('pulp.server.async.tasks.celery', autospec=True)
+        self.mock_celery = self.patch_b.start()
+        self.mock_celery.tasks = {'task_name': mock.Mock()}
 
-        super(TestQueueReservedTask, self).setUp()
+        self.patch_c = mock.patch('pulp.server.async.tasks._release_resource', autospec=True)
+        self.mock__release_resource = self.patch_c.start()
 
     def tearDown(self):
         self.patch_a.stop()
         self.patch_b.stop()
         self.patch_c.stop()
-        self.patch_d.stop()
-        self.patch_e.stop()
-        self.patch_f.stop()
-        super(TestQueueReservedTask, self).tearDown()
 
     def test_creates_and_saves_reserved_resource(self):
-        self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
-        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1,2], {'a':2})
+        tasks._dispatch_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2],
+                                      {'a': 2}, 'worker1')
         self.mock_reserved_resource.assert_called_once_with('my_task_id', 'worker1',
                                                             'my_resource_id')
         self.mock_reserved_resource.return_value.save.assert_called_once_with()
 
     def test_dispatches_inner_task(self):
-        self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
-        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1,2], {'a':2})
+        tasks._dispatch_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2],
+                                      {'a': 2}, 'worker1')
         apply_async = self.mock_celery.tasks['task_name'].apply_async
         apply_async.assert_called_once_with(1, 2, a=2, routing_key='worker1', task_id='my_task_id',
                                             exchange='C.dq')
 
     def test_dispatches__release_resource(self):
-        self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
-        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1,2], {'a':2})
+        tasks._dispatch_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2],
+                                      {'a': 2}, 'worker1')
         self.mock__release_resource.apply_async.assert_called_once_with(('my_task_id',),
                                                                         routing_key='worker1',
                                                                         exchange='C.dq')
 
-    def test_get_worker_for_reservation_breaks_out_of_loop(self):
-        self.mock_get_worker_for_reservation.return_value = Worker('worker1', datetime.utcnow())
-        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1,2], {'a':2})
-        self.assertTrue(not self.mock_get_unreserved_worker.called)
-        self.assertTrue(not self.mock_time.sleep.called)
+    def test_dispatches__release_resource_on_error(self):
+        self.mock_celery.tasks['task_name'].apply_async.side_effect = ValueError()
 
-    def test_get_unreserved_worker_breaks_out_of_loop(self):
-        self.mock_get_worker_for_reservation.side_effect = NoWorkers()
-        self.mock_get_unreserved_worker.return_value = Worker('worker1', datetime.utcnow())
-        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1,2], {'a':2})
-        self.assertTrue(not self.mock_time.sleep.called)
+        self.assertRaises(ValueError, tasks._dispatch_reserved_task, 'task_name', 'my_task_id',
+                          'my_resource_id', [1, 2], {'a': 2}, 'worker1')
 
-    def test_loops_and_sleeps_waiting_for_available_worker(self):
-        self.mock_get_worker_for_reservation.side_effect = NoWorkers()
-        self.mock_get_unreserved_worker.side_effect = NoWorkers()
+        self.mock__release_resource.apply_async.assert_called_once_with(('my_task_id',),
+                                                                        routing_key='worker1',
+                                                                        exchange='C.dq')
 
-        class BreakOutException(Exception):
-            pass
 
-        def side_effect(*args):
-            def second_call(*args):
-                raise BreakOutException()
-            self.mock_time.sleep.side_effect = second_call
-            return None
+@mock.patch('pulp.server.async.tasks._get_reservation_scheduler', autospec=True)
+class TestReservationSchedulerTasks(unittest.TestCase):
 
-        self.mock_time.sleep.side_effect = side_effect
+    def test_queue_reserved_task(self, mock_get_scheduler):
+        tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
+        mock_get_scheduler.return_value.queue.assert_called_once_with(
+            'task_name', 'my_task_id', 'my_resource_id', [1, 2], {'a': 2})
 
-        try:
-            tasks._queue_reserved_task('task_name', 'my_task_id', 'my_resource_id', [1, 2],
-                                       {'a': 2})
-        except BreakOutException:
-            pass
-        else:
-            self.fail('_queue_reserved_task should have raised a BreakOutException')
+    def test_resource_released(self, mock_get_scheduler):
+        tasks._resource_released('my_task_id')
+        mock_get_scheduler.return_value.release.assert_called_once_with('my_task_id')
 
-        self.mock_time.sleep.assert_has_calls([mock.call(0.25), mock.call(0.25)])
+    def test_workers_changed(self, mock_get_scheduler):
+        tasks._workers_changed()
+        mock_get_scheduler.return_value.reload.assert_called_once_with()
 
 
 class TestDeleteWorker(ResourceReservationTests):
@@ -156,6 +146,9 @@ class TestDeleteWorker(ResourceReservationTests):
         self.patch_i = mock.patch('pulp.server.async.tasks.constants', autospec=True)
         self.mock_constants = self.patch_i.start()
 
+        self.patch_j = mock.patch('pulp.server.async.tasks._workers_changed', autospec=True)
+        self.mock__workers_changed = self.patch_j.start()
+
         super(TestDeleteWorker, self).setUp()
 
     def tearDown(self):
@@ -168,6 +161,7 @@ class TestDeleteWorker(ResourceReservationTests):
         self.patch_g.stop()
         self.patch_h.stop()
         self.patch_i.stop()
+        self.patch_j.stop()
         super(TestDeleteWorker, self).tearDown()
 
     def test_normal_shutdown_true_logs_correctly(self):
@@ -188,6 +182,10 @@ class TestDeleteWorker(ResourceReservationTests):
         remove = self.mock_reserved_resource.get_collection.return_value.remove
         remove.assert_called_once_with({'worker_name': 'worker1'})
 
+    def test_notifies_resource_manager(self):
+        tasks._delete_worker('worker1')
+        self.mock__workers_changed.apply_async.assert_called_once_with(queue='resource_manager')
+
     def test_criteria_to_find_all_worker_is_correct(self):
         tasks._delete_worker('worker1')
         self.assertEqual(self.mock_criteria.mock_calls[0], mock.call(filters={'_id': 'worker1'}))
@@ -234,11 +232,12 @@ class TestDeleteWorker(ResourceReservationTests):
         self.mock_cancel.assert_has_calls([mock.call(mock_task_id_a), mock.call(mock_task_id_b)])
 
 
+@mock.patch('pulp.server.async.tasks._resource_released', autospec=True)
 class TestReleaseResource(ResourceReservationTests):
     """
     Test the _release_resource() Task.
     """
-    def test_resource_not_in_resource_map(self):
+    def test_resource_not_in_resource_map(self, mock__resource_released):
         """
         Test _release_resource() with a resource that is not in the database. This should be
         gracefully handled, and result in no changes to the database.
@@ -275,7 +274,7 @@ class TestReleaseResource(ResourceReservationTests):
         self.assertEqual(rr_2['worker_name'], reserved_resource_2.worker_name)
         self.assertEqual(rr_2['resource_id'], 'resource_2')
 
-    def test_resource_in_resource_map(self):
+    def test_resource_in_resource_map(self, mock__resource_released):
         """
         Test _release_resource() with a valid resource. This should remove the resource from the
         database.
@@ -302,6 +301,10 @@ class TestReleaseResource(ResourceReservationTests):
         self.assertEqual(rr_1['worker_name'], reserved_resource_1.worker_name)
         self.assertEqual(rr_1['resource_id'], 'resource_1')
 
+        # The resource manager should have been told about the release
+        mock__resource_released.apply_async.assert_called_once_with(
+            (reserved_resource_2.task_id, ), queue='resource_manager')
+
 
 class TestTaskResult(unittest.TestCase):
 
@@ -57,6 +57,7 @@ class TestLogEvent(unittest.TestCase):
 
 
 class TestHandleWorkerHeartbeat(unittest.TestCase):
+    @mock.patch('pulp.server.async.worker_watcher._workers_changed')
     @mock.patch('__builtin__.list', return_value=False)
     @mock.patch('pulp.server.async.worker_watcher._parse_and_log_event')
     @mock.patch('pulp.server.async.worker_watcher._is_resource_manager', return_value=False)
@@ -67,7 +68,8 @@ class TestHandleWorkerHeartbeat(unittest.TestCase):
     @mock.patch('pulp.server.async.worker_watcher._logger')
     def test_handle_worker_heartbeat_new(self, mock__logger, mock_gettext, mock_worker,
                                          mock_resources, mock_criteria, mock__is_resource_manager,
-                                         mock__parse_and_log_event, mock_list):
+                                         mock__parse_and_log_event, mock_list,
+                                         mock__workers_changed):
         mock_event = mock.Mock()
 
         worker_watcher.handle_worker_heartbeat(mock_event)
@@ -82,6 +84,7 @@ class TestHandleWorkerHeartbeat(unittest.TestCase):
         mock_gettext.assert_called_once_with("New worker '%(worker_name)s' discovered")
         mock__logger.assert_called_once()
         mock_worker.return_value.save.assert_called_once_with()
+        mock__workers_changed.apply_async.assert_called_once_with(queue=RESOURCE_MANAGER_QUEUE)
 
     @mock.patch('__builtin__.list', return_value=True)
     @mock.patch('pulp.server.async.worker_watcher._parse_and_log_event')
@@ -0,0 +1,66 @@
+"""
+This module contains tests for the pulp.server.auth.authorization module.
+"""
+import unittest
+
+from pulp.server.auth.authorization import CREATE, READ, UPDATE, PermissionTrie
+
+
+class PermissionTrieTests(unittest.TestCase):
+
+    def test_from_permissions(self):
+        permissions = [
+            {'resource': '/v2/repositories/',
+             'users': [{'username': 'user', 'permissions': [READ]},
+                       {'username': 'other', 'permissions': [CREATE]}]},
+            {'resource': '/v2/repositories/repo-1/',
+             'users': [{'username': 'user', 'permissions': [UPDATE]}]},
+        ]
+
+        trie = PermissionTrie.from_permissions(permissions, 'user')
+
+        self.assertTrue(trie.is_authorized('/v2/repositories/', READ))
+        self.assertTrue(trie.is_authorized('/v2/repositories/repo-1/importers/', READ))
+        self.assertTrue(trie.is_authorized('/v2/repositories/repo-1/', UPDATE))
+        self.assertFalse(trie.is_authorized('/v2/repositories/', UPDATE))
+        self.assertFalse(trie.is_authorized('/v2/repositories/repo-2/', UPDATE))
+        self.assertFalse(trie.is_authorized('/v2/repositories/', CREATE))
+        self.assertFalse(trie.is_authorized('/v2/users/', READ))
+
+    def test_root(self):
+        trie = PermissionTrie()
+        trie.grant('/', [READ])
+
+        self.assertTrue(trie.is_authorized('/', READ))
+        self.assertTrue(trie.is_authorized('/v2/users/', READ))
+        self.assertFalse(trie.is_authorized('/v2/users/', UPDATE))
+
+    def test_non_canonical_resource_ignored(self):
+        trie = PermissionTrie()
+        trie.grant('/v2/repositories', [READ])
+        trie.grant('v2/users/', [READ])
+
+        self.assertFalse(trie.is_authorized('/v2/repositories/', READ))
+        self.assertFalse(trie.is_authorized('/v2/users/', READ))
+
+    def test_revoke(self):
+        trie = PermissionTrie()
+        trie.grant('/v2/', [READ])
+        trie.grant('/v2/repositories/repo-1/', [READ, UPDATE])
+
+        trie.revoke('/v2/repositories/repo-1/', [READ, UPDATE])
+        trie.revoke('/v2/consumers/', [READ])
+
+        self.assertTrue(trie.is_authorized('/v2/repositories/repo-1/', READ))
+        self.assertFalse(trie.is_authorized('/v2/repositories/repo-1/', UPDATE))
+        self.assertEqual(trie._root['children']['v2']['children'], {})
+
+    def test_revoke_keeps_children(self):
+        trie = PermissionTrie()
+        trie.grant('/v2/', [READ])
+        trie.grant('/v2/repositories/', [UPDATE])
+
+        trie.revoke('/v2/', [READ])
+
+        self.assertFalse(trie.is_authorized('/v2/', READ))
+        self.assertTrue(trie.is_authorized('/v2/repositories/', UPDATE))
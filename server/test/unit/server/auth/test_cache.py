@@ -0,0 +1,155 @@
+"""
+This module contains tests for the pulp.server.auth.cache module.
+"""
+import unittest
+
+import mock
+
+from pulp.server.auth import authorization
+from pulp.server.auth import cache
+from pulp.server.auth.authorization import PermissionTrie
+from pulp.server.managers.auth.authentication import AuthenticationManager
+from pulp.server.managers.auth.user.query import UserQueryManager
+
+
+@mock.patch.object(cache.AuthCache, 'ttl', return_value=60)
+class AuthCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = cache.AuthCache(max_entries=2)
+
+    def test_get_missing(self, mock_ttl):
+        self.assertTrue(self.cache.get('a') is None)
+
+    def test_put_get(self, mock_ttl):
+        self.cache.put('a', False)
+
+        self.assertEqual(self.cache.get('a'), False)
+
+    @mock.patch('pulp.server.auth.cache.time.time')
+    def test_expired(self, mock_time, mock_ttl):
+        mock_time.return_value = 1000
+        self.cache.put('a', True)
+
+        mock_time.return_value = 1059
+        self.assertEqual(self.cache.get('a'), True)
+        mock_time.return_value = 1061
+        self.assertTrue(self.cache.get('a') is None)
+
+    def test_least_recently_used_dropped(self, mock_ttl):
+        self.cache.put('a', 1)
+        self.cache.put('b', 2)
+        self.cache.get('a')
+
+        self.cache.put('c', 3)
+
+        self.assertEqual(self.cache.get('a'), 1)
+        self.assertTrue(self.cache.get('b') is None)
+        self.assertEqual(self.cache.get('c'), 3)
+
+    def test_disabled(self, mock_ttl):
+        mock_ttl.return_value = 0
+
+        self.cache.put('a', 1)
+
+        self.assertTrue(self.cache.get('a') is None)
+
+    def test_invalidate(self, mock_ttl):
+        cache.credentials.put('a', 'user')
+        cache.superusers.put('user', True)
+        cache.permissions.put('user', PermissionTrie())
+
+        cache.invalidate()
+
+        self.assertTrue(cache.credentials.get('a') is None)
+        self.assertTrue(cache.superusers.get('user') is None)
+        self.assertTrue(cache.permissions.get('user') is None)
+
+    def test_permissions_granted_and_revoked(self, mock_ttl):
+        cache.permissions.put('user', PermissionTrie())
+        cache.permissions_granted('user', '/v2/', [authorization.READ])
+        cache.permissions_granted('other', '/v2/', [authorization.READ])
+        self.assertTrue(cache.permissions.get('user').is_authorized('/v2/', authorization.READ))
+        self.assertTrue(cache.permissions.get('other') is None)
+
+        cache.permissions_revoked('user', '/v2/', [authorization.READ])
+        self.assertFalse(cache.permissions.get('user').is_authorized('/v2/', authorization.READ))
+        cache.invalidate()
+
+    def test_roles_changed(self, mock_ttl):
+        cache.superusers.put('user', True)
+        cache.superusers.put('other', True)
+
+        cache.roles_changed('user')
+
+        self.assertTrue(cache.superusers.get('user') is None)
+        self.assertTrue(cache.superusers.get('other'))
+        cache.invalidate()
+
+
+class CredentialsKeyTests(unittest.TestCase):
+
+    def test_distinct(self):
+        keys = set([cache.credentials_key('user', 'password'),
+                    cache.credentials_key('user', 'other'),
+                    cache.credentials_key('other', 'password'),
+                    cache.credentials_key('user', ''),
+                    cache.credentials_key('user', None),
+                    cache.credentials_key(u'user', u'p\xe4ssword')])
+
+        self.assertEqual(len(keys), 6)
+        self.assertEqual(cache.credentials_key('user', 'password'),
+                         cache.credentials_key(u'user', u'password'))
+
+    def test_password_not_in_key(self):
+        self.assertTrue('password' not in cache.credentials_key('user', 'password'))
+
+
+@mock.patch.object(cache.AuthCache, 'ttl', return_value=60)
+class CachedManagerTests(unittest.TestCase):
+
+    def tearDown(self):
+        cache.invalidate()
+
+    @mock.patch.object(AuthenticationManager, '_check_username_password_local')
+    def test_check_username_password(self, mock_check, mock_ttl):
+        mock_check.return_value = {'login': 'user'}
+        manager = AuthenticationManager()
+
+        self.assertEqual(manager.check_username_password('user', 'password'), 'user')
+        self.assertEqual(manager.check_username_password('user', 'password'), 'user')
+
+        mock_check.assert_called_once_with('user', 'password')
+
+    @mock.patch('pulp.server.managers.auth.authentication.config')
+    @mock.patch.object(AuthenticationManager, '_check_username_password_local')
+    def test_check_username_password_failure_not_cached(self, mock_check, mock_config,
+                                                        mock_ttl):
+        mock_check.return_value = None
+        mock_config.getboolean.return_value = False
+        manager = AuthenticationManager()
+
+        self.assertTrue(manager.check_username_password('user', 'wrong') is None)
+        self.assertTrue(manager.check_username_password('user', 'wrong') is None)
+
+        self.assertEqual(mock_check.call_count, 2)
+
+    @mock.patch('pulp.server.managers.auth.user.query.Permission')
+    @mock.patch('pulp.server.managers.auth.user.query.User')
+    def test_is_authorized(self, mock_user, mock_permission, mock_ttl):
+        mock_user.get_collection.return_value.find_one.return_value = {'roles': []}
+        mock_permission.get_collection.return_value.find.return_value = [
+            {'resource': '/v2/repositories/',
+             'users': [{'username': 'user', 'permissions': [authorization.READ]}]}]
+        manager = UserQueryManager()
+
+        for i in range(2):
+            self.assertTrue(manager.is_authorized('/v2/repositories/repo-1/', 'user',
+                                                  authorization.READ))
+        self.assertFalse(manager.is_authorized('/v2/repositories/', 'user',
+                                               authorization.UPDATE))
+
+        mock_user.get_collection.return_value.find_one.assert_called_once_with(
+            {'login': 'user'})
+        mock_permission.get_collection.return_value.find.assert_called_once_with(
+            {'users.username': 'user'})
@@ -20,7 +20,7 @@ from mock import patch, Mock
 
 from pulp.server.content.sources.container import (
     ContentContainer, NectarListener, Item, RequestQueue, Batch, DownloadReport,
-    Listener, NectarFeed, Tracker)
+    Listener, NectarFeed, Tracker, RefreshPool)
 from pulp.server.content.sources.model import ContentSource
 
 
@@ -104,6 +104,7 @@ class TestContainer(TestCase):
             s.refresh.assert_called_with(canceled)
 
         self.assertEqual(sorted(report), [0, 1, 2])
+        fake_manager().refresh_cache.assert_called_once_with()
 
     @patch('pulp.server.content.sources.container.ContentSource.load_all')
     @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
@@ -139,7 +140,7 @@ class TestContainer(TestCase):
         canceled.is_set.return_value = False
         for n in range(3):
             s = ContentSource('s-%d' % n, {})
-            s.refresh = Mock()
+            s.refresh = Mock(return_value=[])
             sources[s.id] = s
 
         fake_manager().has_entries.return_value = True
@@ -188,6 +189,46 @@ class TestContainer(TestCase):
         fake_manager().purge_orphans.assert_called_with(fake_load.return_value.keys())
 
 
+class TestRefreshPool(TestCase):
+
+    def test_refresh(self):
+        sources = []
+        for n in range(5):
+            s = ContentSource('s-%d' % n, {})
+            s.refresh = Mock(return_value=[n, n])
+            sources.append(s)
+        sources[2].refresh.side_effect = ValueError('failed')
+        canceled = Mock()
+        canceled.is_set.return_value = False
+
+        # test
+        reports = RefreshPool(canceled, 2).refresh(sources)
+
+        # validation
+        for s in sources:
+            s.refresh.assert_called_once_with(canceled)
+        self.assertEqual(reports[:4], [0, 0, 1, 1])
+        self.assertEqual(reports[4].source_id, 's-2')
+        self.assertEqual(reports[4].errors, ['failed'])
+        self.assertEqual(reports[5:], [3, 3, 4, 4])
+
+    def test_refresh_canceled(self):
+        s = ContentSource('s-1', {})
+        s.refresh = Mock()
+        canceled = Mock()
+        canceled.is_set.return_value = True
+
+        # test
+        reports = RefreshPool(canceled, 2).refresh([s])
+
+        # validation
+        self.assertFalse(s.refresh.called)
+        self.assertEqual(reports, [])
+
+    def test_refresh_nothing(self):
+        self.assertEqual(RefreshPool(Mock(), 2).refresh([]), [])
+
+
 class TestNectarListener(TestCase):
 
     @patch('pulp.server.content.sources.container.log')
@@ -539,12 +580,15 @@ class TestBatch(TestCase):
         self.assertEqual(batch.queues[fake_source.id], fake_queue())
         self.assertEqual(queue, fake_queue())
 
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
     @patch('pulp.server.content.sources.container.Tracker.wait')
     @patch('pulp.server.content.sources.container.Batch.dispatch')
-    def test_download(self, fake_dispatch, fake_wait):
+    def test_download(self, fake_dispatch, fake_wait, fake_manager):
         primary = Mock()
         sources = [Mock(), Mock()]
         requests = [Mock(), Mock(), Mock()]
+        entries = [[Mock()], [], [Mock(), Mock()]]
+        fake_manager().find_many.return_value = entries
 
         queue_1 = Mock()
         queue_1.downloader = Mock()
@@ -565,9 +609,12 @@ class TestBatch(TestCase):
         report = batch.download()
 
         # validation
+        # catalog searched once
+        units = [(r.type_id, r.unit_key) for r in requests]
+        fake_manager().find_many.assert_called_once_with(units, cached=True)
         # initial dispatch
-        for request in requests:
-            request.find_sources.assert_called_with(primary, sources)
+        for i, request in enumerate(requests):
+            request.find_sources.assert_called_with(primary, sources, entries[i])
         calls = fake_dispatch.call_args_list
         self.assertEqual(len(calls), len(requests))
         for i, request in enumerate(requests):
@@ -587,6 +634,31 @@ class TestBatch(TestCase):
         self.assertEqual(report.downloads['source-2'].total_succeeded, 200)
         self.assertEqual(report.downloads['source-2'].total_failed, 10)
 
+    @patch('pulp.server.content.sources.container.FIND_SOURCES_BATCH_SIZE', 2)
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
+    @patch('pulp.server.content.sources.container.Tracker.wait')
+    @patch('pulp.server.content.sources.container.Batch.dispatch')
+    def test_download_batched(self, fake_dispatch, fake_wait, fake_manager):
+        primary = Mock()
+        sources = [Mock(), Mock()]
+        requests = [Mock(), Mock(), Mock()]
+        fake_manager().find_many.side_effect = [[[], []], [[]]]
+
+        # test
+        canceled = Mock()
+        canceled.is_set.return_value = False
+        batch = Batch(canceled, primary, sources, iter(requests), None)
+        batch.download()
+
+        # validation
+        calls = fake_manager().find_many.call_args_list
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(len(calls[0][0][0]), 2)
+        self.assertEqual(len(calls[1][0][0]), 1)
+        self.assertEqual(fake_dispatch.call_count, len(requests))
+        fake_wait.assert_called_once_with(len(requests))
+
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager', Mock())
     @patch('pulp.server.content.sources.container.Tracker.wait')
     @patch('pulp.server.content.sources.container.Batch.dispatch')
     def test_download_nothing(self, fake_dispatch, fake_wait):
@@ -607,6 +679,7 @@ class TestBatch(TestCase):
         self.assertEqual(len(report.downloads), 0)
         fake_wait.assert_called_once_with(0)
 
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager', Mock())
     @patch('pulp.server.content.sources.container.Tracker.wait')
     @patch('pulp.server.content.sources.container.Batch.dispatch')
     def test_download_canceled(self, fake_dispatch, fake_wait):
@@ -646,13 +719,15 @@ class TestBatch(TestCase):
         self.assertEqual(report.downloads['source-2'].total_succeeded, 200)
         self.assertEqual(report.downloads['source-2'].total_failed, 10)
 
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
     @patch('pulp.server.content.sources.container.Tracker.wait')
     @patch('pulp.server.content.sources.container.Batch.dispatch')
-    def test_download_with_exception(self, fake_dispatch, fake_wait):
+    def test_download_with_exception(self, fake_dispatch, fake_wait, fake_manager):
         primary = Mock()
         fake_dispatch.side_effect = ValueError()
         sources = [Mock(), Mock()]
         requests = [Mock(), Mock(), Mock()]
+        fake_manager().find_many.return_value = [[], [], []]
 
         # test
         canceled = Mock()
@@ -2,7 +2,7 @@ import os
 import sys
 from unittest import TestCase
 
-from mock import patch, Mock
+from mock import patch, Mock, ANY
 
 from pulp.common.constants import PRIMARY_ID
 from pulp.plugins.conduits.cataloger import CatalogerConduit
@@ -147,6 +147,24 @@ class TestRequest(TestCase):
         self.assertEqual(request.sources[4][0].id, primary.id)
         self.assertEqual(request.sources[4][1], url)
 
+    @patch('pulp.server.content.sources.container.managers.content_catalog_manager')
+    def test_find_sources_with_entries(self, fake_manager):
+        primary = PrimarySource(None)
+        alternatives = dict([(s, ContentSource(s, d)) for s, d in DESCRIPTOR])
+
+        # test
+
+        request = Request('test_1', 1, 'http://redhat.com/repository', '/tmp/123')
+        request.find_sources(primary, alternatives, CATALOG[:2])
+
+        # validation
+
+        self.assertFalse(fake_manager().find.called)
+        request.sources = list(request.sources)
+        self.assertEqual(len(request.sources), 3)
+        self.assertEqual(request.sources[0][0].id, 's-1')
+        self.assertEqual(request.sources[2][0].id, primary.id)
+
     def test_next_source(self):
         sources = [1, 2, 3]
         request = Request('', {}, '', '')
@@ -376,19 +394,23 @@ class TestContentSource(TestCase):
         fake_cataloger.get_downloader.assert_called_with(fake_conduit, source.descriptor, url)
         self.assertEqual(downloader, fake_downloader)
 
+    @patch('pulp.server.content.sources.model.managers.content_catalog_manager')
     @patch('pulp.server.content.sources.model.ContentSource.urls')
-    def test_refresh(self, fake_urls):
+    def test_refresh(self, fake_urls, fake_manager):
         url = 'http://xyz.com'
         urls = ['url-1', 'url-2']
         fake_urls.__get__ = Mock(return_value=urls)
+        fake_manager().get_fingerprint.return_value = None
+        fake_manager().purge_stale.return_value = 0
 
         canceled = Mock()
         canceled.isSet = Mock(return_value=False)
         conduit = Mock()
         cataloger = Mock()
         cataloger.refresh.side_effect = FakeRefresh()
+        cataloger.fingerprint.return_value = 'abc'
 
-        source = ContentSource('s-1', {constants.BASE_URL: url})
+        source = ContentSource('s-1', {constants.BASE_URL: url, constants.EXPIRES: '1h'})
         source.get_conduit = Mock(return_value=conduit)
         source.get_cataloger = Mock(return_value=cataloger)
 
@@ -413,10 +435,78 @@ class TestContentSource(TestCase):
             self.assertEqual(report[n].errors, [])
             self.assertEqual(report[n].added_count, added)
             self.assertEqual(report[n].deleted_count, deleted)
+            self.assertFalse(report[n].skipped)
+            fake_manager().purge_stale.assert_any_call(source.id, _url, ANY)
+            fake_manager().set_fingerprint.assert_any_call(source.id, _url, 'abc')
             added += 10
             deleted += 1
             n += 1
+        self.assertEqual(fake_manager().increment_generation.call_count, len(urls))
 
+    @patch('pulp.server.content.sources.model.managers.content_catalog_manager')
+    @patch('pulp.server.content.sources.model.ContentSource.urls')
+    def test_refresh_not_changed(self, fake_urls, fake_manager):
+        urls = ['url-1', 'url-2']
+        fake_urls.__get__ = Mock(return_value=urls)
+        fake_manager().get_fingerprint.side_effect = ['abc', 'xyz']
+        fake_manager().renew.return_value = 10
+        fake_manager().purge_stale.return_value = 2
+
+        canceled = Mock()
+        canceled.isSet = Mock(return_value=False)
+        cataloger = Mock()
+        cataloger.refresh.side_effect = FakeRefresh()
+        cataloger.fingerprint.return_value = 'abc'
+
+        source = ContentSource('s-1', {constants.EXPIRES: '1h'})
+        source.get_conduit = Mock(return_value=Mock())
+        source.get_cataloger = Mock(return_value=cataloger)
+
+        # test
+
+        report = source.refresh(canceled)
+
+        # validation
+
+        # only the changed url is refreshed
+        self.assertEqual(cataloger.refresh.call_count, 1)
+        fake_manager().renew.assert_called_once_with(source.id, 'url-1', source.expires)
+        self.assertTrue(report[0].succeeded)
+        self.assertTrue(report[0].skipped)
+        self.assertEqual(report[0].added_count, 0)
+        self.assertTrue(report[1].succeeded)
+        self.assertFalse(report[1].skipped)
+        self.assertEqual(report[1].added_count, 10)
+        self.assertEqual(report[1].deleted_count, 3)
+
+    @patch('pulp.server.content.sources.model.managers.content_catalog_manager')
+    @patch('pulp.server.content.sources.model.ContentSource.urls')
+    def test_refresh_not_changed_no_entries(self, fake_urls, fake_manager):
+        fake_urls.__get__ = Mock(return_value=['url-1'])
+        fake_manager().get_fingerprint.return_value = 'abc'
+        fake_manager().renew.return_value = 0
+        fake_manager().purge_stale.return_value = 0
+
+        canceled = Mock()
+        canceled.isSet = Mock(return_value=False)
+        cataloger = Mock()
+        cataloger.fingerprint.return_value = 'abc'
+
+        source = ContentSource('s-1', {constants.EXPIRES: '1h'})
+        source.get_conduit = Mock(return_value=Mock(added_count=0, deleted_count=0))
+        source.get_cataloger = Mock(return_value=cataloger)
+
+        # test
+
+        report = source.refresh(canceled)
+
+        # validation
+
+        self.assertEqual(cataloger.refresh.call_count, 1)
+        self.assertFalse(report[0].skipped)
+        self.assertFalse(fake_manager().increment_generation.called)
+
+    @patch('pulp.server.content.sources.model.managers.content_catalog_manager', Mock())
     @patch('pulp.server.content.sources.model.ContentSource.urls')
     def test_refresh_canceled(self, fake_urls):
         url = 'http://xyz.com'
@@ -444,6 +534,7 @@ class TestContentSource(TestCase):
         self.assertEqual(cataloger.refresh.call_count, 0)
         self.assertEqual(report, [])
 
+    @patch('pulp.server.content.sources.model.managers.content_catalog_manager', Mock())
     @patch('pulp.server.content.sources.model.ContentSource.urls')
     def test_refresh_raised(self, fake_urls):
         url = 'http://xyz.com'
@@ -456,7 +547,7 @@ class TestContentSource(TestCase):
         cataloger = Mock()
         cataloger.refresh.side_effect = ValueError('just failed')
 
-        source = ContentSource('s-1', {constants.BASE_URL: url})
+        source = ContentSource('s-1', {constants.BASE_URL: url, constants.EXPIRES: '1h'})
         source.get_conduit = Mock(return_value=conduit)
         source.get_cataloger = Mock(return_value=cataloger)
 
@@ -597,6 +688,8 @@ class TestRefreshReport(TestCase):
         self.assertFalse(report.succeeded)
         self.assertEqual(report.added_count, 0)
         self.assertEqual(report.deleted_count, 0)
+        self.assertFalse(report.skipped)
+        self.assertEqual(report.duration, 0.0)
         self.assertEqual(report.errors, [])
 
     def test_dict(self):
@@ -604,6 +697,8 @@ class TestRefreshReport(TestCase):
         url = 'myurl'
         report = RefreshReport(source_id, url)
         report_dict = report.dict()
+        self.assertFalse(report_dict['skipped'])
+        self.assertEqual(report_dict['duration'], 0.0)
         self.assertEqual(report_dict['source_id'], source_id)
         self.assertEqual(report_dict['url'], url)
         self.assertFalse(report_dict['succeeded'])
@@ -24,6 +24,7 @@ from celery.schedules import schedule as CelerySchedule
 import mock
 
 from pulp.common import dateutils
+from pulp.server.db.model import dispatch
 from pulp.server.db.model.auth import User
 from pulp.server.db.model.dispatch import TaskStatus, ScheduledCall, ScheduleEntry
 from pulp.server.managers.factory import initialize
@@ -613,6 +614,31 @@ class TestScheduledCallCalculateTimes(unittest.TestCase):
 
         self.assertEqual(expected_runs, 0)
 
+    @mock.patch('pulp.server.db.model.dispatch.pickle.loads', wraps=pickle.loads)
+    @mock.patch('pulp.common.dateutils.parse_iso8601_datetime',
+                wraps=dateutils.parse_iso8601_datetime)
+    def test_parsed_values_cached(self, mock_parse, mock_loads):
+        call = ScheduledCall('2014-01-03T10:15Z/PT1H', 'pulp.tasks.dosomething')
+        dispatch._parsed_datetimes.clear()
+        dispatch._parsed_intervals.clear()
+        mock_parse.reset_mock()
+        mock_loads.reset_mock()
+
+        first = call._calculate_times()
+        second = call._calculate_times()
+
+        self.assertEqual((first[1], first[3]), (second[1], second[3]))
+        self.assertEqual(mock_parse.call_count, 1)
+        self.assertEqual(mock_loads.call_count, 1)
+
+    @mock.patch('pulp.server.db.model.dispatch.PARSED_CACHE_SIZE', new=2)
+    def test_parsed_cache_bounded(self):
+        cache = {}
+        for key in ('a', 'b', 'c'):
+            self.assertEqual(dispatch._cached(cache, key, lambda k: k.upper()), key.upper())
+
+        self.assertEqual(cache, {'c': 'C'})
+
 
 class TestScheduledCallCalculateNextRun(unittest.TestCase):
     @mock.patch('time.time')
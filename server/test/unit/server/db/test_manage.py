@@ -14,6 +14,7 @@ Test the pulp.server.db.manage module.
 from argparse import Namespace
 from cStringIO import StringIO
 import os
+import unittest
 
 from mock import call, inPy3k, MagicMock, patch
 
@@ -460,7 +461,7 @@ class TestManageDB(MigrationTest):
     def test_dry_run_no_changes(self, mock_file_config, mock_parse_args, mocked_apply_migration, mock_entry, getLogger):
         logger = MagicMock()
         getLogger.return_value = logger
-        mock_args = Namespace(dry_run=True, test=False)
+        mock_args = Namespace(dry_run=True, test=False, repair_refcounts=False)
         mock_parse_args.return_value = mock_args
 
         # Test that when dry run is on, it returns 1 if migrations remain
@@ -829,3 +830,28 @@ class TestMigrationUtils(MigrationTest):
                               call('Migration version 2 is missing in '
                                    'unit.server.db.migration_packages.version_gap.')]
         log_mock.assert_has_calls(expected_log_calls)
+
+
+@patch('pulp.server.db.manage.logger', MagicMock())
+class TestRepairRefcounts(unittest.TestCase):
+
+    @patch('pulp.server.db.manage.ContentRefcountManager.verify_refcounts', return_value=2)
+    @patch('pulp.server.db.manage.types_db.all_type_ids', return_value=['t1', 't2'])
+    def test_repair(self, all_type_ids, verify_refcounts):
+        options = Namespace(dry_run=False, test=False, repair_refcounts=True)
+
+        self.assertFalse(manage._repair_refcounts(options))
+
+        verify_refcounts.assert_has_calls([call('t1', repair=True), call('t2', repair=True)])
+
+    @patch('pulp.server.db.manage.ContentRefcountManager.verify_refcounts')
+    @patch('pulp.server.db.manage.types_db.all_type_ids', return_value=['t1'])
+    def test_dry_run(self, all_type_ids, verify_refcounts):
+        options = Namespace(dry_run=True, test=False, repair_refcounts=True)
+
+        verify_refcounts.return_value = 0
+        self.assertFalse(manage._repair_refcounts(options))
+        verify_refcounts.return_value = 1
+        self.assertTrue(manage._repair_refcounts(options))
+
+        verify_refcounts.assert_called_with('t1', repair=False)
@@ -444,6 +444,27 @@ class RepoUnitAssociationManagerTests(base.PulpServerTests):
 
         mock_call.assert_called_once_with(self.repo_id, 'type-1', 2)
 
+    @mock.patch('pulp.server.managers.repo.unit_association.ASSOCIATION_PAGE_SIZE', 2)
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    def test_associate_all_pages(self, mock_call):
+        self.manager.associate_unit_by_id(
+            self.repo_id, 'type-1', 'foo', OWNER_TYPE_IMPORTER, 'test-importer', False)
+
+        ret = self.manager.associate_all_by_ids(
+            self.repo_id, 'type-1', iter(['foo', 'bar', 'baz', 'qux']), OWNER_TYPE_USER, 'admin')
+
+        self.assertEqual(ret, 3)
+        mock_call.assert_called_once_with(self.repo_id, 'type-1', 3)
+        repo_units = list(RepoContentUnit.get_collection().find({'repo_id': self.repo_id}))
+        self.assertEqual(4, len(repo_units))
+        owners = dict((u['unit_id'], u['owner_type']) for u in repo_units)
+        self.assertEqual(owners['foo'], OWNER_TYPE_IMPORTER)
+        self.assertEqual(owners['bar'], OWNER_TYPE_USER)
+
+    def test_associate_all_invalid_owner_type(self):
+        self.assertRaises(exceptions.InvalidValue, self.manager.associate_all_by_ids,
+                          self.repo_id, 'type-1', ['unit-1'], 'bad-owner', 'irrelevant')
+
     def test_unassociate_all(self):
         """
         Tests unassociating multiple units in a single call.
@@ -493,6 +514,19 @@ class RepoUnitAssociationManagerTests(base.PulpServerTests):
         self.assertEqual(mock_call.call_args_list[1][0][1], self.unit_type_id)
         self.assertEqual(mock_call.call_args_list[1][0][2], -1)
 
+    @mock.patch('pulp.server.managers.repo.unit_association.ASSOCIATION_PAGE_SIZE', 1)
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    def test_unassociate_all_calls_update_unit_count_once(self, mock_call):
+        unit_ids = [self.unit_id, self.unit_id_2]
+        self.manager.associate_all_by_ids(self.repo_id, self.unit_type_id, unit_ids,
+                                          OWNER_TYPE_USER, 'admin')
+        mock_call.reset_mock()
+
+        self.manager.unassociate_all_by_ids(self.repo_id, self.unit_type_id, unit_ids,
+                                            OWNER_TYPE_USER, 'admin')
+
+        mock_call.assert_called_once_with(self.repo_id, self.unit_type_id, -2)
+
     @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
     def test_unassociate_by_id_non_unique(self, mock_call):
         self.manager.associate_unit_by_id(
@@ -506,6 +540,21 @@ class RepoUnitAssociationManagerTests(base.PulpServerTests):
             self.repo_id, 'type-1', 'unit-1', OWNER_TYPE_USER, 'admin1')
         self.assertEqual(mock_call.call_count, 1) # only once for the associates
 
+    @mock.patch('pulp.server.managers.content.refcount.ContentRefcountManager.enabled',
+                return_value=True)
+    def test_refcounts(self, mock_enabled):
+        unit_ids = [self.unit_id, self.unit_id_2]
+        self.manager.associate_all_by_ids(self.repo_id, self.unit_type_id, unit_ids,
+                                          OWNER_TYPE_USER, 'admin')
+        self.manager.associate_unit_by_id(self.repo_id, self.unit_type_id, self.unit_id,
+                                          OWNER_TYPE_IMPORTER, 'test-importer')
+        self.manager.unassociate_unit_by_id(self.repo_id, self.unit_type_id, self.unit_id_2,
+                                            OWNER_TYPE_USER, 'admin', notify_plugins=False)
+
+        collection = database.type_units_collection(self.unit_type_id)
+        self.assertEqual(collection.find_one({'_id': self.unit_id})['_refcount'], 1)
+        self.assertEqual(collection.find_one({'_id': self.unit_id_2})['_refcount'], 0)
+
     @mock.patch('pymongo.cursor.Cursor.count', return_value=1)
     def test_association_exists_true(self, mock_count):
         self.assertTrue(self.manager.association_exists(self.repo_id, 'unit-1', 'type-1'))
@@ -74,6 +74,35 @@ class RepoUnitAssociationQueryManagerTests(unittest.TestCase):
         ]
         self.assertEqual(return_value, expected_return_value)
 
+    @mock.patch('pulp.server.managers.repo.unit_association_query.types_db')
+    def test__units_from_association_batches(self, mock_types_db):
+        """
+        Make sure each batch is resolved with one query per type, the association order is kept
+        and associations without a matching unit are dropped.
+        """
+        collection = mock_types_db.type_units_collection.return_value
+        collection.find.side_effect = [
+            [{'_id': 'u2', '_content_type_id': 'rpm'}],
+            [{'_id': 'u3', '_content_type_id': 'rpm'}],
+        ]
+        batches = [
+            [{'unit_type_id': 'rpm', 'unit_id': 'u1'}, {'unit_type_id': 'rpm', 'unit_id': 'u2'}],
+            [{'unit_type_id': 'rpm', 'unit_id': 'u3'}],
+        ]
+        criteria = UnitAssociationCriteria(unit_filters={'a': 1}, unit_fields=['a'])
+
+        units = list(association_query_manager.RepoUnitAssociationQueryManager.
+                     _units_from_association_batches(iter(batches), criteria))
+
+        self.assertEqual([u['unit_id'] for u in units], ['u2', 'u3'])
+        self.assertEqual(units[0]['metadata'], {'_id': 'u2', '_content_type_id': 'rpm'})
+        self.assertEqual(collection.find.call_count, 2)
+        collection.find.assert_any_call({'a': 1, '_id': {'$in': ['u1', 'u2']}},
+                                        fields=['a', '_content_type_id'])
+        # the criteria must not be changed
+        self.assertEqual(criteria.unit_fields, ['a'])
+        self.assertEqual(criteria.unit_filters, {'a': 1})
+
 
 class UnitAssociationQueryTests(base.PulpServerTests):
 
@@ -409,6 +438,99 @@ class UnitAssociationQueryTests(base.PulpServerTests):
             self.assertFalse('created' in u)
             self.assertFalse('updated' in u)
 
+    # -- streamed get_units tests ----------------------------------------------
+
+    def test_get_units_streamed(self):
+        # Test
+        units = self.manager.get_units('repo-1', batch_size=2)
+
+        # Verify
+        self.assertEqual(self.repo_1_count + len(self.units['gamma']), len(units))
+
+        #   Without an association sort the units are ordered by type and unit id
+        ids = [(u['unit_type_id'], u['unit_id']) for u in units]
+        self.assertEqual(ids, sorted(ids))
+
+        for u in units:
+            self.assertEqual(u['unit_id'], u['metadata']['_id'])
+            self.assertEqual(u['unit_type_id'], u['metadata']['_content_type_id'])
+
+    def test_get_units_streamed_as_generator(self):
+        # Test
+        units = self.manager.get_units('repo-1', as_generator=True, batch_size=2)
+
+        # Verify
+        self.assertFalse(isinstance(units, list))
+        self.assertEqual(self.repo_1_count + len(self.units['gamma']), len(list(units)))
+
+    def test_get_units_streamed_skip_limit(self):
+        # Test
+        all_units = self.manager.get_units('repo-1', batch_size=2)
+
+        criteria = UnitAssociationCriteria(skip=3, limit=4)
+        units = self.manager.get_units('repo-1', criteria, batch_size=2)
+
+        # Verify
+        self.assertEqual(all_units[3:7], units)
+
+    def test_get_units_streamed_association_sort(self):
+        # Test
+        criteria = UnitAssociationCriteria(
+            association_sort=[('created', association_manager.SORT_DESCENDING)])
+        units = self.manager.get_units('repo-1', criteria, batch_size=3)
+
+        # Verify
+        self.assertEqual(self.repo_1_count + len(self.units['gamma']), len(units))
+        for u1, u2 in zip(units, units[1:]):
+            self.assertTrue(u1['created'] >= u2['created'])
+
+        #   The caller's criteria is left untouched
+        self.assertEqual(criteria.association_sort,
+                         [('created', association_manager.SORT_DESCENDING)])
+
+    def test_get_units_streamed_unit_filters_skip_limit(self):
+        # Test
+        criteria = UnitAssociationCriteria(type_ids=['beta'], unit_filters={'md_2': 0})
+        all_units = self.manager.get_units('repo-1', criteria, batch_size=1)
+
+        criteria = UnitAssociationCriteria(type_ids=['beta'], unit_filters={'md_2': 0},
+                                           skip=1, limit=1)
+        units = self.manager.get_units('repo-1', criteria, batch_size=1)
+
+        # Verify
+        self.assertEqual(2, len(all_units))
+        for u in all_units:
+            self.assertEqual(0, u['metadata']['md_2'])
+        self.assertEqual(all_units[1:], units)
+
+    def test_get_units_streamed_remove_duplicates(self):
+        # Test
+        criteria = UnitAssociationCriteria(remove_duplicates=True)
+        units = self.manager.get_units('repo-1', criteria, batch_size=2)
+
+        # Verify
+        self.assertEqual(self.repo_1_count, len(units))
+
+        #   The earliest (user) association is the one kept
+        gamma_units = [u for u in units if u['unit_type_id'] == 'gamma']
+        self.assertEqual(2, len(gamma_units))
+        for u in gamma_units:
+            self.assertEqual(OWNER_TYPE_USER, u['owner_type'])
+
+    def test_get_units_streamed_unit_sort_not_streamed(self):
+        # Setup
+        self.manager._streamed_units = mock.MagicMock()
+
+        # Test
+        criteria = UnitAssociationCriteria(
+            unit_sort=[('key_1', association_manager.SORT_DESCENDING)])
+        units = self.manager.get_units_by_type('repo-1', 'alpha', criteria)
+        streamed = self.manager.get_units('repo-1', criteria, batch_size=2)
+
+        # Verify
+        self.assertEqual(0, self.manager._streamed_units.call_count)
+        self.assertEqual(units, streamed)
+
     # -- get_units_by_type tests ----------------------------------------------
 
     def test_get_units_by_type_no_criteria(self):
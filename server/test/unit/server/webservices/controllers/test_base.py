@@ -12,6 +12,7 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import copy
+import json
 import unittest
 
 from datetime import datetime
@@ -98,3 +99,32 @@ class JSONControllerTests(unittest.TestCase):
                 (('Content-Type', 'application/json'), {}),
                 (('Content-Length', len(encoded)), {}),
             ])
+
+    @patch('pulp.server.webservices.http.header')
+    def test_output_stream(self, header):
+        """
+        Test streamed json encoding.
+        """
+        data = [{'a': 1}, {'b': datetime(2014, 1, 1)}]
+
+        chunks = list(JSONController()._output_stream(iter(data)))
+
+        self.assertEqual(json.loads(''.join(chunks)), [{'a': 1}, {'b': json_encoder(data[1]['b'])}])
+        header.assert_called_once_with('Content-Type', 'application/json')
+
+    @patch('pulp.server.webservices.http.header')
+    def test_output_stream_extra(self, header):
+        def extra():
+            return {'next_cursor': None}
+
+        chunks = list(JSONController()._output_stream(iter([1, 2]), extra))
+
+        self.assertEqual(json.loads(''.join(chunks)), {'results': [1, 2], 'next_cursor': None})
+
+    @patch('pulp.server.webservices.http.header')
+    @patch('pulp.server.webservices.controllers.base.STREAM_CHUNK_SIZE', 5)
+    def test_output_stream_chunks(self, header):
+        chunks = list(JSONController()._output_stream(['abcd', 'efgh', 'ijkl']))
+
+        self.assertEqual(chunks, ['["abcd"', ', "efgh"', ', "ijkl"', ']'])
+        self.assertEqual(json.loads(''.join(chunks)), ['abcd', 'efgh', 'ijkl'])
@@ -1,7 +1,6 @@
 """
 Test the pulp.server.webservices.controllers.consumers module.
 """
-import datetime
 import logging
 
 from web.webapi import BadRequest
@@ -20,7 +19,6 @@ from pulp.server.db.model.consumer import (Consumer, Bind, RepoProfileApplicabil
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.dispatch import ScheduledCall
 from pulp.server.db.model.repository import Repo, RepoDistributor
-from pulp.server.db.model.resources import Worker
 from pulp.server.exceptions import InvalidValue, OperationPostponed, MissingValue
 from pulp.server.managers import factory
 from pulp.server.managers.consumer.bind import BindManager
@@ -1592,9 +1590,7 @@ class TestConsumerApplicabilityRegeneration(base.PulpWebserviceTests):
         for consumer_id in self.CONSUMER_IDS:
             manager.create(consumer_id, 'rpm', self.PROFILE)
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_regenerate_applicability(self, mock_get_worker_for_reservation):
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
+    def test_regenerate_applicability(self):
         self.populate()
         self.populate_bindings()
         request_body = dict(consumer_criteria={'filters': self.FILTER})
@@ -1604,9 +1600,7 @@ class TestConsumerApplicabilityRegeneration(base.PulpWebserviceTests):
         self.assertEquals(status, 202)
         self.assertTrue('task_id' in body.get('spawned_tasks')[0])
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_regenerate_applicability_no_consumers(self, mock_get_worker_for_reservation):
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
+    def test_regenerate_applicability_no_consumers(self):
         # Test
         request_body = dict(consumer_criteria={'filters': self.FILTER})
         status, body = self.post(self.PATH, request_body)
@@ -1614,9 +1608,7 @@ class TestConsumerApplicabilityRegeneration(base.PulpWebserviceTests):
         self.assertEquals(status, 202)
         self.assertTrue('task_id' in body.get('spawned_tasks')[0])
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_regenerate_applicability_no_bindings(self, mock_get_worker_for_reservation):
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
+    def test_regenerate_applicability_no_bindings(self):
         # Setup
         self.populate()
         # Test
@@ -1649,9 +1641,7 @@ class TestConsumerApplicabilityRegeneration(base.PulpWebserviceTests):
         self.assertTrue('property_names' in body)
         self.assertTrue(body['property_names'] == ['consumer_criteria'])
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_consumer_regenerate_applicability(self, mock_get_worker_for_reservation):
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
+    def test_consumer_regenerate_applicability(self):
         self.populate()
         self.populate_bindings()
 
@@ -1661,9 +1651,7 @@ class TestConsumerApplicabilityRegeneration(base.PulpWebserviceTests):
         self.assertEquals(status, 202)
         self.assertTrue('task_id' in body.get('spawned_tasks')[0])
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_consumer_regenerate_applicability_no_bindings(self, mock_get_worker_for_reservation):
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
+    def test_consumer_regenerate_applicability_no_bindings(self):
         self.populate()
 
         consumer_path = '/v2/consumers/%s/actions/content/regenerate_applicability/'
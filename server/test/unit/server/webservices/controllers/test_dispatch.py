@@ -12,6 +12,7 @@ from pulp.devel.unit.server.base import PulpWebservicesTests
 from pulp.devel.unit.util import compare_dict
 from pulp.server.async.task_status_manager import TaskStatusManager
 from pulp.server.auth import authorization
+from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.dispatch import TaskStatus
 from pulp.server.exceptions import MissingResource
 from pulp.server.webservices import serialization
@@ -247,11 +248,13 @@ class SearchTaskCollectionTests(PulpWebservicesTests):
                 u'spawned_tasks': [u'bar', u'baz']}
 
     @mock.patch('pulp.server.webservices.controllers.dispatch.SearchTaskCollection.'
-                '_get_query_results_from_get', autospec=True)
-    def test_get(self, mock_get_results):
+                '_get_criteria_from_get', autospec=True)
+    @mock.patch('pulp.server.webservices.controllers.dispatch.TaskStatusManager.find_by_criteria')
+    def test_get(self, mock_find, mock_get_criteria):
         search_controller = dispatch_controller.SearchTaskCollection()
-        mock_get_results.return_value = [self.get_task()]
-        processed_tasks_json = search_controller.GET()
+        mock_get_criteria.return_value = Criteria()
+        mock_find.return_value = [self.get_task()]
+        processed_tasks_json = ''.join(search_controller.GET())
 
         # Mimic the processing
         updated_task = dispatch_controller.task_serializer(self.get_task())
@@ -262,11 +265,13 @@ class SearchTaskCollectionTests(PulpWebservicesTests):
         self.validate_auth(authorization.READ)
 
     @mock.patch('pulp.server.webservices.controllers.dispatch.SearchTaskCollection.'
-                '_get_query_results_from_post', autospec=True)
-    def test_post(self, mock_get_results):
+                '_get_criteria_from_post', autospec=True)
+    @mock.patch('pulp.server.webservices.controllers.dispatch.TaskStatusManager.find_by_criteria')
+    def test_post(self, mock_find, mock_get_criteria):
         search_controller = dispatch_controller.SearchTaskCollection()
-        mock_get_results.return_value = [self.get_task()]
-        processed_tasks_json = search_controller.POST()
+        mock_get_criteria.return_value = Criteria()
+        mock_find.return_value = [self.get_task()]
+        processed_tasks_json = ''.join(search_controller.POST())
 
         # Mimic the processing
         updated_task = dispatch_controller.task_serializer(self.get_task())
@@ -29,7 +29,6 @@ from pulp.server.db.model.criteria import UnitAssociationCriteria, Criteria
 from pulp.server.db.model.dispatch import ScheduledCall
 from pulp.server.db.model.repository import (Repo, RepoDistributor, RepoImporter,
                                              RepoPublishResult, RepoSyncResult)
-from pulp.server.db.model.resources import Worker
 from pulp.server.exceptions import MissingResource, OperationPostponed, PulpException
 from pulp.server.managers import factory as manager_factory
 from pulp.server.managers.repo.distributor import RepoDistributorManager
@@ -86,10 +85,8 @@ class RepoImportUploadTests(RepoControllersTests):
 
     @mock.patch('celery.Task.apply_async')
     @mock.patch('pulp.server.async.tasks.uuid', autospec=True)
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
     @mock.patch('pulp.server.managers.content.upload.ContentUploadManager.import_uploaded_unit')
-    def test_POST_returns_report(self, import_uploaded_unit, mock_get_worker_for_reservation,
-                                 mock_uuid, mock_apply_async):
+    def test_POST_returns_report(self, import_uploaded_unit, mock_uuid, mock_apply_async):
         """
         Assert that the POST() method returns the appropriate report dictionary, based on the return
         value of the import_uploaded_unit() method.
@@ -102,7 +99,6 @@ class RepoImportUploadTests(RepoControllersTests):
         uuid_list = [uuid.uuid4() for i in range(10)]
         mock_uuid.uuid4.side_effect = copy.deepcopy(uuid_list)
         expected_async_result = AsyncResult(str(uuid_list[0]))
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         params = {'upload_id': 'upload_id', 'unit_type_id': 'unit_type_id', 'unit_key': 'unit_key'}
 
         status, body = self.post(self.URL % 'repo_id', params)
@@ -127,8 +123,8 @@ class RepoSearchTests(RepoControllersTests):
         self.assertEqual(mock_query.call_count, 1)
         query_arg = mock_query.call_args[0][0]
         self.assertTrue(isinstance(query_arg, criteria.Criteria))
-        # one call each for criteria, importers, and distributors
-        self.assertEqual(mock_params.call_count, 3)
+        # one call for the criteria, and one for the importers and distributors
+        self.assertEqual(mock_params.call_count, 2)
 
     @mock.patch.object(PulpCollection, 'query')
     @mock.patch('pulp.server.db.model.criteria.Criteria.from_client_input')
@@ -170,9 +166,10 @@ class RepoSearchTests(RepoControllersTests):
             'importers': 1,
             'distributors': 0
         }
+        mock_query.return_value = [{'id': 'repo-1'}]
         ret = self.post('/v2/repositories/search/')
         self.assertEqual(ret[0], 200)
-        mock_process_repos.assert_called_once_with([], 1, 0)
+        mock_process_repos.assert_called_once_with([{'id': 'repo-1'}], 1, 0)
 
     @mock.patch('pulp.server.webservices.controllers.repositories.RepoCollection._process_repos')
     @mock.patch.object(repositories.RepoSearch, 'params')
@@ -183,9 +180,10 @@ class RepoSearchTests(RepoControllersTests):
             'importers': 0,
             'distributors': 1
         }
+        mock_query.return_value = [{'id': 'repo-1'}]
         ret = self.post('/v2/repositories/search/')
         self.assertEqual(ret[0], 200)
-        mock_process_repos.assert_called_once_with([], 0, 1)
+        mock_process_repos.assert_called_once_with([{'id': 'repo-1'}], 0, 1)
 
     @mock.patch('pulp.server.webservices.controllers.repositories.RepoCollection._process_repos')
     @mock.patch.object(repositories.RepoSearch, 'params')
@@ -196,9 +194,10 @@ class RepoSearchTests(RepoControllersTests):
             'importers': 1,
             'distributors': 1
         }
+        mock_query.return_value = [{'id': 'repo-1'}]
         ret = self.post('/v2/repositories/search/')
         self.assertEqual(ret[0], 200)
-        mock_process_repos.assert_called_once_with([], 1, 1)
+        mock_process_repos.assert_called_once_with([{'id': 'repo-1'}], 1, 1)
 
     @mock.patch.object(repositories.RepoSearch, 'params', return_value={})
     def test_require_criteria(self, mock_params):
@@ -634,8 +633,7 @@ class RepoImportersTests(RepoPluginsTests):
 
     @mock.patch('celery.Task.apply_async')
     @mock.patch('pulp.server.async.tasks.uuid', autospec=True)
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_post(self, mock_get_worker_for_reservation, mock_uuid, mock_apply_async):
+    def test_post(self, mock_uuid, mock_apply_async):
         """
         Tests adding an importer to a repo.
         """
@@ -644,7 +642,6 @@ class RepoImportersTests(RepoPluginsTests):
         uuid_list = [uuid.uuid4() for i in range(10)]
         mock_uuid.uuid4.side_effect = copy.deepcopy(uuid_list)
         expected_async_result = AsyncResult(str(uuid_list[0]))
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
 
         # Test
         req_body = {
@@ -660,12 +657,10 @@ class RepoImportersTests(RepoPluginsTests):
         self.assertEqual(call_args, ['gravy', 'dummy-importer'])
         self.assertEqual(call_kwargs, {'repo_plugin_config': {'foo': 'bar'}})
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_post_missing_repo(self, mock_get_worker_for_reservation):
+    def test_post_missing_repo(self):
         """
         Tests adding an importer to a repo that doesn't exist.
         """
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         # Test
         req_body = {
             'importer_type_id': 'dummy-importer',
@@ -686,8 +681,7 @@ class RepoImportersTests(RepoPluginsTests):
         # Verify
         self.assertEqual(400, status)
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_post_bad_request_invalid_data(self, mock_get_worker_for_reservation):
+    def test_post_bad_request_invalid_data(self):
         """
         Tests adding an importer but specifying incorrect metadata.
         """
@@ -696,7 +690,6 @@ class RepoImportersTests(RepoPluginsTests):
         req_body = {
             'importer_type_id': 'not-a-real-importer'
         }
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         # Test
         status, body = self.post('/v2/repositories/walnuts/importers/', params=req_body)
         # Verify
@@ -739,8 +732,7 @@ class RepoImporterTests(RepoPluginsTests):
 
     @mock.patch('celery.Task.apply_async')
     @mock.patch('pulp.server.async.tasks.uuid', autospec=True)
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_delete(self, mock_get_worker_for_reservation, mock_uuid, mock_apply_async):
+    def test_delete(self, mock_uuid, mock_apply_async):
         """
         Tests removing an importer from a repo.
         """
@@ -750,7 +742,6 @@ class RepoImporterTests(RepoPluginsTests):
         self.importer_manager.set_importer(repo_id, 'dummy-importer', {})
         uuid_list = [uuid.uuid4() for i in range(10)]
         mock_uuid.uuid4.side_effect = copy.deepcopy(uuid_list)
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
 
         # Test
         status, body = self.delete('/v2/repositories/blueberry_pie/importers/dummy-importer/')
@@ -761,25 +752,21 @@ class RepoImporterTests(RepoPluginsTests):
         call_args = mock_apply_async.call_args[0]
         self.assertTrue([repo_id] in call_args)
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_delete_missing_repo(self, mock_get_worker_for_reservation):
+    def test_delete_missing_repo(self):
         """
         Tests deleting the importer from a repo that doesn't exist.
         """
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         # Test
         status, body = self.delete('/v2/repositories/bad_pie/importers/dummy-importer/')
         # Verify
         self.assertEqual(202, status)
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_delete_missing_importer(self, mock_get_worker_for_reservation):
+    def test_delete_missing_importer(self):
         """
         Tests deleting an importer from a repo that doesn't have one.
         """
         # Setup
         self.repo_manager.create_repo('apple_pie')
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         # Test
         status, body = self.delete('/v2/repositories/apple_pie/importers/dummy-importer/')
         # Verify
@@ -787,9 +774,7 @@ class RepoImporterTests(RepoPluginsTests):
 
     @mock.patch('celery.Task.apply_async')
     @mock.patch('pulp.server.async.tasks.uuid', autospec=True)
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_update_importer_config(self, mock_get_worker_for_reservation, mock_uuid,
-                                    mock_apply_async):
+    def test_update_importer_config(self, mock_uuid, mock_apply_async):
         """
         Tests successfully updating an importer's config.
         """
@@ -799,7 +784,6 @@ class RepoImporterTests(RepoPluginsTests):
         self.importer_manager.set_importer(repo_id, 'dummy-importer', {})
         uuid_list = [uuid.uuid4() for i in range(10)]
         mock_uuid.uuid4.side_effect = copy.deepcopy(uuid_list)
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         # Test
         new_config = {'importer_config': {'ice_cream': True}}
         status, body = self.put('/v2/repositories/pumpkin_pie/importers/dummy-importer/',
@@ -811,26 +795,22 @@ class RepoImporterTests(RepoPluginsTests):
         self.assertTrue(repo_id in call_args)
         self.assertEqual(call_kwargs['importer_config'], {'ice_cream': True})
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_update_missing_repo(self, mock_get_worker_for_reservation):
+    def test_update_missing_repo(self):
         """
         Tests updating an importer config on a repo that doesn't exist.
         """
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         # Test
         status, body = self.put('/v2/repositories/foo/importers/dummy-importer/',
                                 params={'importer_config': {}})
         # Verify
         self.assertEqual(202, status)
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_update_missing_importer(self, mock_get_worker_for_reservation):
+    def test_update_missing_importer(self):
         """
         Tests updating a repo that doesn't have an importer.
         """
         # Setup
         self.repo_manager.create_repo('pie')
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         # Test
         status, body = self.put('/v2/repositories/pie/importers/dummy-importer/',
                                 params={'importer_config': {}})
@@ -1675,10 +1655,8 @@ class TestRepoApplicabilityRegeneration(base.PulpWebserviceTests):
         for consumer_id in self.CONSUMER_IDS:
             manager.create(consumer_id, 'rpm', self.PROFILE)
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_regenerate_applicability(self, mock_get_worker_for_reservation):
+    def test_regenerate_applicability(self):
         # Setup
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         self.populate()
         self.populate_bindings()
         # Test
@@ -1688,20 +1666,16 @@ class TestRepoApplicabilityRegeneration(base.PulpWebserviceTests):
         self.assertEquals(status, 202)
         self.assertTrue('task_id' in body['spawned_tasks'][0])
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_regenerate_applicability_no_consumer(self, mock_get_worker_for_reservation):
+    def test_regenerate_applicability_no_consumer(self):
         # Test
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         request_body = dict(repo_criteria={'filters': self.REPO_FILTER})
         status, body = self.post(self.PATH, request_body)
         # Verify
         self.assertEquals(status, 202)
         self.assertTrue('task_id' in body['spawned_tasks'][0])
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_regenerate_applicability_no_bindings(self, mock_get_worker_for_reservation):
+    def test_regenerate_applicability_no_bindings(self):
         # Setup
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         self.populate()
         # Test
         request_body = dict(repo_criteria={'filters': self.REPO_FILTER})
@@ -566,6 +566,73 @@ class AddUnitMixinTests(unittest.TestCase):
         # Test
         self.assertRaises(mixins.ImporterConduitException, self.mixin.save_unit, None)
 
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'request_content_unit_file_path')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_last_unit_added')
+    @mock.patch('pulp.server.managers.repo.cud.RepoManager.update_unit_count')
+    @mock.patch('pulp.server.managers.repo.unit_association.RepoContentUnit.get_collection')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.save_content_units')
+    def test_save_units(self, mock_save, mock_collection, mock_count, mock_last_added,
+                        mock_path):
+        # Setup
+        units = [self.mixin.init_unit('t', {'k': 'v%s' % i}, {'m': 'm1'}, '/bar')
+                 for i in range(3)]
+        units.append(self.mixin.init_unit('t2', {'k': 'v'}, {}, None))
+        saved = {'t': [('id-0', True), ('id-1', False), ('id-2', True)], 't2': [('id-3', False)]}
+        mock_save.side_effect = lambda type_id, documents: saved[type_id]
+        bulk = mock_collection.return_value.initialize_unordered_bulk_op.return_value
+        upserted = {'t': [{'index': 0, '_id': 'a-0'}, {'index': 2, '_id': 'a-2'}], 't2': []}
+
+        def execute():
+            type_upserted = upserted[bulk.find.call_args[0][0]['unit_type_id']]
+            return {'nUpserted': len(type_upserted), 'upserted': type_upserted}
+        bulk.execute.side_effect = execute
+
+        # Test
+        unit_ids = self.mixin.save_units(iter(units))
+
+        # Verify
+        self.assertEqual(unit_ids, ['id-0', 'id-1', 'id-2', 'id-3'])
+        self.assertEqual([u.id for u in units], unit_ids)
+        self.assertEqual(2, mock_save.call_count)
+        documents = dict(c[0] for c in mock_save.call_args_list)
+        self.assertEqual([d[0] for d in documents['t']], [u.unit_key for u in units[:3]])
+        self.assertEqual(2, self.mixin._added_count)
+        self.assertEqual(2, self.mixin._updated_count)
+        self.assertEqual(4, bulk.find.call_count)
+        spec = {'repo_id': self.repo_id, 'unit_type_id': 't2', 'unit_id': 'id-3'}
+        self.assertTrue(mock.call(spec) in bulk.find.call_args_list)
+        mock_count.assert_called_once_with(self.repo_id, 't', 2)
+        mock_last_added.assert_called_once_with(self.repo_id)
+
+    @mock.patch('pulp.server.managers.content.query.ContentQueryManager.'
+                'request_content_unit_file_path')
+    @mock.patch('pulp.plugins.conduits.mixins.SAVE_UNITS_PAGE_SIZE', 2)
+    @mock.patch('pulp.server.managers.repo.unit_association.RepoContentUnit.get_collection')
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.save_content_units')
+    def test_save_units_pages(self, mock_save, mock_collection, mock_path):
+        # Setup
+        units = [self.mixin.init_unit('t', {'k': 'v%s' % i}, {}, None) for i in range(3)]
+        mock_save.side_effect = lambda type_id, documents: [('id', False)] * len(documents)
+        bulk = mock_collection.return_value.initialize_unordered_bulk_op.return_value
+        bulk.execute.return_value = {'nUpserted': 0, 'upserted': []}
+
+        # Test
+        self.mixin.save_units(units)
+
+        # Verify
+        self.assertEqual([len(c[0][1]) for c in mock_save.call_args_list], [2, 1])
+        self.assertEqual(2, bulk.execute.call_count)
+
+    @mock.patch('pulp.server.managers.content.cud.ContentManager.save_content_units')
+    def test_save_units_with_error(self, mock_save):
+        # Setup
+        mock_save.side_effect = Exception()
+        unit = Unit('t', {'k': 'v'}, {}, None)
+
+        # Test
+        self.assertRaises(mixins.ImporterConduitException, self.mixin.save_units, [unit])
+
     @mock.patch('pulp.server.managers.content.cud.ContentManager.link_referenced_content_units')
     def test_link_unit(self, mock_link):
         # Setup
@@ -624,7 +691,7 @@ class StatusMixinTests(unittest.TestCase):
     def setUp(self):
         manager_factory.initialize()
 
-    @mock.patch('pulp.server.async.task_status_manager.TaskStatusManager.update_task_status')
+    @mock.patch('pulp.server.async.task_status_manager.TaskStatusManager.set_task_progress')
     @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
     def test_set_progress(self, mock_get_task_id, mock_update):
         # Setup
@@ -638,17 +705,69 @@ class StatusMixinTests(unittest.TestCase):
         self.mixin.set_progress(status)
 
         # Verify
-        expected_report = {
-            self.report_id : status,
-        }
-
         self.assertEqual(1, mock_update.call_count)
-        delta = {'progress_report': expected_report}
         call_args = mock_update.call_args[0]
         self.assertEqual(call_args[0], task_id)
-        self.assertEqual(call_args[1], delta)
+        self.assertEqual(call_args[1], {self.report_id: status})
+        self.assertEqual(self.mixin.progress_report, {self.report_id: status})
+
+    @mock.patch('pulp.server.async.task_status_manager.TaskStatusManager.set_task_progress')
+    @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
+    def test_set_progress_unchanged(self, mock_get_task_id, mock_update):
+        # Setup
+        mock_get_task_id.return_value = 'test-id'
+        self.mixin = mixins.StatusMixin('test-report', mixins.ImporterConduitException)
+        status = {'state': 'running', 'items': [1]}
+
+        # Test
+        self.mixin.set_progress(status)
+        self.mixin.set_progress({'state': 'running', 'items': [1]})
+
+        # Verify
+        self.assertEqual(1, mock_update.call_count)
+
+    @mock.patch('pulp.server.async.task_status_manager.TaskStatusManager.set_task_progress')
+    @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
+    def test_set_progress_delta(self, mock_get_task_id, mock_update):
+        # Setup
+        mock_get_task_id.return_value = 'test-id'
+        self.mixin = mixins.StatusMixin('test-report', mixins.ImporterConduitException)
+        status = {'metadata': {'state': 'running'}, 'content': {'state': 'not-started'}}
+        steps = [{'state': 'running'}, {'state': 'not-started'}]
+
+        # Test; the status is modified in place between calls
+        self.mixin.set_progress(status)
+        status['content']['state'] = 'running'
+        self.mixin.set_progress(status)
+        self.mixin.report_id = 'step-report'
+        self.mixin.set_progress(steps)
+        steps[1] = {'state': 'running'}
+        self.mixin.set_progress(steps)
+
+        # Verify
+        deltas = [c[0][1] for c in mock_update.call_args_list]
+        self.assertEqual(deltas[1], {'test-report.content': {'state': 'running'}})
+        self.assertEqual(deltas[3], {'step-report.1': {'state': 'running'}})
+
+    @mock.patch('pulp.server.async.task_status_manager.TaskStatusManager.set_task_progress')
+    @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
+    def test_set_progress_structure_changed(self, mock_get_task_id, mock_update):
+        # Setup
+        mock_get_task_id.return_value = 'test-id'
+        self.mixin = mixins.StatusMixin('test-report', mixins.ImporterConduitException)
+
+        # Test
+        self.mixin.set_progress([1])
+        self.mixin.set_progress([1, 2])
+        self.mixin.set_progress({'a.b': 1})
+        self.mixin.set_progress({'a.b': 2})
+
+        # Verify
+        deltas = [c[0][1] for c in mock_update.call_args_list]
+        self.assertEqual(deltas[1:], [{'test-report': [1, 2]}, {'test-report': {'a.b': 1}},
+                                      {'test-report': {'a.b': 2}}])
 
-    @mock.patch('pulp.server.async.task_status_manager.TaskStatusManager.update_task_status')
+    @mock.patch('pulp.server.async.task_status_manager.TaskStatusManager.set_task_progress')
     @mock.patch('pulp.plugins.conduits.mixins.get_current_task_id')
     def test_set_progress_no_task(self, mock_get_task_id, mock_update):
         # Setup
@@ -662,7 +781,7 @@ class StatusMixinTests(unittest.TestCase):
         # Verify
         self.assertFalse(mock_update.called)
 
-    @mock.patch('pulp.server.async.task_status_manager.TaskStatusManager.update_task_status')
+    @mock.patch('pulp.server.async.task_status_manager.TaskStatusManager.set_task_progress')
     def test_set_progress_with_exception(self, mock_call):
         # Setup
         self.report_id = 'test-report'
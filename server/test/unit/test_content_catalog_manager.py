@@ -9,12 +9,18 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+from unittest import TestCase
 from uuid import uuid4
 
+from mock import patch
+
 from base import PulpServerTests
 
-from pulp.server.db.model.content import ContentCatalog
-from pulp.server.managers.content.catalog import ContentCatalogManager
+from pulp.server.db.model.content import (
+    ContentCatalog, ContentCatalogFingerprint, ContentCatalogGeneration)
+from pulp.server.managers.content import catalog
+from pulp.server.managers.content.catalog import (
+    BloomFilter, CatalogCache, ContentCatalogManager)
 from pulp.server.managers import factory
 
 
@@ -28,10 +34,16 @@ class TestCatalogManager(PulpServerTests):
     def setUp(self):
         super(TestCatalogManager, self).setUp()
         ContentCatalog.get_collection().remove()
+        ContentCatalogFingerprint.get_collection().remove()
+        ContentCatalogGeneration.get_collection().remove()
+        catalog.CACHE.clear()
 
     def tearDown(self):
         super(TestCatalogManager, self).tearDown()
         ContentCatalog.get_collection().remove()
+        ContentCatalogFingerprint.get_collection().remove()
+        ContentCatalogGeneration.get_collection().remove()
+        catalog.CACHE.clear()
 
     def test_locator(self):
         key_1 = {'a': 1, 'b': 2, 'c': 3}
@@ -200,6 +212,230 @@ class TestCatalogManager(PulpServerTests):
             entries = manager.find(TYPE_ID, unit_key)
             self.assertEqual(len(entries), 0)
 
+    @patch('pulp.server.managers.content.catalog.FIND_MANY_BATCH_SIZE', 3)
+    def test_find_many(self):
+        units = self.units(0, 10)
+        manager = ContentCatalogManager()
+        for unit_key, url in units:
+            manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url)
+            manager.add_entry('other', EXPIRATION, TYPE_ID, unit_key, url)
+        missing = self.units(10, 1)
+        wanted = [(TYPE_ID, unit_key) for unit_key, url in missing + units]
+        found = manager.find_many(wanted)
+        self.assertEqual(len(found), len(wanted))
+        self.assertEqual(found[0], [])
+        for (unit_key, url), entries in zip(units, found[1:]):
+            self.assertEqual(sorted(e['source_id'] for e in entries), ['other', SOURCE_ID])
+            for entry in entries:
+                self.assertEqual(entry['unit_key'], unit_key)
+                self.assertEqual(entry['url'], url)
+
+    def test_find_many_expired(self):
+        units = self.units(0, 10)
+        manager = ContentCatalogManager()
+        for unit_key, url in units:
+            manager.add_entry(SOURCE_ID, -1, TYPE_ID, unit_key, url)
+        found = manager.find_many([(TYPE_ID, unit_key) for unit_key, url in units])
+        self.assertEqual(found, [[]] * len(units))
+
+    def test_find_many_cached(self):
+        units = self.units(0, 10)
+        manager = ContentCatalogManager()
+        for unit_key, url in units[:5]:
+            manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url)
+        manager.refresh_cache()
+        wanted = [(TYPE_ID, unit_key) for unit_key, url in units]
+        found = manager.find_many(wanted, cached=True)
+        with patch.object(ContentCatalog, 'get_collection') as fake_collection:
+            self.assertEqual(manager.find_many(wanted, cached=True), found)
+            self.assertFalse(fake_collection().find.called)
+        self.assertEqual([len(entries) for entries in found], [1] * 5 + [0] * 5)
+
+    def test_find_many_cached_added(self):
+        units = self.units(0, 2)
+        manager = ContentCatalogManager()
+        manager.refresh_cache()
+        wanted = [(TYPE_ID, unit_key) for unit_key, url in units]
+        self.assertEqual(manager.find_many(wanted, cached=True), [[], []])
+        unit_key, url = units[1]
+        manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url)
+        found = manager.find_many(wanted, cached=True)
+        self.assertEqual(found[0], [])
+        self.assertEqual(found[1][0]['url'], url)
+
+    def test_find_many_cached_generation_changed(self):
+        units = self.units(0, 2)
+        manager = ContentCatalogManager()
+        manager.refresh_cache()
+        wanted = [(TYPE_ID, unit_key) for unit_key, url in units]
+        self.assertEqual(manager.find_many(wanted, cached=True), [[], []])
+        # added and refreshed by another process
+        unit_key, url = units[1]
+        ContentCatalog.get_collection().insert(
+            ContentCatalog(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url), safe=True)
+        manager.increment_generation()
+        found = manager.find_many(wanted, cached=True)
+        self.assertEqual(found[0], [])
+        self.assertEqual(found[1][0]['url'], url)
+
+    def test_generation(self):
+        manager = ContentCatalogManager()
+        self.assertEqual(manager.get_generation(), 0)
+        manager.increment_generation()
+        manager.increment_generation()
+        self.assertEqual(manager.get_generation(), 2)
+
+    def test_add_existing(self):
+        unit_key, url = self.units(0, 1)[0]
+        manager = ContentCatalogManager()
+        manager.add_entry(SOURCE_ID, -1, TYPE_ID, unit_key, url)
+        manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url)
+        collection = ContentCatalog.get_collection()
+        self.assertEqual(collection.find().count(), 1)
+        entries = manager.find(TYPE_ID, unit_key)
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]['unit_key'], unit_key)
+        self.assertEqual(entries[0]['type_id'], TYPE_ID)
+
+    def test_renew(self):
+        manager = ContentCatalogManager()
+        for unit_key, url in self.units(0, 10):
+            manager.add_entry(SOURCE_ID, -1, TYPE_ID, unit_key, url)
+        unit_key, url = self.units(10, 1)[0]
+        manager.add_entry(SOURCE_ID, -1, TYPE_ID, unit_key, 'http://other.com/unit')
+        renewed = manager.renew(SOURCE_ID, 'file://redhat.com/', EXPIRATION)
+        self.assertEqual(renewed, 10)
+        self.assertEqual(len(manager.find(TYPE_ID, unit_key)), 0)
+
+    def test_renew_sibling_url(self):
+        manager = ContentCatalogManager()
+        unit_key, url = self.units(0, 1)[0]
+        manager.add_entry(SOURCE_ID, -1, TYPE_ID, unit_key, 'http://redhat.com/repo/unit')
+        unit_key, url = self.units(1, 1)[0]
+        manager.add_entry(SOURCE_ID, -1, TYPE_ID, unit_key, 'http://redhat.com/repo-updates/unit')
+        renewed = manager.renew(SOURCE_ID, 'http://redhat.com/repo', EXPIRATION)
+        self.assertEqual(renewed, 1)
+        self.assertEqual(len(manager.find(TYPE_ID, unit_key)), 0)
+
+    def test_purge_stale(self):
+        manager = ContentCatalogManager()
+        units = self.units(0, 10)
+        for unit_key, url in units:
+            manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url)
+        expiration = ContentCatalog.get_expiration(EXPIRATION * 2)
+        for unit_key, url in units[:4]:
+            manager.add_entry(SOURCE_ID, EXPIRATION * 3, TYPE_ID, unit_key, url)
+        purged = manager.purge_stale(SOURCE_ID, 'file://redhat.com/', expiration)
+        self.assertEqual(purged, 6)
+        self.assertEqual(ContentCatalog.get_collection().find().count(), 4)
+
+    def test_purge_stale_sibling_url(self):
+        manager = ContentCatalogManager()
+        for unit_key, url in self.units(0, 2):
+            manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, url)
+        unit_key, url = self.units(2, 1)[0]
+        manager.add_entry(SOURCE_ID, EXPIRATION, TYPE_ID, unit_key, 'file://redhat.com-2/unit')
+        expiration = ContentCatalog.get_expiration(EXPIRATION * 2)
+        purged = manager.purge_stale(SOURCE_ID, 'file://redhat.com', expiration)
+        self.assertEqual(purged, 2)
+        self.assertEqual(len(manager.find(TYPE_ID, unit_key)), 1)
+
+    def test_fingerprint(self):
+        manager = ContentCatalogManager()
+        self.assertEqual(manager.get_fingerprint(SOURCE_ID, 'http://a'), None)
+        manager.set_fingerprint(SOURCE_ID, 'http://a', 'abc')
+        manager.set_fingerprint(SOURCE_ID, 'http://a', 'xyz')
+        manager.set_fingerprint(SOURCE_ID, 'http://b', 'abc')
+        self.assertEqual(manager.get_fingerprint(SOURCE_ID, 'http://a'), 'xyz')
+        self.assertEqual(ContentCatalogFingerprint.get_collection().find().count(), 2)
+        manager.set_fingerprint(SOURCE_ID, 'http://a', None)
+        self.assertEqual(manager.get_fingerprint(SOURCE_ID, 'http://a'), None)
+        manager.purge_orphans(['other'])
+        self.assertEqual(manager.get_fingerprint(SOURCE_ID, 'http://b'), None)
+
     def test_factory(self):
         manager = factory.content_catalog_manager()
-        self.assertTrue(isinstance(manager, ContentCatalogManager))
\ No newline at end of file
+        self.assertTrue(isinstance(manager, ContentCatalogManager))
+
+
+class TestBloomFilter(TestCase):
+
+    def test_contains(self):
+        locators = [ContentCatalog.get_locator(TYPE_ID, {'n': n}) for n in range(1000)]
+        bloom = BloomFilter(len(locators))
+        for locator in locators:
+            bloom.add(locator)
+        for locator in locators:
+            self.assertTrue(locator in bloom)
+        others = [ContentCatalog.get_locator(TYPE_ID, {'n': n}) for n in range(1000, 3000)]
+        false_positives = len([locator for locator in others if locator in bloom])
+        self.assertTrue(false_positives < 100)
+
+    def test_empty(self):
+        bloom = BloomFilter(0)
+        self.assertFalse(ContentCatalog.get_locator(TYPE_ID, {}) in bloom)
+
+
+class TestCatalogCache(TestCase):
+
+    def test_get_not_cached(self):
+        cache = CatalogCache()
+        self.assertEqual(cache.get('abcd', 10), None)
+
+    def test_put(self):
+        cache = CatalogCache()
+        entries = [{'expiration': 20}, {'expiration': 30}]
+        cache.put('abcd', entries)
+        self.assertEqual(cache.get('abcd', 10), entries)
+        self.assertEqual(cache.get('abcd', 21), None)
+
+    def test_put_empty_without_filter(self):
+        cache = CatalogCache()
+        cache.put('abcd', [])
+        self.assertEqual(cache.get('abcd', 10), None)
+
+    def test_max_size(self):
+        cache = CatalogCache(max_size=2)
+        cache.put('a', [{'expiration': 20}])
+        cache.put('b', [{'expiration': 20}])
+        cache.get('a', 10)
+        cache.put('c', [{'expiration': 20}])
+        self.assertEqual(cache.get('b', 10), None)
+        self.assertNotEqual(cache.get('a', 10), None)
+        self.assertNotEqual(cache.get('c', 10), None)
+
+    def test_filter(self):
+        cache = CatalogCache()
+        present = ContentCatalog.get_locator(TYPE_ID, {'n': 1})
+        absent = ContentCatalog.get_locator(TYPE_ID, {'n': 2})
+        cache.rebuild([present], 1)
+        self.assertEqual(cache.get(present, 10), None)
+        self.assertEqual(cache.get(absent, 10), [])
+        cache.added(absent)
+        self.assertEqual(cache.get(absent, 10), None)
+
+    def test_rebuild_clears(self):
+        cache = CatalogCache()
+        locator = ContentCatalog.get_locator(TYPE_ID, {'n': 1})
+        cache.put(locator, [{'expiration': 20}])
+        cache.rebuild([locator], 1)
+        self.assertEqual(cache.get(locator, 10), None)
+
+    def test_validate(self):
+        cache = CatalogCache()
+        locator = ContentCatalog.get_locator(TYPE_ID, {'n': 1})
+        cache.rebuild([locator], 1)
+        cache.put(locator, [{'expiration': 20}])
+        cache.validate(1)
+        self.assertNotEqual(cache.filter, None)
+        self.assertEqual(cache.get(locator, 10), [{'expiration': 20}])
+        cache.validate(2)
+        self.assertEqual(cache.filter, None)
+        self.assertEqual(cache.generation, None)
+        self.assertEqual(cache.get(locator, 10), None)
+
+    def test_deleted(self):
+        cache = CatalogCache()
+        cache.put('abcd', [{'expiration': 20}])
+        cache.deleted('abcd')
+        self.assertEqual(cache.get('abcd', 10), None)
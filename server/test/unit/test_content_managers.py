@@ -14,11 +14,13 @@ import inspect
 import unittest
 
 import mock
+from pymongo.errors import BulkWriteError
 
 import base
 from pulp.plugins.types import database, model
 from pulp.server.db.connection import PulpCollection
 from pulp.server.db.model.criteria import Criteria
+from pulp.server.managers.content import cud
 from pulp.server.managers.content.cud import ContentManager
 from pulp.server.managers.content.query import ContentQueryManager
 
@@ -84,6 +86,50 @@ class PulpContentCUDTests(PulpContentTests):
         self.assertTrue(unit['search-1'] == 'two')
         self.assertTrue('_last_updated' in unit)
 
+    def test_save_content_units(self):
+        existing_id = self.cud_manager.add_content_unit(TYPE_1_DEF.id, None, TYPE_1_UNITS[0])
+        units = [({'key-1': u['key-1']}, dict(u, **{'search-1': 'three'})) for u in TYPE_1_UNITS]
+        # The same unit passed twice
+        units.append(units[1])
+
+        saved = self.cud_manager.save_content_units(TYPE_1_DEF.id, units)
+
+        self.assertEqual(len(saved), 4)
+        self.assertEqual(saved[0], (existing_id, False))
+        self.assertTrue(saved[1][1])
+        self.assertTrue(saved[2][1])
+        self.assertEqual(saved[3], (saved[1][0], False))
+        stored = self.query_manager.list_content_units(TYPE_1_DEF.id)
+        self.assertEqual(sorted(u['_id'] for u in stored), sorted(s[0] for s in saved[:3]))
+        for unit in stored:
+            self.assertEqual(unit['search-1'], 'three')
+            self.assertEqual(unit['_content_type_id'], TYPE_1_DEF.id)
+            self.assertTrue('_last_updated' in unit)
+
+    def test_save_content_units_added_concurrently(self):
+        # Simulate the unit being added after the lookup
+        added = []
+
+        def _content_unit_ids(collection, keys):
+            if not added:
+                added.append(self.cud_manager.add_content_unit(TYPE_1_DEF.id, None,
+                                                               TYPE_1_UNITS[0]))
+                return {}
+            return ContentManager._content_unit_ids.original(collection, keys)
+
+        original = ContentManager._content_unit_ids
+        _content_unit_ids.original = original
+        ContentManager._content_unit_ids = staticmethod(_content_unit_ids)
+        try:
+            saved = self.cud_manager.save_content_units(
+                TYPE_1_DEF.id, [({'key-1': 'A'}, {'key-1': 'A', 'search-1': 'two'})])
+        finally:
+            ContentManager._content_unit_ids = staticmethod(original)
+
+        self.assertEqual(saved, [(added[0], False)])
+        unit = self.query_manager.get_content_unit_by_id(TYPE_1_DEF.id, added[0])
+        self.assertEqual(unit['search-1'], 'two')
+
     def test_delete_content_unit(self):
         unit_id = self.cud_manager.add_content_unit(TYPE_1_DEF.id, None, TYPE_1_UNITS[0])
         units = self.query_manager.list_content_units(TYPE_1_DEF.id)
@@ -187,6 +233,43 @@ class PulpContentQueryTests(PulpContentTests):
         self.assertEqual(len(units), 2)
 
 
+@mock.patch('pulp.plugins.types.database.type_units_collection')
+@mock.patch('pulp.server.managers.content.cud.ContentManager._save_content_units')
+class TestSaveContentUnits(unittest.TestCase):
+    def setUp(self):
+        super(TestSaveContentUnits, self).setUp()
+        self.manager = ContentManager()
+        self.units = [({'a': 'foo'}, {'a': 'foo'})]
+
+    def test_retries_duplicate_key(self, mock_save, mock_type_collection):
+        mock_save.side_effect = [self.bulk_write_error(11000), [('abc', False)]]
+
+        ret = self.manager.save_content_units('fake_type', self.units)
+
+        self.assertEqual(ret, [('abc', False)])
+        self.assertEqual(mock_save.call_count, 2)
+
+    def test_retries_bounded(self, mock_save, mock_type_collection):
+        mock_save.side_effect = self.bulk_write_error(11000)
+
+        self.assertRaises(BulkWriteError, self.manager.save_content_units, 'fake_type',
+                          self.units)
+
+        self.assertEqual(mock_save.call_count, cud.SAVE_CONTENT_UNITS_ATTEMPTS)
+
+    def test_other_error_not_retried(self, mock_save, mock_type_collection):
+        mock_save.side_effect = self.bulk_write_error(121)
+
+        self.assertRaises(BulkWriteError, self.manager.save_content_units, 'fake_type',
+                          self.units)
+
+        self.assertEqual(mock_save.call_count, 1)
+
+    @staticmethod
+    def bulk_write_error(code):
+        return BulkWriteError({'writeErrors': [{'code': code}]})
+
+
 @mock.patch('pulp.plugins.types.database.type_units_unit_key', return_value=['a'])
 @mock.patch('pulp.plugins.types.database.type_units_collection')
 class TestGetContentUnitIDs(unittest.TestCase):
@@ -17,6 +17,7 @@ import string
 import tempfile
 import traceback
 
+from multiprocessing.pool import ThreadPool
 from pprint import pformat
 from unittest import TestCase
 
@@ -507,3 +508,117 @@ class TestDeleteOrphanedFile(TestCase):
         is_shared.assert_called_once_with(storage_dir, path)
         delete.assert_called_once_with(path)
         self.assertFalse(unlink_shared.called)
+
+
+@patch('pulp.server.managers.content.orphan.ORPHAN_PAGE_SIZE', 2)
+@patch('pulp.server.managers.content.orphan.RepoContentUnit.get_collection')
+@patch('pulp.server.managers.content.orphan.content_types_db.type_units_collection')
+class TestGenerateOrphanPages(TestCase):
+
+    def test_all(self, units_collection, associations_collection):
+        pages = [[{'_id': 'a'}, {'_id': 'b'}], [{'_id': 'c'}], []]
+        cursor = units_collection.return_value.find.return_value
+        cursor.sort.return_value.limit.side_effect = pages
+        distinct = associations_collection.return_value.find.return_value.distinct
+        distinct.side_effect = [['b'], ['c']]
+
+        # test
+        orphans = list(OrphanManager._generate_orphan_pages('t', ['name']))
+
+        # validation
+        self.assertEqual(orphans, [[{'_id': 'a'}]])
+        specs = [c[0][0] for c in units_collection.return_value.find.call_args_list]
+        self.assertEqual(specs, [{}, {'_id': {'$gt': 'b'}}, {'_id': {'$gt': 'c'}}])
+        self.assertEqual(set(units_collection.return_value.find.call_args[1]['fields']),
+                         set(['_id', 'name']))
+        cursor.sort.assert_called_with('_id')
+        associations_collection.return_value.find.assert_any_call(
+            {'unit_id': {'$in': ['a', 'b']}})
+        distinct.assert_called_with('unit_id')
+
+    def test_by_id(self, units_collection, associations_collection):
+        units_collection.return_value.find.side_effect = [
+            [{'_id': 'a'}, {'_id': 'b'}], [{'_id': 'c'}]]
+        distinct = associations_collection.return_value.find.return_value.distinct
+        distinct.side_effect = [[], ['c']]
+
+        # test
+        orphans = list(OrphanManager._generate_orphan_pages('t', ['_id'], ['c', 'b', 'a', 'a']))
+
+        # validation
+        self.assertEqual(orphans, [[{'_id': 'a'}, {'_id': 'b'}]])
+        specs = [c[0][0] for c in units_collection.return_value.find.call_args_list]
+        self.assertEqual(specs, [{'_id': {'$in': ['a', 'b']}}, {'_id': {'$in': ['c']}}])
+
+
+class TestDeleteOrphansByType(TestCase):
+
+    @patch('pulp.server.managers.content.orphan.TaskStatusManager.set_task_progress')
+    @patch('pulp.server.managers.content.orphan.get_current_task_id', return_value='task-1')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.delete_orphaned_files')
+    @patch('pulp.server.managers.content.orphan.OrphanManager._generate_orphan_pages')
+    @patch('pulp.server.managers.content.orphan.content_types_db.type_units_collection')
+    def test_delete(self, units_collection, generate, delete_files, task_id, set_progress):
+        generate.return_value = [[{'_id': 'a', '_storage_path': '/a'}, {'_id': 'b'}],
+                                 [{'_id': 'c', '_storage_path': '/c'}]]
+
+        # test
+        OrphanManager.delete_orphans_by_type('t', ['a', 'b', 'c'])
+
+        # validation
+        generate.assert_called_once_with('t', ['_id', '_storage_path'], ['a', 'b', 'c'])
+        units_collection.return_value.remove.assert_any_call({'_id': {'$in': ['a', 'b']}},
+                                                             safe=True)
+        units_collection.return_value.remove.assert_any_call({'_id': {'$in': ['c']}},
+                                                             safe=True)
+        self.assertEqual([c[0][0] for c in delete_files.call_args_list], [['/a'], ['/c']])
+        set_progress.assert_called_with('task-1', {'orphans.t': {'deleted': 3}})
+
+
+class TestDeleteOrphanedFiles(TestCase):
+
+    @patch('pulp.server.managers.content.orphan.pulp_config.config')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.delete_orphaned_file')
+    @patch('pulp.server.managers.content.orphan.OrphanManager.is_shared')
+    def test_delete(self, is_shared, delete_orphaned_file, config):
+        is_shared.side_effect = lambda storage_dir, path: path.startswith('/shared')
+        pool = ThreadPool(2)
+        paths = ['/a', '/shared/b', '/c']
+
+        # test
+        OrphanManager.delete_orphaned_files(paths, pool)
+        pool.close()
+        pool.join()
+
+        # validation
+        self.assertEqual(sorted(c[0][0] for c in delete_orphaned_file.call_args_list),
+                         sorted(paths))
+        self.assertEqual(delete_orphaned_file.call_args_list[-1][0][0], '/shared/b')
+
+
+@patch('pulp.server.managers.content.orphan.ContentRefcountManager.enabled', return_value=True)
+@patch('pulp.server.managers.content.orphan.content_types_db.type_units_collection')
+class TestOrphansByRefcount(TestCase):
+
+    def test_count(self, units_collection, enabled):
+        units_collection.return_value.find.return_value.count.return_value = 3
+
+        count = OrphanManager().orphans_count_by_type('t')
+
+        self.assertEqual(count, 3)
+        units_collection.return_value.find.assert_called_once_with(
+            {'_refcount': {'$in': [0, None]}})
+
+    @patch('pulp.server.managers.content.orphan.RepoContentUnit.get_collection')
+    def test_generate_verified(self, associations_collection, units_collection, enabled):
+        cursor = units_collection.return_value.find.return_value
+        cursor.sort.return_value.limit.side_effect = [[{'_id': 'a'}, {'_id': 'b'}], []]
+        distinct = associations_collection.return_value.find.return_value.distinct
+        distinct.return_value = ['b']
+
+        orphans = list(OrphanManager.generate_orphans_by_type('t'))
+
+        self.assertEqual(orphans, [{'_id': 'a'}])
+        specs = [c[0][0] for c in units_collection.return_value.find.call_args_list]
+        self.assertEqual(specs, [{'_refcount': {'$in': [0, None]}},
+                                 {'_refcount': {'$in': [0, None]}, '_id': {'$gt': 'b'}}])
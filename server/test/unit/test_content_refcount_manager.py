@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2014 Red Hat, Inc.
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from unittest import TestCase
+
+from mock import patch
+
+from pulp.server.managers.content.refcount import ContentRefcountManager, REFCOUNT
+
+
+MODULE = 'pulp.server.managers.content.refcount'
+
+
+@patch(MODULE + '.content_types_db.type_units_collection')
+class TestUpdateRefcounts(TestCase):
+
+    @patch(MODULE + '.ContentRefcountManager.enabled', return_value=False)
+    def test_disabled(self, enabled, units_collection):
+        ContentRefcountManager.update_refcounts('t', ['a'], 1)
+
+        self.assertFalse(units_collection.called)
+
+    @patch(MODULE + '.REFCOUNT_PAGE_SIZE', 2)
+    @patch(MODULE + '.ContentRefcountManager.enabled', return_value=True)
+    def test_update(self, enabled, units_collection):
+        ContentRefcountManager.update_refcounts('t', iter(['a', 'b', 'c']), -1)
+
+        units_collection.assert_called_with('t')
+        update = units_collection.return_value.update
+        self.assertEqual(2, update.call_count)
+        update.assert_any_call({'_id': {'$in': ['a', 'b']}}, {'$inc': {REFCOUNT: -1}},
+                               multi=True, safe=True)
+        update.assert_any_call({'_id': {'$in': ['c']}}, {'$inc': {REFCOUNT: -1}},
+                               multi=True, safe=True)
+
+
+class TestRepoRemoved(TestCase):
+
+    @patch(MODULE + '.ContentRefcountManager.update_refcounts')
+    @patch(MODULE + '.RepoContentUnit.get_collection')
+    @patch(MODULE + '.ContentRefcountManager.enabled', return_value=True)
+    def test_repo_removed(self, enabled, associations_collection, update_refcounts):
+        collection = associations_collection.return_value
+        collection.find.return_value.distinct.return_value = ['t']
+        collection.find.return_value.sort.return_value = [
+            {'unit_id': 'a'}, {'unit_id': 'a'}, {'unit_id': 'b'}]
+        updated = []
+        update_refcounts.side_effect = \
+            lambda type_id, unit_ids, delta: updated.append((type_id, list(unit_ids), delta))
+
+        ContentRefcountManager.repo_removed('repo-1')
+
+        collection.find.assert_called_with({'repo_id': 'repo-1', 'unit_type_id': 't'},
+                                           fields=['unit_id'])
+        collection.find.return_value.sort.assert_called_once_with('unit_id')
+        self.assertEqual(updated, [('t', ['a', 'b'], -1)])
+
+
+@patch(MODULE + '.REFCOUNT_PAGE_SIZE', 2)
+@patch(MODULE + '.RepoContentUnit.get_collection')
+@patch(MODULE + '.content_types_db.type_units_collection')
+class TestVerifyRefcounts(TestCase):
+
+    def setUp(self):
+        self.pages = [[{'_id': 'a', REFCOUNT: 2}, {'_id': 'b', REFCOUNT: 1}],
+                      [{'_id': 'c'}], []]
+        self.associations = [[{'unit_id': 'a', 'repo_id': 'r1'},
+                              {'unit_id': 'a', 'repo_id': 'r1'},
+                              {'unit_id': 'a', 'repo_id': 'r2'}],
+                             [{'unit_id': 'c', 'repo_id': 'r1'}]]
+
+    def _setup(self, units_collection, associations_collection):
+        cursor = units_collection.return_value.find.return_value
+        cursor.sort.return_value.limit.side_effect = self.pages
+        associations_collection.return_value.find.side_effect = self.associations
+
+    def test_verify(self, units_collection, associations_collection):
+        self._setup(units_collection, associations_collection)
+
+        mismatched = ContentRefcountManager.verify_refcounts('t')
+
+        self.assertEqual(mismatched, 2)
+        self.assertFalse(units_collection.return_value.update.called)
+        specs = [c[0][0] for c in units_collection.return_value.find.call_args_list]
+        self.assertEqual(specs, [{}, {'_id': {'$gt': 'b'}}, {'_id': {'$gt': 'c'}}])
+
+    @patch(MODULE + '.ContentRefcountManager.ensure_index')
+    def test_repair(self, ensure_index, units_collection, associations_collection):
+        self._setup(units_collection, associations_collection)
+
+        mismatched = ContentRefcountManager.verify_refcounts('t', repair=True)
+
+        self.assertEqual(mismatched, 2)
+        ensure_index.assert_called_once_with('t')
+        update = units_collection.return_value.update
+        self.assertEqual(2, update.call_count)
+        update.assert_any_call({'_id': {'$in': ['b']}}, {'$set': {REFCOUNT: 0}},
+                               multi=True, safe=True)
+        update.assert_any_call({'_id': {'$in': ['c']}}, {'$set': {REFCOUNT: 1}},
+                               multi=True, safe=True)
@@ -12,7 +12,6 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import copy
-import datetime
 import os
 import shutil
 import uuid
@@ -23,7 +22,6 @@ import mock
 from pulp.devel import dummy_plugins
 from pulp.devel.unit.util import assert_body_matches_async_task
 from pulp.server.db.model.repository import Repo, RepoImporter
-from pulp.server.db.model.resources import Worker
 from pulp.server.webservices.controllers.contents import ContentUnitsCollection, ContentUnitsSearch
 import base
 import pulp.server.managers.factory as manager_factory
@@ -238,6 +236,30 @@ class UploadResourceTests(BaseUploadTest):
         self.assertTrue(not os.path.exists(upload_file))
 
 
+class UploadExistingUnitResourceTests(BaseUploadTest):
+
+    @mock.patch('pulp.server.managers.content.upload.ContentUploadManager.find_existing_unit')
+    def test_post(self, mock_find):
+        mock_find.return_value = 'unit-1'
+        upload_id = self.upload_manager.initialize_upload()
+        body = {'unit_type_id': 'rpm', 'unit_key': {'name': 'foo'}, 'checksum_type': 'sha256',
+                'checksum': 'abc'}
+
+        status, body = self.post('/v2/content/uploads/%s/existing/' % upload_id, body)
+
+        self.assertEqual(200, status)
+        self.assertEqual(body, {'exists': True, 'unit_id': 'unit-1'})
+        mock_find.assert_called_once_with(upload_id, 'rpm', {'name': 'foo'}, 'sha256', 'abc')
+
+    def test_post_missing_checksum(self):
+        upload_id = self.upload_manager.initialize_upload()
+        body = {'unit_type_id': 'rpm', 'unit_key': {'name': 'foo'}, 'checksum_type': 'sha256'}
+
+        status, body = self.post('/v2/content/uploads/%s/existing/' % upload_id, body)
+
+        self.assertEqual(400, status)
+
+
 class UploadSegmentResourceTests(BaseUploadTest):
 
     def test_put(self):
@@ -305,13 +327,11 @@ class ImportUnitTests(BaseUploadTest):
 
     @mock.patch('celery.Task.apply_async')
     @mock.patch('pulp.server.async.tasks.uuid', autospec=True)
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_post(self, mock_get_worker_for_reservation, mock_uuid, mock_apply_async):
+    def test_post(self, mock_uuid, mock_apply_async):
         # Setup
         uuid_list = [uuid.uuid4() for i in range(10)]
         mock_uuid.uuid4.side_effect = copy.deepcopy(uuid_list)
         expected_async_result = AsyncResult(str(uuid_list[0]))
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         upload_id = self.upload_manager.initialize_upload()
         self.upload_manager.save_data(upload_id, 0, 'string data')
 
@@ -339,14 +359,11 @@ class ImportUnitTests(BaseUploadTest):
 
     @mock.patch('celery.Task.apply_async')
     @mock.patch('pulp.server.async.tasks.uuid', autospec=True)
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
-    def test_post_with_override_config(self, mock_get_worker_for_reservation, mock_uuid,
-                                       mock_apply_async):
+    def test_post_with_override_config(self, mock_uuid, mock_apply_async):
         # Setup
         uuid_list = [uuid.uuid4() for i in range(10)]
         mock_uuid.uuid4.side_effect = copy.deepcopy(uuid_list)
         expected_async_result = AsyncResult(str(uuid_list[0]))
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
         upload_id = self.upload_manager.initialize_upload()
         self.upload_manager.save_data(upload_id, 0, 'string data')
 
@@ -11,6 +11,8 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import unittest
+
 import base
 import mock
 
@@ -18,6 +20,44 @@ from pulp.server.db.model.event import EventListener
 from pulp.server.event import notifiers
 from pulp.server.event import data as event_data
 from pulp.server.managers import factory as manager_factory
+from pulp.server.managers.event import fire
+
+
+@mock.patch('pulp.server.managers.event.fire.time.time', return_value=1000)
+@mock.patch('pulp.server.managers.event.fire.EventListener.get_collection')
+class ListenerCacheTests(unittest.TestCase):
+
+    def setUp(self):
+        self.cache = fire.ListenerCache()
+        self.listeners = [{'event_types': ['type-1']},
+                          {'event_types': ['type-2']},
+                          {'event_types': ['*']}]
+
+    def test_get(self, mock_get_collection, mock_time):
+        mock_get_collection.return_value.find.return_value = self.listeners
+
+        self.assertEqual(self.cache.get('type-1'), [self.listeners[0], self.listeners[2]])
+        self.assertEqual(self.cache.get('type-2'), [self.listeners[1], self.listeners[2]])
+
+        mock_get_collection.return_value.find.assert_called_once_with()
+
+    def test_expired(self, mock_get_collection, mock_time):
+        mock_get_collection.return_value.find.return_value = self.listeners
+        self.cache.get('type-1')
+
+        mock_time.return_value = 1000 + fire.LISTENER_CACHE_TTL + 1
+        self.cache.get('type-1')
+
+        self.assertEqual(2, mock_get_collection.return_value.find.call_count)
+
+    def test_invalidate(self, mock_get_collection, mock_time):
+        mock_get_collection.return_value.find.return_value = self.listeners
+        self.cache.get('type-1')
+
+        self.cache.invalidate()
+        mock_get_collection.return_value.find.return_value = []
+
+        self.assertEqual(self.cache.get('type-1'), [])
 
 
 class EventFireManagerTests(base.PulpServerTests):
@@ -32,6 +72,7 @@ class EventFireManagerTests(base.PulpServerTests):
         super(EventFireManagerTests, self).tearDown()
 
         EventListener.get_collection().remove()
+        fire.listener_cache.invalidate()
         notifiers.reset()
 
     # -- plumbing tests -------------------------------------------------------
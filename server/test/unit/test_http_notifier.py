@@ -12,7 +12,8 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import httplib
-import time
+import socket
+import unittest
 
 import mock
 
@@ -23,110 +24,233 @@ from pulp.server.compat import json
 from pulp.server.event import http
 from pulp.server.event.data import Event
 
-import base
 
+@mock.patch('pulp.server.event.http._deliverer')
+@mock.patch('pulp.server.event.http.EventNotification.get_collection')
+class TestHandleEvent(unittest.TestCase):
 
-class TestHTTPNotifierTests(base.PulpServerTests):
-
-    @mock.patch('pulp.server.event.http._create_connection')
-    def test_handle_event(self, mock_create):
+    def test_handle_event(self, mock_get_collection, mock_deliverer):
         # Setup
         notifier_config = {
-            'url' : 'https://localhost/api/',
-            'username' : 'admin',
-            'password' : 'admin',
+            'url': 'https://localhost/api/',
+            'username': 'admin',
+            'password': 'admin',
         }
 
-        event = Event('type-1', {'k1' : 'v1'})
+        event = Event('type-1', {'k1': 'v1'})
+
+        # Test
+        http.handle_event(notifier_config, event)
+
+        # Verify
+        notification = mock_get_collection.return_value.insert.call_args[0][0]
+        self.assertEqual(notification['notifier_type_id'], http.TYPE_ID)
+        self.assertEqual(notification['notifier_config'], notifier_config)
+        self.assertEqual(notification['attempts'], 0)
 
-        mock_connection = mock.Mock()
-        mock_response = mock.Mock()
+        expected_body = {'event_type': event.event_type,
+                         'payload': event.payload,
+                         'call_report': None}
+        self.assertEqual(json.loads(notification['body']), expected_body)
 
-        mock_response.status = httplib.OK
+        mock_deliverer.wakeup.assert_called_once_with()
 
-        mock_connection.getresponse.return_value = mock_response
-        mock_create.return_value = mock_connection
+    # test bz 1099945
+    def test_handle_event_with_serialize_error(self, mock_get_collection, mock_deliverer):
+        event = Event('type-1', {'k1': 'v1', '_id': _test_objid()})
 
         # Test
-        http.handle_event(notifier_config, event)
-        time.sleep(.5) # handle works in a thread so give it a bit to finish
+        http.handle_event({'url': 'https://localhost/api/'}, event)  # should not throw TypeError
 
         # Verify
-        self.assertEqual(1, mock_create.call_count)
-        self.assertEqual(1, mock_connection.request.call_count)
+        self.assertEqual(1, mock_get_collection.return_value.insert.call_count)
 
-        request_args = mock_connection.request.call_args[0]
-        self.assertEqual('POST', request_args[0])
-        self.assertEqual('/api/', request_args[1])
+    def test_handle_event_missing_url(self, mock_get_collection, mock_deliverer):
+        # Test
+        http.handle_event({}, Event('type-1', {}))  # should not error
 
-        expected_body = {'event_type' : event.event_type,
-                         'payload' : event.payload,
-                         'call_report': None}
+        # Verify
+        self.assertFalse(mock_get_collection.return_value.insert.called)
+        self.assertFalse(mock_deliverer.wakeup.called)
+
+    def test_handle_event_unparsable_url(self, mock_get_collection, mock_deliverer):
+        # Test
+        http.handle_event({'url': '!@#$%'}, Event('type-1', {}))  # should not error
 
-        request_kwargs = mock_connection.request.call_args[1]
-        parsed_body = json.loads(request_kwargs['body'])
-        self.assertEqual(parsed_body, expected_body)
+        # Verify
+        self.assertFalse(mock_get_collection.return_value.insert.called)
 
-        headers = request_kwargs['headers']
-        self.assertTrue('Authorization' in headers)
 
-    @mock.patch('pulp.server.event.http._create_connection')
-    def test_handle_event_with_error(self, mock_create):
-        # Setup
-        notifier_config = {'url' : 'https://localhost/api/'}
+def _notification(body, notifier_config, attempts=0):
+    return {'_id': _test_objid(), 'body': body, 'notifier_config': notifier_config,
+            'attempts': attempts}
 
-        event = Event('type-1', {'k1' : 'v1'})
 
-        mock_connection = mock.Mock()
-        mock_response = mock.Mock()
+@mock.patch('pulp.server.event.http.time.time', return_value=1000)
+@mock.patch('pulp.server.event.http._create_connection')
+@mock.patch('pulp.server.event.http.EventNotification.get_collection')
+class TestDeliver(unittest.TestCase):
 
-        mock_response.status = httplib.NOT_FOUND
+    def setUp(self):
+        self.connections = http._ConnectionPool()
+        self.connection = mock.Mock()
+        self.connection.getresponse.return_value.status = httplib.OK
 
-        mock_connection.getresponse.return_value = mock_response
-        mock_create.return_value = mock_connection
+    def test_deliver(self, mock_get_collection, mock_create, mock_time):
+        mock_create.return_value = self.connection
+        notifier_config = {'url': 'https://localhost/api/',
+                           'username': 'admin',
+                           'password': 'admin'}
+        notification = _notification('{"k1": "v1"}', notifier_config)
 
         # Test
-        http.handle_event(notifier_config, event) # should not error
-        time.sleep(.5)
+        http._deliver([notification], self.connections)
 
         # Verify
-        self.assertEqual(1, mock_create.call_count)
-        self.assertEqual(1, mock_connection.request.call_count)
+        mock_create.assert_called_once_with('https:', 'localhost')
+        request_args = self.connection.request.call_args[0]
+        self.assertEqual('POST', request_args[0])
+        self.assertEqual('/api/', request_args[1])
 
-    # test bz 1099945
-    @mock.patch('pulp.server.event.http._create_connection')
-    def test_handle_event_with_serialize_error(self, mock_create):
-        # Setup
-        notifier_config = {'url' : 'https://localhost/api/'}
+        request_kwargs = self.connection.request.call_args[1]
+        self.assertEqual(request_kwargs['body'], '{"k1": "v1"}')
+        self.assertTrue('Authorization' in request_kwargs['headers'])
 
-        event = Event('type-1', {'k1' : 'v1', '_id': _test_objid()})
+        mock_get_collection.return_value.remove.assert_called_once_with(
+            {'_id': {'$in': [notification['_id']]}}, safe=True)
 
-        mock_connection = mock.Mock()
-        mock_response = mock.Mock()
+        # the connection is kept open for the next request
+        self.assertFalse(self.connection.close.called)
+        self.assertEqual(self.connections.get('https:', 'localhost'), (self.connection, True))
 
-        mock_response.status = httplib.NOT_FOUND
+    def test_deliver_batch(self, mock_get_collection, mock_create, mock_time):
+        mock_create.return_value = self.connection
+        notifier_config = {'url': 'http://localhost/api/', 'batch_size': 2}
+        notifications = [_notification('{"k": 1}', notifier_config),
+                         _notification('{"k": 2}', notifier_config)]
 
-        mock_connection.getresponse.return_value = mock_response
-        mock_create.return_value = mock_connection
+        # Test
+        http._deliver(notifications, self.connections)
+
+        # Verify
+        body = self.connection.request.call_args[1]['body']
+        self.assertEqual(json.loads(body), [{'k': 1}, {'k': 2}])
+        remove_spec = mock_get_collection.return_value.remove.call_args[0][0]
+        self.assertEqual(remove_spec['_id']['$in'], [n['_id'] for n in notifications])
+
+    def test_deliver_with_error(self, mock_get_collection, mock_create, mock_time):
+        mock_create.return_value = self.connection
+        self.connection.getresponse.return_value.status = httplib.NOT_FOUND
+        notification = _notification('{}', {'url': 'https://localhost/api/'})
+
+        # Test
+        http._deliver([notification], self.connections)  # should not error
+
+        # Verify the event is not sent again
+        self.assertEqual(1, mock_get_collection.return_value.remove.call_count)
+        self.assertFalse(mock_get_collection.return_value.update.called)
+
+    def test_deliver_with_server_error(self, mock_get_collection, mock_create, mock_time):
+        mock_create.return_value = self.connection
+        self.connection.getresponse.return_value.status = httplib.SERVICE_UNAVAILABLE
+        notification = _notification('{}', {'url': 'https://localhost/api/'}, attempts=2)
 
         # Test
-        http.handle_event(notifier_config, event) # should not throw TypeError
+        http._deliver([notification], self.connections)
+
+        # Verify the event is retried later
+        self.assertFalse(mock_get_collection.return_value.remove.called)
+        mock_get_collection.return_value.update.assert_called_once_with(
+            {'_id': notification['_id']},
+            {'$set': {'attempts': 3, 'next_attempt': 1000 + 4 * http.RETRY_DELAY,
+                      'claim': None}},
+            safe=True)
+
+    def test_deliver_gives_up(self, mock_get_collection, mock_create, mock_time):
+        mock_create.return_value = self.connection
+        self.connection.request.side_effect = socket.error()
+        notification = _notification('{}', {'url': 'https://localhost/api/'},
+                                     attempts=http.MAX_ATTEMPTS - 1)
 
-    @mock.patch('pulp.server.event.http._create_connection')
-    def test_handle_event_missing_url(self, mock_create):
         # Test
-        http.handle_event({}, Event('type-1', {})) # should not error
+        http._deliver([notification], self.connections)
 
         # Verify
-        self.assertEqual(0, mock_create.call_count)
+        self.assertTrue(self.connection.close.called)
+        self.assertFalse(mock_get_collection.return_value.update.called)
+        mock_get_collection.return_value.remove.assert_called_once_with(
+            {'_id': notification['_id']}, safe=True)
+
+    def test_deliver_stale_connection(self, mock_get_collection, mock_create, mock_time):
+        stale = mock.Mock()
+        stale.request.side_effect = httplib.BadStatusLine('')
+        self.connections.put('https:', 'localhost', stale)
+        mock_create.return_value = self.connection
+        notification = _notification('{}', {'url': 'https://localhost/api/'})
 
-    @mock.patch('pulp.server.event.http._create_connection')
-    def test_handle_event_unparsable_url(self, mock_create):
         # Test
-        http.handle_event({'url' : '!@#$%'}, Event('type-1', {})) # should not error
+        http._deliver([notification], self.connections)
+
+        # Verify the request is made again on a new connection
+        self.assertTrue(stale.close.called)
+        self.assertEqual(1, self.connection.request.call_count)
+        self.assertEqual(1, mock_get_collection.return_value.remove.call_count)
+
+
+class TestBatches(unittest.TestCase):
+
+    def test_batches(self):
+        single = {'url': 'http://a/'}
+        batched = {'url': 'http://b/', 'batch_size': 2}
+        notifications = [_notification(str(i), batched if i % 2 else single)
+                         for i in range(6)]
+
+        batches = http._batches(notifications)
+
+        bodies = [[n['body'] for n in batch] for batch in batches]
+        self.assertEqual(bodies, [['0'], ['2'], ['4'], ['1', '3'], ['5']])
+
+    def test_invalid_batch_size(self):
+        self.assertEqual(http._batch_size({'batch_size': 'many'}), 1)
+        self.assertEqual(http._batch_size({'batch_size': 0}), 1)
+        self.assertEqual(http._batch_size({'batch_size': '10'}), 10)
+
+
+@mock.patch('pulp.server.event.http.time.time', return_value=1000)
+class TestClaimDue(unittest.TestCase):
+
+    def test_claim(self, mock_time):
+        collection = mock.Mock()
+        claimed = [{'_id': 'a'}]
+
+        def find(spec, **kwargs):
+            cursor = mock.Mock()
+            if 'claim' in spec:
+                cursor.sort.return_value = claimed
+            else:
+                cursor.sort.return_value.limit.return_value = [{'_id': 'a'}, {'_id': 'b'}]
+            return cursor
+        collection.find.side_effect = find
+
+        # Test
+        notifications = http._claim_due(collection)
 
         # Verify
-        self.assertEqual(0, mock_create.call_count)
+        self.assertEqual(notifications, claimed)
+        spec, document = collection.update.call_args[0]
+        self.assertEqual(spec, {'_id': {'$in': ['a', 'b']}, 'next_attempt': {'$lte': 1000}})
+        self.assertEqual(document['$set']['next_attempt'], 1000 + http.CLAIM_TIMEOUT)
+        self.assertEqual(collection.find.call_args[0][0], {'claim': document['$set']['claim']})
+
+    def test_none_due(self, mock_time):
+        collection = mock.Mock()
+        collection.find.return_value.sort.return_value.limit.return_value = []
+
+        self.assertTrue(http._claim_due(collection) is None)
+        self.assertFalse(collection.update.called)
+
+
+class TestCreateConnection(unittest.TestCase):
 
     def test_create_configuration(self):
         # Test HTTPS
@@ -30,6 +30,7 @@ from pulp.server.managers.auth.user.query import UserQueryManager
 from pulp.server.managers.consumer.cud import ConsumerManager
 from pulp.server.managers.content.cud import ContentManager
 from pulp.server.managers.content.query import ContentQueryManager
+from pulp.server.managers.content.refcount import ContentRefcountManager
 from pulp.server.managers.content.upload import ContentUploadManager
 from pulp.server.managers.event.remote import TopicPublishManager
 from pulp.server.managers.repo.cud import RepoManager
@@ -70,6 +71,7 @@ class FactoryTests(unittest.TestCase):
         self.assertTrue(isinstance(factory.repo_sync_manager(), RepoSyncManager))
         self.assertTrue(isinstance(factory.content_manager(), ContentManager))
         self.assertTrue(isinstance(factory.content_query_manager(), ContentQueryManager))
+        self.assertTrue(isinstance(factory.content_refcount_manager(), ContentRefcountManager))
         self.assertTrue(isinstance(factory.content_upload_manager(), ContentUploadManager))
         self.assertTrue(isinstance(factory.consumer_manager(), ConsumerManager))
         self.assertTrue(isinstance(factory.topic_publish_manager(), TopicPublishManager))
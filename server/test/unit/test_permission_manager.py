@@ -15,7 +15,10 @@ import base
 import random
 import string
 
+import mock
+
 from pulp.server.auth import authorization
+from pulp.server.auth import cache as auth_cache
 from pulp.server.managers import factory as manager_factory
 import pulp.server.exceptions as exceptions
 
@@ -137,6 +140,18 @@ class PermissionManagerTests(base.PulpServerTests):
         self.permission_manager.revoke(r, u['login'], [o])
         self.assertFalse(self.user_query_manager.is_authorized(r, u['login'], o))
 
+    @mock.patch.object(auth_cache.AuthCache, 'ttl', return_value=60)
+    def test_user_permission_revoke_cached(self, mock_ttl):
+        u = self._create_user()
+        r = self._create_resource()
+        o = authorization.READ
+        self.permission_manager.grant(r, u['login'], [o])
+        self.assertTrue(self.user_query_manager.is_authorized(r, u['login'], o))
+        self.assertTrue(auth_cache.permissions.get(u['login']).is_authorized(r, o))
+        self.permission_manager.revoke(r, u['login'], [o])
+        self.assertFalse(self.user_query_manager.is_authorized(r, u['login'], o))
+        auth_cache.invalidate()
+
     def test_non_existing_user_permission_revoke(self):
         login = 'non-existing-user-login'
         r = self._create_resource()
@@ -11,8 +11,6 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
-import datetime
-
 import mock
 from celery.result import AsyncResult
 
@@ -24,7 +22,6 @@ from pulp.server.db.model import criteria
 from pulp.server.db.model.criteria import Criteria
 from pulp.server.db.model.repository import Repo
 from pulp.server.db.model.repo_group import RepoGroup, RepoGroupDistributor
-from pulp.server.db.model.resources import Worker
 from pulp.server.managers import factory as manager_factory
 
 
@@ -569,9 +566,8 @@ class PublishActionTests(base.PulpWebserviceTests):
         RepoGroup.get_collection().remove()
         RepoGroupDistributor.get_collection().remove()
 
-    @mock.patch('pulp.server.async.tasks.resources.get_worker_for_reservation')
     @mock.patch('pulp.server.webservices.controllers.repo_groups.publish')
-    def test_post(self, mock_publish, mock_get_worker_for_reservation):
+    def test_post(self, mock_publish):
         """
         Test that publish repo group creates a task for a worker.
         """
@@ -584,7 +580,6 @@ class PublishActionTests(base.PulpWebserviceTests):
         self.distributor_manager.add_distributor(
             group_id, 'dummy-group-distributor', {}, distributor_id=distributor_id
         )
-        mock_get_worker_for_reservation.return_value = Worker('some_queue', datetime.datetime.now())
 
         # Test
         data = {'id': distributor_id}
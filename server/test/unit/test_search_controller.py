@@ -15,8 +15,10 @@ import unittest
 
 import mock
 
+from pulp.server.compat import json, ObjectId
 from pulp.server.db.model.criteria import Criteria
 import pulp.server.exceptions as exceptions
+from pulp.server.webservices.controllers import search
 from pulp.server.webservices.controllers.search import SearchController
 
 class TestGetQueryResultsFromPost(unittest.TestCase):
@@ -68,3 +70,92 @@ class TestGetQueryResultsFromGet(unittest.TestCase):
         self.controller._get_query_results_from_get()
         self.assertTrue('id' in self.mock_query_method.call_args[0][0].fields)
 
+
+class TestCursor(unittest.TestCase):
+    def test_round_trip(self):
+        for last_id in ('abc', 12, ObjectId()):
+            token = search.encode_cursor(last_id)
+            self.assertEqual(search.decode_cursor(token), last_id)
+
+    def test_decode_invalid(self):
+        self.assertRaises(exceptions.InvalidValue, search.decode_cursor, 'not a cursor')
+
+    def test_criteria_first_page(self):
+        criteria = Criteria(filters={'a': 1}, fields=['id'])
+        page = search.cursor_criteria(criteria, '')
+        self.assertEqual(page.filters, {'a': 1})
+        self.assertEqual(page.sort, [('_id', 1)])
+        self.assertEqual(page.limit, search.DEFAULT_CURSOR_LIMIT)
+        self.assertEqual(page.fields, ['id'])
+
+    def test_criteria_next_page(self):
+        criteria = Criteria(filters={'a': 1}, limit=10)
+        page = search.cursor_criteria(criteria, search.encode_cursor('abc'))
+        self.assertEqual(page.filters, {'$and': [{'a': 1}, {'_id': {'$gt': 'abc'}}]})
+        self.assertEqual(page.limit, 10)
+
+    def test_criteria_next_page_no_filters(self):
+        page = search.cursor_criteria(Criteria(), search.encode_cursor('abc'))
+        self.assertEqual(page.filters, {'_id': {'$gt': 'abc'}})
+
+    def test_criteria_rejects_sort_and_skip(self):
+        self.assertRaises(exceptions.InvalidValue, search.cursor_criteria,
+                          Criteria(sort=[('id', 1)]), '')
+        self.assertRaises(exceptions.InvalidValue, search.cursor_criteria, Criteria(skip=5), '')
+
+
+@mock.patch('pulp.server.webservices.http.header')
+@mock.patch('pulp.server.webservices.http.status_ok')
+class TestStreamQueryResults(unittest.TestCase):
+    DOCUMENTS = [{'_id': 'a', 'id': 1}, {'_id': 'b', 'id': 2}, {'_id': 'c', 'id': 3}]
+
+    def setUp(self):
+        self.mock_query_method = mock.MagicMock(return_value=iter(self.DOCUMENTS))
+        self.controller = SearchController(self.mock_query_method)
+
+    def stream(self, criteria, process=None):
+        return json.loads(''.join(self.controller._stream_query_results(criteria, process)))
+
+    def test_results(self, mock_status, mock_header):
+        self.assertEqual(self.stream(Criteria()), self.DOCUMENTS)
+        mock_header.assert_called_once_with('Content-Type', 'application/json')
+
+    @mock.patch.object(search, 'STREAM_BATCH_SIZE', 2)
+    def test_process_in_batches(self, mock_status, mock_header):
+        process = mock.MagicMock(side_effect=lambda batch: [d['id'] for d in batch])
+        self.assertEqual(self.stream(Criteria(), process), [1, 2, 3])
+        self.assertEqual(process.call_args_list, [mock.call(self.DOCUMENTS[:2]),
+                                                  mock.call(self.DOCUMENTS[2:])])
+
+    @mock.patch('web.input', return_value={'field': [], 'cursor': '', 'limit': '3'})
+    def test_cursor_full_page(self, mock_input, mock_status, mock_header):
+        criteria = self.controller._get_criteria_from_get()
+        body = self.stream(criteria)
+        self.assertEqual(body['results'], self.DOCUMENTS)
+        self.assertEqual(search.decode_cursor(body['next_cursor']), 'c')
+
+    def test_cursor_last_page(self, mock_status, mock_header):
+        self.controller.params = mock.MagicMock(return_value={'criteria': {'limit': 5},
+                                                              'cursor': ''})
+        criteria = self.controller._get_criteria_from_post()
+        body = self.stream(criteria)
+        self.assertEqual(body, {'results': self.DOCUMENTS, 'next_cursor': None})
+
+    def test_error_before_first_chunk(self, mock_status, mock_header):
+        self.mock_query_method.side_effect = ValueError()
+        self.assertRaises(ValueError, list, self.controller._stream_query_results(Criteria()))
+
+    @mock.patch('pulp.server.webservices.controllers.base.STREAM_CHUNK_SIZE', 1)
+    @mock.patch.object(search, 'STREAM_BATCH_SIZE', 1)
+    @mock.patch.object(search, '_logger')
+    def test_error_after_first_chunk(self, mock_logger, mock_status, mock_header):
+        def documents():
+            yield self.DOCUMENTS[0]
+            raise ValueError()
+        self.mock_query_method.return_value = documents()
+
+        chunks = list(self.controller._stream_query_results(Criteria()))
+
+        # the body ends early and is not valid JSON
+        self.assertEqual(chunks, ['[{"_id": "a", "id": 1}'])
+        self.assertEqual(mock_logger.exception.call_count, 1)
@@ -11,7 +11,10 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import unittest
+
 import mock
+from pymongo.errors import BulkWriteError
 
 from pulp.plugins.conduits.profiler import ProfilerConduit
 from pulp.plugins.loader import api as plugins
@@ -24,7 +27,8 @@ from pulp.server.managers.consumer.applicability import (
     _add_consumers_to_applicability_map, _add_profiles_to_consumer_map_and_get_hashes,
     _add_repo_ids_to_consumer_map, _format_report, _get_applicability_map,
     _get_consumer_applicability_map, DoesNotExist, MultipleObjectsReturned,
-    retrieve_consumer_applicability, ApplicabilityRegenerationManager)
+    retrieve_consumer_applicability, ApplicabilityRegenerationManager,
+    SAVE_APPLICABILITY_ATTEMPTS)
 from pulp.server.managers.consumer.bind import BindManager
 from pulp.server.managers.consumer.cud import ConsumerManager
 from pulp.server.managers.consumer.profile import ProfileManager
@@ -306,6 +310,104 @@ class ApplicabilityRegenerationManagerTests(base.PulpServerTests):
         self.assertEqual(applicability_list[0]['profile'], self.PROFILE1)
         self.assertEqual(applicability_list[0]['applicability'], expected_applicability)
 
+    def test_regenerate_applicability_for_consumers_batches_profiles(self):
+        # Setup
+        self.populate_consumers_different_profiles()
+        self.populate_bindings()
+        profiler, cfg = plugins.get_profiler_by_type('rpm')
+        # Test
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        # Verify that the profiler is called once per repo with both profiles
+        self.assertEqual(profiler.calculate_applicable_units_batch.call_count, 2)
+        for call in profiler.calculate_applicable_units_batch.call_args_list:
+            self.assertEqual(sorted(call[0][0].values()), sorted([self.PROFILE1, self.PROFILE2]))
+
+    def test_regenerate_applicability_for_consumers_skips_existing(self):
+        # Setup
+        self.populate_consumers()
+        self.populate_bindings()
+        manager = factory.applicability_regeneration_manager()
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        profiler, cfg = plugins.get_profiler_by_type('rpm')
+        profiler.calculate_applicable_units_batch.reset_mock()
+        # Test
+        manager.regenerate_applicability_for_consumers(self.CONSUMER_CRITERIA)
+        # Verify
+        self.assertEqual(profiler.calculate_applicable_units_batch.call_count, 0)
+
+    @mock.patch('pulp.server.managers.consumer.applicability.REPO_BATCH_SIZE', 1)
+    @mock.patch('pulp.server.managers.consumer.applicability.'
+                'regenerate_applicability_for_repo_ids')
+    def test_regenerate_applicability_for_repos_spawns_tasks(self, mock_task):
+        # Setup
+        self.populate_repos()
+        # Test
+        manager = factory.applicability_regeneration_manager()
+        result = manager.regenerate_applicability_for_repos(self.REPO_CRITERIA)
+        # Verify
+        self.assertEqual(mock_task.apply_async.call_count, 2)
+        batches = [c[0][0] for c in mock_task.apply_async.call_args_list]
+        self.assertEqual(batches, [(['repo-1'],), (['repo-2'],)])
+        self.assertEqual(len(result.spawned_tasks), 2)
+
+
+@mock.patch('pulp.server.db.model.consumer.RepoProfileApplicability.get_collection')
+@mock.patch('pulp.server.managers.consumer.applicability.ApplicabilityRegenerationManager.'
+            '_get_existing_repo_content_types', return_value=['rpm'])
+@mock.patch('pulp.server.managers.consumer.applicability.ApplicabilityRegenerationManager.'
+            '_profiler')
+class TestRegenerateApplicabilityBatch(unittest.TestCase):
+    def setUp(self):
+        super(TestRegenerateApplicabilityBatch, self).setUp()
+        self.profiler = mock.Mock()
+        self.profiler.metadata.return_value = {'types': ['rpm']}
+        self.profiler.calculate_applicable_units_batch.return_value = {'hash-1': {'rpm': []}}
+
+    def regenerate(self, mock_profiler):
+        mock_profiler.return_value = self.profiler, {}
+        ApplicabilityRegenerationManager.regenerate_applicability_batch(
+            'rpm', 'repo-1', {'hash-1': {'name': 'zsh'}})
+
+    def test_upserts(self, mock_profiler, mock_content_types, mock_get_collection):
+        bulk = mock_get_collection.return_value.initialize_unordered_bulk_op.return_value
+
+        self.regenerate(mock_profiler)
+
+        bulk.find.assert_called_once_with({'profile_hash': 'hash-1', 'repo_id': 'repo-1'})
+        bulk.find.return_value.upsert.return_value.update_one.assert_called_once_with(
+            {'$set': {'profile': {'name': 'zsh'}, 'applicability': {'rpm': []}}})
+        self.assertEqual(bulk.execute.call_count, 1)
+
+    def test_retries_duplicate_key(self, mock_profiler, mock_content_types, mock_get_collection):
+        bulk = mock_get_collection.return_value.initialize_unordered_bulk_op.return_value
+        bulk.execute.side_effect = [self.bulk_write_error(11000), None]
+
+        self.regenerate(mock_profiler)
+
+        self.assertEqual(bulk.execute.call_count, 2)
+
+    def test_retries_bounded(self, mock_profiler, mock_content_types, mock_get_collection):
+        bulk = mock_get_collection.return_value.initialize_unordered_bulk_op.return_value
+        bulk.execute.side_effect = self.bulk_write_error(11000)
+
+        self.assertRaises(BulkWriteError, self.regenerate, mock_profiler)
+
+        self.assertEqual(bulk.execute.call_count, SAVE_APPLICABILITY_ATTEMPTS)
+
+    def test_other_error_not_retried(self, mock_profiler, mock_content_types,
+                                     mock_get_collection):
+        bulk = mock_get_collection.return_value.initialize_unordered_bulk_op.return_value
+        bulk.execute.side_effect = self.bulk_write_error(121)
+
+        self.assertRaises(BulkWriteError, self.regenerate, mock_profiler)
+
+        self.assertEqual(bulk.execute.call_count, 1)
+
+    @staticmethod
+    def bulk_write_error(code):
+        return BulkWriteError({'writeErrors': [{'code': code}]})
+
 
 class TestRepoProfileApplicabilityManager(base.PulpServerTests):
     """
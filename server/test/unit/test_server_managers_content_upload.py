@@ -9,9 +9,12 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import hashlib
 import os
 import shutil
 
+import mock
+
 import base
 
 from pulp.devel import mock_plugins
@@ -21,6 +24,7 @@ from pulp.server.db.model.auth import User
 from pulp.server.db.model.repository import Repo, RepoImporter
 from pulp.server.exceptions import (MissingResource, PulpDataException, PulpExecutionException,
                                     InvalidValue)
+from pulp.server.managers.content import upload
 from pulp.server.managers.repo.unit_association import OWNER_TYPE_USER
 import pulp.server.managers.factory as manager_factory
 
@@ -98,6 +102,81 @@ class ContentUploadManagerTests(base.PulpServerTests):
 
         self.assertEqual(expected_size, found_size)
 
+    def test_save_data_out_of_order(self):
+        upload_id = self.upload_manager.initialize_upload()
+
+        self.upload_manager.save_data(upload_id, 6, 'ghi')
+        self.upload_manager.save_data(upload_id, 3, 'def')
+        state = self.upload_manager.get_upload_state(upload_id)
+        self.assertEqual(state['ranges'], [[3, 9]])
+        self.assertEqual(state['hashed'], 0)
+
+        self.upload_manager.save_data(upload_id, 0, 'abc')
+
+        self.assertEqual(self.upload_manager.read_upload(upload_id), 'abcdefghi')
+        state = self.upload_manager.get_upload_state(upload_id)
+        self.assertEqual(state['ranges'], [[0, 9]])
+        self.assertEqual(state['hashed'], 9)
+        self.assertEqual(state['checksum'], hashlib.sha256('abcdefghi').hexdigest())
+
+    def test_save_data_checksum_held_by_other_process(self):
+        upload_id = self.upload_manager.initialize_upload()
+        self.upload_manager.save_data(upload_id, 0, 'abc')
+        upload._upload_digests.clear()
+
+        self.upload_manager.save_data(upload_id, 3, 'def')
+
+        state = self.upload_manager.get_upload_state(upload_id)
+        self.assertEqual(state['ranges'], [[0, 6]])
+        self.assertEqual(state['hashed'], 3)
+        self.assertEqual(state['checksum'], hashlib.sha256('abc').hexdigest())
+
+    def _existing_unit(self, checksum='abc', **fields):
+        storage_path = os.path.join(self.upload_manager._upload_storage_dir(), 'stored')
+        with open(storage_path, 'w') as f:
+            f.write('stored')
+        unit = {'_id': 'unit-1', '_storage_path': storage_path, 'checksum': checksum}
+        unit.update(fields)
+        return unit
+
+    @mock.patch('pulp.server.managers.factory.content_query_manager')
+    def test_find_existing_unit(self, mock_query_manager):
+        get_units = mock_query_manager.return_value.get_multiple_units_by_keys_dicts
+        get_units.return_value = [self._existing_unit(checksumtype='sha')]
+        upload_id = self.upload_manager.initialize_upload()
+
+        unit_id = self.upload_manager.find_existing_unit(upload_id, 'mock-type', {'k': 'v'},
+                                                         'sha1', 'ABC')
+
+        self.assertEqual(unit_id, 'unit-1')
+        get_units.assert_called_once_with('mock-type', ({'k': 'v'},))
+        state = self.upload_manager.get_upload_state(upload_id)
+        self.assertEqual(state['existing_unit_id'], 'unit-1')
+        self.assertEqual(state['existing_unit_type_id'], 'mock-type')
+        self.assertEqual(state['existing_unit_key'], {'k': 'v'})
+
+    @mock.patch('pulp.server.managers.factory.content_query_manager')
+    def test_find_existing_unit_not_present(self, mock_query_manager):
+        get_units = mock_query_manager.return_value.get_multiple_units_by_keys_dicts
+        upload_id = self.upload_manager.initialize_upload()
+        unit = self._existing_unit()
+
+        # No unit, a different checksum, a different checksum type and missing bits
+        for units in ([], [self._existing_unit(checksum='def')],
+                      [self._existing_unit(checksumtype='md5')],
+                      [dict(unit, _storage_path=unit['_storage_path'] + '-missing')]):
+            get_units.return_value = units
+            unit_id = self.upload_manager.find_existing_unit(upload_id, 'mock-type', {},
+                                                             'sha256', 'abc')
+            self.assertEqual(unit_id, None)
+
+        self.assertEqual(self.upload_manager.get_upload_state(upload_id)['existing_unit_id'],
+                         None)
+
+    def test_find_existing_unit_no_init(self):
+        self.assertRaises(MissingResource, self.upload_manager.find_existing_unit, 'foo',
+                          'mock-type', {}, 'sha256', 'abc')
+
     def test_save_no_init(self):
 
         # Test
@@ -121,6 +200,8 @@ class ContentUploadManagerTests(base.PulpServerTests):
 
         # Verify
         self.assertTrue(not os.path.exists(uploaded_filename))
+        self.assertFalse(os.path.exists(self.upload_manager._upload_state_path(upload_id)))
+        self.assertFalse(upload_id in upload._upload_digests)
 
     def test_list_upload_ids(self):
 
@@ -177,6 +258,7 @@ class ContentUploadManagerTests(base.PulpServerTests):
         mock_plugins.MOCK_IMPORTER.upload_unit.return_value = importer_return_report
 
         upload_id = self.upload_manager.initialize_upload()
+        self.upload_manager.save_data(upload_id, 0, 'abc')
         file_path = self.upload_manager._upload_file_path(upload_id)
 
         fake_user = User('import-user', '')
@@ -200,11 +282,56 @@ class ContentUploadManagerTests(base.PulpServerTests):
         self.assertEqual(call_args[5].repo_id, 'repo-u')
         self.assertEqual(conduit.association_owner_type, OWNER_TYPE_USER)
         self.assertEqual(conduit.association_owner_id, fake_user.login)
+        self.assertEqual(conduit.get_upload_checksum('sha256'), hashlib.sha256('abc').hexdigest())
 
         # Clean up
         mock_plugins.MOCK_IMPORTER.upload_unit.return_value = None
         manager_factory.principal_manager().set_principal(principal=None)
 
+    @mock.patch('pulp.server.managers.factory.repo_unit_association_manager')
+    @mock.patch('pulp.server.managers.factory.content_query_manager')
+    def test_import_uploaded_unit_existing_unit(self, mock_query_manager, mock_association):
+        self.repo_manager.create_repo('repo-u')
+        self.importer_manager.set_importer('repo-u', 'mock-importer', {})
+        get_units = mock_query_manager.return_value.get_multiple_units_by_keys_dicts
+        get_units.return_value = [self._existing_unit()]
+        upload_id = self.upload_manager.initialize_upload()
+        self.upload_manager.find_existing_unit(upload_id, 'mock-type', {}, 'sha256', 'abc')
+        manager_factory.principal_manager().set_principal(principal=User('import-user', ''))
+
+        report = self.upload_manager.import_uploaded_unit('repo-u', 'mock-type', {}, {},
+                                                          upload_id)
+
+        self.assertEqual(report, {'success_flag': True,
+                                  'summary': 'Associated existing unit [unit-1]',
+                                  'details': {}})
+        self.assertFalse(mock_plugins.MOCK_IMPORTER.upload_unit.called)
+        mock_association.return_value.associate_unit_by_id.assert_called_once_with(
+            'repo-u', 'mock-type', 'unit-1', OWNER_TYPE_USER, 'import-user')
+
+        manager_factory.principal_manager().set_principal(principal=None)
+
+    @mock.patch('pulp.server.managers.factory.repo_unit_association_manager')
+    @mock.patch('pulp.server.managers.factory.content_query_manager')
+    def test_import_uploaded_unit_existing_unit_mismatch(self, mock_query_manager,
+                                                         mock_association):
+        self.repo_manager.create_repo('repo-u')
+        self.importer_manager.set_importer('repo-u', 'mock-importer', {})
+        get_units = mock_query_manager.return_value.get_multiple_units_by_keys_dicts
+        get_units.return_value = [self._existing_unit()]
+
+        # Units found for a different unit key or a different unit type are not used
+        for unit_type_id, unit_key in (('mock-type', {'k': 'other'}), ('other-type', {'k': 'v'})):
+            upload_id = self.upload_manager.initialize_upload()
+            self.upload_manager.find_existing_unit(upload_id, unit_type_id, unit_key, 'sha256',
+                                                   'abc')
+            mock_plugins.MOCK_IMPORTER.upload_unit.reset_mock()
+            self.upload_manager.import_uploaded_unit('repo-u', 'mock-type', {'k': 'v'}, {},
+                                                     upload_id)
+            self.assertEqual(mock_plugins.MOCK_IMPORTER.upload_unit.call_count, 1)
+
+        self.assertFalse(mock_association.return_value.associate_unit_by_id.called)
+
     def test_import_uploaded_unit_missing_repo(self):
         # Test
         self.assertRaises(MissingResource, self.upload_manager.import_uploaded_unit, 'fake', 'mock-type', {}, {}, 'irrelevant')
@@ -13,6 +13,7 @@
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
 import base
+import mock
 
 import pulp.plugins.types.database as types_db
 from pulp.plugins.types.model import TypeDefinition
@@ -260,6 +261,67 @@ class TypesDatabaseTests(base.PulpServerTests):
         # Verify
         self.assertTrue(indexes is None)
 
+    def test_definitions_cached(self):
+        """
+        Tests the definitions are only read from the database again after they change.
+        """
+
+        # Setup
+        types_db.update_database([DEF_1, DEF_2])
+        self.assertEqual(['single_1'], types_db.type_units_unit_key(DEF_1.id))
+
+        # Test
+        with mock.patch.object(ContentType, 'get_collection') as mock_get_collection:
+            unit_key = types_db.type_units_unit_key(DEF_2.id)
+            type_def = types_db.type_definition(DEF_2.id)
+            type_ids = types_db.all_type_ids()
+        self.assertFalse(mock_get_collection.called)
+
+        types_db.update_database([DEF_1, DEF_2, DEF_3])
+
+        # Verify
+        self.assertEqual(['single_1'], unit_key)
+        self.assertEqual(DEF_2.id, type_def['id'])
+        self.assertEqual([DEF_1.id, DEF_2.id], type_ids)
+        self.assertEqual(['compound_1', 'compound_2'], types_db.type_units_unit_key(DEF_3.id))
+        self.assertEqual(3, len(types_db.all_type_ids()))
+
+        types_db.clean()
+        self.assertEqual([], types_db.all_type_ids())
+
+    def test_definitions_cached_copies(self):
+        """
+        Tests callers modifying a definition do not modify the cached one.
+        """
+
+        # Setup
+        types_db.update_database([DEF_3])
+
+        # Test
+        types_db.type_definition(DEF_3.id)['unit_key'].append('extra')
+        types_db.type_units_unit_key(DEF_3.id).append('extra')
+
+        # Verify
+        self.assertEqual(['compound_1', 'compound_2'], types_db.type_units_unit_key(DEF_3.id))
+
+    def test_definitions_reloaded_for_unknown_type(self):
+        """
+        Tests a type added to the database by another process is found.
+        """
+
+        # Setup
+        types_db.update_database([DEF_1])
+        types_db.all_type_ids()
+        ContentType.get_collection().save(ContentType(DEF_2.id, DEF_2.display_name,
+                                                      DEF_2.description, DEF_2.unit_key,
+                                                      DEF_2.search_indexes, []), safe=True)
+
+        # Test
+        unit_key = types_db.type_units_unit_key(DEF_2.id)
+
+        # Verify
+        self.assertEqual(['single_1'], unit_key)
+
     # -- utility method tests ------------------------------------------------
 
     def test_create_or_update_type_collection(self):